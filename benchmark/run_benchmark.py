@@ -0,0 +1,60 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+import sys
+import os
+currentdir = os.path.dirname(os.path.abspath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(currentdir)
+sys.path.append(parentdir)
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+import yaml
+from xoa_cpom.benchmark import *
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the optimize modes of the tests against the simulated tester")
+    parser.add_argument("--config", default=os.path.join(currentdir, "benchmark_config.yml"), help="benchmark configuration file")
+    parser.add_argument("--baseline", default=os.path.join(currentdir, "baseline.json"), help="baseline results to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to the baseline file instead of comparing")
+    parser.add_argument("--output", default=None, help="output directory of the results, test reports and logs")
+    parser.add_argument("--only", nargs="*", default=None, help="run only the scenarios whose name contains one of these strings")
+    args = parser.parse_args()
+
+    config_file = os.path.abspath(args.config)
+    baseline_file = os.path.abspath(args.baseline)
+    output_dir = os.path.abspath(args.output or os.path.join(tempfile.gettempdir(), "xena_cpom_benchmark_" + time.strftime("%Y%m%d_%H%M%S", time.localtime())))
+    os.makedirs(output_dir, exist_ok=True)
+    os.chdir(output_dir)
+
+    # log to a file only, the tests do not add their own handlers if the root logger has one
+    logging.basicConfig(format="%(asctime)s  %(message)s", level=logging.INFO, handlers=[logging.FileHandler(filename=os.path.join(output_dir, "benchmark.log"), mode="a")])
+
+    results = await run_benchmark(config_file, output_dir, args.only)
+    print(format_results(results))
+    save_results(os.path.join(output_dir, "results.json"), results)
+    print(f"Results: {os.path.join(output_dir, 'results.json')}")
+
+    if args.update_baseline:
+        baseline = load_baseline(baseline_file) if os.path.exists(baseline_file) else {}
+        baseline.update(results)
+        save_results(baseline_file, baseline)
+        print(f"Baseline updated: {baseline_file}")
+        return 0
+
+    if not os.path.exists(baseline_file):
+        print(f"No baseline: {baseline_file}")
+        return 0
+    with open(config_file, "r") as f:
+        benchmark_config = BenchmarkConfig.model_validate(yaml.safe_load(f)["benchmark_config"])
+    regressions = compare_to_baseline(results, load_baseline(baseline_file), benchmark_config.cost_tolerance, benchmark_config.ber_penalty_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
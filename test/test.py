@@ -15,7 +15,13 @@ async def main():
     stop_event = asyncio.Event()
     try:
         test = XenaCablePerfOptimization("test_config.yml")
-        await test.run()
+        if "--dry-run" in sys.argv[1:]:
+            await test.dry_run()
+        elif "--resume" in sys.argv[1:]:
+            # resume the interrupted run in the given report directory
+            await test.run(resume=sys.argv[sys.argv.index("--resume") + 1])
+        else:
+            await test.run()
         
     except KeyboardInterrupt:
         stop_event.set()
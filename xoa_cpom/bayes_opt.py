@@ -0,0 +1,214 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import math
+from typing import List, Tuple, Dict, Any, Sequence, Optional
+
+# *************************************************************************************
+# func: log_ber_score
+# description: Convert a PRBS measurement to log10(BER) for the surrogate model
+# *************************************************************************************
+def log_ber_score(lane_ber_dict: Dict[str, Any]) -> float:
+    """Convert a PRBS measurement to log10(BER) for the surrogate model. Half an error is added to the error count, so a window with no error still gets a finite score, which is lower for longer windows.
+
+    :param lane_ber_dict: Dictionary containing {"prbs_ber": PRBS BER value}, and optionally {"error_count": number of errors, "bit_count": number of bits}
+    :type lane_ber_dict: Dict[str, Any]
+    :return: log10(BER). 0 (BER = 1) if no bit was received.
+    :rtype: float
+    """
+    if "bit_count" in lane_ber_dict and "error_count" in lane_ber_dict:
+        if lane_ber_dict["bit_count"] <= 0:
+            return 0.0
+        return min(0.0, math.log10((lane_ber_dict["error_count"] + 0.5) / lane_ber_dict["bit_count"]))
+    return min(0.0, math.log10(max(lane_ber_dict["prbs_ber"], 1e-20)))
+
+
+# *************************************************************************************
+# func: matern52
+# description: Matern 5/2 kernel
+# *************************************************************************************
+def matern52(a: Sequence[float], b: Sequence[float], length_scale: float, variance: float) -> float:
+    """Matern 5/2 covariance of two points. It assumes a surface that is smooth, but less smooth than the squared exponential kernel, which suits BER surfaces measured on a coarse grid.
+    """
+    r = math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b))) / length_scale
+    s = math.sqrt(5.0) * r
+    return variance * (1.0 + s + s * s / 3.0) * math.exp(-s)
+
+
+# *************************************************************************************
+# func: cholesky
+# description: Cholesky decomposition of a symmetric positive definite matrix
+# *************************************************************************************
+def cholesky(matrix: List[List[float]]) -> List[List[float]]:
+    """Cholesky decomposition of a symmetric positive definite matrix, matrix = L * L^T
+
+    :param matrix: Symmetric positive definite matrix
+    :type matrix: List[List[float]]
+    :return: Lower triangular matrix L
+    :rtype: List[List[float]]
+    """
+    n = len(matrix)
+    lower = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        row_i = lower[i]
+        for j in range(i + 1):
+            row_j = lower[j]
+            total = matrix[i][j] - sum(row_i[k] * row_j[k] for k in range(j))
+            if i == j:
+                if total <= 0:
+                    raise ValueError("Matrix is not positive definite")
+                row_i[j] = math.sqrt(total)
+            else:
+                row_i[j] = total / row_j[j]
+    return lower
+
+
+# *************************************************************************************
+# func: solve_lower
+# description: Solve L * x = b for a lower triangular matrix L
+# *************************************************************************************
+def solve_lower(lower: List[List[float]], b: Sequence[float]) -> List[float]:
+    x: List[float] = []
+    for i, row in enumerate(lower):
+        x.append((b[i] - sum(row[k] * x[k] for k in range(i))) / row[i])
+    return x
+
+
+# *************************************************************************************
+# func: solve_upper
+# description: Solve L^T * x = b for a lower triangular matrix L
+# *************************************************************************************
+def solve_upper(lower: List[List[float]], b: Sequence[float]) -> List[float]:
+    n = len(lower)
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        x[i] = (b[i] - sum(lower[k][i] * x[k] for k in range(i + 1, n))) / lower[i][i]
+    return x
+
+
+# *************************************************************************************
+# class: GaussianProcess
+# description: Gaussian process regression with a Matern 5/2 kernel
+# *************************************************************************************
+class GaussianProcess:
+    """Gaussian process regression with a Matern 5/2 kernel and a constant mean. The length scale and the noise are chosen from a small set of candidates by the log marginal likelihood.
+
+    The test grids are small (at most a few hundred points and a few dozen measurements), so the model is written in plain Python.
+    """
+    LENGTH_SCALES = (1.0, 2.0, 3.0, 5.0)   # in grid steps
+    NOISE_VARIANCES = (0.01, 0.05, 0.25)   # in decades^2 of BER
+
+    def __init__(self) -> None:
+        self.points: List[Tuple[float, ...]] = []
+        self.mean = 0.0
+        self.variance = 1.0
+        self.length_scale = 1.0
+        self.noise = 0.01
+        self.lower: List[List[float]] = []
+        self.alpha: List[float] = []
+
+    def fit(self, points: Sequence[Sequence[float]], values: Sequence[float]) -> None:
+        """Fit the model to measured points
+
+        :param points: Measured points
+        :type points: Sequence[Sequence[float]]
+        :param values: Measured values, e.g. log10(BER)
+        :type values: Sequence[float]
+        """
+        self.points = [tuple(float(x) for x in point) for point in points]
+        n = len(values)
+        self.mean = sum(values) / n
+        centered = [value - self.mean for value in values]
+        self.variance = max(sum(c * c for c in centered) / n, 0.01)
+        best = None
+        for length_scale in self.LENGTH_SCALES:
+            for noise in self.NOISE_VARIANCES:
+                try:
+                    lower, alpha = self.__factorize(centered, length_scale, noise)
+                except ValueError:
+                    continue
+                # log marginal likelihood, without the constant term
+                likelihood = -0.5 * sum(c * a for c, a in zip(centered, alpha)) - sum(math.log(lower[i][i]) for i in range(n))
+                if best is None or likelihood > best[0]:
+                    best = (likelihood, length_scale, noise, lower, alpha)
+        if best is None:
+            raise ValueError("Unable to fit the Gaussian process")
+        _, self.length_scale, self.noise, self.lower, self.alpha = best
+
+    def __factorize(self, centered: List[float], length_scale: float, noise: float) -> Tuple[List[List[float]], List[float]]:
+        n = len(centered)
+        matrix = [[matern52(self.points[i], self.points[j], length_scale, self.variance) for j in range(n)] for i in range(n)]
+        for i in range(n):
+            matrix[i][i] += noise + 1e-9
+        lower = cholesky(matrix)
+        alpha = solve_upper(lower, solve_lower(lower, centered))
+        return lower, alpha
+
+    def predict(self, point: Sequence[float]) -> Tuple[float, float]:
+        """Predict the value at a point
+
+        :param point: The point
+        :type point: Sequence[float]
+        :return: Tuple of (posterior mean, posterior standard deviation)
+        :rtype: Tuple[float, float]
+        """
+        point = tuple(float(x) for x in point)
+        k = [matern52(point, p, self.length_scale, self.variance) for p in self.points]
+        mean = self.mean + sum(a * b for a, b in zip(k, self.alpha))
+        v = solve_lower(self.lower, k)
+        var = self.variance - sum(x * x for x in v)
+        return mean, math.sqrt(max(var, 1e-12))
+
+
+# *************************************************************************************
+# func: expected_improvement
+# description: Expected improvement of a point over the best value, for minimization
+# *************************************************************************************
+def expected_improvement(mean: float, std: float, best: float) -> float:
+    """Expected improvement of a point over the best value, for minimization
+
+    :param mean: Posterior mean of the point
+    :type mean: float
+    :param std: Posterior standard deviation of the point
+    :type std: float
+    :param best: The best (lowest) value so far
+    :type best: float
+    :return: Expected improvement, in the unit of the values
+    :rtype: float
+    """
+    if std <= 0:
+        return max(0.0, best - mean)
+    z = (best - mean) / std
+    cdf = 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+    pdf = math.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+    return (best - mean) * cdf + std * pdf
+
+
+# *************************************************************************************
+# func: spread_points
+# description: Pick points of a grid that are spread as far apart as possible
+# *************************************************************************************
+def spread_points(grid: Sequence[Tuple[int, ...]], count: int) -> List[Tuple[int, ...]]:
+    """Pick points of a grid that are spread as far apart as possible (greedy maximin), starting from the point closest to the center of the grid. The result is deterministic.
+
+    :param grid: Grid points
+    :type grid: Sequence[Tuple[int, ...]]
+    :param count: Number of points to pick
+    :type count: int
+    :return: List of grid points
+    :rtype: List[Tuple[int, ...]]
+    """
+    if len(grid) == 0 or count <= 0:
+        return []
+    dims = len(grid[0])
+    center = [sum(point[d] for point in grid) / len(grid) for d in range(dims)]
+    distance = lambda a, b: sum((x - y) ** 2 for x, y in zip(a, b))
+    chosen = [min(grid, key=lambda point: distance(point, center))]
+    nearest = {point: distance(point, chosen[0]) for point in grid}
+    while len(chosen) < min(count, len(grid)):
+        point = max(grid, key=lambda p: nearest[p])
+        chosen.append(point)
+        for p in grid:
+            nearest[p] = min(nearest[p], distance(p, point))
+    return chosen
@@ -0,0 +1,294 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import copy
+import json
+import logging
+import math
+import os
+import time
+import yaml
+from typing import List, Dict, Any, Tuple, Optional, Sequence
+from .models import *
+from .cpom import XenaCablePerfOptimization
+
+SUBTEST_KEYS = ("tcvr_rx_output_eq_test_config", "tcvr_tx_input_eq_test_config", "host_tx_eq_test_config")
+
+COST_METRICS = ("simulated_time", "prbs_windows", "round_trips", "cmis_writes", "commissions")
+"""
+Metrics that must not grow by more than the cost tolerance over the baseline. The real time depends on the machine, so it is reported but not compared.
+"""
+
+# *************************************************************************************
+# class: PrbsWindowCounter
+# description: Count the PRBS measurement windows of a test run
+# *************************************************************************************
+class PrbsWindowCounter(logging.Handler):
+    """Logging handler that counts the PRBS measurement windows of a test run. Every measurement mode of :func:`xoa_cpom.prbs_control.measure_prbs_ber` logs one "Measuring PRBS for" line per window.
+    """
+    def __init__(self) -> None:
+        super().__init__(level=logging.INFO)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.getMessage().startswith("Measuring PRBS for"):
+            self.count += 1
+
+
+# *************************************************************************************
+# func: block_distance
+# description: Distance of EQ settings from the optimum of the simulated BER surface
+# *************************************************************************************
+def block_distance(values: Sequence[float], optimum: Sequence[float], width: Sequence[float]) -> Tuple[float, float]:
+    """Distance of EQ settings from the optimum of the simulated BER surface
+
+    :param values: EQ settings
+    :type values: Sequence[float]
+    :param optimum: Optimum settings
+    :type optimum: Sequence[float]
+    :param width: Widths of the BER surface, see :class:`xoa_cpom.models.SimulatedBerSurfaceConfig`
+    :type width: Sequence[float]
+    :return: Tuple of (Euclidean distance in EQ steps, BER penalty in decades)
+    :rtype: Tuple[float, float]
+    """
+    steps = math.sqrt(sum((v - o) ** 2 for v, o in zip(values, optimum)))
+    penalty = sum(((v - o) / w) ** 2 for v, o, w in zip(values, optimum, width))
+    return steps, penalty
+
+
+# *************************************************************************************
+# func: port_pair_names
+# description: Map the port pair names of the test reports to the RX port of the pair
+# *************************************************************************************
+def port_pair_names(port_pair_list: List[PortPair], separator: str) -> Dict[str, str]:
+    result = {}
+    for port_pair in port_pair_list:
+        tx_port_txt = f"Port {port_pair.tx.split(':')[1]}"
+        rx_port_txt = f"Port {port_pair.rx.split(':')[1]}"
+        result[f"{tx_port_txt} {separator} {rx_port_txt}"] = port_pair.rx
+    return result
+
+
+# *************************************************************************************
+# func: score_results
+# description: Score the best result of each lane against the simulated BER surface
+# *************************************************************************************
+def score_results(test: XenaCablePerfOptimization, subtest: str) -> List[Tuple[float, float]]:
+    """Score the best result of each lane, i.e. the result the test reports, against the optimum of the simulated BER surface of the lane
+
+    :param test: A finished test run
+    :type test: XenaCablePerfOptimization
+    :param subtest: Key of the subtest in the test configuration
+    :type subtest: str
+    :return: List of (distance in EQ steps, BER penalty in decades), one per lane
+    :rtype: List[Tuple[float, float]]
+    """
+    testbed = test.testbed
+    assert testbed is not None
+    scores: List[Tuple[float, float]] = []
+    if subtest == "tcvr_rx_output_eq_test_config":
+        assert test.rx_output_eq_optimization_test is not None
+        report_gen = test.rx_output_eq_optimization_test.report_gen
+        names = port_pair_names(test.rx_output_eq_optimization_test.test_config.port_pair_list, "-->")
+        for port_name, lane_records in report_gen.best_results().items():
+            for lane, record in lane_records.items():
+                surface = testbed.surfaces[(names[port_name], lane)]
+                values = [record["Amplitude"], record["PreCursor"], record["PostCursor"]]
+                scores.append(block_distance(values, surface.rx_output_eq_optimum, surface.rx_output_eq_width))
+    elif subtest == "tcvr_tx_input_eq_test_config":
+        assert test.tx_input_eq_optimization_test is not None
+        report_gen = test.tx_input_eq_optimization_test.report_gen
+        names = port_pair_names(test.tx_input_eq_optimization_test.test_config.port_pair_list, "-->")
+        for port_name, lane_records in report_gen.best_results().items():
+            for lane, record in lane_records.items():
+                surface = testbed.surfaces[(names[port_name], lane)]
+                scores.append(block_distance([record["Tx EQ"]], [surface.tx_input_eq_optimum], [surface.tx_input_eq_width]))
+    else:
+        assert test.host_tx_eq_optimization_test is not None
+        report_gen = test.host_tx_eq_optimization_test.report_gen
+        test_config = test.host_tx_eq_optimization_test.test_config
+        names = port_pair_names(test_config.port_pair_list, "->")
+        for port_name, lane_records in report_gen.best_results().items():
+            tap_names = report_gen.setting_fieldnames(port_name)
+            num_txtaps_pre = len([name for name in tap_names if name.startswith("Pre")])
+            # only the optimized taps count, the other taps stay at the start values
+            positions = [num_txtaps_pre + txeq_id for txeq_id in test_config.optimize_txeq_ids]
+            for lane, record in lane_records.items():
+                surface = testbed.surfaces[(names[port_name], lane)]
+                values = [record[tap_names[i]] for i in positions]
+                scores.append(block_distance(values, [surface.host_txeq_optimum[i] for i in positions], [surface.host_txeq_width[i] for i in positions]))
+    return scores
+
+
+# *************************************************************************************
+# func: run_benchmark_case
+# description: Run one subtest in one optimize mode against the simulator
+# *************************************************************************************
+async def run_benchmark_case(test_config: Dict[str, Any], subtest: str, optimize_mode: str, seed: int, work_dir: str, simulator: Dict[str, Any] = {}) -> Dict[str, Any]:
+    """Run one subtest in one optimize mode against the simulator, with the other subtests removed from the test configuration
+
+    :param test_config: The "test_config" section of a test configuration with a simulator
+    :type test_config: Dict[str, Any]
+    :param subtest: Key of the subtest in the test configuration
+    :type subtest: str
+    :param optimize_mode: Optimize mode of the subtest
+    :type optimize_mode: str
+    :param seed: Simulator seed
+    :type seed: int
+    :param work_dir: Directory of the generated test configuration files
+    :type work_dir: str
+    :param simulator: Simulator settings that replace those of the test configuration, defaults to {}
+    :type simulator: Dict[str, Any], optional
+    :return: Metrics of the run
+    :rtype: Dict[str, Any]
+    """
+    case_config = copy.deepcopy(test_config)
+    for key in SUBTEST_KEYS:
+        if key != subtest:
+            case_config.pop(key, None)
+    case_config[subtest]["optimize_mode"] = optimize_mode
+    case_config["simulator"].update(copy.deepcopy(simulator))
+    case_config["simulator"]["seed"] = seed
+    config_file = os.path.join(work_dir, f"{subtest}_{optimize_mode}_{seed}.yml")
+    with open(config_file, "w") as f:
+        yaml.safe_dump({"test_config": case_config}, f)
+
+    test = XenaCablePerfOptimization(config_file)
+    counter = PrbsWindowCounter()
+    logger = logging.getLogger(test.logger_name)
+    logger.addHandler(counter)
+    try:
+        start = time.perf_counter()
+        await test.run()
+        real_time = time.perf_counter() - start
+    finally:
+        logger.removeHandler(counter)
+
+    testbed = test.testbed
+    assert testbed is not None
+    scores = score_results(test, subtest)
+    return {
+        "simulated_time": testbed.elapsed,
+        "real_time": real_time,
+        "prbs_windows": counter.count,
+        "prbs_lane_seconds": testbed.prbs_lane_seconds,
+        "commands": testbed.command_count,
+        "round_trips": testbed.round_trip_count,
+        "cmis_reads": testbed.cmis_read_count,
+        "cmis_writes": testbed.cmis_write_count,
+        "commissions": testbed.commission_count,
+        "optimum_distance": [score[0] for score in scores],
+        "ber_penalty": [score[1] for score in scores],
+    }
+
+
+# *************************************************************************************
+# func: summarize_cases
+# description: Average the metrics of the runs of a scenario
+# *************************************************************************************
+def summarize_cases(cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"runs": len(cases)}
+    for key in cases[0]:
+        if key in ("optimum_distance", "ber_penalty"):
+            values = [value for case in cases for value in case[key]]
+            result[key] = sum(values) / len(values) if len(values) > 0 else float("nan")
+            result[f"max_{key}"] = max(values) if len(values) > 0 else float("nan")
+        else:
+            result[key] = sum(case[key] for case in cases) / len(cases)
+    return result
+
+
+# *************************************************************************************
+# func: run_benchmark
+# description: Run the benchmark scenarios of a benchmark configuration file
+# *************************************************************************************
+async def run_benchmark(config_file: str, work_dir: str, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Run the benchmark scenarios of a benchmark configuration file. The file has a "benchmark_config" section (:class:`xoa_cpom.models.BenchmarkConfig`) and a "test_config" section with a simulator. The test reports are created in the current directory.
+
+    :param config_file: Benchmark configuration file path
+    :type config_file: str
+    :param work_dir: Directory of the generated test configuration files
+    :type work_dir: str
+    :param only: Run only the scenarios whose name "subtest/optimize_mode" contains one of these strings, defaults to None (all)
+    :type only: Optional[List[str]], optional
+    :return: Dictionary of {"subtest/optimize_mode": metrics}
+    :rtype: Dict[str, Dict[str, Any]]
+    """
+    with open(config_file, "r") as f:
+        config_dict = yaml.safe_load(f)
+    benchmark_config = BenchmarkConfig.model_validate(config_dict["benchmark_config"])
+    test_config = config_dict["test_config"]
+    if test_config.get("simulator") is None:
+        raise ValueError("The benchmark needs a simulator in the test configuration")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for scenario in benchmark_config.scenarios:
+        if scenario.subtest not in SUBTEST_KEYS or test_config.get(scenario.subtest) is None:
+            raise ValueError(f"No test configuration for benchmark subtest {scenario.subtest}")
+        for optimize_mode in scenario.optimize_modes:
+            name = f"{scenario.subtest}/{optimize_mode}"
+            if only is not None and not any(text in name for text in only):
+                continue
+            cases = [await run_benchmark_case(test_config, scenario.subtest, optimize_mode, seed, work_dir, scenario.simulator) for seed in benchmark_config.seeds]
+            results[name] = summarize_cases(cases)
+    return results
+
+
+# *************************************************************************************
+# func: compare_to_baseline
+# description: Compare benchmark results to a baseline
+# *************************************************************************************
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], cost_tolerance: float, ber_penalty_tolerance: float) -> List[str]:
+    """Compare benchmark results to a baseline. A cost metric that grows by more than the cost tolerance, or a mean BER penalty that grows by more than the BER penalty tolerance, is a regression.
+
+    :param results: Benchmark results, see :func:`run_benchmark`
+    :type results: Dict[str, Dict[str, Any]]
+    :param baseline: Baseline results
+    :type baseline: Dict[str, Dict[str, Any]]
+    :param cost_tolerance: Relative tolerance of the cost metrics
+    :type cost_tolerance: float
+    :param ber_penalty_tolerance: Absolute tolerance of the mean BER penalty, in decades
+    :type ber_penalty_tolerance: float
+    :return: Descriptions of the regressions, empty if there is none
+    :rtype: List[str]
+    """
+    regressions: List[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        for key in COST_METRICS:
+            if result[key] > base[key] * (1 + cost_tolerance) + 1e-9:
+                regressions.append(f"{name}: {key} {result[key]:.6g} > baseline {base[key]:.6g}")
+        if result["ber_penalty"] > base["ber_penalty"] + ber_penalty_tolerance:
+            regressions.append(f"{name}: ber_penalty {result['ber_penalty']:.3f} > baseline {base['ber_penalty']:.3f}")
+    return regressions
+
+
+# *************************************************************************************
+# func: format_results
+# description: Format benchmark results as a table
+# *************************************************************************************
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    columns = [("simulated_time", "sim time (s)", "{:.1f}"), ("real_time", "real time (s)", "{:.2f}"), ("prbs_windows", "windows", "{:.1f}"),
+               ("round_trips", "round trips", "{:.0f}"), ("cmis_writes", "CMIS writes", "{:.0f}"), ("commissions", "commissions", "{:.1f}"),
+               ("optimum_distance", "distance", "{:.2f}"), ("ber_penalty", "penalty (dec)", "{:.2f}")]
+    name_width = max([len(name) for name in results] + [8])
+    lines = ["scenario".ljust(name_width) + "".join(title.rjust(15) for _, title, _ in columns)]
+    for name, result in results.items():
+        lines.append(name.ljust(name_width) + "".join(fmt.format(result[key]).rjust(15) for key, _, fmt in columns))
+    return "\n".join(lines)
+
+
+# *************************************************************************************
+# func: load_baseline / save_results
+# description: Read and write benchmark results as JSON
+# *************************************************************************************
+def load_baseline(filename: str) -> Dict[str, Dict[str, Any]]:
+    with open(filename, "r") as f:
+        return json.load(f)["scenarios"]
+
+def save_results(filename: str, results: Dict[str, Dict[str, Any]]) -> None:
+    with open(filename, "w") as f:
+        json.dump({"scenarios": results}, f, indent=2, sort_keys=True)
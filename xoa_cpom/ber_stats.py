@@ -0,0 +1,244 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import math
+from typing import Tuple, List, Dict, Any
+
+# *************************************************************************************
+# func: poisson_cdf
+# description: Cumulative probability of observing at most k events
+# *************************************************************************************
+def poisson_cdf(k: int, lam: float) -> float:
+    """Cumulative probability of observing at most k events when lam events are expected
+
+    :param k: Number of events
+    :type k: int
+    :param lam: Expected number of events
+    :type lam: float
+    :return: P(X <= k)
+    :rtype: float
+    """
+    if k < 0:
+        return 0.0
+    if lam <= 0:
+        return 1.0
+    # P(X <= k) is the upper regularized incomplete gamma function Q(k+1, lam)
+    a = k + 1.0
+    log_prefix = a * math.log(lam) - lam - math.lgamma(a)
+    if lam < a + 1.0:
+        # series expansion of the lower function P(a, lam)
+        term = 1.0 / a
+        total = term
+        n = a
+        for _ in range(100000):
+            n += 1.0
+            term *= lam / n
+            total += term
+            if term < total * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # continued fraction of Q(a, lam), modified Lentz method
+    tiny = 1e-300
+    b = lam + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for i in range(1, 100000):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-15:
+            break
+    return min(1.0, h * math.exp(log_prefix))
+
+
+# *************************************************************************************
+# func: solve_poisson_mean
+# description: Find the expected number of events for which a Poisson probability reaches a value
+# *************************************************************************************
+def solve_poisson_mean(k: int, probability: float, upper: bool) -> float:
+    """Find the expected number of events lam for which P(X <= k) = probability (upper = True), or P(X >= k) = probability (upper = False), by bisection.
+    """
+    if upper:
+        func = lambda lam: poisson_cdf(k, lam) - probability  # decreasing in lam
+    else:
+        func = lambda lam: probability - (1.0 - poisson_cdf(k - 1, lam))  # decreasing in lam
+    low, high = 0.0, max(10.0, 2.0 * k + 10.0)
+    while func(high) > 0:
+        high *= 2.0
+    for _ in range(200):
+        mid = (low + high) / 2.0
+        if func(mid) > 0:
+            low = mid
+        else:
+            high = mid
+        if high - low <= 1e-12 * max(1.0, high):
+            break
+    return (low + high) / 2.0
+
+
+ZERO_ERROR_CONFIDENCE = 0.99
+"""
+Confidence level of the PRBS BER reported for a measurement without error
+"""
+
+
+# *************************************************************************************
+# func: prbs_ber_estimate
+# description: PRBS BER of a measurement as reported by the tests
+# *************************************************************************************
+def prbs_ber_estimate(errors: int, bits: int) -> float:
+    """PRBS BER of a measurement as reported by the tests: errors/bits, or the BER upper bound at the ZERO_ERROR_CONFIDENCE level of 99% (4.6/bits) when there is no error. A window sized by :func:`required_bits` at the same confidence level therefore reports an error-free lane below the target BER.
+
+    :param errors: Number of errors
+    :type errors: int
+    :param bits: Number of bits
+    :type bits: int
+    :return: PRBS BER. 1.0 if no bit was received.
+    :rtype: float
+    """
+    if bits <= 0:
+        return 1.0
+    if errors == 0:
+        return 4.6/bits
+    return errors/bits
+
+
+# *************************************************************************************
+# func: ber_upper_bound
+# description: One-sided upper confidence bound of BER
+# *************************************************************************************
+def ber_upper_bound(errors: int, bits: int, confidence: float = 0.99) -> float:
+    """One-sided upper confidence bound of BER, using the Clopper-Pearson bound in its Poisson limit (exact for the small BER and large bit counts of PRBS tests). With no error at 99% confidence this is about 4.6/bits.
+
+    :param errors: Number of errors
+    :type errors: int
+    :param bits: Number of bits
+    :type bits: int
+    :param confidence: Confidence level, e.g. 0.99
+    :type confidence: float
+    :return: BER upper bound. 1.0 if no bit was received.
+    :rtype: float
+    """
+    if bits <= 0:
+        return 1.0
+    return min(1.0, solve_poisson_mean(errors, 1.0 - confidence, upper=True) / bits)
+
+
+# *************************************************************************************
+# func: ber_lower_bound
+# description: One-sided lower confidence bound of BER
+# *************************************************************************************
+def ber_lower_bound(errors: int, bits: int, confidence: float = 0.99) -> float:
+    """One-sided lower confidence bound of BER, using the Clopper-Pearson bound in its Poisson limit.
+
+    :param errors: Number of errors
+    :type errors: int
+    :param bits: Number of bits
+    :type bits: int
+    :param confidence: Confidence level, e.g. 0.99
+    :type confidence: float
+    :return: BER lower bound. 0.0 if there is no error or no bit.
+    :rtype: float
+    """
+    if bits <= 0 or errors <= 0:
+        return 0.0
+    return min(1.0, solve_poisson_mean(errors, 1.0 - confidence, upper=False) / bits)
+
+
+# *************************************************************************************
+# func: ber_confidence_interval
+# description: Two-sided confidence interval of BER
+# *************************************************************************************
+def ber_confidence_interval(errors: int, bits: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Two-sided confidence interval of BER
+
+    :param errors: Number of errors
+    :type errors: int
+    :param bits: Number of bits
+    :type bits: int
+    :param confidence: Confidence level, e.g. 0.95
+    :type confidence: float
+    :return: Tuple of (lower bound, upper bound)
+    :rtype: Tuple[float, float]
+    """
+    one_sided = 1.0 - (1.0 - confidence) / 2.0
+    return (ber_lower_bound(errors, bits, one_sided), ber_upper_bound(errors, bits, one_sided))
+
+
+# *************************************************************************************
+# func: required_bits
+# description: Number of bits needed to prove a BER at a confidence level
+# *************************************************************************************
+def required_bits(target_ber: float, confidence: float = 0.95, allowed_errors: int = 0) -> int:
+    """Number of bits needed to prove that the BER is below the target BER at a confidence level, if no more than allowed_errors errors are received. With no allowed error this is -ln(1 - confidence) / target_ber, e.g. about 3e12 bits for 1e-12 at 95% confidence.
+
+    :param target_ber: Target BER
+    :type target_ber: float
+    :param confidence: Confidence level, e.g. 0.95
+    :type confidence: float
+    :param allowed_errors: Number of errors allowed in the measurement
+    :type allowed_errors: int
+    :return: Number of bits
+    :rtype: int
+    """
+    return math.ceil(solve_poisson_mean(allowed_errors, 1.0 - confidence, upper=True) / target_ber)
+
+
+# *************************************************************************************
+# func: lane_value_effects
+# description: Separate the per-lane effect from the per-value effect on the BER
+# *************************************************************************************
+def lane_value_effects(results: List[Dict[str, Any]], iterations: int = 50) -> Dict[str, Any]:
+    """Separate the per-lane effect from the per-value effect on the BER, by fitting the additive model log10(BER) = mean + lane effect + value effect. The fit uses alternating means, so lanes that missed some values (e.g. failed configurations) are handled.
+
+    A small residual means the lanes respond to the values in the same way, so one shared value is as good as per-lane values. A large residual means the best value depends on the lane.
+
+    :param results: List of dictionaries containing {"lane": lane number, "value": candidate value, "prbs_ber": PRBS BER value}
+    :type results: List[Dict[str, Any]]
+    :param iterations: Number of alternating mean iterations
+    :type iterations: int
+    :return: Dictionary containing {"mean": mean log10(BER), "lane_effects": {lane: effect}, "value_effects": {value: effect}, "residual_rms": RMS of the residual in decades, "shared_best": value with the lowest value effect, "per_lane_best": {lane: (value, BER)}}
+    :rtype: Dict[str, Any]
+    """
+    cells = [(item["lane"], item["value"], math.log10(max(item["prbs_ber"], 1e-30))) for item in results]
+    if len(cells) == 0:
+        return {"mean": 0.0, "lane_effects": {}, "value_effects": {}, "residual_rms": 0.0, "shared_best": None, "per_lane_best": {}}
+    lanes = sorted(set(lane for lane, _, _ in cells))
+    values = sorted(set(value for _, value, _ in cells))
+    mean = sum(y for _, _, y in cells) / len(cells)
+    lane_effects = {lane: 0.0 for lane in lanes}
+    value_effects = {value: 0.0 for value in values}
+    for _ in range(iterations):
+        for lane in lanes:
+            residuals = [y - mean - value_effects[value] for l, value, y in cells if l == lane]
+            lane_effects[lane] = sum(residuals) / len(residuals)
+        for value in values:
+            residuals = [y - mean - lane_effects[lane] for lane, v, y in cells if v == value]
+            value_effects[value] = sum(residuals) / len(residuals)
+        # keep the lane effects centered, so the value effects carry the mean of the lanes
+        shift = sum(lane_effects.values()) / len(lanes)
+        for lane in lanes:
+            lane_effects[lane] -= shift
+        mean += shift
+    residual_rms = math.sqrt(sum((y - mean - lane_effects[lane] - value_effects[value]) ** 2 for lane, value, y in cells) / len(cells))
+
+    per_lane_best = {}
+    for item in sorted(results, key=lambda x: x["prbs_ber"]):
+        if item["lane"] not in per_lane_best:
+            per_lane_best[item["lane"]] = (item["value"], item["prbs_ber"])
+    return {
+        "mean": mean,
+        "lane_effects": lane_effects,
+        "value_effects": value_effects,
+        "residual_rms": residual_rms,
+        "shared_best": min(values, key=lambda value: value_effects[value]),
+        "per_lane_best": per_lane_best,
+    }
@@ -0,0 +1,267 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import contextlib
+import contextvars
+import copy
+import hashlib
+import json
+import logging
+import os
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Iterator, Sequence
+from .timing import current_scope, phase_sleep
+
+CHECKPOINT_VERSION = 2
+
+_current_checkpoint: contextvars.ContextVar[Optional["Checkpoint"]] = contextvars.ContextVar("xoa_cpom_checkpoint", default=None)
+_current_subtest: contextvars.ContextVar[str] = contextvars.ContextVar("xoa_cpom_checkpoint_subtest", default="")
+
+
+# *************************************************************************************
+# func: config_fingerprint
+# description: Fingerprint of the test configuration that a checkpoint belongs to
+# *************************************************************************************
+def config_fingerprint(config_dict: Dict[str, Any]) -> str:
+    """Fingerprint of the parts of the test configuration that decide which measurements a test makes: the chassis, the subtests and their settings.
+
+    :param config_dict: The test configuration as a dictionary
+    :type config_dict: Dict[str, Any]
+    :return: SHA-256 hex digest
+    :rtype: str
+    """
+    keys = ("chassis_list", "tcvr_rx_output_eq_test_config", "tcvr_tx_input_eq_test_config", "host_tx_eq_test_config")
+    text = json.dumps({key: config_dict.get(key) for key in keys}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# *************************************************************************************
+# class: Checkpoint
+# description: Durable journal of the PRBS measurements of a test run
+# *************************************************************************************
+class Checkpoint:
+    """Durable journal of the PRBS measurements of a test run, one JSON line per measurement, appended and flushed to disk as soon as the measurement ends.
+
+    The measurements are journaled by subtest and port pair, in the order they are made, with the lanes and the EQ setting of each lane. A resumed run runs the subtests again from the start: the ports are reserved and reset, PRBS and the Data Path explicit control are configured, and the EQ settings are written and applied as in the interrupted run. But each measurement that is in the journal returns the journaled result instead of measuring, and the settle delay before it is skipped. The searches get the same results, so they take the same path, and the run continues with real measurements where the interrupted run stopped. If a port pair asks for a measurement on other lanes or at other settings than the journal has, e.g. because a lane failed to apply its settings, the rest of its journal is dropped and it measures from there.
+
+    Other inputs of a search that can change between the runs, e.g. the warm start setting of the result store that the interrupted run has added measurements to, are journaled as values (see :func:`checkpointed_value`), so the resumed run uses the values of the interrupted run.
+    """
+    def __init__(self, filename: str, fingerprint: str, resume: bool, fsync: bool, logger_name: str) -> None:
+        self.filename = filename
+        self.fsync = fsync
+        self.logger_name = logger_name
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        """
+        Journaled measurements by "subtest/port pair", in the order they were made
+        """
+        self.positions: Dict[str, int] = {}
+        """
+        Number of journaled measurements of each "subtest/port pair" that the run has replayed
+        """
+        self.replayed_count = 0
+        self.recorded_count = 0
+        if resume:
+            self.load(fingerprint)
+            self.file = open(filename, "a")
+        else:
+            self.file = open(filename, "w")
+            self.write({"version": CHECKPOINT_VERSION, "config": fingerprint})
+
+    def load(self, fingerprint: str) -> None:
+        """Load the journal of the interrupted run. A last line cut short by the interruption is ignored.
+        """
+        logger = logging.getLogger(self.logger_name)
+        with open(self.filename, "r") as f:
+            text = f.read()
+        lines = text.splitlines()
+        if len(lines) == 0:
+            raise ValueError(f"Checkpoint {self.filename} is empty")
+        header = json.loads(lines[0])
+        if header.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {self.filename} has version {header.get('version')}, expected {CHECKPOINT_VERSION}")
+        if header.get("config") != fingerprint:
+            raise ValueError(f"Checkpoint {self.filename} was made with another test configuration")
+        complete_lines = lines
+        for i, line in enumerate(lines[1:], start=1):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if i != len(lines) - 1:
+                    raise
+                logger.warning(f"Ignoring the incomplete last entry of checkpoint {self.filename}")
+                complete_lines = lines[:-1]
+                break
+            if "truncate" in entry:
+                del self.entries.get(entry["key"], [])[entry["truncate"]:]
+            else:
+                self.entries.setdefault(entry["key"], []).append(entry)
+        if complete_lines is not lines or not text.endswith("\n"):
+            # rewrite the complete entries, so the next entry starts on a line of its own
+            with open(self.filename, "w") as f:
+                f.write("".join(line + "\n" for line in complete_lines))
+        logger.info(f"Checkpoint {self.filename}: {sum(len(entries) for entries in self.entries.values())} entries to replay")
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
+
+    def key(self) -> str:
+        return f"{_current_subtest.get()}/{current_scope()}"
+
+    def replaying(self) -> bool:
+        """Whether the next measurement of the current subtest and port pair is in the journal
+        """
+        key = self.key()
+        return self.positions.get(key, 0) < len(self.entries.get(key, []))
+
+    def next_entry(self, kind: str, expected: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The next journaled entry of the current subtest and port pair, if it matches. An entry that does not match, and the entries after it, are dropped from the journal.
+
+        :param kind: What the run asks for, used in the log, e.g. "measurement"
+        :type kind: str
+        :param expected: Fields that the entry must have, e.g. {"lanes": [1, 2]}
+        :type expected: Dict[str, Any]
+        :return: The entry, or None if the journal has no more entries or the entry does not match
+        :rtype: Optional[Dict[str, Any]]
+        """
+        key = self.key()
+        if not self.replaying():
+            return None
+        position = self.positions.get(key, 0)
+        entry = self.entries[key][position]
+        if any(entry.get(field) != value for field, value in expected.items()):
+            logger = logging.getLogger(self.logger_name)
+            logger.warning(f"Checkpoint of {key} has {({field: entry.get(field) for field in expected})} at entry {position + 1}, but the test asks for a {kind} with {expected}. Measuring from here.")
+            del self.entries[key][position:]
+            # a later resume drops them too
+            self.write({"key": key, "truncate": position})
+            return None
+        self.positions[key] = position + 1
+        return entry
+
+    def replay(self, lanes: List[int], settings: Optional[List[List[int]]]) -> Optional[List[Dict[str, Any]]]:
+        """The journaled result of the next measurement of the current subtest and port pair
+
+        :param lanes: Lanes of the measurement
+        :type lanes: List[int]
+        :param settings: EQ setting of each lane of the measurement, or None if the caller does not know them
+        :type settings: Optional[List[List[int]]]
+        :return: Lane BER dicts, or None if the measurement is not in the journal
+        :rtype: Optional[List[Dict[str, Any]]]
+        """
+        entry = self.next_entry("measurement", {"lanes": list(lanes), "settings": settings})
+        if entry is None:
+            return None
+        self.replayed_count += 1
+        return [dict(lane_ber_dict, replayed=True) for lane_ber_dict in entry["results"]]
+
+    def record(self, lanes: List[int], settings: Optional[List[List[int]]], lane_ber_dicts: List[Dict[str, Any]]) -> None:
+        """Append a measurement of the current subtest and port pair to the journal
+        """
+        self.write({"key": self.key(), "lanes": list(lanes), "settings": settings, "results": lane_ber_dicts})
+        self.recorded_count += 1
+
+
+# *************************************************************************************
+# func: set_checkpoint
+# description: Set the checkpoint of the current context
+# *************************************************************************************
+def set_checkpoint(checkpoint: Optional[Checkpoint]) -> contextvars.Token:
+    """Set the checkpoint of the current context, and of the tasks created in it. Without a checkpoint, the measurements are neither journaled nor replayed.
+
+    :param checkpoint: The checkpoint, or None
+    :type checkpoint: Optional[Checkpoint]
+    :return: Token to restore the previous checkpoint with ``reset_checkpoint()``
+    :rtype: contextvars.Token
+    """
+    return _current_checkpoint.set(checkpoint)
+
+def reset_checkpoint(token: contextvars.Token) -> None:
+    _current_checkpoint.reset(token)
+
+
+# *************************************************************************************
+# func: checkpoint_subtest
+# description: Journal the measurements of a block under a subtest name
+# *************************************************************************************
+@contextlib.contextmanager
+def checkpoint_subtest(name: str) -> Iterator[None]:
+    token = _current_subtest.set(name)
+    try:
+        yield
+    finally:
+        _current_subtest.reset(token)
+
+
+# *************************************************************************************
+# func: checkpointed_measurement
+# description: Replay a measurement from the checkpoint, or make and journal it
+# *************************************************************************************
+async def checkpointed_measurement(lanes: List[int], measure: Callable[[], Awaitable[List[Dict[str, Any]]]], lane_settings: Optional[Dict[int, Sequence[int]]] = None) -> List[Dict[str, Any]]:
+    """Replay a measurement from the checkpoint of the current context. If it is not in the checkpoint, make it and journal it.
+
+    :param lanes: Lanes of the measurement
+    :type lanes: List[int]
+    :param measure: Coroutine function that makes the measurement
+    :type measure: Callable[[], Awaitable[List[Dict[str, Any]]]]
+    :param lane_settings: EQ setting of each lane. A journaled measurement is only replayed at the same settings. Defaults to None to match on the lanes only.
+    :type lane_settings: Optional[Dict[int, Sequence[int]]], optional
+    :return: Lane BER dicts. A replayed lane BER dict has "replayed": True.
+    :rtype: List[Dict[str, Any]]
+    """
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return await measure()
+    settings = None if lane_settings is None else [list(lane_settings[lane]) for lane in lanes]
+    replayed = checkpoint.replay(lanes, settings)
+    if replayed is not None:
+        return replayed
+    lane_ber_dicts = await measure()
+    checkpoint.record(lanes, settings, copy.deepcopy(lane_ber_dicts))
+    return lane_ber_dicts
+
+
+# *************************************************************************************
+# func: checkpointed_value
+# description: Replay a value from the checkpoint, or compute and journal it
+# *************************************************************************************
+def checkpointed_value(name: str, compute: Callable[[], Any]) -> Any:
+    """Replay a value of the current subtest and port pair from the checkpoint of the current context. If it is not in the checkpoint, compute it and journal it. A search that depends on a value that can change between runs gets it here, so a resumed run takes the same path.
+
+    :param name: Name of the value, e.g. "warm_start"
+    :type name: str
+    :param compute: Function that computes the value. The value must be JSON serializable, and tuples come back as lists.
+    :type compute: Callable[[], Any]
+    :return: The value
+    :rtype: Any
+    """
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return compute()
+    entry = checkpoint.next_entry("value", {"value_name": name})
+    if entry is not None:
+        return entry["value"]
+    value = compute()
+    checkpoint.write({"key": checkpoint.key(), "value_name": name, "value": value})
+    return value
+
+
+# *************************************************************************************
+# func: settle_sleep
+# description: Wait for EQ settings to take effect, unless the next measurement is replayed
+# *************************************************************************************
+async def settle_sleep(seconds: float) -> None:
+    """Wait for EQ settings to take effect, as the "settle_delay" phase. Skipped if the next measurement is replayed from the checkpoint.
+
+    :param seconds: Delay in seconds
+    :type seconds: float
+    """
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is not None and checkpoint.replaying():
+        return
+    await phase_sleep("settle_delay", seconds)
@@ -0,0 +1,130 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+from xoa_driver import ports
+from xoa_driver.misc import Hex
+import logging
+from typing import List, Dict, Tuple, Set, Union
+
+FreyaEdunPort = Union[ports.Z800FreyaPort, ports.Z1600EdunPort]
+
+# Host-owned CMIS registers that the module never changes by itself, so their
+# value is known as soon as the host has read or written them once.
+# Page 10h:128-142 are the Data Path and lane controls, and 10h:145-173 is the
+# Staged Control Set 0 (DPConfig, Tx input EQ, CDR and Rx output EQ).
+# Page 10h:143-144 (Apply DPInit / Apply Immediate) are triggers and never cached.
+HOST_OWNED_REGIONS: Dict[int, List[Tuple[int, int]]] = {
+    0x10: [(128, 142), (145, 173)],
+}
+
+# *************************************************************************************
+# class: CmisShadowCache
+# description: Per-port shadow copy of the host-owned CMIS control registers
+# *************************************************************************************
+class CmisShadowCache:
+    """Per-port shadow copy of the host-owned CMIS control registers.
+
+    Reads of a cacheable register load its whole region with one multi-byte read, and are served from the shadow copy afterwards. Writes are staged in the shadow copy and only sent to the module by :meth:`flush`, which combines the dirty bytes of a region into a single multi-byte write.
+
+    The cache must be invalidated when the module is reset or written by anything else than this cache.
+    """
+    def __init__(self, port: FreyaEdunPort, logger_name: str):
+        self.port = port
+        self.logger_name = logger_name
+        self.__shadow: Dict[Tuple[int, int], int] = {}
+        self.__dirty: Set[Tuple[int, int]] = set()
+        self.read_count = 0
+        """Number of register read transactions sent to the module"""
+        self.write_count = 0
+        """Number of register write transactions sent to the module"""
+
+    @staticmethod
+    def find_region(page: int, reg_addr: int) -> Union[Tuple[int, int], None]:
+        """Return the host-owned region (first, last) that contains the register, or None if the register is not cacheable.
+        """
+        for first, last in HOST_OWNED_REGIONS.get(page, []):
+            if first <= reg_addr <= last:
+                return (first, last)
+        return None
+
+    def is_cacheable(self, page: int, reg_addr: int) -> bool:
+        return self.find_region(page, reg_addr) is not None
+
+    def invalidate(self) -> None:
+        """Drop the shadow copy and any staged write
+        """
+        self.__shadow.clear()
+        self.__dirty.clear()
+
+    async def load_region(self, page: int, region: Tuple[int, int]) -> None:
+        first, last = region
+        _size = last - first + 1
+        resp = await self.port.transceiver.access_rw_seq(page_address=page, register_address=first, byte_count=_size).get()
+        self.read_count += 1
+        for offset, byte in enumerate(bytes.fromhex(resp.value)):
+            if (page, first + offset) not in self.__dirty:
+                self.__shadow[(page, first + offset)] = byte
+
+    async def read_byte(self, page: int, reg_addr: int) -> int:
+        """Read one byte, from the shadow copy if cached
+        """
+        region = self.find_region(page, reg_addr)
+        if region is None:
+            resp = await self.port.transceiver.access_rw_seq(page_address=page, register_address=reg_addr, byte_count=1).get()
+            self.read_count += 1
+            return int(resp.value, 16)
+        if (page, reg_addr) not in self.__shadow:
+            await self.load_region(page, region)
+        return self.__shadow[(page, reg_addr)]
+
+    async def stage_byte(self, page: int, reg_addr: int, value: int) -> None:
+        """Stage a byte write. Writing the value already in the module is a no-op.
+        """
+        if not self.is_cacheable(page, reg_addr):
+            raise ValueError(f"Register {page:02X}h:{reg_addr} is not a host-owned register")
+        current = await self.read_byte(page, reg_addr)
+        if current != value:
+            self.__shadow[(page, reg_addr)] = value
+            self.__dirty.add((page, reg_addr))
+
+    async def stage_nibble(self, page: int, reg_addr: int, high_nibble: bool, value: int) -> None:
+        """Stage a write to the high or low nibble of a byte
+        """
+        assert 0 <= value <= 15
+        current = await self.read_byte(page, reg_addr)
+        if high_nibble:
+            new_value = (current & 0x0F) + (value << 4)
+        else:
+            new_value = (current & 0xF0) + value
+        await self.stage_byte(page, reg_addr, new_value)
+
+    @property
+    def is_dirty(self) -> bool:
+        return len(self.__dirty) > 0
+
+    async def flush(self) -> int:
+        """Write all staged bytes to the module, one multi-byte write per region.
+
+        Clean bytes between two dirty bytes of the same region are rewritten with their cached value, so each region needs only one write.
+
+        :return: the number of write transactions sent
+        :rtype: int
+        """
+        logger = logging.getLogger(self.logger_name)
+        spans: Dict[Tuple[int, Tuple[int, int]], List[int]] = {}
+        for page, reg_addr in self.__dirty:
+            region = self.find_region(page, reg_addr)
+            assert region is not None
+            spans.setdefault((page, region), []).append(reg_addr)
+
+        sent = 0
+        for (page, _), addrs in sorted(spans.items()):
+            first, last = min(addrs), max(addrs)
+            value = "".join('{:02X}'.format(self.__shadow[(page, addr)]) for addr in range(first, last + 1))
+            logger.info(f"Port {self.port.kind.module_id}/{self.port.kind.port_id}: Write {value} to {page:02X}h:{first}-{last}")
+            await self.port.transceiver.access_rw_seq(page_address=page, register_address=first, byte_count=last - first + 1).set(value=Hex(value))
+            self.write_count += 1
+            sent += 1
+        self.__dirty.clear()
+        return sent
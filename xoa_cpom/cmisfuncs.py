@@ -6,11 +6,165 @@ import asyncio
 from xoa_driver import  ports
 from xoa_driver.misc import Hex
 from .enums import *
+from .models import CmisWaitConfig
+from .cmis_shadow import CmisShadowCache
+from .timing import timed
 import logging
-from typing import List, Any, Union
+from typing import List, Dict, Any, Union, Tuple, Optional, Callable, Awaitable, TypeVar
+from dataclasses import dataclass
 
 FreyaEdunPort = Union[ports.Z800FreyaPort, ports.Z1600EdunPort]
 
+T = TypeVar("T")
+
+
+# *************************************************************************************
+# class: CmisWaitPolicy
+# description: How long to wait for the module after a CMIS write
+# *************************************************************************************
+@dataclass
+class CmisWaitPolicy:
+    """How long to wait for the module after a CMIS write.
+
+    The host first waits ``min_holdoff`` seconds so the module can take the write, then polls the status register, starting at ``poll_interval`` and multiplying the interval by ``backoff_factor`` up to ``max_poll_interval``, until the module reports completion or ``timeout`` expires.
+    """
+    min_holdoff: float = 0.1
+    poll_interval: float = 0.02
+    max_poll_interval: float = 0.5
+    backoff_factor: float = 2.0
+    timeout: float = 10.0
+
+DEFAULT_CMIS_WAIT_POLICY = CmisWaitPolicy()
+
+
+# *************************************************************************************
+# class: ModuleIdentity
+# description: Vendor name, part number and serial number of a module
+# *************************************************************************************
+@dataclass(frozen=True)
+class ModuleIdentity:
+    """Vendor name, part number and serial number of a module, from CMIS page 00h
+    """
+    vendor_name: str
+    part_number: str
+    serial_number: str
+
+
+# *************************************************************************************
+# func: get_cmis_wait_policy
+# description: Build the CMIS wait policy for a module media from the test config
+# *************************************************************************************
+def get_cmis_wait_policy(wait_config: CmisWaitConfig, module_media: str) -> CmisWaitPolicy:
+    """Build the CMIS wait policy for a module media from the test config
+
+    :param wait_config: CMIS wait configuration
+    :type wait_config: CmisWaitConfig
+    :param module_media: Module media, used to look up the module specific minimum hold-off
+    :type module_media: str
+    :return: CMIS wait policy
+    :rtype: CmisWaitPolicy
+    """
+    return CmisWaitPolicy(
+        min_holdoff=wait_config.module_min_holdoff.get(module_media, wait_config.min_holdoff),
+        poll_interval=wait_config.poll_interval,
+        max_poll_interval=wait_config.max_poll_interval,
+        backoff_factor=wait_config.backoff_factor,
+        timeout=wait_config.timeout,
+    )
+
+
+# *************************************************************************************
+# func: poll_until
+# description: Poll a register with exponential backoff until a condition is met
+# *************************************************************************************
+async def poll_until(read_func: Callable[[], Awaitable[T]], is_done: Callable[[T], bool], wait_policy: CmisWaitPolicy) -> Tuple[T, bool]:
+    """Poll a register with exponential backoff until a condition is met
+
+    :param read_func: Coroutine function that reads the register
+    :type read_func: Callable[[], Awaitable[T]]
+    :param is_done: Function that returns True when the read value means the operation is complete
+    :type is_done: Callable[[T], bool]
+    :param wait_policy: Wait policy
+    :type wait_policy: CmisWaitPolicy
+    :return: Tuple of the last read value, and whether the condition was met before timeout
+    :rtype: Tuple[T, bool]
+    """
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(wait_policy.min_holdoff)
+    deadline = loop.time() + wait_policy.timeout
+    interval = wait_policy.poll_interval
+    while True:
+        value = await read_func()
+        if is_done(value):
+            return value, True
+        if loop.time() >= deadline:
+            return value, False
+        await asyncio.sleep(interval)
+        interval = min(interval * wait_policy.backoff_factor, wait_policy.max_poll_interval)
+
+
+# *************************************************************************************
+# func: wait_config_status
+# description: Wait until the ConfigStatus of a lane is no longer ConfigInProgress
+# *************************************************************************************
+@timed("commission_wait")
+async def wait_config_status(port: FreyaEdunPort, lane: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> ConfigStatus:
+    """Wait until the ConfigStatus of a lane is no longer ConfigInProgress
+    """
+    logger = logging.getLogger(logger_name)
+    config_status, done = await poll_until(
+        lambda: read_config_status(port=port, lane=lane, logger_name=logger_name),
+        lambda status: status != ConfigStatus.ConfigInProgress,
+        wait_policy
+    )
+    if not done:
+        logger.warning(f"Port {port.kind.module_id}/{port.kind.port_id}: ConfigStatus of Lane {lane} is still {config_status.name} after {wait_policy.timeout}s")
+    return config_status
+
+
+# *************************************************************************************
+# func: read_dp_states
+# description: Read the Data Path state of all lanes
+# *************************************************************************************
+async def read_dp_states(port: FreyaEdunPort, logger_name: str) -> List[DataPathState]:
+    """Read the Data Path state of all lanes (Read address 11h:128-131)
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+
+    _page = 0x11
+    _start_addr = 128
+    _reg_addr = _start_addr
+    _size = 4
+    resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
+    value = bytes.fromhex(resp.value)
+    result = []
+    for lane in range(1, 9):
+        _byte = value[int((lane-1)/2)]
+        _read = (_byte >> 4) if lane % 2 == 0 else (_byte & 0x0F)
+        result.append(DataPathState(_read) if _read in DataPathState._value2member_map_ else DataPathState.DPReserved)
+    logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: DataPathState={[state.name for state in result]}")
+    return result
+
+
+# *************************************************************************************
+# func: wait_dp_states
+# description: Wait until the Data Path of all lanes leaves the transient states
+# *************************************************************************************
+@timed("dp_state_wait")
+async def wait_dp_states(port: FreyaEdunPort, target_states: List[DataPathState], logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> List[DataPathState]:
+    """Wait until the Data Path of all lanes is in one of the target states
+    """
+    logger = logging.getLogger(logger_name)
+    dp_states, done = await poll_until(
+        lambda: read_dp_states(port=port, logger_name=logger_name),
+        lambda states: all(state in target_states or state == DataPathState.DPReserved for state in states),
+        wait_policy
+    )
+    if not done:
+        logger.warning(f"Port {port.kind.module_id}/{port.kind.port_id}: Data Path did not reach {[state.name for state in target_states]} after {wait_policy.timeout}s")
+    return dp_states
+
 # *************************************************************************************
 # func: check_eq_reconfig_support
 # description: Check what type of reconfiguration the transceiver supports
@@ -116,15 +270,62 @@ async def read_config_status(port: FreyaEdunPort, lane: int, logger_name: str) -
     logger.info(f"  Read operation done. Value: ConfigStatus={ConfigStatus(_read).name}")
     return ConfigStatus(_read)
         
+# *************************************************************************************
+# func: read_config_statuses
+# description: Read the config status of several lanes in one register read
+# *************************************************************************************
+async def read_config_statuses(port: FreyaEdunPort, lanes: List[int], logger_name: str) -> Dict[int, ConfigStatus]:
+    """Read the config status of several lanes in one register read (Read address 11h:202-205)
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+    logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Read ConfigStatus - Lanes {lanes} ")
+    assert all(1<=lane<=8 for lane in lanes)
+
+    _page = 0x11
+    _start_addr = 202
+    _reg_addr = _start_addr
+    _size = 4
+    resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
+    value = bytes.fromhex(resp.value)
+    result = {}
+    for lane in lanes:
+        _byte = value[int((lane-1)/2)]
+        _read = (_byte >> 4) if lane % 2 == 0 else (_byte & 0x0F)
+        result[lane] = ConfigStatus(_read)
+    logger.info(f"  Read operation done. Value: ConfigStatus={[(lane, status.name) for lane, status in result.items()]}")
+    return result
+
+
+# *************************************************************************************
+# func: wait_config_statuses
+# description: Wait until the ConfigStatus of all lanes is no longer ConfigInProgress
+# *************************************************************************************
+@timed("commission_wait")
+async def wait_config_statuses(port: FreyaEdunPort, lanes: List[int], logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> Dict[int, ConfigStatus]:
+    """Wait until the ConfigStatus of all lanes is no longer ConfigInProgress
+    """
+    logger = logging.getLogger(logger_name)
+    config_statuses, done = await poll_until(
+        lambda: read_config_statuses(port=port, lanes=lanes, logger_name=logger_name),
+        lambda statuses: all(status != ConfigStatus.ConfigInProgress for status in statuses.values()),
+        wait_policy
+    )
+    if not done:
+        logger.warning(f"Port {port.kind.module_id}/{port.kind.port_id}: ConfigStatus of Lanes {lanes} is still {[status.name for status in config_statuses.values()]} after {wait_policy.timeout}s")
+    return config_statuses
+
+
 # *************************************************************************************
 # func: apply_change_on_lane
 # description: Trigger Provision-and-Commission/Provision procedure using the 
 # Staged Control Set 0 settings for host lane
 # (Write address 10h:144/10h:143)
 # *************************************************************************************
-async def apply_change_on_lane(port: FreyaEdunPort, lane: int, logger_name: str, reconfig_support: ReconfigurationSupport):
+@timed("commission")
+async def apply_change_on_lane(port: FreyaEdunPort, lane: int, logger_name: str, reconfig_support: ReconfigurationSupport, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> ConfigStatus:
     """Trigger Provision-and-Commission/Provision procedure using the Staged Control Set 0 
-    settings for host lane (Write address 144/143)
+    settings for host lane (Write address 144/143), and wait for the ConfigStatus of the lane
     """
     # Get logger
     logger = logging.getLogger(logger_name)
@@ -149,7 +350,41 @@ async def apply_change_on_lane(port: FreyaEdunPort, lane: int, logger_name: str,
     # 1b: Trigger the Provision-and-Commission procedure using the Staged Control Set 0 settings for host lane <i>, with feedback provided in the associated ConfigStatusLane<i> field
 
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex(value))
-    await asyncio.sleep(1)
+    return await wait_config_status(port=port, lane=lane, logger_name=logger_name, wait_policy=wait_policy)
+
+# *************************************************************************************
+# func: apply_change_on_lanes
+# description: Trigger Provision-and-Commission/Provision procedure using the 
+# Staged Control Set 0 settings for several host lanes at once
+# (Write address 10h:144/10h:143)
+# *************************************************************************************
+@timed("commission")
+async def apply_change_on_lanes(port: FreyaEdunPort, lanes: List[int], logger_name: str, reconfig_support: ReconfigurationSupport, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> Dict[int, ConfigStatus]:
+    """Trigger Provision-and-Commission/Provision procedure using the Staged Control Set 0 
+    settings for several host lanes with one write of the lane bitmask (Write address 144/143), and wait for the ConfigStatus of the lanes
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+    logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Apply Changes on Lanes {lanes}")
+    assert all(1<=lane<=8 for lane in lanes)
+
+    _page = 0x10
+    if reconfig_support == ReconfigurationSupport.Both or reconfig_support == ReconfigurationSupport.Hot:
+        _start_addr = 144
+    elif reconfig_support == ReconfigurationSupport.Regular:
+        _start_addr = 143
+    else:
+        raise ValueError("Reconfiguration support is neither regular nor hot")
+    _reg_addr = _start_addr
+    _size = 1
+
+    _mask = 0
+    for lane in lanes:
+        _mask |= 1<<(lane-1)
+    value = '{:02X}'.format(_mask)
+
+    await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex(value))
+    return await wait_config_statuses(port=port, lanes=lanes, logger_name=logger_name, wait_policy=wait_policy)
 
 # *************************************************************************************
 # func: trigger_provision
@@ -157,9 +392,10 @@ async def apply_change_on_lane(port: FreyaEdunPort, lane: int, logger_name: str,
 # Staged Control Set 0 settings for host lane
 # (Write address 10h:143)
 # *************************************************************************************
-async def trigger_provision(port: FreyaEdunPort, lane: int, logger_name: str):
+@timed("commission")
+async def trigger_provision(port: FreyaEdunPort, lane: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> ConfigStatus:
     """Trigger Provision-and-Commission procedure using the Staged Control Set 0 
-    settings for host lane (Write address 143)
+    settings for host lane (Write address 143), and wait for the ConfigStatus of the lane
     """
     # Get logger
     logger = logging.getLogger(logger_name)
@@ -176,14 +412,15 @@ async def trigger_provision(port: FreyaEdunPort, lane: int, logger_name: str):
     # 1b: Trigger the Provision procedure using the Staged Control Set 0 settings for host lane <i>, with feedback provided in the associated ConfigStatusLane<i> field
 
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex(value))
-    await asyncio.sleep(1)
+    return await wait_config_status(port=port, lane=lane, logger_name=logger_name, wait_policy=wait_policy)
 
 # *************************************************************************************
 # func: dp_initialize
 # description: Initialize the Data Path associated with host lane 
 # (Write address 10h:128 with value 0x00)
 # *************************************************************************************
-async def dp_initialize(port: FreyaEdunPort, logger_name: str):
+@timed("dp_reinit")
+async def dp_initialize(port: FreyaEdunPort, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY):
     """Initialize the Data Path associated with host lane (Write address 128 with value 0x00)
     """
     # Get logger
@@ -195,14 +432,15 @@ async def dp_initialize(port: FreyaEdunPort, logger_name: str):
     _reg_addr = _start_addr
     _size = 1
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex("00"))
-    await asyncio.sleep(1)
+    await wait_dp_states(port=port, target_states=[DataPathState.DPActivated, DataPathState.DPInitialized], logger_name=logger_name, wait_policy=wait_policy)
 
 # *************************************************************************************
 # func: dp_deinitialize
 # description: Deinitialize the Data Path associated with host lane
 # (Write address 10h:128 value with 0xFF)
 # *************************************************************************************
-async def dp_deinitialize(port: FreyaEdunPort, logger_name: str):
+@timed("dp_reinit")
+async def dp_deinitialize(port: FreyaEdunPort, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY):
     """Deinitialize the Data Path associated with host lane (Write address 128 with 1)
     """
     # Get logger
@@ -214,7 +452,7 @@ async def dp_deinitialize(port: FreyaEdunPort, logger_name: str):
     _reg_addr = _start_addr
     _size = 1
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex("FF"))
-    await asyncio.sleep(1)
+    await wait_dp_states(port=port, target_states=[DataPathState.DPDeactivated], logger_name=logger_name, wait_policy=wait_policy)
 
 # *************************************************************************************
 # func: dp_read
@@ -235,7 +473,6 @@ async def dp_read(port: FreyaEdunPort, lane: int, logger_name: str):
     
     # read the byte from the address again to verify the write
     resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
-    await asyncio.sleep(1)
     appsel_code = int(resp.value, 16) >> 4
     dp_id = (int(resp.value, 16) >> 1) & 0x07
     explicit_ctrl = int(resp.value, 16) & 0x01
@@ -247,7 +484,8 @@ async def dp_read(port: FreyaEdunPort, lane: int, logger_name: str):
 # func: dp_write
 # description: Write AppSelCode, DataPathID, and ExplicitControl to a specified lane
 # *************************************************************************************
-async def dp_write(port: FreyaEdunPort, lane: int, appsel_code: int, dp_id: int, explicit_ctrl: int, logger_name: str):
+@timed("cmis_write")
+async def dp_write(port: FreyaEdunPort, lane: int, appsel_code: int, dp_id: int, explicit_ctrl: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY):
     """Write AppSelCode, DataPathID, and ExplicitControl to a specified lane
     """
     # Get logger
@@ -267,14 +505,17 @@ async def dp_write(port: FreyaEdunPort, lane: int, appsel_code: int, dp_id: int,
     
     # write the new byte into the address
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex('{:02X}'.format(_tmp)))
-    await asyncio.sleep(1)
+    await asyncio.sleep(wait_policy.min_holdoff)
 
 # *************************************************************************************
 # func: rx_output_eq_write
 # description: Write output value to a specified cursor on a specified lane
 # *************************************************************************************
-async def rx_output_eq_write(port: FreyaEdunPort, lane: int, value: int, cursor: Cursor, logger_name: str):
-    """Write output value to a specified cursor on a specified lane
+@timed("cmis_write")
+async def rx_output_eq_write(port: FreyaEdunPort, lane: int, value: int, cursor: Cursor, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY, shadow: Optional[CmisShadowCache] = None):
+    """Write output value to a specified cursor on a specified lane. 
+    
+    If a shadow cache is given, the current value is read from the cache and the write is skipped if the value is unchanged.
     """
     # Get logger
     logger = logging.getLogger(logger_name)
@@ -286,6 +527,12 @@ async def rx_output_eq_write(port: FreyaEdunPort, lane: int, value: int, cursor:
     _start_addr = 162
     _reg_addr = _start_addr + int(cursor.value*4) + int((lane-1)/2)
     _size = 1
+
+    if shadow is not None:
+        await shadow.stage_nibble(page=_page, reg_addr=_reg_addr, high_nibble=(lane % 2 == 0), value=value)
+        if await shadow.flush() > 0:
+            await asyncio.sleep(wait_policy.min_holdoff)
+        return
     
     # read the byte from the address
     resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
@@ -304,7 +551,56 @@ async def rx_output_eq_write(port: FreyaEdunPort, lane: int, value: int, cursor:
     else:
         _tmp = (current_byte & 0xF0) + value
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex('{:02X}'.format(_tmp)))
-    await asyncio.sleep(1)
+    await asyncio.sleep(wait_policy.min_holdoff)
+    
+# *************************************************************************************
+# func: rx_output_eq_write_cursors
+# description: Write amplitude, precursor and postcursor on a specified lane in one 
+# register transaction
+# *************************************************************************************
+@timed("cmis_write")
+async def rx_output_eq_write_cursors(port: FreyaEdunPort, lane: int, amplitude: int, precursor: int, postcursor: int, logger_name: str, shadow: CmisShadowCache, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> int:
+    """Write amplitude, precursor and postcursor on a specified lane. 
+    
+    The three cursors are staged in the shadow cache and written with one multi-byte write (Write address 10h:162-173). Cursors that already have the value are not written.
+
+    :return: the number of write transactions sent
+    :rtype: int
+    """
+    return await rx_output_eq_write_cursors_on_lanes(port=port, lane_cursors=[(lane, amplitude, precursor, postcursor)], logger_name=logger_name, shadow=shadow, wait_policy=wait_policy)
+
+# *************************************************************************************
+# func: rx_output_eq_write_cursors_on_lanes
+# description: Write amplitude, precursor and postcursor on several lanes in one 
+# register transaction
+# *************************************************************************************
+@timed("cmis_write")
+async def rx_output_eq_write_cursors_on_lanes(port: FreyaEdunPort, lane_cursors: List[Tuple[int, int, int, int]], logger_name: str, shadow: CmisShadowCache, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> int:
+    """Write amplitude, precursor and postcursor on several lanes. 
+    
+    The cursors of all lanes are staged in the shadow cache and written with one multi-byte write (Write address 10h:162-173). Cursors that already have the value are not written.
+
+    :param lane_cursors: List of (lane, amplitude, precursor, postcursor)
+    :type lane_cursors: List[Tuple[int, int, int, int]]
+    :return: the number of write transactions sent
+    :rtype: int
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+
+    _page = 0x10
+    _start_addr = 162
+    for lane, amplitude, precursor, postcursor in lane_cursors:
+        logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Write Amplitude={amplitude}, PreCursor={precursor}, PostCursor={postcursor} - Lane {lane} ")
+        assert 1<=lane<=8
+        for cursor, value in ((Cursor.Amplitude, amplitude), (Cursor.Precursor, precursor), (Cursor.Postcursor, postcursor)):
+            assert 0<=value<=7
+            _reg_addr = _start_addr + int(cursor.value*4) + int((lane-1)/2)
+            await shadow.stage_nibble(page=_page, reg_addr=_reg_addr, high_nibble=(lane % 2 == 0), value=value)
+    sent = await shadow.flush()
+    if sent > 0:
+        await asyncio.sleep(wait_policy.min_holdoff)
+    return sent
     
 # *************************************************************************************
 # func: rx_output_eq_read
@@ -395,7 +691,8 @@ async def tx_input_eq_max_read(port: FreyaEdunPort, logger_name: str) -> int:
 # func: enable_host_controlled_eq
 # description: Enable Host Controlled EQ for a lane
 # *************************************************************************************
-async def enable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name: str):
+@timed("cmis_write")
+async def enable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY):
     """Set HostControl for a lane
     """
     # Get logger
@@ -421,13 +718,14 @@ async def enable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name:
     value = '{:02X}'.format(value)
 
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex(value))
-    await asyncio.sleep(1)
+    await asyncio.sleep(wait_policy.min_holdoff)
 
 # *************************************************************************************
 # func: disable_host_controlled_eq
 # description: Disable Host Controlled EQ for a lane
 # *************************************************************************************
-async def disable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name: str):
+@timed("cmis_write")
+async def disable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY):
     """Clear HostControl for a lane
     """
     # Get logger
@@ -452,15 +750,18 @@ async def disable_host_controlled_eq(port: FreyaEdunPort, lane: int, logger_name
     value = '{:02X}'.format(value)
 
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex(value))
-    await asyncio.sleep(1)
+    await asyncio.sleep(wait_policy.min_holdoff)
 
 
 # *************************************************************************************
 # func: tx_input_eq_write
 # description: Write input value to a specified cursor on a specified lane
 # *************************************************************************************
-async def tx_input_eq_write(port: FreyaEdunPort, lane: int, value: int, logger_name: str):
-    """Write input dB value to a specified cursor on a specified lane
+@timed("cmis_write")
+async def tx_input_eq_write(port: FreyaEdunPort, lane: int, value: int, logger_name: str, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY, shadow: Optional[CmisShadowCache] = None):
+    """Write input dB value to a specified cursor on a specified lane. 
+    
+    If a shadow cache is given, the current value is read from the cache and the write is skipped if the value is unchanged.
     """
     # Get logger
     logger = logging.getLogger(logger_name)
@@ -472,6 +773,12 @@ async def tx_input_eq_write(port: FreyaEdunPort, lane: int, value: int, logger_n
     _start_addr = 156
     _reg_addr = _start_addr + int((lane-1)/2)
     _size = 1
+
+    if shadow is not None:
+        await shadow.stage_nibble(page=_page, reg_addr=_reg_addr, high_nibble=(lane % 2 == 0), value=value)
+        if await shadow.flush() > 0:
+            await asyncio.sleep(wait_policy.min_holdoff)
+        return
     
     # read the byte from the address
     resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
@@ -491,7 +798,38 @@ async def tx_input_eq_write(port: FreyaEdunPort, lane: int, value: int, logger_n
         _tmp = (current_byte & 0xF0) + value
     
     await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).set(value=Hex('{:02X}'.format(_tmp)))
-    await asyncio.sleep(1)
+    await asyncio.sleep(wait_policy.min_holdoff)
+
+# *************************************************************************************
+# func: tx_input_eq_write_on_lanes
+# description: Write input values to several lanes in one register transaction
+# *************************************************************************************
+@timed("cmis_write")
+async def tx_input_eq_write_on_lanes(port: FreyaEdunPort, lane_values: List[Tuple[int, int]], logger_name: str, shadow: CmisShadowCache, wait_policy: CmisWaitPolicy = DEFAULT_CMIS_WAIT_POLICY) -> int:
+    """Write input values to several lanes, each lane can have a different value.
+
+    The values of all lanes are staged in the shadow cache and written with one multi-byte write (Write address 10h:156-159). Lanes that already have the value are not written.
+
+    :param lane_values: List of (lane, value)
+    :type lane_values: List[Tuple[int, int]]
+    :return: the number of write transactions sent
+    :rtype: int
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+
+    _page = 0x10
+    _start_addr = 156
+    for lane, value in lane_values:
+        logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Write {value} - Lane {lane} ")
+        assert 1<=lane<=8
+        assert 0<=value<=12
+        _reg_addr = _start_addr + int((lane-1)/2)
+        await shadow.stage_nibble(page=_page, reg_addr=_reg_addr, high_nibble=(lane % 2 == 0), value=value)
+    sent = await shadow.flush()
+    if sent > 0:
+        await asyncio.sleep(wait_policy.min_holdoff)
+    return sent
 
 # *************************************************************************************
 # func: tx_input_eq_read
@@ -518,4 +856,27 @@ async def tx_input_eq_read(port: FreyaEdunPort, lane: int, logger_name: str) ->
         _tmp = int(resp.value, 16) & 0x0F
         _read = _tmp
     logger.info(f"Port {port.kind.module_id}/{port.kind.port_id} Lane {lane} TX Input EQ: {_read}")
-    return _read
\ No newline at end of file
+    return _read
+
+
+# *************************************************************************************
+# func: read_module_identity
+# description: Read the vendor name, part number and serial number of a module
+# *************************************************************************************
+async def read_module_identity(port: FreyaEdunPort, logger_name: str) -> ModuleIdentity:
+    """Read the vendor name (Read address 00h:129-144), part number (00h:148-163) and serial number (00h:166-181) of a module in one read. The fields are ASCII padded with spaces.
+    """
+    # Get logger
+    logger = logging.getLogger(logger_name)
+
+    _page = 0x00
+    _start_addr = 129
+    _reg_addr = _start_addr
+    _size = 53
+    resp = await port.transceiver.access_rw_seq(page_address=_page, register_address=_reg_addr, byte_count=_size).get()
+    value = bytes.fromhex(resp.value)
+    def _field(addr: int, size: int) -> str:
+        return value[addr - _start_addr:addr - _start_addr + size].decode("ascii", errors="replace").replace("\x00", " ").strip()
+    identity = ModuleIdentity(vendor_name=_field(129, 16), part_number=_field(148, 16), serial_number=_field(166, 16))
+    logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Vendor Name={identity.vendor_name}, Part Number={identity.part_number}, Serial Number={identity.serial_number}")
+    return identity
\ No newline at end of file
@@ -14,6 +14,12 @@ from pathlib import Path
 import logging
 from typing import Optional
 from .reportgen import *
+from .simulator import SimulatedTestbed, run_in_virtual_time
+from .traffic import TrafficRecorder, TrafficReplay
+from .timing import PhaseTimer, set_phase_timer, reset_phase_timer, span
+from .planner import TestPlan, LiveEta, plan_test
+from .result_store import ResultStore
+from .checkpoint import Checkpoint, config_fingerprint, set_checkpoint, reset_checkpoint, checkpoint_subtest
 
 # *************************************************************************************
 # class: XenaCablePerfOptimization
@@ -31,6 +37,38 @@ class XenaCablePerfOptimization:
         self.test_config_file = test_config_file
         self.test_config: CablePerformanceTestConfig
         self.tester_objs: List[testers.L23Tester]
+        self.testbed: Optional[SimulatedTestbed] = None
+        """
+        Simulated testers, if the simulator is configured
+        """
+        self.traffic_recorder: Optional[TrafficRecorder] = None
+        """
+        Recorder of the tester traffic, if record_traffic is configured
+        """
+        self.traffic_replay: Optional[TrafficReplay] = None
+        """
+        Recorded tester traffic served instead of the testers, if replay_traffic is configured
+        """
+        self.phase_timer: Optional[PhaseTimer] = None
+        """
+        Timer of the test phases, if the timing report or the live ETA is enabled
+        """
+        self.test_plan: Optional[TestPlan] = None
+        """
+        Estimated runtime and command count of the test, after a dry run or if the live ETA is enabled
+        """
+        self.result_store: Optional[ResultStore] = None
+        """
+        Measurements of all runs by module, if result_store is configured
+        """
+        self.checkpoint: Optional[Checkpoint] = None
+        """
+        Journal of the measurements of the run, if the checkpoint is enabled
+        """
+        self.resume_path: Optional[str] = None
+        """
+        Report directory of the interrupted run to resume
+        """
         self.rx_output_eq_optimization_test: Optional[XenaTcvrRxOutputEqOptimization] = None
         """
         Optimizing RX Output Equalization        
@@ -49,19 +87,38 @@ class XenaCablePerfOptimization:
         self.load_test_config(test_config_file)
 
     async def connect(self):
-        """Connect to the chassis and create tester object, and create a report directory for the test report and logs.
+        """Connect to the chassis and create tester object, and create a report directory for the test report and logs, or reuse the report directory of the run to resume. If the simulator is configured, simulated testers are created instead, and if a traffic replay is configured, the testers are served from the recording. If traffic recording is configured, the tester objects are wrapped in recording proxies.
         """
         self.tester_objs = []
+        if self.test_config.replay_traffic is not None:
+            self.traffic_replay = TrafficReplay(self.test_config.replay_traffic.filename, self.test_config.replay_traffic.command_latency)
+        elif self.test_config.simulator is not None:
+            self.testbed = SimulatedTestbed(self.test_config.simulator, self.port_pair_list)
+        if self.test_config.record_traffic is not None:
+            self.traffic_recorder = TrafficRecorder()
         for chassis in self.test_config.chassis_list:
-            tester_obj = await testers.L23Tester(
-                host=chassis.chassis_ip, 
-                username=self.test_config.username, 
-                password=chassis.password, 
-                port=chassis.tcp_port, 
-                enable_logging=self.enable_comm_trace)
-            self.tester_objs.append(tester_obj)
+            if self.traffic_replay is not None:
+                tester_obj = self.traffic_replay.connect(chassis.chassis_ip)
+            elif self.testbed is not None:
+                tester_obj = self.testbed.connect(chassis.chassis_ip)
+            else:
+                tester_obj = await testers.L23Tester(
+                    host=chassis.chassis_ip, 
+                    username=self.test_config.username, 
+                    password=chassis.password, 
+                    port=chassis.tcp_port, 
+                    enable_logging=self.enable_comm_trace)
+            if self.traffic_recorder is not None:
+                tester_obj = self.traffic_recorder.wrap(tester_obj, chassis.chassis_ip)
+            self.tester_objs.append(tester_obj) # type: ignore
 
-        self.path = await create_report_dir()
+        if self.resume_path is not None:
+            self.path = self.resume_path
+            # the report of the resumed run is generated again from the start
+            if os.path.exists(self.report_filepathname):
+                os.remove(self.report_filepathname)
+        else:
+            self.path = await create_report_dir()
 
         # configure basic logger
         logging.basicConfig(
@@ -77,6 +134,19 @@ class XenaCablePerfOptimization:
         logger.info(f"Welcome to Xena Cable Performance Optimization Test")
         logger.info(f"Chassis:              {', '.join([chassis.chassis_ip for chassis in self.test_config.chassis_list])}")
         logger.info(f"Username:             {self.username}")
+        if self.testbed is not None:
+            logger.info(f"Simulator:            {'simulated time' if self.test_config.simulator.virtual_time else 'real time'}, seed {self.test_config.simulator.seed}") # type: ignore
+        if self.traffic_replay is not None:
+            logger.info(f"Replay:               {self.test_config.replay_traffic.filename}") # type: ignore
+        if self.test_config.result_store is not None:
+            self.result_store = ResultStore(self.test_config.result_store, self.logger_name)
+            logger.info(f"Result Store:         {self.test_config.result_store.filename}, warm start {'enabled' if self.test_config.result_store.warm_start else 'disabled'}")
+        if self.test_config.checkpoint.enable:
+            filename = os.path.join(self.path, self.test_config.checkpoint.filename)
+            logger.info(f"Checkpoint:           {filename}{', resuming' if self.resume_path is not None else ''}")
+            self.checkpoint = Checkpoint(filename, config_fingerprint(self.test_config.model_dump(mode="json")), self.resume_path is not None, self.test_config.checkpoint.fsync, self.logger_name)
+        elif self.resume_path is not None:
+            raise ValueError(f"Resuming a test needs the checkpoint to be enabled")
         logger.info(f"#####################################################################")
 
     async def disconnect(self):
@@ -85,6 +155,18 @@ class XenaCablePerfOptimization:
         for tester_obj in self.tester_objs:
             await tester_obj.session.logoff()
         logger = logging.getLogger(self.logger_name)
+        if self.testbed is not None:
+            logger.info(f"Simulated testers: {self.testbed.command_count} commands in {self.testbed.round_trip_count} round trips")
+        if self.traffic_replay is not None:
+            logger.info(f"Replayed testers: {self.traffic_replay.command_count} commands in {self.traffic_replay.round_trip_count} round trips, {self.traffic_replay.miss_count} not recorded in the same state")
+        self.save_traffic_recording()
+        if self.result_store is not None:
+            self.result_store.close()
+            self.result_store = None
+        if self.checkpoint is not None:
+            logger.info(f"Checkpoint: {self.checkpoint.replayed_count} measurements replayed, {self.checkpoint.recorded_count} measurements journaled in {self.checkpoint.filename}")
+            self.checkpoint.close()
+            self.checkpoint = None
         logger.info(f"Gracefully disconnect from testers")
         logger.info(f"Bye!")
 
@@ -104,27 +186,37 @@ class XenaCablePerfOptimization:
         """Run the TX Input Equalization optimization test, if configured.
         """
         if self.test_config.tcvr_tx_input_eq_test_config is not None:
-            self.tx_input_eq_optimization_test = XenaTcvrTxInputEqOptimization(self.tester_objs, self.test_config.tcvr_tx_input_eq_test_config, self.logger_name, self.report_filepathname)
+            self.tx_input_eq_optimization_test = XenaTcvrTxInputEqOptimization(self.tester_objs, self.test_config.tcvr_tx_input_eq_test_config, self.logger_name, self.report_filepathname, self.result_store, self.test_config.report_writer)
             await self.tx_input_eq_optimization_test.run()
 
     async def run_rx_output_eq_optimization_test(self):
         """Run the RX Output Equalization optimization test, if configured.
         """
         if self.test_config.tcvr_rx_output_eq_test_config is not None:
-            self.rx_output_eq_optimization_test  = XenaTcvrRxOutputEqOptimization(self.tester_objs, self.test_config.tcvr_rx_output_eq_test_config, self.logger_name, self.report_filepathname)
+            self.rx_output_eq_optimization_test  = XenaTcvrRxOutputEqOptimization(self.tester_objs, self.test_config.tcvr_rx_output_eq_test_config, self.logger_name, self.report_filepathname, self.result_store, self.test_config.report_writer)
             await self.rx_output_eq_optimization_test.run()
 
     async def run_host_tx_eq_optimization_test(self):
         """Run the Host TX Equalization optimization test, if configured.
         """
         if self.test_config.host_tx_eq_test_config is not None:
-            self.host_tx_eq_optimization_test = XenaHostTxEqOptimization(self.tester_objs, self.test_config.host_tx_eq_test_config, self.logger_name, self.report_filepathname)
+            self.host_tx_eq_optimization_test = XenaHostTxEqOptimization(self.tester_objs, self.test_config.host_tx_eq_test_config, self.logger_name, self.report_filepathname, self.result_store, self.test_config.report_writer)
             await self.host_tx_eq_optimization_test.run()
 
     # @property
     # def chassis_credentials(self):
     #     return [(chassis.chassis_ip, chassis.username, chassis.password) for chassis in self.test_config.chassis_list]
     
+    @property
+    def port_pair_list(self) -> List[PortPair]:
+        """All port pairs of the configured tests
+        """
+        port_pairs: List[PortPair] = []
+        for test_config in (self.test_config.tcvr_rx_output_eq_test_config, self.test_config.tcvr_tx_input_eq_test_config, self.test_config.host_tx_eq_test_config):
+            if test_config is not None:
+                port_pairs.extend(test_config.port_pair_list)
+        return port_pairs
+
     @property
     def username(self):
         return self.test_config.username
@@ -142,20 +234,111 @@ class XenaCablePerfOptimization:
             return "xena_cpom"
         else:
             return self.log_filename.replace(".log", "")
+
+    def save_traffic_recording(self):
+        """Save the recording of the tester traffic in the report directory, if record_traffic is configured. A run that fails saves the commands recorded up to the failure.
+        """
+        if self.traffic_recorder is None or getattr(self, "path", None) is None:
+            return
+        logger = logging.getLogger(self.logger_name)
+        filename = os.path.join(self.path, self.test_config.record_traffic.filename) # type: ignore
+        self.traffic_recorder.save(filename)
+        logger.info(f"Tester traffic recorded: {len(self.traffic_recorder.commands)} commands in {filename}")
     
     @property
     def report_filepathname(self):
         return os.path.join(self.path, self.test_config.csv_report_filename)
     
-    async def run(self):
-        """Run the XenaCablePerfOptimization test.
+    async def run(self, resume: Optional[str] = None):
+        """Run the XenaCablePerfOptimization test. With the simulator or a traffic replay in simulated time, the test runs in its own event loop, where delays and PRBS durations take no real time.
+
+        :param resume: Report directory of an interrupted run to resume, see :class:`xoa_cpom.checkpoint.Checkpoint`. The run uses the same configuration, reuses the directory, and does not measure again what the interrupted run measured. Defaults to None for a new run.
+        :type resume: Optional[str], optional
+        """
+        self.resume_path = resume
+        if self.test_config.replay_traffic is not None:
+            virtual_time = self.test_config.replay_traffic.virtual_time
+        else:
+            virtual_time = self.test_config.simulator is not None and self.test_config.simulator.virtual_time
+        if virtual_time:
+            await run_in_virtual_time(self.run_tests)
+        else:
+            await self.run_tests()
+
+    async def run_tests(self):
+        """Connect, run the configured tests, and disconnect. If the timing report is enabled, the test time is broken down by phase before disconnecting. If the checkpoint is enabled, every measurement is journaled. If traffic recording is configured and a test fails, the traffic recorded so far is saved before the error is raised.
         """
-        await self.connect()
-        await self.run_rx_output_eq_optimization_test()
-        await self.run_tx_input_eq_optimization_test()
-        await self.run_host_tx_eq_optimization_test()
+        if self.test_config.timing_report.enable or self.test_config.planner.live_eta:
+            self.phase_timer = PhaseTimer()
+        token = set_phase_timer(self.phase_timer)
+        checkpoint_token = None
+        try:
+            with span("connect"):
+                await self.connect()
+            checkpoint_token = set_checkpoint(self.checkpoint)
+            if self.test_config.planner.live_eta:
+                with span("plan"):
+                    await self.plan()
+                LiveEta(self.test_plan, self.phase_timer, self.logger_name, self.test_config.planner.eta_interval) # type: ignore
+            with span("rx_output_eq_test"), checkpoint_subtest("rx_output_eq_test"):
+                await self.run_rx_output_eq_optimization_test()
+            with span("tx_input_eq_test"), checkpoint_subtest("tx_input_eq_test"):
+                await self.run_tx_input_eq_optimization_test()
+            with span("host_tx_eq_test"), checkpoint_subtest("host_tx_eq_test"):
+                await self.run_host_tx_eq_optimization_test()
+        except BaseException:
+            # keep the traffic recorded up to the failure, disconnect is not reached
+            self.save_traffic_recording()
+            raise
+        finally:
+            if checkpoint_token is not None:
+                reset_checkpoint(checkpoint_token)
+            reset_phase_timer(token)
+        self.report_timing()
         await self.disconnect()
 
+    async def plan(self) -> TestPlan:
+        """Estimate the runtime and the command count of the test by running it on simulated testers in simulated time, and log the plan.
+
+        :return: The plan
+        :rtype: TestPlan
+        """
+        self.test_plan = await plan_test(self.test_config, self.port_pair_list, self.logger_name)
+        logger = logging.getLogger(self.logger_name)
+        for line in self.test_plan.format():
+            logger.info(line)
+        return self.test_plan
+
+    async def dry_run(self) -> TestPlan:
+        """Plan the test without running it: print the estimated runtime and the number of command round trips of each port pair, see :func:`xoa_cpom.planner.plan_test`. Nothing is sent to the chassis, and no report directory is created.
+
+        :return: The plan
+        :rtype: TestPlan
+        """
+        logging.basicConfig(
+            format="%(asctime)s  %(message)s",
+            level=logging.DEBUG,
+            handlers=[logging.StreamHandler()]
+            )
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"#####################################################################")
+        logger.info(f"Dry run of {self.test_config_file}")
+        logger.info(f"Chassis:              {', '.join([chassis.chassis_ip for chassis in self.test_config.chassis_list])}")
+        logger.info(f"#####################################################################")
+        return await self.plan()
+
+    def report_timing(self):
+        """Log the test time broken down by phase, and save the Chrome trace-event timelines if configured.
+        """
+        if self.phase_timer is None or not self.test_config.timing_report.enable:
+            return
+        logger = logging.getLogger(self.logger_name)
+        for line in self.phase_timer.format_breakdown():
+            logger.info(line)
+        if self.test_config.timing_report.chrome_trace:
+            for filename in self.phase_timer.save_chrome_traces(self.path):
+                logger.info(f"Timeline saved: {filename}")
+
 
 
 
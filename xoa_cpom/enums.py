@@ -50,4 +50,30 @@ class ReconfigurationSupport(IntEnum):
     """
     Both = 3
     """Both Reconfiguration supported
+    """
+
+class DataPathState(IntEnum):
+    DPReserved = 0x00
+    """Reserved
+    """
+    DPDeactivated = 0x01
+    """Data Path is deactivated
+    """
+    DPInit = 0x02
+    """Data Path is being initialized
+    """
+    DPDeinit = 0x03
+    """Data Path is being deinitialized
+    """
+    DPActivated = 0x04
+    """Data Path is activated
+    """
+    DPTxTurnOn = 0x05
+    """Tx output is being turned on
+    """
+    DPTxTurnOff = 0x06
+    """Tx output is being turned off
+    """
+    DPInitialized = 0x07
+    """Data Path is initialized
     """
\ No newline at end of file
@@ -0,0 +1,211 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from .ber_stats import prbs_ber_estimate
+
+
+# *************************************************************************************
+# class: LaneMeasurement
+# description: Raw counters of one PRBS measurement of one lane
+# *************************************************************************************
+@dataclass(slots=True)
+class LaneMeasurement:
+    """Raw counters of one PRBS measurement of one lane at one EQ setting. The PRBS BER and the report fields are derived from the counters, so measurements can be pooled without loss of precision.
+    """
+    lane: int
+    setting: Tuple[int, ...]    # EQ vector applied on the lane, e.g. (amplitude, pre-cursor, post-cursor)
+    error_count: int
+    bit_count: int
+    start: float                # event loop time of the start of the measurement, in seconds
+    end: float                  # event loop time of the end of the measurement
+    count: int = 1              # number of measurements pooled into this one
+
+    @property
+    def prbs_ber(self) -> float:
+        return prbs_ber_estimate(self.error_count, self.bit_count)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @classmethod
+    def from_lane_ber_dict(cls, lane_ber_dict: Dict[str, Any], setting: Iterable[int]) -> "LaneMeasurement":
+        """Create a measurement from a lane BER dict of :func:`xoa_cpom.prbs_control.measure_prbs_ber`. The lane BER dict of a pooled measurement (see :func:`xoa_cpom.prbs_control.measure_prbs_ber_pooled`) gives the counts of its own window only.
+
+        :param lane_ber_dict: {"lane": lane number, "error_count": number of errors, "bit_count": number of bits, "start": start time, "end": end time}
+        :type lane_ber_dict: Dict[str, Any]
+        :param setting: EQ vector applied on the lane
+        :type setting: Iterable[int]
+        :return: The measurement
+        :rtype: LaneMeasurement
+        """
+        return cls(
+            lane=int(lane_ber_dict["lane"]),
+            setting=tuple(int(value) for value in setting),
+            error_count=int(lane_ber_dict.get("window_error_count", lane_ber_dict["error_count"])),
+            bit_count=int(lane_ber_dict.get("window_bit_count", lane_ber_dict["bit_count"])),
+            start=float(lane_ber_dict.get("start", 0.0)),
+            end=float(lane_ber_dict.get("end", 0.0)))
+
+    def merge(self, other: "LaneMeasurement") -> "LaneMeasurement":
+        """Pool two measurements of the same lane and setting: the counters add up, and the time span covers both.
+        """
+        if (self.lane, self.setting) != (other.lane, other.setting):
+            raise ValueError(f"Cannot pool lane {other.lane} setting {other.setting} into lane {self.lane} setting {self.setting}")
+        return LaneMeasurement(
+            lane=self.lane,
+            setting=self.setting,
+            error_count=self.error_count + other.error_count,
+            bit_count=self.bit_count + other.bit_count,
+            start=min(self.start, other.start),
+            end=max(self.end, other.end),
+            count=self.count + other.count)
+
+
+# *************************************************************************************
+# func: pool_measurements
+# description: Pool the measurements of each lane and setting
+# *************************************************************************************
+def pool_measurements(measurements: Iterable[LaneMeasurement]) -> Dict[Tuple[int, Tuple[int, ...]], LaneMeasurement]:
+    """Pool the repeated measurements of each lane and setting, see :meth:`LaneMeasurement.merge`
+
+    :param measurements: Measurements
+    :type measurements: Iterable[LaneMeasurement]
+    :return: Dictionary of {(lane, setting): pooled measurement}, in the order the settings were first measured
+    :rtype: Dict[Tuple[int, Tuple[int, ...]], LaneMeasurement]
+    """
+    pooled: Dict[Tuple[int, Tuple[int, ...]], LaneMeasurement] = {}
+    for measurement in measurements:
+        key = (measurement.lane, measurement.setting)
+        pooled[key] = pooled[key].merge(measurement) if key in pooled else measurement
+    return pooled
+
+
+# *************************************************************************************
+# func: lane_measurements
+# description: Measurements of the lane BER dicts of one PRBS window
+# *************************************************************************************
+def lane_measurements(lane_ber_dicts: List[Dict[str, Any]], lane_settings: Dict[int, Iterable[int]]) -> List[LaneMeasurement]:
+    """Measurements of the lane BER dicts of one PRBS window, with the EQ setting of each lane. Lanes without a setting, and lanes served from the evidence of earlier measurements without measuring, are skipped.
+
+    :param lane_ber_dicts: Lane BER dicts of :func:`xoa_cpom.prbs_control.measure_prbs_ber`
+    :type lane_ber_dicts: List[Dict[str, Any]]
+    :param lane_settings: EQ setting of each lane
+    :type lane_settings: Dict[int, Iterable[int]]
+    :return: The measurements
+    :rtype: List[LaneMeasurement]
+    """
+    return [LaneMeasurement.from_lane_ber_dict(lane_ber_dict, lane_settings[lane_ber_dict["lane"]]) for lane_ber_dict in lane_ber_dicts if lane_ber_dict["lane"] in lane_settings and not lane_ber_dict.get("cached", False)]
+
+
+# *************************************************************************************
+# class: MeasurementTable
+# description: Pooled measurements of each port pair, lane and setting
+# *************************************************************************************
+class MeasurementTable:
+    """Pooled measurements of each port pair, lane and setting of a test. A setting measured again adds its errors and bits to the earlier measurements of the setting.
+    """
+    def __init__(self) -> None:
+        self.measurements: Dict[str, Dict[Tuple[int, Tuple[int, ...]], LaneMeasurement]] = {}
+        """
+        Pooled measurements by port pair name and by (lane, setting), in the order the settings were first measured
+        """
+
+    def add(self, port_name: str, measurement: LaneMeasurement) -> LaneMeasurement:
+        """Pool a measurement of a port pair
+
+        :param port_name: Port pair name
+        :type port_name: str
+        :param measurement: The measurement
+        :type measurement: LaneMeasurement
+        :return: The pooled measurement of the lane and setting
+        :rtype: LaneMeasurement
+        """
+        pooled = self.measurements.setdefault(port_name, {})
+        key = (measurement.lane, measurement.setting)
+        pooled[key] = pooled[key].merge(measurement) if key in pooled else measurement
+        return pooled[key]
+
+    def get(self, port_name: str, lane: int, setting: Iterable[int]) -> Optional[LaneMeasurement]:
+        return self.measurements.get(port_name, {}).get((lane, tuple(setting)))
+
+
+# *************************************************************************************
+# class: BestMeasurements
+# description: Best measurement of each port pair and lane
+# *************************************************************************************
+class BestMeasurements:
+    """Measurement with the lowest PRBS BER of each port pair and lane, kept as the measurements are recorded, so its size does not grow with the number of measurements. A measurement of the setting that is the best of its lane is pooled into it. On a tie, the measurement recorded first stays.
+    """
+    def __init__(self) -> None:
+        self.measurements: Dict[str, Dict[int, LaneMeasurement]] = {}
+        """
+        Best measurement by port pair name and lane
+        """
+
+    def add(self, port_name: str, measurement: LaneMeasurement) -> None:
+        lane_best = self.measurements.setdefault(port_name, {})
+        best = lane_best.get(measurement.lane)
+        if best is not None and best.setting == measurement.setting:
+            lane_best[measurement.lane] = best.merge(measurement)
+        elif best is None or measurement.prbs_ber < best.prbs_ber:
+            lane_best[measurement.lane] = measurement
+
+    def port_names(self) -> List[str]:
+        return list(self.measurements)
+
+    def best(self) -> Dict[str, Dict[int, LaneMeasurement]]:
+        """The best measurement of each lane of each port pair
+
+        :return: Dictionary of {port pair name: {lane: measurement}}
+        :rtype: Dict[str, Dict[int, LaneMeasurement]]
+        """
+        return {port_name: dict(lane_best) for port_name, lane_best in self.measurements.items()}
+
+
+# *************************************************************************************
+# class: EvidenceMemo
+# description: Errors and bits of each port pair, lane and setting measured in a run
+# *************************************************************************************
+class EvidenceMemo:
+    """Errors and bits of each port pair, lane and setting measured in a run. When a search comes back to a setting, the bits already counted at the setting are kept, and the setting is only measured again for the time that the earlier visits did not cover, see :func:`xoa_cpom.prbs_control.measure_prbs_ber_pooled`.
+    """
+    def __init__(self, confidence: float) -> None:
+        self.confidence = confidence
+        """
+        Confidence level of the BER bounds that decide if the evidence of a setting is sufficient
+        """
+        self.table = MeasurementTable()
+        self.measured_times: Dict[Tuple[str, int, Tuple[int, ...]], float] = {}
+        """
+        PRBS time in seconds spent on each port pair, lane and setting
+        """
+        self.served_count = 0
+        self.topped_up_count = 0
+
+    def lookup(self, port_name: str, lane: int, setting: Iterable[int]) -> Optional[LaneMeasurement]:
+        return self.table.get(port_name, lane, setting)
+
+    def measured_time(self, port_name: str, lane: int, setting: Iterable[int]) -> float:
+        return self.measured_times.get((port_name, lane, tuple(setting)), 0.0)
+
+    def add(self, port_name: str, measurement: LaneMeasurement, measured_time: float) -> LaneMeasurement:
+        """Pool a measurement of a port pair
+
+        :param port_name: Port pair name
+        :type port_name: str
+        :param measurement: The measurement
+        :type measurement: LaneMeasurement
+        :param measured_time: PRBS time of the measurement in seconds
+        :type measured_time: float
+        :return: The pooled measurement of the lane and setting
+        :rtype: LaneMeasurement
+        """
+        key = (port_name, measurement.lane, measurement.setting)
+        if key in self.measured_times:
+            self.topped_up_count += 1
+        self.measured_times[key] = self.measured_times.get(key, 0.0) + measured_time
+        return self.table.add(port_name, measurement)
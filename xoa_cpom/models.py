@@ -13,12 +13,65 @@ from typing import (
 
 class PRBSTestConfig(BaseModel):
     polynomial: str
-    duration: int
+    duration: Optional[int] = None  # seconds, required when duration_mode is "fixed"
+    measurement_mode: str = "restart"  # "restart" or "continuous"
+    duration_mode: str = "fixed"    # "fixed" or "auto"
+    target_ber: Optional[float] = None  # BER to prove in "auto" duration mode
+    confidence: float = 0.99            # confidence level in "auto" duration mode, the confidence level of the reported PRBS BER of an error-free lane
+    max_duration: Optional[float] = None    # seconds, upper limit in "auto" duration mode
 
 class PortPair(BaseModel):
     tx: str
     rx: str
 
+class ConcurrencyConfig(BaseModel):
+    enable: bool = False
+    max_pairs_per_chassis: int = 0  # 0 = no limit
+    max_pairs_per_module: int = 0   # 0 = no limit
+
+class CmisWaitConfig(BaseModel):
+    min_holdoff: float = 0.1    # seconds to wait after a CMIS write before polling the module
+    poll_interval: float = 0.02 # first polling interval, in seconds
+    max_poll_interval: float = 0.5
+    backoff_factor: float = 2.0
+    timeout: float = 10.0
+    module_min_holdoff: Dict[str, float] = {}   # min_holdoff per module media, e.g. {"QSFPDD800": 0.2}
+
+class SuccessiveHalvingConfig(BaseModel):
+    min_duration: float = 1.0   # PRBS duration in seconds of the first round
+    keep_fraction: float = 0.5  # fraction of candidates kept after each round
+    polynomials: List[str] = [] # PRBS polynomial of each round before the final round, e.g. ["PRBS7", "PRBS15"]
+    min_saving: float = 0.2     # screen with short rounds only if the estimated time is at least this fraction below measuring every candidate with the full duration
+    max_tap_values: int = 16    # host TX EQ only: the largest number of values of a tap, the tap range is sampled with an even step through the start value
+
+class BayesianSearchConfig(BaseModel):
+    initial_points: int = 8                 # number of spread-out grid points measured before the model is used
+    max_measurements: int = 40              # maximum number of measurements per lane
+    min_expected_improvement: float = 0.01  # stop a lane when no point is expected to improve log10(BER) by more than this
+
+class LocalSearchConfig(BaseModel):
+    refine_radius: int = 1  # steps around the best point searched exhaustively after the descent
+
+class SpsaConfig(BaseModel):
+    iterations: int = 20        # number of iterations, each with two measurements per lane
+    perturbation: float = 2.0   # tap steps of the first perturbation
+    initial_step: float = 2.0   # tap steps of the largest tap change in the first iteration
+    seed: int = 0               # seed of the random perturbation directions
+
+class QFactorConfig(BaseModel):
+    short_duration: float = 1.0 # PRBS duration in seconds of the screening window of each EQ value
+    min_errors: int = 10        # screening measurements with fewer errors only bound their BER, and are not fitted
+    max_residual_rms: float = 0.5   # a fit whose weighted RMS of the Q residuals is higher is not trusted
+
+class EarlyStopConfig(BaseModel):
+    enable: bool = False
+    poll_interval: float = 0.5  # seconds between two readings of the PRBS counters
+    confidence: float = 0.99    # confidence level of the BER bounds
+
+class EvidencePoolingConfig(BaseModel):
+    enable: bool = False
+    confidence: float = 0.99    # confidence level of the BER bounds that decide if the pooled evidence of a setting is sufficient
+
 class TcvrRxOutputEqRange(BaseModel):
     amp_min: int
     amp_max: int
@@ -39,25 +92,50 @@ class HostTxEqPreset(BaseModel):
     post1: Optional[int] = None
     post2: Optional[int] = None
 
+class HostTxEqTapRange(BaseModel):
+    txeq_id: int                # 0 = main, -1 = pre1, 1 = post1, etc.
+    min: Optional[int] = None   # the port minimum if not set
+    max: Optional[int] = None   # the port maximum if not set
+    step: int = 1
+
+class HostTxEqJointSweepConfig(BaseModel):
+    tap_ranges: List[HostTxEqTapRange] = []   # taps of optimize_txeq_ids not listed here sweep their full range by 1
+    max_candidates: int = 0                   # sample this many candidates if there are more. 0 = no limit
+    seed: int = 0                             # seed of the sample
+
 class TcvrRxOutputEqTestConfig(BaseModel):
     port_pair_list: list[PortPair]
     module_media: str
     port_speed: str
-    lane: int
+    lane: Optional[int] = None
+    lanes: Optional[List[int]] = None   # sweep the grid on all these lanes at once, instead of lane
     delay_after_reset: int
     prbs_config: PRBSTestConfig
     rx_output_eq_range: TcvrRxOutputEqRange
     delay_after_eq_write: int
+    optimize_mode: str = "exhaustive"   # "exhaustive", "successive_halving", "bayesian" or "coordinate_descent"
+    successive_halving: SuccessiveHalvingConfig = SuccessiveHalvingConfig()
+    bayesian: BayesianSearchConfig = BayesianSearchConfig()
+    local_search: LocalSearchConfig = LocalSearchConfig()
+    cmis_wait: CmisWaitConfig = CmisWaitConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
 
 class TcvrTxInputEqTestConfig(BaseModel):
     port_pair_list: list[PortPair]
     module_media: str
     port_speed: str
-    lane: int
+    lane: Optional[int] = None
+    lanes: Optional[List[int]] = None   # test all these lanes at once, instead of lane
     delay_after_reset: int    
     prbs_config: PRBSTestConfig
     tx_input_eq_range: TcvrTxInputEqRange
     delay_after_eq_write: int
+    optimize_mode: str = "exhaustive"   # "exhaustive", "lane_multiplexed", "successive_halving", "golden_section" or "q_factor"
+    successive_halving: SuccessiveHalvingConfig = SuccessiveHalvingConfig()
+    local_search: LocalSearchConfig = LocalSearchConfig()
+    q_factor: QFactorConfig = QFactorConfig()
+    cmis_wait: CmisWaitConfig = CmisWaitConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
 
 class HostTxEqTestConfig(BaseModel):
     port_pair_list: list[PortPair]
@@ -69,8 +147,14 @@ class HostTxEqTestConfig(BaseModel):
     delay_after_eq_write: int
     target_ber: float
     start_txeq: HostTxEqPreset
-    optimize_mode: str  # "heuristic" or "exhaustive"
+    optimize_mode: str  # "heuristic", "exhaustive", "successive_halving", "spsa" or "joint_exhaustive"
     optimize_txeq_ids: List[int]
+    successive_halving: SuccessiveHalvingConfig = SuccessiveHalvingConfig()
+    spsa: SpsaConfig = SpsaConfig()
+    joint_sweep: HostTxEqJointSweepConfig = HostTxEqJointSweepConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    early_stop: EarlyStopConfig = EarlyStopConfig()
+    evidence_pooling: EvidencePoolingConfig = EvidencePoolingConfig()
 
 class ChassisRepositoryItem(BaseModel):
     chassis_ip: str
@@ -78,6 +162,69 @@ class ChassisRepositoryItem(BaseModel):
     tcp_port: int = 22606
     
 
+class SimulatedBerSurfaceConfig(BaseModel):
+    rx_port: Optional[str] = None   # RX port "chassis_ip:m/p" the surface applies to, None = all ports
+    lane: Optional[int] = None      # lane the surface applies to, None = all lanes
+    best_ber: float = 1e-12         # BER at the optimum
+    rx_output_eq_optimum: List[int] = [2, 3, 3]         # amplitude, pre, post
+    rx_output_eq_width: List[float] = [1.5, 3.0, 3.0]   # distance from the optimum that makes the BER 10 times worse
+    tx_input_eq_optimum: int = 6
+    tx_input_eq_width: float = 4.0
+    host_txeq_optimum: List[int] = [0, 0, -20, 110, -10, 0]         # pre3, pre2, pre1, main, post1, post2
+    host_txeq_width: List[float] = [6.0, 8.0, 15.0, 20.0, 15.0, 8.0]
+    lane_spread: int = 1    # random shift of the optimum per lane, in steps for the module EQ and in widths for the host TX taps
+
+class SimulatorConfig(BaseModel):
+    virtual_time: bool = True       # run in simulated time, so delays and PRBS durations take no real time
+    seed: int = 0
+    command_latency: float = 0.0005 # seconds per command round trip
+    noise: float = 0.1              # standard deviation of the BER of a PRBS window, in decades
+    apply_delay: float = 0.05       # seconds a lane stays in ConfigInProgress after an Apply
+    dp_state_delay: float = 0.1     # seconds a lane stays in DPInit or DPDeinit
+    serdes_count: int = 4
+    num_txeq_pre: int = 3
+    host_txeq_min: List[int] = [-10, -20, -60, 40, -40, -20]
+    host_txeq_max: List[int] = [10, 20, 10, 168, 10, 20]
+    host_txeq_default: List[int] = [0, 0, 0, 100, 0, 0]
+    tx_input_eq_max: int = 12
+    rx_output_eq_max: List[int] = [3, 7, 7]     # amplitude, pre, post
+    vendor_name: str = "XENA SIMULATOR"         # 00h:129-144 of the simulated modules
+    part_number: str = "SIM-CPOM-1"             # 00h:148-163, the serial number is derived from the port
+    surfaces: List[SimulatedBerSurfaceConfig] = [SimulatedBerSurfaceConfig()]  # the first matching surface is used
+
+class TrafficRecordConfig(BaseModel):
+    filename: str = "xena_cpom_traffic.json"  # saved in the report directory
+
+class TrafficReplayConfig(BaseModel):
+    filename: str                   # a recording made with record_traffic
+    virtual_time: bool = True       # replay in simulated time, so delays and PRBS durations take no real time
+    command_latency: Optional[float] = None   # seconds per command round trip, None = the median of the recording
+
+class TimingReportConfig(BaseModel):
+    enable: bool = True             # log the test time broken down by phase at the end of the test
+    chrome_trace: bool = False      # also save a Chrome trace-event timeline per port pair in the report directory
+
+class ResultStoreConfig(BaseModel):
+    filename: str = "xena_cpom_results.sqlite"  # SQLite file shared by all runs, relative to the working directory
+    warm_start: bool = True         # start the searches from the best setting stored for the part number of the module
+    confidence: float = 0.95        # confidence of the BER upper bound that ranks the stored settings
+    tx_input_eq_window: int = 2     # golden_section mode of the TX input EQ test searches the best stored value +/- this window
+
+class ReportWriterConfig(BaseModel):
+    flush_rows: int = 1             # flush the CSV report every this many rows, 0 to flush only at the end of each test
+    fsync: bool = False             # also force the CSV report to disk at every flush
+
+class CheckpointConfig(BaseModel):
+    enable: bool = True             # journal every PRBS measurement, so that an interrupted test can be resumed
+    filename: str = "xena_cpom_checkpoint.jsonl"   # journal file in the report directory
+    fsync: bool = True              # force every journal entry to disk before the test continues
+
+class PlannerConfig(BaseModel):
+    calibration_profile: Optional[str] = None   # JSON file of simulator timing settings measured on the chassis, or a recording made with record_traffic
+    seed: int = 0                   # seed of the simulated cable that the adaptive search modes are planned on
+    live_eta: bool = False          # plan the test before it runs, and log the ETA from the measured progress
+    eta_interval: float = 60.0      # seconds between two live ETA logs
+
 class CablePerformanceTestConfig(BaseModel):
     chassis_list: List[ChassisRepositoryItem]
     username: str
@@ -85,4 +232,23 @@ class CablePerformanceTestConfig(BaseModel):
     csv_report_filename: str
     tcvr_rx_output_eq_test_config: Optional[TcvrRxOutputEqTestConfig] = None
     tcvr_tx_input_eq_test_config: Optional[TcvrTxInputEqTestConfig] = None
-    host_tx_eq_test_config: Optional[HostTxEqTestConfig] = None
\ No newline at end of file
+    host_tx_eq_test_config: Optional[HostTxEqTestConfig] = None
+    simulator: Optional[SimulatorConfig] = None   # run against a simulated tester instead of the chassis
+    record_traffic: Optional[TrafficRecordConfig] = None   # record the commands and responses of the test
+    replay_traffic: Optional[TrafficReplayConfig] = None   # serve a recording instead of the chassis
+    timing_report: TimingReportConfig = TimingReportConfig()   # time budget of the test by phase
+    planner: PlannerConfig = PlannerConfig()   # runtime estimate of the dry run and the live ETA
+    result_store: Optional[ResultStoreConfig] = None   # store every measurement by module identity, for warm starts
+    checkpoint: CheckpointConfig = CheckpointConfig()   # journal of the measurements, to resume an interrupted test
+    report_writer: ReportWriterConfig = ReportWriterConfig()   # flush and fsync policy of the CSV report, which is written row by row
+
+class BenchmarkScenarioConfig(BaseModel):
+    subtest: str    # "tcvr_rx_output_eq_test_config", "tcvr_tx_input_eq_test_config" or "host_tx_eq_test_config"
+    optimize_modes: List[str]
+    simulator: Dict[str, Any] = {}  # simulator settings of the scenario, on top of the simulator of the test configuration
+
+class BenchmarkConfig(BaseModel):
+    seeds: List[int] = [0, 1, 2]    # simulator seeds, each seed randomizes the optimum of every lane
+    cost_tolerance: float = 0.1     # relative increase of a cost metric over the baseline that is a regression
+    ber_penalty_tolerance: float = 0.3  # increase of the mean BER penalty over the baseline that is a regression, in decades
+    scenarios: List[BenchmarkScenarioConfig]
@@ -0,0 +1,265 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import json
+import logging
+import os
+import statistics
+import tempfile
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+from .models import CablePerformanceTestConfig, SimulatorConfig, PortPair
+from .simulator import SimulatedTestbed, run_in_virtual_time
+from .timing import PhaseTimer, Span, RUN_SCOPE, set_phase_timer, reset_phase_timer, span
+from .checkpoint import set_checkpoint, reset_checkpoint
+from .subtests.host_tx_eq import XenaHostTxEqOptimization
+from .subtests.rx_output_eq import XenaTcvrRxOutputEqOptimization
+from .subtests.tx_input_eq import XenaTcvrTxInputEqOptimization
+
+SUBTESTS = (
+    ("tcvr_rx_output_eq_test_config", "rx_output_eq_test", XenaTcvrRxOutputEqOptimization),
+    ("tcvr_tx_input_eq_test_config", "tx_input_eq_test", XenaTcvrTxInputEqOptimization),
+    ("host_tx_eq_test_config", "host_tx_eq_test", XenaHostTxEqOptimization),
+)
+"""
+Config key, phase name and class of the subtests, in the order the test runs them
+"""
+
+CALIBRATION_KEYS = ("command_latency", "apply_delay", "dp_state_delay", "serdes_count", "num_txeq_pre", "host_txeq_min", "host_txeq_max", "host_txeq_default", "tx_input_eq_max", "rx_output_eq_max")
+"""
+Simulator settings that a calibration profile can set
+"""
+
+MEASUREMENT_PHASE = "prbs_measurement"
+
+
+# *************************************************************************************
+# func: load_calibration_profile
+# description: Load the measured timing of the testers
+# *************************************************************************************
+def load_calibration_profile(filename: str) -> Dict[str, Any]:
+    """Load a calibration profile: a JSON file of simulator settings measured on the chassis and the modules, e.g. ``{"command_latency": 0.004, "apply_delay": 0.2}``, see :data:`CALIBRATION_KEYS`. A recording made with ``record_traffic`` is also a calibration profile, with the median response time of its commands as the command latency.
+
+    :param filename: Calibration profile file
+    :type filename: str
+    :return: Simulator settings
+    :rtype: Dict[str, Any]
+    """
+    with open(filename, "r") as f:
+        profile = json.load(f)
+    if "commands" in profile:
+        latencies = [entry["latency"] for entry in profile["commands"] if "latency" in entry]
+        return {"command_latency": statistics.median(latencies)} if len(latencies) > 0 else {}
+    unknown = sorted(key for key in profile if key not in CALIBRATION_KEYS)
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown calibration profile keys {unknown}, supported keys are {list(CALIBRATION_KEYS)}")
+    return profile
+
+
+# *************************************************************************************
+# func: format_duration
+# description: Format seconds as hours, minutes and seconds
+# *************************************************************************************
+def format_duration(seconds: float) -> str:
+    seconds = max(0.0, seconds)
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}h{minutes:02d}m{secs:02d}s"
+    return f"{minutes}m{secs:02d}s"
+
+
+# *************************************************************************************
+# func: remaining_time
+# description: Estimate the remaining time from the progress
+# *************************************************************************************
+def remaining_time(planned_ends: List[float], planned_end: float, done: int, elapsed: float) -> Optional[float]:
+    """Estimate the remaining time after a number of PRBS measurements. The planned remaining time is scaled by the ratio of the measured to the planned elapsed time at the same progress.
+
+    :param planned_ends: Planned times of the end of the PRBS measurements
+    :type planned_ends: List[float]
+    :param planned_end: Planned time of the end
+    :type planned_end: float
+    :param done: Number of PRBS measurements done
+    :type done: int
+    :param elapsed: Measured time since the start
+    :type elapsed: float
+    :return: Remaining time in seconds, or None before the first measurement or after the planned ones
+    :rtype: Optional[float]
+    """
+    if done <= 0 or done > len(planned_ends) or planned_ends[done - 1] <= 0:
+        return None
+    planned = planned_ends[done - 1]
+    return max(0.0, planned_end - planned) * elapsed / planned
+
+
+@dataclass
+class SubtestPlan:
+    name: str
+    optimize_mode: str
+    duration: float
+    measurements: int
+
+
+@dataclass
+class PortPairPlan:
+    duration: float                 # time the port pair runs, summed over the subtests
+    end: float                      # time from the start of the test to the end of the port pair
+    round_trips: int
+    measurement_ends: List[float]   # times from the start of the test to the end of each PRBS measurement
+
+
+# *************************************************************************************
+# class: TestPlan
+# description: Estimated runtime and command count of a test
+# *************************************************************************************
+@dataclass
+class TestPlan:
+    """Estimated runtime and command count of a test, from a run of the test on simulated testers
+    """
+    calibration: str
+    command_latency: float
+    duration: float
+    round_trips: int
+    measurement_ends: List[float]
+    subtests: List[SubtestPlan]
+    port_pairs: Dict[str, PortPairPlan]
+
+    def format(self) -> List[str]:
+        """Format the plan as lines of text
+        """
+        lines = [
+            f"Plan: {format_duration(self.duration)}, {self.round_trips} round trips, {len(self.measurement_ends)} PRBS measurements",
+            f"  Calibration:          {self.calibration}, command latency {self.command_latency * 1000:.2f}ms",
+        ]
+        for subtest in self.subtests:
+            lines.append(f"  {subtest.name + ' (' + subtest.optimize_mode + '):':<40}{format_duration(subtest.duration):>10}, {subtest.measurements} PRBS measurements")
+        for port_pair, port_pair_plan in self.port_pairs.items():
+            lines.append(f"  {port_pair + ':':<40}{format_duration(port_pair_plan.duration):>10}, done at +{format_duration(port_pair_plan.end)}, {port_pair_plan.round_trips} round trips, {len(port_pair_plan.measurement_ends)} PRBS measurements")
+        return lines
+
+
+def summarize_plan(timer: PhaseTimer, test_config: CablePerformanceTestConfig, calibration: str, command_latency: float) -> TestPlan:
+    measurements = sorted((s for s in timer.spans if s.path[-1] == MEASUREMENT_PHASE), key=lambda x: x.end)
+    subtests = []
+    for key, name, _ in SUBTESTS:
+        for s in timer.spans:
+            if s.scope == RUN_SCOPE and s.path == (name,):
+                subtests.append(SubtestPlan(
+                    name=name,
+                    optimize_mode=getattr(test_config, key).optimize_mode,
+                    duration=s.duration,
+                    measurements=len([m for m in measurements if s.start <= m.end <= s.end])))
+    port_pairs: Dict[str, PortPairPlan] = {}
+    for s in sorted(timer.spans, key=lambda x: x.start):
+        if s.path != ("port_pair",):
+            continue
+        if s.scope not in port_pairs:
+            port_pairs[s.scope] = PortPairPlan(
+                duration=0.0,
+                end=0.0,
+                round_trips=timer.counters.get(s.scope, {}).get("round_trip", 0),
+                measurement_ends=[m.end - timer.start for m in measurements if m.scope == s.scope])
+        port_pairs[s.scope].duration += s.duration
+        port_pairs[s.scope].end = max(port_pairs[s.scope].end, s.end - timer.start)
+    return TestPlan(
+        calibration=calibration,
+        command_latency=command_latency,
+        duration=timer.now() - timer.start,
+        round_trips=sum(counters.get("round_trip", 0) for counters in timer.counters.values()),
+        measurement_ends=[m.end - timer.start for m in measurements],
+        subtests=subtests,
+        port_pairs=port_pairs)
+
+
+# *************************************************************************************
+# func: plan_test
+# description: Estimate the runtime and the command count of a test
+# *************************************************************************************
+async def plan_test(test_config: CablePerformanceTestConfig, port_pairs: List[PortPair], logger_name: str) -> TestPlan:
+    """Estimate the runtime and the command count of a test, by running its subtests on simulated testers in simulated time. The subtests expand their candidate sets (RX cursor grid, TX input EQ range, host TX tap moves) as on the chassis, and the configured delays and PRBS durations take their configured time. The command latency and the module timing come from the calibration profile of the planner config, or else from the simulator config. The adaptive search modes are planned on a simulated cable, so their plan is an estimate.
+
+    :param test_config: Test configuration
+    :type test_config: CablePerformanceTestConfig
+    :param port_pairs: All port pairs of the configured tests
+    :type port_pairs: List[PortPair]
+    :param logger_name: Logger name of the test. The subtests of the plan log to a child logger that is not printed.
+    :type logger_name: str
+    :return: The plan
+    :rtype: TestPlan
+    """
+    settings = test_config.simulator.model_dump() if test_config.simulator is not None else {}
+    calibration = "simulator defaults"
+    if test_config.planner.calibration_profile is not None:
+        settings.update(load_calibration_profile(test_config.planner.calibration_profile))
+        calibration = test_config.planner.calibration_profile
+    settings.update(seed=test_config.planner.seed, virtual_time=True)
+    simulator_config = SimulatorConfig(**settings)
+
+    plan_logger = logging.getLogger(f"{logger_name}.plan")
+    plan_logger.propagate = False
+    if len(plan_logger.handlers) == 0:
+        plan_logger.addHandler(logging.NullHandler())
+
+    async def _plan() -> TestPlan:
+        testbed = SimulatedTestbed(simulator_config, port_pairs)
+        tester_objs = [testbed.connect(chassis.chassis_ip) for chassis in test_config.chassis_list]
+        timer = PhaseTimer()
+        token = set_phase_timer(timer)
+        # the simulated measurements of the plan are not journaled in the checkpoint of the test
+        checkpoint_token = set_checkpoint(None)
+        try:
+            with tempfile.TemporaryDirectory() as path:
+                report_filepathname = os.path.join(path, test_config.csv_report_filename)
+                for key, name, subtest_class in SUBTESTS:
+                    subtest_config = getattr(test_config, key)
+                    if subtest_config is None:
+                        continue
+                    with span(name):
+                        await subtest_class(tester_objs, subtest_config, plan_logger.name, report_filepathname).run() # type: ignore
+        finally:
+            reset_checkpoint(checkpoint_token)
+            reset_phase_timer(token)
+        return summarize_plan(timer, test_config, calibration, simulator_config.command_latency)
+
+    return await run_in_virtual_time(_plan)
+
+
+# *************************************************************************************
+# class: LiveEta
+# description: Log the remaining time of a running test
+# *************************************************************************************
+class LiveEta:
+    """Log the remaining time of a running test, from its plan and its progress. The progress is the number of PRBS measurements done, of the test and of the port pair that just measured. The ETA is logged at most once per interval.
+    """
+    def __init__(self, plan: TestPlan, timer: PhaseTimer, logger_name: str, interval: float) -> None:
+        self.plan = plan
+        self.timer = timer
+        self.logger_name = logger_name
+        self.interval = interval
+        self.start = timer.now()
+        self.done = 0
+        self.port_pair_done: Dict[str, int] = {}
+        self.last_log: Optional[float] = None
+        timer.listeners.append(self.on_span)
+
+    def on_span(self, ended: Span) -> None:
+        if ended.path[-1] != MEASUREMENT_PHASE:
+            return
+        self.done += 1
+        self.port_pair_done[ended.scope] = self.port_pair_done.get(ended.scope, 0) + 1
+        if self.last_log is not None and ended.end - self.last_log < self.interval:
+            return
+        self.last_log = ended.end
+        elapsed = ended.end - self.start
+        logger = logging.getLogger(self.logger_name)
+        remaining = remaining_time(self.plan.measurement_ends, self.plan.duration, self.done, elapsed)
+        text = f"ETA: {'beyond the plan' if remaining is None else format_duration(remaining) + ' remaining'}, {self.done}/{len(self.plan.measurement_ends)} PRBS measurements"
+        port_pair_plan = self.plan.port_pairs.get(ended.scope)
+        if port_pair_plan is not None:
+            port_pair_remaining = remaining_time(port_pair_plan.measurement_ends, port_pair_plan.end, self.port_pair_done[ended.scope], elapsed)
+            text += f", {ended.scope}: {'beyond the plan' if port_pair_remaining is None else format_duration(port_pair_remaining) + ' remaining'}"
+        logger.info(text)
@@ -7,6 +7,11 @@ from xoa_driver import testers, modules, ports, enums, utils
 from xoa_driver.misc import Hex
 from xoa_driver.hlfuncs import mgmt
 from .enums import *
+from .models import EarlyStopConfig, PRBSTestConfig
+from .ber_stats import ber_lower_bound, ber_upper_bound, required_bits, prbs_ber_estimate, ZERO_ERROR_CONFIDENCE
+from .timing import timed, phase_sleep
+from .checkpoint import checkpointed_measurement
+from .measurement import LaneMeasurement, EvidenceMemo
 import logging
 from typing import(
     List, 
@@ -14,8 +19,10 @@ from typing import(
     Union, 
     Dict, 
     Tuple, 
+    Optional,
+    Sequence,
     TYPE_CHECKING)
-import time, os
+import time, os, math
 from dataclasses import dataclass
 
 FreyaEdunModule = Union[modules.Z800FreyaModule, modules.Z1600EdunModule]
@@ -29,6 +36,7 @@ if TYPE_CHECKING:
 # func: config_prbs
 # description: Configure PRBS on the port
 # *************************************************************************************
+@timed("prbs_config")
 async def config_prbs(ports: List[FreyaEdunPort], pattern: enums.PRBSPolynomial, logger_name: str) -> None:
     """Configure PRBS on the port. 
     
@@ -49,11 +57,40 @@ async def config_prbs(ports: List[FreyaEdunPort], pattern: enums.PRBSPolynomial,
     await asyncio.sleep(1)
 
 
+# *************************************************************************************
+# func: switch_prbs_polynomial
+# description: Change the PRBS polynomial during a test
+# *************************************************************************************
+@timed("prbs_config")
+async def switch_prbs_polynomial(tx_port: FreyaEdunPort, rx_port: FreyaEdunPort, lanes: List[int], pattern: enums.PRBSPolynomial, measurement_mode: str, logger_name: str) -> None:
+    """Change the PRBS polynomial during a test. In continuous mode the PRBS is stopped on the lanes while the polynomial changes, and started again, so the next window sees the new pattern.
+
+    :param tx_port: TX port object
+    :type tx_port: FreyaEdunPort
+    :param rx_port: RX port object
+    :type rx_port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :param pattern: PRBS polynomial type
+    :type pattern: enums.PRBSPolynomial
+    :param measurement_mode: "restart" or "continuous"
+    :type measurement_mode: str
+    :param logger_name: Logger name
+    :type logger_name: str
+    """
+    if measurement_mode == "continuous":
+        await stop_prbs_on_lanes(tx_port, lanes, logger_name)
+    await config_prbs([tx_port, rx_port], pattern, logger_name)
+    if measurement_mode == "continuous":
+        await start_prbs_on_lanes(tx_port, lanes, logger_name)
+
+
 # *************************************************************************************
 # func: run_prbs_on_lanes
 # description: Measure PRBS BER on lanes.
 # *************************************************************************************
-async def run_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], duration: int, logger_name: str) -> None:
+@timed("prbs_window")
+async def run_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], duration: float, logger_name: str) -> None:
     """Run PRBS on lanes
 
     :param port: Port object
@@ -61,7 +98,7 @@ async def run_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], duration: int
     :param lanes: List of lane numbers
     :type lanes: List[int]
     :param duration: Duration to measure PRBS in seconds
-    :type duration: int
+    :type duration: float
     :param logger_name: Logger name
     :type logger_name: str
     """
@@ -96,6 +133,7 @@ async def run_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], duration: int
 # func: stop_prbs_on_lanes
 # description: Stop PRBS on lanes. 
 # *************************************************************************************
+@timed("prbs_stop")
 async def stop_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], logger_name: str) -> None:
     """Stop PRBS on lanes
 
@@ -122,10 +160,40 @@ async def stop_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], logger_name:
     await asyncio.sleep(1)
 
 
+# *************************************************************************************
+# func: calc_prbs_ber
+# description: Calculate PRBS BER from the number of bits and errors
+# *************************************************************************************
+def calc_prbs_ber(lane: int, bits: int, errors: int, logger_name: str) -> float:
+    """Calculate PRBS BER from the number of bits and errors. When there is no error, the BER upper bound at 99% confidence level (4.6/bits) is returned.
+
+    :param lane: Lane number, used for logging
+    :type lane: int
+    :param bits: Number of bits received
+    :type bits: int
+    :param errors: Number of errors detected
+    :type errors: int
+    :param logger_name: Logger name
+    :type logger_name: str
+    :return: PRBS BER
+    :rtype: float
+    """
+    logger = logging.getLogger(logger_name)
+    _prbs_ber = prbs_ber_estimate(errors, bits)
+    if bits == 0:
+        logger.info(f"  PRBS BER [{lane}]: N/A (No bits sent)")
+    elif errors == 0:
+        logger.info(f"  PRBS BER [{lane}]: < {'{0:.3e}'.format(_prbs_ber)}")
+    else:
+        logger.info(f"  PRBS BER [{lane}]: {'{0:.3e}'.format(_prbs_ber)}")
+    return _prbs_ber
+
+
 # *************************************************************************************
 # func: read_ber_from_lanes
 # description: Read PRBS BER from the lanes.
 # *************************************************************************************
+@timed("prbs_read")
 async def read_ber_from_lanes(port: FreyaEdunPort, lanes: List[int], logger_name: str, attempts: int = 5) -> List[Dict[str, Any]]:
     """Read the PRBS BER from the lanes
 
@@ -137,13 +205,11 @@ async def read_ber_from_lanes(port: FreyaEdunPort, lanes: List[int], logger_name
     :type logger_name: str
     :param attempts: Number of attempts to check PRBS status off for the lanes. Each attempt is made after 1s interval. Default is 5 attempts (5s total).
     :type attempts: int
-    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value}.
+    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits}.
     :rtype: List[Dict[str, Any]]
     """
     
     logger = logging.getLogger(logger_name)
-
-    _prbs_ber: float = 0.0
     
     cmd_list = []
     for _lane in lanes:
@@ -162,7 +228,7 @@ async def read_ber_from_lanes(port: FreyaEdunPort, lanes: List[int], logger_name
 
         if all(lock_status == enums.PRBSLockStatus.PRBSOFF or lock_status == enums.PRBSLockStatus.PRBSOFFUNSTABLE for lock_status in lock_status_lanes):
             break
-        await asyncio.sleep(1)
+        await phase_sleep("lock_poll", 1)
         _reading_failures += 1
         if _reading_failures >= attempts:
             logger.warning(f"Specified lanes failed to be PRBS OFF after {attempts} attempts.")
@@ -172,22 +238,518 @@ async def read_ber_from_lanes(port: FreyaEdunPort, lanes: List[int], logger_name
     for _lane, _resp in zip(lanes, resps):
         _prbs_bits: int = _resp.byte_count * 8
         _prbs_errors: int = _resp.error_count
-        _prbs_ber: float = 1
-        if _prbs_bits == 0:
-            logger.info(f"  PRBS BER [{_lane}]: N/A (No bits sent)")
-            _prbs_ber = 1
-        elif _prbs_errors == 0:
-            _prbs_ber = 4.6/_prbs_bits
-            # _prbs_ber = 0
-            logger.info(f"  PRBS BER [{_lane}]: < {'{0:.3e}'.format(_prbs_ber)}")
-        else:
-            _prbs_ber = _prbs_errors/_prbs_bits
-            logger.info(f"  PRBS BER [{_lane}]: {'{0:.3e}'.format(_prbs_ber)}")
-        results.append({"lane": _lane, "prbs_ber": _prbs_ber})
+        _prbs_ber = calc_prbs_ber(_lane, _prbs_bits, _prbs_errors, logger_name)
+        results.append({"lane": _lane, "prbs_ber": _prbs_ber, "error_count": _prbs_errors, "bit_count": _prbs_bits})
     await asyncio.sleep(1)
     return results
 
 
+# *************************************************************************************
+# class: PrbsCounterSnapshot
+# description: PRBS counters of a lane at a point in time
+# *************************************************************************************
+@dataclass
+class PrbsCounterSnapshot:
+    """PRBS counters of a lane at a point in time
+    """
+    lane: int
+    byte_count: int
+    error_count: int
+    lock: enums.PRBSLockStatus
+    timestamp: float
+
+
+# *************************************************************************************
+# func: start_prbs_on_lanes
+# description: Start PRBS on lanes and leave it running.
+# *************************************************************************************
+@timed("prbs_start")
+async def start_prbs_on_lanes(port: FreyaEdunPort, lanes: List[int], logger_name: str) -> None:
+    """Start PRBS on lanes and leave it running
+
+    :param port: Port object
+    :type port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :param logger_name: Logger name
+    :type logger_name: str
+    """
+    
+    logger = logging.getLogger(logger_name)
+    logger.info(f"Starting PRBS on Port {port.kind.module_id}/{port.kind.port_id} on Lanes {lanes}")
+
+    cmd_list = []
+    for lane in lanes:
+        _serdes_index = lane - 1
+        cmd_list.append(
+            port.layer1.serdes[_serdes_index].prbs.control.set(prbs_seed=17, prbs_on_off=enums.PRBSOnOff.PRBSON, error_on_off=enums.ErrorOnOff.ERRORSOFF)
+        )
+    await utils.apply(*cmd_list)
+
+
+# *************************************************************************************
+# func: read_prbs_counters
+# description: Take a snapshot of the PRBS counters of the lanes
+# *************************************************************************************
+async def read_prbs_counters(port: FreyaEdunPort, lanes: List[int]) -> List[PrbsCounterSnapshot]:
+    """Take a snapshot of the PRBS counters of the lanes
+
+    :param port: Port object
+    :type port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :return: List of counter snapshots, in the same order as the lanes
+    :rtype: List[PrbsCounterSnapshot]
+    """
+    cmd_list = []
+    for _lane in lanes:
+        _serdes_index: int = _lane - 1
+        cmd_list.append(
+            port.layer1.serdes[_serdes_index].prbs.status.get()
+        )
+    resps = await utils.apply(*cmd_list)
+    timestamp = asyncio.get_running_loop().time()
+    return [PrbsCounterSnapshot(lane=_lane, byte_count=_resp.byte_count, error_count=_resp.error_count, lock=_resp.lock, timestamp=timestamp) for _lane, _resp in zip(lanes, resps)]
+
+
+# *************************************************************************************
+# func: count_prbs_window
+# description: Count the errors and bits received between two counter snapshots of a lane
+# *************************************************************************************
+def count_prbs_window(before: PrbsCounterSnapshot, after: PrbsCounterSnapshot) -> Tuple[int, int]:
+    """Count the errors and bits received between two counter snapshots of a lane
+
+    :param before: Snapshot at the start of the window
+    :type before: PrbsCounterSnapshot
+    :param after: Snapshot at the end of the window
+    :type after: PrbsCounterSnapshot
+    :return: Tuple of (number of errors, number of bits)
+    :rtype: Tuple[int, int]
+    """
+    if after.byte_count < before.byte_count or after.error_count < before.error_count:
+        # counters were cleared during the window
+        return (after.error_count, after.byte_count * 8)
+    return (after.error_count - before.error_count, (after.byte_count - before.byte_count) * 8)
+
+
+# *************************************************************************************
+# func: diff_prbs_counters
+# description: Calculate the PRBS BER of the window between two counter snapshots
+# *************************************************************************************
+def diff_prbs_counters(before: List[PrbsCounterSnapshot], after: List[PrbsCounterSnapshot], logger_name: str) -> List[Dict[str, Any]]:
+    """Calculate the PRBS BER of the window between two counter snapshots. 
+    
+    The counters only count while the lane is in PRBS lock, so a window where the lock was lost has fewer bits, or no bit at all.
+
+    :param before: Snapshots at the start of the window
+    :type before: List[PrbsCounterSnapshot]
+    :param after: Snapshots at the end of the window
+    :type after: List[PrbsCounterSnapshot]
+    :param logger_name: Logger name
+    :type logger_name: str
+    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits}.
+    :rtype: List[Dict[str, Any]]
+    """
+    logger = logging.getLogger(logger_name)
+    results = []
+    for _before, _after in zip(before, after):
+        if _after.lock != enums.PRBSLockStatus.PRBSON or _before.lock != enums.PRBSLockStatus.PRBSON:
+            logger.warning(f"Lane {_after.lane}: PRBS not locked during the measurement window ({_before.lock.name} -> {_after.lock.name})")
+        _prbs_errors, _prbs_bits = count_prbs_window(_before, _after)
+        _prbs_ber = calc_prbs_ber(_after.lane, _prbs_bits, _prbs_errors, logger_name)
+        results.append({"lane": _after.lane, "prbs_ber": _prbs_ber, "error_count": _prbs_errors, "bit_count": _prbs_bits})
+    return results
+
+
+# *************************************************************************************
+# func: measure_prbs_window
+# description: Measure PRBS BER on lanes over a window, while PRBS keeps running
+# *************************************************************************************
+@timed("prbs_window")
+async def measure_prbs_window(port: FreyaEdunPort, lanes: List[int], duration: float, logger_name: str) -> List[Dict[str, Any]]:
+    """Measure PRBS BER on lanes over a window, by taking a snapshot of the PRBS counters at the start and at the end of the window. PRBS must already be running.
+
+    :param port: Port object that receives PRBS
+    :type port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :param duration: Window length in seconds
+    :type duration: float
+    :param logger_name: Logger name
+    :type logger_name: str
+    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits}.
+    :rtype: List[Dict[str, Any]]
+    """
+    logger = logging.getLogger(logger_name)
+    before = await read_prbs_counters(port, lanes)
+    logger.info(f"Measuring PRBS for {duration}s")
+    await asyncio.sleep(duration)
+    after = await read_prbs_counters(port, lanes)
+    return diff_prbs_counters(before, after, logger_name)
+
+
+# *************************************************************************************
+# func: early_stop_decision
+# description: Decide if the BER of a lane is already known well enough to stop measuring it
+# *************************************************************************************
+def early_stop_decision(errors: int, bits: int, incumbent_lane_ber_dict: Optional[Dict[str, Any]], target_ber: Optional[float], confidence: float) -> Optional[str]:
+    """Decide if the BER of a lane is already known well enough to stop measuring it.
+
+    The candidate is statistically worse than the incumbent when its BER lower bound is above the incumbent's BER upper bound, and statistically below the target BER when its BER upper bound is below the target BER.
+
+    :param errors: Number of errors received so far
+    :type errors: int
+    :param bits: Number of bits received so far
+    :type bits: int
+    :param incumbent_lane_ber_dict: Lane BER dict of the current best result of the lane, or None
+    :type incumbent_lane_ber_dict: Optional[Dict[str, Any]]
+    :param target_ber: Target BER, or None
+    :type target_ber: Optional[float]
+    :param confidence: Confidence level of the BER bounds
+    :type confidence: float
+    :return: "worse", "below_target", or None if the measurement should continue
+    :rtype: Optional[str]
+    """
+    if bits <= 0:
+        return None
+    if incumbent_lane_ber_dict is not None:
+        if "error_count" in incumbent_lane_ber_dict and "bit_count" in incumbent_lane_ber_dict:
+            incumbent_ber = ber_upper_bound(incumbent_lane_ber_dict["error_count"], incumbent_lane_ber_dict["bit_count"], confidence)
+        else:
+            incumbent_ber = incumbent_lane_ber_dict["prbs_ber"]
+        if ber_lower_bound(errors, bits, confidence) > incumbent_ber:
+            return "worse"
+    if target_ber is not None and ber_upper_bound(errors, bits, confidence) < target_ber:
+        return "below_target"
+    return None
+
+
+# *************************************************************************************
+# func: measure_prbs_ber_early_stop
+# description: Measure PRBS BER on lanes, and stop as soon as the result of every lane is decided
+# *************************************************************************************
+@timed("prbs_window")
+async def measure_prbs_ber_early_stop(tx_port: FreyaEdunPort, rx_port: FreyaEdunPort, lanes: List[int], duration: float, measurement_mode: str, early_stop: EarlyStopConfig, incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]], target_ber: Optional[float], logger_name: str) -> List[Dict[str, Any]]:
+    """Measure PRBS BER on lanes, reading the PRBS counters every ``early_stop.poll_interval`` seconds. The measurement stops before ``duration`` when every lane is statistically worse than its incumbent or statistically below the target BER (see :func:`early_stop_decision`).
+
+    :param tx_port: Port object that transmits PRBS
+    :type tx_port: FreyaEdunPort
+    :param rx_port: Port object that receives PRBS
+    :type rx_port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :param duration: Maximum duration to measure PRBS in seconds
+    :type duration: float
+    :param measurement_mode: "restart" or "continuous"
+    :type measurement_mode: str
+    :param early_stop: Early stop configuration
+    :type early_stop: EarlyStopConfig
+    :param incumbent_lane_ber_dicts: Lane BER dicts of the current best results, or None
+    :type incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]]
+    :param target_ber: Target BER, or None
+    :type target_ber: Optional[float]
+    :param logger_name: Logger name
+    :type logger_name: str
+    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits, "early_stop": decision or None, "measured_time": seconds of PRBS counted before the window ended}.
+    :rtype: List[Dict[str, Any]]
+    """
+    logger = logging.getLogger(logger_name)
+    loop = asyncio.get_running_loop()
+    incumbents = {item["lane"]: item for item in (incumbent_lane_ber_dicts or [])}
+
+    if measurement_mode == "continuous":
+        before = await read_prbs_counters(rx_port, lanes)
+    else:
+        await clear_prbs_counters(rx_port, logger_name)
+        await start_prbs_on_lanes(tx_port, lanes, logger_name)
+        before = None
+
+    logger.info(f"Measuring PRBS for up to {duration}s, reading counters every {early_stop.poll_interval}s")
+    start_time = loop.time()
+    deadline = start_time + duration
+    decisions: Dict[int, Optional[str]] = {lane: None for lane in lanes}
+    counts: Dict[int, Tuple[int, int]] = {lane: (0, 0) for lane in lanes}
+    while True:
+        await asyncio.sleep(max(0.0, min(early_stop.poll_interval, deadline - loop.time())))
+        after = await read_prbs_counters(rx_port, lanes)
+        for idx, _after in enumerate(after):
+            if before is None:
+                counts[_after.lane] = (_after.error_count, _after.byte_count * 8)
+            else:
+                counts[_after.lane] = count_prbs_window(before[idx], _after)
+            if decisions[_after.lane] is None and _after.lock == enums.PRBSLockStatus.PRBSON:
+                _errors, _bits = counts[_after.lane]
+                decisions[_after.lane] = early_stop_decision(_errors, _bits, incumbents.get(_after.lane), target_ber, early_stop.confidence)
+        if all(decision is not None for decision in decisions.values()):
+            logger.info(f"Early stop after {loop.time() - start_time:.2f}s: {[(lane, decision) for lane, decision in decisions.items()]}")
+            break
+        if loop.time() >= deadline:
+            break
+    measured_time = min(duration, loop.time() - start_time)
+
+    if measurement_mode != "continuous":
+        await stop_prbs_on_lanes(tx_port, lanes, logger_name)
+
+    results = []
+    for _lane in lanes:
+        _prbs_errors, _prbs_bits = counts[_lane]
+        _prbs_ber = calc_prbs_ber(_lane, _prbs_bits, _prbs_errors, logger_name)
+        results.append({"lane": _lane, "prbs_ber": _prbs_ber, "error_count": _prbs_errors, "bit_count": _prbs_bits, "early_stop": decisions[_lane], "measured_time": measured_time})
+    return results
+
+
+# *************************************************************************************
+# func: measure_prbs_ber
+# description: Measure PRBS BER on lanes with the configured measurement mode
+# *************************************************************************************
+@timed("prbs_measurement")
+async def measure_prbs_ber(tx_port: FreyaEdunPort, rx_port: FreyaEdunPort, lanes: List[int], duration: float, measurement_mode: str, logger_name: str, early_stop: Optional[EarlyStopConfig] = None, incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]] = None, target_ber: Optional[float] = None, lane_settings: Optional[Dict[int, Sequence[int]]] = None) -> List[Dict[str, Any]]:
+    """Measure PRBS BER on lanes.
+
+    In "restart" mode, the counters are cleared, PRBS is started and stopped on the TX port, and the BER is read from the RX port. 
+    In "continuous" mode, PRBS must already be running (see :func:`start_prbs_on_lanes`) and the BER is calculated from counter snapshots.
+    If early stop is enabled, the measurement may end before ``duration`` (see :func:`measure_prbs_ber_early_stop`).
+    If a checkpoint is set, the measurement is journaled with ``lane_settings``, or replayed from the journal of an interrupted run that measured the same lanes at the same settings (see :class:`xoa_cpom.checkpoint.Checkpoint`).
+
+    :param tx_port: Port object that transmits PRBS
+    :type tx_port: FreyaEdunPort
+    :param rx_port: Port object that receives PRBS
+    :type rx_port: FreyaEdunPort
+    :param lanes: List of lane numbers
+    :type lanes: List[int]
+    :param duration: Duration to measure PRBS in seconds
+    :type duration: float
+    :param measurement_mode: "restart" or "continuous"
+    :type measurement_mode: str
+    :param logger_name: Logger name
+    :type logger_name: str
+    :param early_stop: Early stop configuration. None or disabled to always measure for ``duration``.
+    :type early_stop: Optional[EarlyStopConfig]
+    :param incumbent_lane_ber_dicts: Lane BER dicts of the current best results, used by early stop
+    :type incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]]
+    :param target_ber: Target BER, used by early stop
+    :type target_ber: Optional[float]
+    :param lane_settings: EQ setting of each lane, journaled with the measurement
+    :type lane_settings: Optional[Dict[int, Sequence[int]]]
+    :return: List of dictionaries containing {"lane": lane number, "prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits, "start": event loop time of the start of the measurement, "end": event loop time of its end, "measured_time": seconds of PRBS counted, less than ``duration`` if the measurement stopped early}, see :class:`xoa_cpom.measurement.LaneMeasurement`.
+    :rtype: List[Dict[str, Any]]
+    """
+    async def _measure() -> List[Dict[str, Any]]:
+        if early_stop is not None and early_stop.enable:
+            return await measure_prbs_ber_early_stop(tx_port, rx_port, lanes, duration, measurement_mode, early_stop, incumbent_lane_ber_dicts, target_ber, logger_name)
+        if measurement_mode == "continuous":
+            return await measure_prbs_window(rx_port, lanes, duration, logger_name)
+        await clear_prbs_counters(rx_port, logger_name)
+        await run_prbs_on_lanes(tx_port, lanes, duration, logger_name)
+        return await read_ber_from_lanes(port=rx_port, lanes=lanes, logger_name=logger_name)
+
+    async def _timed_measure() -> List[Dict[str, Any]]:
+        # the event loop clock is monotonic, and in simulated time with the simulator
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        lane_ber_dicts = await _measure()
+        end = loop.time()
+        for lane_ber_dict in lane_ber_dicts:
+            lane_ber_dict.update(start=start, end=end)
+            # a window that is not stopped early counts PRBS for the whole duration
+            lane_ber_dict.setdefault("measured_time", duration)
+        return lane_ber_dicts
+
+    # a measurement that is in the checkpoint of a resumed run is not measured again
+    return await checkpointed_measurement(lanes, _timed_measure, lane_settings)
+
+
+# *************************************************************************************
+# func: measure_prbs_ber_pooled
+# description: Measure PRBS BER on lanes, pooled with the earlier measurements of their settings
+# *************************************************************************************
+async def measure_prbs_ber_pooled(tx_port: FreyaEdunPort, rx_port: FreyaEdunPort, lane_settings: Dict[int, Sequence[int]], duration: float, measurement_mode: str, logger_name: str, memo: Optional[EvidenceMemo], early_stop: Optional[EarlyStopConfig] = None, incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]] = None, target_ber: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Measure PRBS BER on lanes, pooled with the earlier measurements of the same port pair, lane and setting in the evidence memo.
+
+    A lane whose setting was measured before is served from the memo without measuring when its pooled evidence is sufficient: the earlier visits measured it for ``duration`` in total, or its pooled BER is statistically worse than its incumbent or statistically below the target BER (see :func:`early_stop_decision`). The other lanes are measured in one window, for the longest time that a lane still misses, and their counts are added to the memo.
+
+    :param tx_port: Port object that transmits PRBS
+    :type tx_port: FreyaEdunPort
+    :param rx_port: Port object that receives PRBS
+    :type rx_port: FreyaEdunPort
+    :param lane_settings: EQ setting of each lane to measure
+    :type lane_settings: Dict[int, Sequence[int]]
+    :param duration: Duration to measure PRBS in seconds
+    :type duration: float
+    :param measurement_mode: "restart" or "continuous"
+    :type measurement_mode: str
+    :param logger_name: Logger name
+    :type logger_name: str
+    :param memo: Evidence memo of the run. None to measure every lane like :func:`measure_prbs_ber`.
+    :type memo: Optional[EvidenceMemo]
+    :param early_stop: Early stop configuration
+    :type early_stop: Optional[EarlyStopConfig]
+    :param incumbent_lane_ber_dicts: Lane BER dicts of the current best results
+    :type incumbent_lane_ber_dicts: Optional[List[Dict[str, Any]]]
+    :param target_ber: Target BER
+    :type target_ber: Optional[float]
+    :return: Lane BER dicts as :func:`measure_prbs_ber`, with the pooled "prbs_ber", "error_count" and "bit_count", the counts of the window in "window_error_count" and "window_bit_count", and "cached": True for a lane that was not measured.
+    :rtype: List[Dict[str, Any]]
+    """
+    lanes = list(lane_settings)
+    if memo is None:
+        return await measure_prbs_ber(tx_port=tx_port, rx_port=rx_port, lanes=lanes, duration=duration, measurement_mode=measurement_mode, logger_name=logger_name, early_stop=early_stop, incumbent_lane_ber_dicts=incumbent_lane_ber_dicts, target_ber=target_ber, lane_settings=lane_settings)
+
+    logger = logging.getLogger(logger_name)
+    port_name = f"{tx_port.kind.module_id}/{tx_port.kind.port_id} -> {rx_port.kind.module_id}/{rx_port.kind.port_id}"
+    incumbents = {item["lane"]: item for item in (incumbent_lane_ber_dicts or [])}
+    missing_times: Dict[int, float] = {}
+    for lane in lanes:
+        pooled = memo.lookup(port_name, lane, lane_settings[lane])
+        missing_time = duration - memo.measured_time(port_name, lane, lane_settings[lane])
+        if pooled is not None and early_stop_decision(pooled.error_count, pooled.bit_count, incumbents.get(lane), target_ber, memo.confidence) is not None:
+            missing_time = 0.0
+        if missing_time > 1e-9:
+            missing_times[lane] = missing_time
+
+    window_lane_ber_dicts: Dict[int, Dict[str, Any]] = {}
+    window_duration = max(missing_times.values(), default=0.0)
+    if len(missing_times) > 0:
+        if window_duration < duration:
+            logger.info(f"Topping up the evidence of lanes {list(missing_times)} with {window_duration:g}s of PRBS")
+        lane_ber_dicts = await measure_prbs_ber(tx_port=tx_port, rx_port=rx_port, lanes=list(missing_times), duration=window_duration, measurement_mode=measurement_mode, logger_name=logger_name, early_stop=early_stop, incumbent_lane_ber_dicts=incumbent_lane_ber_dicts, target_ber=target_ber, lane_settings=lane_settings)
+        window_lane_ber_dicts = {lane_ber_dict["lane"]: lane_ber_dict for lane_ber_dict in lane_ber_dicts}
+
+    results = []
+    for lane in lanes:
+        if lane in window_lane_ber_dicts:
+            window = LaneMeasurement.from_lane_ber_dict(window_lane_ber_dicts[lane], lane_settings[lane])
+            # an early stopped window only adds the time it counted PRBS
+            pooled = memo.add(port_name, window, window_lane_ber_dicts[lane].get("measured_time", window_duration))
+            result = dict(window_lane_ber_dicts[lane], window_error_count=window.error_count, window_bit_count=window.bit_count)
+        else:
+            pooled = memo.lookup(port_name, lane, lane_settings[lane])
+            assert pooled is not None
+            memo.served_count += 1
+            result = {"lane": lane, "window_error_count": 0, "window_bit_count": 0, "start": pooled.start, "end": pooled.end, "cached": True}
+        if pooled.count > 1 or result.get("cached", False):
+            logger.info(f"  PRBS BER [{lane}]: {'{0:.3e}'.format(pooled.prbs_ber)} pooled over {pooled.count} measurements of {list(pooled.setting)}")
+        result.update(prbs_ber=pooled.prbs_ber, error_count=pooled.error_count, bit_count=pooled.bit_count)
+        results.append(result)
+    return results
+
+
+# *************************************************************************************
+# func: prbs_measurement_overhead
+# description: Time a PRBS measurement takes on top of its window
+# *************************************************************************************
+def prbs_measurement_overhead(measurement_mode: str) -> float:
+    """Time in seconds a PRBS measurement of :func:`measure_prbs_ber` takes on top of its window, without the command round trips. In "restart" mode, clearing the counters, stopping PRBS and reading the counters are each followed by a 1 second wait. In "continuous" mode, the counters are read without waiting.
+
+    :param measurement_mode: PRBS measurement mode, "restart" or "continuous"
+    :type measurement_mode: str
+    :return: Time in seconds
+    :rtype: float
+    """
+    return 0.0 if measurement_mode == "continuous" else 3.0
+
+
+# *************************************************************************************
+# func: get_lane_bit_rate
+# description: Get the nominal bit rate of one serdes lane of the port
+# *************************************************************************************
+async def get_lane_bit_rate(port: FreyaEdunPort, port_speed: str) -> float:
+    """Get the nominal bit rate of one serdes lane of the port, e.g. 100 Gbit/s for a "2x400G" port. The serdes count of the port capabilities is the number of serdes of the fastest mode of the port, so the number of serdes lanes used by the configured port speed is derived from the serdes bit rate of the fastest mode (max speed divided by the serdes count), e.g. 4 of the 8 serdes of an 800G port for a "2x400G" port. The line rate is slightly higher because of the FEC and encoding overhead, so a duration calculated from the nominal bit rate is on the safe side.
+
+    :param port: Port object
+    :type port: FreyaEdunPort
+    :param port_speed: Port speed string, e.g. "2x400G"
+    :type port_speed: str
+    :return: Bit rate in bit/s
+    :rtype: float
+    """
+    _port_speed_mbps = int(port_speed.split('x')[1].replace('G','')) * 1000
+    resp = await port.capabilities.get()
+    _serdes_count = max(1, resp.serdes_count)
+    _serdes_speed_mbps = resp.max_speed / _serdes_count
+    _lane_count = _serdes_count
+    if _serdes_speed_mbps > 0:
+        _lane_count = min(_serdes_count, max(1, math.ceil(_port_speed_mbps / _serdes_speed_mbps - 1e-9)))
+    return _port_speed_mbps * 1e6 / _lane_count
+
+
+# *************************************************************************************
+# func: calc_prbs_duration
+# description: Calculate the PRBS duration needed to prove a target BER
+# *************************************************************************************
+def calc_prbs_duration(target_ber: float, confidence: float, lane_bit_rate: float) -> float:
+    """Calculate the PRBS duration needed to prove that the BER of a lane is below the target BER at the confidence level, when no error is received.
+
+    :param target_ber: Target BER
+    :type target_ber: float
+    :param confidence: Confidence level, e.g. 0.95
+    :type confidence: float
+    :param lane_bit_rate: Bit rate of the lane in bit/s
+    :type lane_bit_rate: float
+    :return: Duration in seconds, rounded up to 10 ms
+    :rtype: float
+    """
+    _duration = required_bits(target_ber, confidence) / lane_bit_rate
+    return max(0.01, math.ceil(_duration * 100) / 100)
+
+
+# *************************************************************************************
+# func: get_prbs_duration
+# description: Get the PRBS duration of the port from the PRBS configuration
+# *************************************************************************************
+async def get_prbs_duration(port: FreyaEdunPort, prbs_config: PRBSTestConfig, port_speed: str, logger_name: str, default_target_ber: Optional[float] = None) -> float:
+    """Get the PRBS duration of the port from the PRBS configuration.
+
+    In "fixed" duration mode, the configured duration is used. In "auto" duration mode, the duration is the time needed to prove the target BER at the configured confidence level (see :func:`calc_prbs_duration`).
+
+    :param port: Port object that receives PRBS
+    :type port: FreyaEdunPort
+    :param prbs_config: PRBS configuration
+    :type prbs_config: PRBSTestConfig
+    :param port_speed: Port speed string, e.g. "2x400G"
+    :type port_speed: str
+    :param logger_name: Logger name
+    :type logger_name: str
+    :param default_target_ber: Target BER to use in "auto" duration mode if the PRBS configuration has none
+    :type default_target_ber: Optional[float]
+    :return: Duration in seconds
+    :rtype: float
+    """
+    logger = logging.getLogger(logger_name)
+    if prbs_config.duration_mode == "fixed":
+        if prbs_config.duration is None:
+            raise ValueError(f"PRBS duration is required in fixed duration mode")
+        return float(prbs_config.duration)
+    if prbs_config.duration_mode != "auto":
+        raise ValueError(f"Invalid PRBS duration mode: {prbs_config.duration_mode}. Supported modes are 'fixed' and 'auto'.")
+    
+    _target_ber = prbs_config.target_ber if prbs_config.target_ber is not None else default_target_ber
+    if _target_ber is None:
+        raise ValueError(f"PRBS target BER is required in auto duration mode")
+    _lane_bit_rate = await get_lane_bit_rate(port, port_speed)
+    if prbs_config.confidence < ZERO_ERROR_CONFIDENCE:
+        logger.warning(f"PRBS confidence {prbs_config.confidence:.0%} is below the {ZERO_ERROR_CONFIDENCE:.0%} confidence of the reported PRBS BER of an error-free lane, so error-free lanes are reported above BER {_target_ber}")
+    _duration = calc_prbs_duration(_target_ber, prbs_config.confidence, _lane_bit_rate)
+    logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: PRBS duration {_duration}s to prove BER < {_target_ber} at {prbs_config.confidence:.0%} confidence ({_lane_bit_rate/1e9:g} Gbit/s per lane)")
+    if prbs_config.max_duration is not None and _duration > prbs_config.max_duration:
+        logger.warning(f"PRBS duration limited to {prbs_config.max_duration}s, which is too short to prove BER < {_target_ber} without error")
+        _duration = prbs_config.max_duration
+    return _duration
+
+
+# *************************************************************************************
+# func: describe_prbs_duration
+# description: Describe the PRBS duration configuration for logging
+# *************************************************************************************
+def describe_prbs_duration(prbs_config: PRBSTestConfig, default_target_ber: Optional[float] = None) -> str:
+    """Describe the PRBS duration configuration for logging, e.g. "20 seconds" or "auto (target BER 1e-12 at 95% confidence)"
+    """
+    if prbs_config.duration_mode == "auto":
+        _target_ber = prbs_config.target_ber if prbs_config.target_ber is not None else default_target_ber
+        return f"auto (target BER {_target_ber} at {prbs_config.confidence:.0%} confidence)"
+    return f"{prbs_config.duration} seconds"
+
+
 # *************************************************************************************
 # func: update_last_prbs_bers_for_opt_lanes
 # description: Get lanes that need to be optimized based on current PRBS BER and target BER
@@ -219,6 +781,7 @@ def update_last_prbs_bers_for_opt_lanes(curr_best_bers: List[float], curr_lanes:
 # func: clear_prbs_counters
 # description: Clear PRBS counters on all lanes
 # *************************************************************************************
+@timed("prbs_clear")
 async def clear_prbs_counters(port: FreyaEdunPort, logger_name: str) -> None:
     """Clear PRBS counters on all lanes
 
@@ -0,0 +1,189 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import math
+from dataclasses import dataclass
+from typing import List, Tuple, Sequence, Optional
+from .bayes_opt import cholesky, solve_lower, solve_upper
+
+MAX_Q = 40.0
+"""
+Q-factor of a BER far below anything a PRBS test can measure (about 1e-350)
+"""
+
+
+# *************************************************************************************
+# func: ber_from_q
+# description: BER of a Gaussian Q-factor
+# *************************************************************************************
+def ber_from_q(q: float) -> float:
+    """BER of a Gaussian Q-factor, BER = erfc(Q / sqrt(2)) / 2
+    """
+    return 0.5 * math.erfc(q / math.sqrt(2.0))
+
+
+# *************************************************************************************
+# func: q_from_ber
+# description: Gaussian Q-factor of a BER
+# *************************************************************************************
+def q_from_ber(ber: float) -> float:
+    """Gaussian Q-factor of a BER, the inverse of :func:`ber_from_q`, found by bisection, e.g. about 7.03 for 1e-12.
+
+    :param ber: BER
+    :type ber: float
+    :return: Q-factor. 0 for a BER of 0.5 or more, and MAX_Q for a BER of 0.
+    :rtype: float
+    """
+    if ber >= 0.5:
+        return 0.0
+    if ber <= 0.0:
+        return MAX_Q
+    low, high = 0.0, MAX_Q
+    for _ in range(100):
+        mid = (low + high) / 2.0
+        if ber_from_q(mid) > ber:
+            low = mid
+        else:
+            high = mid
+        if high - low <= 1e-9:
+            break
+    return (low + high) / 2.0
+
+
+# *************************************************************************************
+# class: QFactorFit
+# description: Quadratic Q-factor model of the BER along an EQ value
+# *************************************************************************************
+@dataclass
+class QFactorFit:
+    """Quadratic Q-factor model of the BER along an EQ value, Q(x) = a + b * (x - center) + c * (x - center)^2. The Q-factor of a Gaussian eye is roughly a parabola around the best EQ value, so the model fitted to the values with enough errors also predicts the BER of the values that are too good to measure in a short window.
+    """
+    coefficients: Tuple[float, float, float]    # a, b, c
+    center: float               # mean of the fitted EQ values, so the normal equations are well conditioned
+    points: int                 # number of fitted measurements
+    residual_rms: float         # weighted RMS of the Q residuals
+
+    def predict_q(self, x: float) -> float:
+        a, b, c = self.coefficients
+        u = x - self.center
+        return max(0.0, min(MAX_Q, a + b * u + c * u * u))
+
+    def predict_ber(self, x: float) -> float:
+        return ber_from_q(self.predict_q(x))
+
+
+MAX_FIT_BER = 1e-2
+"""
+Highest BER of a fitted measurement. Above it the eye is nearly closed, the Gaussian model no longer holds, and Q saturates towards 0.
+"""
+
+MAX_WEIGHT_ERRORS = 100
+"""
+Number of errors above which a measurement gets no more weight in the fit, so the shape error of the quadratic model, rather than the counting noise, limits the weight of the measurements with many errors
+"""
+
+
+def q_weight(errors: int, q: float) -> float:
+    # the standard deviation of ln(BER) is 1/sqrt(errors), and ln(BER) falls about (Q + 1/Q) per unit of Q
+    slope = q + 1.0 / max(q, 0.5)
+    return min(errors, MAX_WEIGHT_ERRORS) * slope * slope
+
+
+# *************************************************************************************
+# func: fit_q_factor
+# description: Fit the quadratic Q-factor model to the measurements of an EQ value range
+# *************************************************************************************
+def fit_q_factor(measurements: Sequence[Tuple[float, int, int]], min_errors: int, max_residual_rms: float = 0.5) -> Optional[QFactorFit]:
+    """Fit the quadratic Q-factor model to measurements along an EQ value, by weighted least squares on the normal equations. Only the measurements with at least ``min_errors`` errors and a BER of at most MAX_FIT_BER are fitted: a measurement with fewer errors only bounds its BER, and a measurement with a higher BER is outside the Gaussian regime of the model. Each measurement is weighted by its precision in Q, which grows with its number of errors up to MAX_WEIGHT_ERRORS.
+
+    :param measurements: List of (EQ value, number of errors, number of bits)
+    :type measurements: Sequence[Tuple[float, int, int]]
+    :param min_errors: Minimum number of errors of a fitted measurement
+    :type min_errors: int
+    :param max_residual_rms: Largest weighted RMS of the Q residuals of an accepted fit, defaults to 0.5
+    :type max_residual_rms: float, optional
+    :return: The fit, or None if fewer than 3 distinct EQ values can be fitted, if the fitted Q-factor has no maximum (c >= 0), if the maximum is outside the fitted EQ values, or if the residual RMS is above ``max_residual_rms``
+    :rtype: Optional[QFactorFit]
+    """
+    usable = [(float(x), errors, q_from_ber(errors / bits)) for x, errors, bits in measurements if bits > 0 and errors >= max(1, min_errors) and errors / bits <= MAX_FIT_BER]
+    if len(set(x for x, _, _ in usable)) < 3:
+        return None
+    center = sum(x for x, _, _ in usable) / len(usable)
+    normal = [[0.0] * 3 for _ in range(3)]
+    rhs = [0.0] * 3
+    for x, errors, q in usable:
+        u = x - center
+        basis = (1.0, u, u * u)
+        weight = q_weight(errors, q)
+        for i in range(3):
+            rhs[i] += weight * basis[i] * q
+            for j in range(3):
+                normal[i][j] += weight * basis[i] * basis[j]
+    # a tiny ridge keeps the factorization stable when the values are nearly collinear
+    for i in range(3):
+        normal[i][i] += 1e-12 * max(1.0, normal[i][i])
+    try:
+        lower = cholesky(normal)
+    except ValueError:
+        return None
+    a, b, c = solve_upper(lower, solve_lower(lower, rhs))
+    if c >= 0.0:
+        return None
+    # the model is only trusted between the fitted values, so the best value must lie there
+    vertex = center - b / (2.0 * c)
+    if not min(x for x, _, _ in usable) <= vertex <= max(x for x, _, _ in usable):
+        return None
+    total_weight = sum(q_weight(errors, q) for _, errors, q in usable)
+    residual_rms = math.sqrt(sum(q_weight(errors, q) * (q - (a + b * (x - center) + c * (x - center) ** 2)) ** 2 for x, errors, q in usable) / total_weight)
+    if residual_rms > max_residual_rms:
+        return None
+    return QFactorFit(coefficients=(a, b, c), center=center, points=len(usable), residual_rms=residual_rms)
+
+
+# *************************************************************************************
+# func: plateau_center
+# description: The middle of the longest run of error-free EQ values
+# *************************************************************************************
+def plateau_center(measurements: Sequence[Tuple[int, int, int]]) -> Optional[int]:
+    """The middle of the longest run of consecutive error-free EQ values, the value farthest from the errors on both sides. A run is broken by an EQ value with errors and by an EQ value that was not measured. On a tie, the run listed first is used, and a run of an even length takes the lower of its two middle values.
+
+    :param measurements: List of (EQ value, number of errors, number of bits)
+    :type measurements: Sequence[Tuple[int, int, int]]
+    :return: The EQ value, or None if every value has errors
+    :rtype: Optional[int]
+    """
+    ordered = sorted((x, errors) for x, errors, bits in measurements if bits > 0)
+    best: List[int] = []
+    run: List[int] = []
+    for x, errors in ordered:
+        if errors == 0:
+            if len(run) > 0 and x == run[-1]:
+                continue
+            if len(run) > 0 and x - run[-1] > 1:
+                run = []
+            run.append(x)
+            if len(run) > len(best):
+                best = list(run)
+        else:
+            run = []
+    if len(best) == 0:
+        return None
+    return best[(len(best) - 1) // 2]
+
+
+# *************************************************************************************
+# func: rank_by_q_factor
+# description: Rank EQ values by the BER the Q-factor model predicts
+# *************************************************************************************
+def rank_by_q_factor(candidates: Sequence[int], fit: QFactorFit) -> List[Tuple[int, float]]:
+    """Rank EQ values by the BER the Q-factor model predicts, best first
+
+    :param candidates: EQ values
+    :type candidates: Sequence[int]
+    :param fit: The fitted model
+    :type fit: QFactorFit
+    :return: List of (EQ value, predicted BER), from the lowest predicted BER. On a tie, the value listed first comes first.
+    :rtype: List[Tuple[int, float]]
+    """
+    return sorted(((value, fit.predict_ber(value)) for value in candidates), key=lambda x: -fit.predict_q(x[0]))
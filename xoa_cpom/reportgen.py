@@ -5,8 +5,11 @@
 import time
 import csv
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 import logging
+from .models import ReportWriterConfig
+from .timing import timed
+from .measurement import LaneMeasurement, BestMeasurements, lane_measurements
 
 # *************************************************************************************
 # func: create_report_dir
@@ -20,54 +23,171 @@ async def create_report_dir() -> str:
     return path
 
 
+# *************************************************************************************
+# func: measurement_record
+# description: Report record of a measurement
+# *************************************************************************************
+def measurement_record(measurement: LaneMeasurement, setting_fieldnames: Sequence[str]) -> Dict[str, Any]:
+    """Report record of a measurement. The values stay numeric, they are formatted when the record is written.
+
+    :param measurement: The measurement
+    :type measurement: LaneMeasurement
+    :param setting_fieldnames: Field names of the values of the EQ setting, e.g. ["Amplitude", "PreCursor", "PostCursor"]
+    :type setting_fieldnames: Sequence[str]
+    :return: Dictionary of {"Lane": lane, setting field name: value, ..., "PRBS BER": PRBS BER, "Errors": number of errors, "Bits": number of bits}
+    :rtype: Dict[str, Any]
+    """
+    record: Dict[str, Any] = {"Lane": measurement.lane}
+    record.update(zip(setting_fieldnames, measurement.setting))
+    record["PRBS BER"] = measurement.prbs_ber
+    record["Errors"] = measurement.error_count
+    record["Bits"] = measurement.bit_count
+    return record
+
+
+# *************************************************************************************
+# func: best_records
+# description: Records of the lowest PRBS BER of each lane
+# *************************************************************************************
+def best_records(table: BestMeasurements, setting_fieldnames: Dict[str, Sequence[str]]) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """Records of the setting with the lowest PRBS BER of each lane of each port pair, see :class:`xoa_cpom.measurement.BestMeasurements`
+
+    :param table: Best measurements of the test
+    :type table: BestMeasurements
+    :param setting_fieldnames: Field names of the values of the EQ setting of each port pair
+    :type setting_fieldnames: Dict[str, Sequence[str]]
+    :return: Dictionary of {port pair name: {lane: record}}, see :func:`measurement_record`
+    :rtype: Dict[str, Dict[int, Dict[str, Any]]]
+    """
+    return {port_name: {lane: measurement_record(measurement, setting_fieldnames[port_name]) for lane, measurement in lane_measurements.items()} for port_name, lane_measurements in table.best().items()}
+
+
+def format_field(value: Any) -> Any:
+    # a BER is the only float of a record
+    if isinstance(value, float):
+        return '{:.2e}'.format(abs(value))
+    return value
+
+
+# *************************************************************************************
+# class: CsvReportWriter
+# description: Append-only CSV writer of the rows of a test report
+# *************************************************************************************
+class CsvReportWriter:
+    """Append-only CSV writer of the rows of a test report. Each row is written once, as soon as it is recorded, so the memory use does not grow with the length of the test, and an interrupted test leaves a report with every row recorded so far.
+
+    The rows of a port pair are written under a section with the port pair name and a header row. When the port pairs run concurrently, their rows interleave, so they are written in one section with a "Port Pair" column instead.
+    """
+    def __init__(self, filename: str, name: str, chassis_list: List[str], config: ReportWriterConfig, port_pair_column: bool = False) -> None:
+        self.filename = filename
+        self.name = name
+        self.chassis_list = chassis_list
+        self.config = config
+        self.port_pair_column = port_pair_column
+        self.created_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        self.__file: Optional[Any] = None
+        self.__writer: Any = None
+        self.__section: Optional[List[Any]] = None   # title and header row of the current section
+        self.__unflushed = 0
+
+    def open(self) -> None:
+        """Open the report file for appending, and write the test header
+        """
+        if self.__file is not None:
+            return
+        self.__file = open(self.filename, 'a', newline='')
+        self.__writer = csv.writer(self.__file)
+        for line in [["*******************************************"], ["Test:", self.name], ["Chassis:", ', '.join(self.chassis_list)], ["Datetime:", self.created_time], []]:
+            self.__writer.writerow(line)
+        self.flush()
+
+    def write_record(self, port_name: str, fieldnames: List[str], record: Dict[str, Any]) -> None:
+        """Write a record of a port pair. A new section starts when the port pair or the header row changes. A float value is a BER, and is written in scientific notation.
+        """
+        self.open()
+        row = [format_field(record[fieldname]) for fieldname in fieldnames]
+        if self.port_pair_column:
+            section = ["Port Pairs", ["Port Pair"] + fieldnames]
+            row = [port_name] + row
+        else:
+            section = [port_name, fieldnames]
+        if self.__section != section:
+            self.end_section()
+            self.__writer.writerow([section[0]])
+            self.__writer.writerow(section[1])
+            self.__section = section
+        self.__writer.writerow(row)
+        self.__unflushed += 1
+        if self.config.flush_rows > 0 and self.__unflushed >= self.config.flush_rows:
+            self.flush()
+
+    def write_lines(self, lines: List[List[Any]]) -> None:
+        """Write lines after the current section, e.g. a summary of a port pair
+        """
+        self.open()
+        self.end_section()
+        for line in lines:
+            self.__writer.writerow(line)
+        self.__writer.writerow([])
+        self.flush()
+
+    def end_section(self) -> None:
+        if self.__section is not None:
+            self.__writer.writerow([])
+            self.__section = None
+
+    def flush(self) -> None:
+        if self.__file is None:
+            return
+        self.__file.flush()
+        if self.config.fsync:
+            os.fsync(self.__file.fileno())
+        self.__unflushed = 0
+
+    def close(self) -> None:
+        """End the last section and close the report file. A test without records still gets its header.
+        """
+        self.open()
+        self.end_section()
+        self.flush()
+        self.__file.close() # type: ignore
+        self.__file = None
+
+
 # *************************************************************************************
 # class: TcvrRxOutputEqTestReportGenerator
 # description: Generate report for Tcvr Rx Output EQ Test
 # *************************************************************************************
 class TcvrRxOutputEqTestReportGenerator:
-    def __init__(self, logger_name: str, chassis_list: List[str], name: str = "Tcvr Rx Output EQ Test"):
+    def __init__(self, logger_name: str, chassis_list: List[str], filename: str, name: str = "Tcvr Rx Output EQ Test", writer_config: ReportWriterConfig = ReportWriterConfig(), port_pair_column: bool = False):
         self.logger = logging.getLogger(logger_name)
         self.name = name
         self.chassis_list = chassis_list
-        self.__fieldnames = ["Time", "Lane", "Amplitude", "PreCursor", "PostCursor", "PRBS BER"]
-        self.__create_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        self.__database = {}
-
-    def record_data(self, port_name: str, lane: int, amplitude: int, precursor: int, postcursor:int, prbs_ber: float) -> None:
-        self.logger.info(f"Lane ({lane}) Amplitude: {amplitude}, PreCursor: {precursor}, PostCursor: {postcursor}, PRBS BER: {prbs_ber}")
-        time_str = time.strftime("%H:%M:%S", time.localtime())
-        if port_name not in self.__database:
-            self.__database[port_name] = []
-        self.__database[port_name].append({
-                "Time": time_str,
-                "Lane": lane,
-                "Amplitude": amplitude,
-                "PreCursor": precursor,
-                "PostCursor": postcursor,
-                "PRBS BER": '{:.2e}'.format(abs(prbs_ber))
-            })
-            
+        self.__setting_fieldnames = ["Amplitude", "PreCursor", "PostCursor"]
+        self.__fieldnames = ["Time", "Lane"] + self.__setting_fieldnames + ["PRBS BER", "Errors", "Bits"]
+        self.__writer = CsvReportWriter(filename, name, chassis_list, writer_config, port_pair_column)
+        self.measurements = BestMeasurements()
+
+    def record_data(self, port_name: str, measurement: LaneMeasurement) -> None:
+        """Record a measurement with the setting (amplitude, pre-cursor, post-cursor)
+        """
+        amplitude, precursor, postcursor = measurement.setting
+        self.logger.info(f"Lane ({measurement.lane}) Amplitude: {amplitude}, PreCursor: {precursor}, PostCursor: {postcursor}, PRBS BER: {measurement.prbs_ber}")
+        record = measurement_record(measurement, self.__setting_fieldnames)
+        record["Time"] = time.strftime("%H:%M:%S", time.localtime())
+        self.__writer.write_record(port_name, self.__fieldnames, record)
+        self.measurements.add(port_name, measurement)
     
-    def generate_report(self, filename: str) -> None:
-        headers = [
-            ["*******************************************"],
-            ["Test:", self.name],
-            ["Chassis:", ', '.join(self.chassis_list)],
-            ["Datetime:", self.__create_time],
-            []
-        ]
-        with open(filename, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            for line in headers:
-                writer.writerow(line)
-            for key, value in self.__database.items():
-                writer.writerow([key])
-                dict_writer = csv.DictWriter(csvfile, fieldnames=self.__fieldnames)
-                dict_writer.writeheader()
-                for data in value:
-                    dict_writer.writerow(data)
-                writer.writerow([])
+    def best_results(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """Return the record with the lowest PRBS BER of each lane of each port pair
+        """
+        return best_records(self.measurements, {port_name: self.__setting_fieldnames for port_name in self.measurements.port_names()})
 
+    @timed("report")
+    def generate_report(self) -> None:
+        """Finish the report. The records are already written.
+        """
+        self.__writer.close()
 
 
 # *************************************************************************************
@@ -75,46 +195,48 @@ class TcvrRxOutputEqTestReportGenerator:
 # description: Generate report for Tcvr Tx Input EQ Test
 # *************************************************************************************
 class TcvrTxInputEqTestReportGenerator:
-    def __init__(self, logger_name: str, chassis_list: List[str], name: str = "Tcvr Tx Input EQ Test"):
+    def __init__(self, logger_name: str, chassis_list: List[str], filename: str, name: str = "Tcvr Tx Input EQ Test", writer_config: ReportWriterConfig = ReportWriterConfig(), port_pair_column: bool = False):
         self.logger = logging.getLogger(logger_name)
         self.name = name
         self.chassis_list = chassis_list
-        self.__fieldnames = ["Time", "Lane", "Tx EQ", "PRBS BER"]
-        self.__create_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        self.__database = {}
-
-    def record_data(self, port_name: str, lane: int, eq_value: int, prbs_ber: float) -> None:
-        self.logger.info(f"Lane ({lane}) Equalizer: {eq_value}, PRBS BER: {prbs_ber}")
-        time_str = time.strftime("%H:%M:%S", time.localtime())
-        if port_name not in self.__database:
-            self.__database[port_name] = []
-        self.__database[port_name].append({
-                "Time": time_str,
-                "Lane": lane,
-                "Tx EQ": eq_value,
-                "PRBS BER": '{:.2e}'.format(abs(prbs_ber))
-            })
-            
+        self.__setting_fieldnames = ["Tx EQ"]
+        self.__fieldnames = ["Time", "Lane"] + self.__setting_fieldnames + ["PRBS BER", "Errors", "Bits"]
+        self.__writer = CsvReportWriter(filename, name, chassis_list, writer_config, port_pair_column)
+        self.measurements = BestMeasurements()
+
+    def record_data(self, port_name: str, measurement: LaneMeasurement) -> None:
+        """Record a measurement with the setting (EQ value,)
+        """
+        self.logger.info(f"Lane ({measurement.lane}) Equalizer: {measurement.setting[0]}, PRBS BER: {measurement.prbs_ber}")
+        record = measurement_record(measurement, self.__setting_fieldnames)
+        record["Time"] = time.strftime("%H:%M:%S", time.localtime())
+        self.__writer.write_record(port_name, self.__fieldnames, record)
+        self.measurements.add(port_name, measurement)
+
+    def record_effect_summary(self, port_name: str, effects: Dict[str, Any]) -> None:
+        """Record the lane effect / value effect summary of a port pair, see :func:`xoa_cpom.ber_stats.lane_value_effects`. It is written after the records of the port pair.
+        """
+        rows: List[List[Any]] = [[port_name], ["Effect Summary", "log10(BER)"], ["Mean", '{:.2f}'.format(effects["mean"])]]
+        for lane, effect in effects["lane_effects"].items():
+            rows.append([f"Lane {lane}", '{:+.2f}'.format(effect)])
+        for value, effect in effects["value_effects"].items():
+            rows.append([f"Tx EQ {value}", '{:+.2f}'.format(effect)])
+        rows.append(["Residual RMS", '{:.2f}'.format(effects["residual_rms"])])
+        rows.append(["Shared Best Tx EQ", effects["shared_best"]])
+        for lane, (value, prbs_ber) in effects["per_lane_best"].items():
+            rows.append([f"Lane {lane} Best Tx EQ", value, '{:.2e}'.format(abs(prbs_ber))])
+        self.__writer.write_lines(rows)
     
-    def generate_report(self, filename: str) -> None:
-        headers = [
-            ["*******************************************"],
-            ["Test:", self.name],
-            ["Chassis:", ', '.join(self.chassis_list)],
-            ["Datetime:", self.__create_time],
-            []
-        ]
-        with open(filename, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            for line in headers:
-                writer.writerow(line)
-            for key, value in self.__database.items():
-                writer.writerow([key])
-                dict_writer = csv.DictWriter(csvfile, fieldnames=self.__fieldnames)
-                dict_writer.writeheader()
-                for data in value:
-                    dict_writer.writerow(data)
-                writer.writerow([])
+    def best_results(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """Return the record with the lowest PRBS BER of each lane of each port pair
+        """
+        return best_records(self.measurements, {port_name: self.__setting_fieldnames for port_name in self.measurements.port_names()})
+
+    @timed("report")
+    def generate_report(self) -> None:
+        """Finish the report. The records and the summaries are already written.
+        """
+        self.__writer.close()
 
 
 # *************************************************************************************
@@ -122,75 +244,47 @@ class TcvrTxInputEqTestReportGenerator:
 # description: Generate report for Host Tx EQ Test
 # *************************************************************************************
 class HostTxEqTestReportGenerator:
-    def __init__(self, logger_name: str, chassis_list: List[str], name: str = "Host Tx EQ Test"):
+    def __init__(self, logger_name: str, chassis_list: List[str], filename: str, name: str = "Host Tx EQ Test", writer_config: ReportWriterConfig = ReportWriterConfig(), port_pair_column: bool = False):
         self.logger = logging.getLogger(logger_name)
         self.name = name
         self.chassis_list = chassis_list
-        self.__fieldnames = ["Time", "Lane", "Equalizers", "PRBS BER"]
-        self.__created_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        self.__database = {}
-
-    def setup(self, num_tx_taps: int, num_txtaps_pre: int, num_txtaps_post: int) -> None:
-        self.num_tx_taps = num_tx_taps
-        self.num_txtaps_pre = num_txtaps_pre
-        self.num_txtaps_post = num_txtaps_post
-
-        # Generate dict with "pre", "post" keys for tx taps depending on the num_txtaps_pre and num_txtaps_post
-        self.rec = dict()
-        self.rec["Time"] = ""
-        self.rec["Lane"] = 0
-        for i in range(self.num_txtaps_pre):
-            self.rec[f"Pre{self.num_txtaps_pre-i}"] = 0
-        self.rec["Main"] = 0
-        for i in range(self.num_txtaps_post):
-            self.rec[f"Post{i+1}"] = 0
-        self.rec["PRBS BER"] = 0.0
-
-        self.__fieldnames = ["Time", "Lane"] + [f"Pre{self.num_txtaps_pre-i}" for i in range(self.num_txtaps_pre)] + ["Main"] + [f"Post{i+1}" for i in range(self.num_txtaps_post)] + ["PRBS BER"]
+        self.__writer = CsvReportWriter(filename, name, chassis_list, writer_config, port_pair_column)
+        self.measurements = BestMeasurements()
+        self.__layouts = {}
+
+    def setup(self, port_name: str, num_tx_taps: int, num_txtaps_pre: int, num_txtaps_post: int) -> None:
+        # Each port pair keeps its own tap layout, so port pairs with different tap counts can be recorded at the same time
+        self.__layouts[port_name] = (num_tx_taps, num_txtaps_pre, num_txtaps_post)
+
+    def setting_fieldnames(self, port_name: str) -> List[str]:
+        """Field names of the host Tx EQ taps of a port pair, in the order of the Tx EQ values
+        """
+        _, num_txtaps_pre, num_txtaps_post = self.__layouts[port_name]
+        return [f"Pre{num_txtaps_pre-i}" for i in range(num_txtaps_pre)] + ["Main"] + [f"Post{i+1}" for i in range(num_txtaps_post)]
+
+    def fieldnames(self, port_name: str) -> List[str]:
+        return ["Time", "Lane"] + self.setting_fieldnames(port_name) + ["PRBS BER", "Errors", "Bits"]
         
     def record_data(self, port_name: str, lane_ber_dicts: List[Dict[str, Any]], lane_txeqs_dicts: List[Dict[str, Any]]) -> None:
-        
-        sorted_lane_txeqs_dicts = sorted(lane_txeqs_dicts, key=lambda x: x["lane"])
-        sorted_lane_ber_dicts = sorted(lane_ber_dicts, key=lambda x: x["lane"])
-
-        for lane_ber_dict, lane_txeqs_dict in zip(sorted_lane_ber_dicts, sorted_lane_txeqs_dicts):
-            lane = lane_ber_dict["lane"]
-            txeqs = lane_txeqs_dict["txeq_values"]
-            prbs_ber = lane_ber_dict["prbs_ber"]
-            self.logger.info(f"Lane ({lane}): Tx Eqs: {txeqs}, PRBS BER: {prbs_ber}")
-            
-            time_str = time.strftime("%H:%M:%S", time.localtime())
-            
-            if port_name not in self.__database:
-                self.__database[port_name] = []
-            self.rec["Time"] = time_str
-            self.rec["Lane"] = lane
-            for i in range(self.num_txtaps_pre):
-                self.rec[f"Pre{self.num_txtaps_pre - i}"] = txeqs[i]
-            self.rec["Main"] = txeqs[self.num_txtaps_pre]
-            for i in range(self.num_txtaps_post):
-                self.rec[f"Post{i+1}"] = txeqs[self.num_txtaps_pre + 1 + i]
-            self.rec["PRBS BER"] = '{:.2e}'.format(abs(prbs_ber))
-
-            self.__database[port_name].append(self.rec)
+        fieldnames = self.fieldnames(port_name)
+        setting_fieldnames = self.setting_fieldnames(port_name)
+        lane_settings = {lane_txeqs_dict["lane"]: lane_txeqs_dict["txeq_values"] for lane_txeqs_dict in lane_txeqs_dicts}
+
+        for measurement in sorted(lane_measurements(lane_ber_dicts, lane_settings), key=lambda x: x.lane):
+            self.logger.info(f"Lane ({measurement.lane}): Tx Eqs: {list(measurement.setting)}, PRBS BER: {measurement.prbs_ber}")
+            record = measurement_record(measurement, setting_fieldnames)
+            record["Time"] = time.strftime("%H:%M:%S", time.localtime())
+            self.__writer.write_record(port_name, fieldnames, record)
+            self.measurements.add(port_name, measurement)
             
     
-    def generate_report(self, filename: str) -> None:
-        headers = [
-            ["*******************************************"],
-            ["Test:", self.name],
-            ["Chassis:", ', '.join(self.chassis_list)],
-            ["Datetime:", self.__created_time],
-            []
-        ]
-        with open(filename, 'w+') as csvfile:
-            writer = csv.writer(csvfile)
-            for line in headers:
-                writer.writerow(line)
-            for key, value in self.__database.items():
-                writer.writerow([key])
-                dict_writer = csv.DictWriter(csvfile, fieldnames=self.__fieldnames)
-                dict_writer.writeheader()
-                for data in value:
-                    dict_writer.writerow(data)
-                writer.writerow([])
\ No newline at end of file
+    def best_results(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """Return the record with the lowest PRBS BER of each lane of each port pair
+        """
+        return best_records(self.measurements, {port_name: self.setting_fieldnames(port_name) for port_name in self.measurements.port_names()})
+
+    @timed("report")
+    def generate_report(self) -> None:
+        """Finish the report. The records are already written.
+        """
+        self.__writer.close()
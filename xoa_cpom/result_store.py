@@ -0,0 +1,170 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import json
+import logging
+import sqlite3
+import time
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Union
+from xoa_driver import ports
+from .models import ResultStoreConfig
+from .cmisfuncs import ModuleIdentity, read_module_identity
+from .ber_stats import ber_upper_bound
+from .checkpoint import checkpointed_value
+
+FreyaEdunPort = Union[ports.Z800FreyaPort, ports.Z1600EdunPort]
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS modules (
+        id INTEGER PRIMARY KEY,
+        vendor_name TEXT NOT NULL,
+        part_number TEXT NOT NULL,
+        serial_number TEXT NOT NULL,
+        UNIQUE (vendor_name, part_number, serial_number))""",
+    """CREATE TABLE IF NOT EXISTS measurements (
+        id INTEGER PRIMARY KEY,
+        module_id INTEGER NOT NULL REFERENCES modules (id),
+        subtest TEXT NOT NULL,
+        condition TEXT NOT NULL,
+        lane INTEGER NOT NULL,
+        setting TEXT NOT NULL,
+        error_count INTEGER NOT NULL,
+        bit_count INTEGER NOT NULL,
+        time REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS modules_part_number ON modules (vendor_name, part_number)",
+    "CREATE INDEX IF NOT EXISTS measurements_module ON measurements (module_id, subtest, condition, lane)",
+)
+"""
+Tables and indexes of the result store. A setting is stored as a JSON list, e.g. "[2, 3, 3]" for the RX output EQ amplitude, pre-cursor and post-cursor.
+"""
+
+
+# *************************************************************************************
+# class: ResultStore
+# description: Local SQLite store of the measurements of all runs
+# *************************************************************************************
+class ResultStore:
+    """Local SQLite store of the measurements of all runs, by module (vendor name, part number and serial number from CMIS page 00h), subtest, test condition (module media, port speed and PRBS polynomial), lane and EQ setting. The best setting measured on the modules of a part number can seed the search of the next module of the same part number.
+    """
+    def __init__(self, config: ResultStoreConfig, logger_name: str) -> None:
+        self.config = config
+        self.logger_name = logger_name
+        self.connection = sqlite3.connect(config.filename)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+        self.__module_ids: Dict[ModuleIdentity, int] = {}
+
+    def close(self) -> None:
+        self.connection.close()
+
+    async def identify(self, port: FreyaEdunPort) -> ModuleIdentity:
+        """Read the identity of the module in a port
+
+        :param port: Port object
+        :type port: FreyaEdunPort
+        :return: Module identity
+        :rtype: ModuleIdentity
+        """
+        return await read_module_identity(port, self.logger_name)
+
+    def module_id(self, identity: ModuleIdentity) -> int:
+        if identity not in self.__module_ids:
+            self.connection.execute("INSERT OR IGNORE INTO modules (vendor_name, part_number, serial_number) VALUES (?, ?, ?)", (identity.vendor_name, identity.part_number, identity.serial_number))
+            row = self.connection.execute("SELECT id FROM modules WHERE vendor_name = ? AND part_number = ? AND serial_number = ?", (identity.vendor_name, identity.part_number, identity.serial_number)).fetchone()
+            self.__module_ids[identity] = row[0]
+        return self.__module_ids[identity]
+
+    def record(self, identity: ModuleIdentity, subtest: str, condition: str, lane_settings: Dict[int, Sequence[int]], lane_ber_dicts: List[Dict[str, Any]]) -> None:
+        """Store the measurements of one PRBS window
+
+        :param identity: Identity of the module the settings are written to
+        :type identity: ModuleIdentity
+        :param subtest: Subtest name, e.g. "rx_output_eq"
+        :type subtest: str
+        :param condition: Test condition, see :func:`test_condition`
+        :type condition: str
+        :param lane_settings: EQ setting of each lane
+        :type lane_settings: Dict[int, Sequence[int]]
+        :param lane_ber_dicts: Measurements of the window, [{"lane": lane number, "error_count": number of errors, "bit_count": number of bits}]
+        :type lane_ber_dicts: List[Dict[str, Any]]
+        """
+        module_id = self.module_id(identity)
+        now = time.time()
+        rows = []
+        for lane_ber_dict in lane_ber_dicts:
+            lane = lane_ber_dict["lane"]
+            # a measurement replayed from the checkpoint of a resumed run is already stored, and so is a lane served from the evidence memo
+            if lane not in lane_settings or "bit_count" not in lane_ber_dict or lane_ber_dict.get("replayed", False) or lane_ber_dict.get("cached", False):
+                continue
+            # a pooled lane BER dict stores the counts of its own window only
+            error_count = lane_ber_dict.get("window_error_count", lane_ber_dict["error_count"])
+            bit_count = lane_ber_dict.get("window_bit_count", lane_ber_dict["bit_count"])
+            rows.append((module_id, subtest, condition, lane, json.dumps([int(v) for v in lane_settings[lane]]), int(error_count), int(bit_count), now))
+        self.connection.executemany("INSERT INTO measurements (module_id, subtest, condition, lane, setting, error_count, bit_count, time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+
+    def best_setting(self, identity: ModuleIdentity, subtest: str, condition: str) -> Optional[Tuple[int, ...]]:
+        """Find the best setting measured on the modules of the same vendor and part number, in the same subtest and test condition. The measurements of a setting are pooled over the modules and the lanes, and the setting with the lowest BER upper bound wins, so a setting measured with few bits does not win by chance.
+
+        :param identity: Identity of the module to test
+        :type identity: ModuleIdentity
+        :param subtest: Subtest name
+        :type subtest: str
+        :param condition: Test condition
+        :type condition: str
+        :return: The best setting, or None if the part number has no measurement
+        :rtype: Optional[Tuple[int, ...]]
+        """
+        rows = self.connection.execute(
+            """SELECT measurements.setting, SUM(measurements.error_count), SUM(measurements.bit_count)
+            FROM measurements JOIN modules ON measurements.module_id = modules.id
+            WHERE modules.vendor_name = ? AND modules.part_number = ? AND measurements.subtest = ? AND measurements.condition = ?
+            GROUP BY measurements.setting""",
+            (identity.vendor_name, identity.part_number, subtest, condition)).fetchall()
+        if len(rows) == 0:
+            return None
+        setting, errors, bits = min(rows, key=lambda row: ber_upper_bound(row[1], row[2], self.config.confidence))
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Best {subtest} setting of {identity.vendor_name} {identity.part_number} from {len(rows)} stored settings: {setting}, {errors} errors in {bits} bits")
+        return tuple(json.loads(setting))
+
+
+# *************************************************************************************
+# func: test_condition
+# description: Key of the test condition of a measurement
+# *************************************************************************************
+def test_condition(module_media: str, port_speed: str, polynomial: str) -> str:
+    return f"{module_media}/{port_speed}/{polynomial}"
+
+
+# *************************************************************************************
+# class: SubtestResults
+# description: Measurements of one subtest in the result store
+# *************************************************************************************
+class SubtestResults:
+    """Measurements of one subtest in the result store. Does nothing if the result store is not configured, so the subtests can call it unconditionally.
+    """
+    def __init__(self, store: Optional[ResultStore], subtest: str, condition: str) -> None:
+        self.store = store
+        self.subtest = subtest
+        self.condition = condition
+
+    async def identify(self, port: FreyaEdunPort) -> Optional[ModuleIdentity]:
+        if self.store is None:
+            return None
+        return await self.store.identify(port)
+
+    def record(self, identity: Optional[ModuleIdentity], lane_settings: Dict[int, Sequence[int]], lane_ber_dicts: List[Dict[str, Any]]) -> None:
+        if self.store is None or identity is None:
+            return
+        self.store.record(identity, self.subtest, self.condition, lane_settings, lane_ber_dicts)
+
+    def warm_start(self, identity: Optional[ModuleIdentity]) -> Optional[Tuple[int, ...]]:
+        """The best stored setting of the part number of a module, if warm start is enabled. The setting is journaled in the checkpoint of the run, so a resumed run starts from the same setting, and not from the one that the measurements of the interrupted run have since made the best.
+        """
+        if self.store is None or identity is None or not self.store.config.warm_start:
+            return None
+        setting = checkpointed_value("warm_start", lambda: self.store.best_setting(identity, self.subtest, self.condition))
+        return None if setting is None else tuple(setting)
@@ -0,0 +1,534 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import math
+import asyncio
+import logging
+from xoa_driver import enums
+from .models import SuccessiveHalvingConfig, BayesianSearchConfig, SpsaConfig
+from .bayes_opt import GaussianProcess, expected_improvement, log_ber_score, spread_points
+from typing import List, Dict, Tuple, Sequence, Callable, Awaitable, Optional, Hashable, TypeVar, Any, Generator
+from dataclasses import dataclass
+import itertools
+import random
+
+C = TypeVar("C", bound=Hashable)
+
+
+# *************************************************************************************
+# class: Rung
+# description: One round of a multi-fidelity search
+# *************************************************************************************
+@dataclass
+class Rung:
+    """One round of a multi-fidelity search: the PRBS duration and polynomial used to measure the candidates of the round
+    """
+    index: int
+    duration: float
+    polynomial: enums.PRBSPolynomial
+    is_final: bool
+
+
+# *************************************************************************************
+# func: successive_halving_time
+# description: Estimate the time of the remaining rounds of a successive halving search
+# *************************************************************************************
+def successive_halving_time(num_candidates: int, index: int, screening_rounds: int, config: SuccessiveHalvingConfig, final_duration: float, overhead: float) -> float:
+    """Estimate the time of the remaining rounds of a successive halving search, from round ``index`` on, with ``screening_rounds`` short rounds before the final round. Every measurement costs its PRBS duration plus the overhead of a candidate.
+
+    :param num_candidates: Number of candidates left for a lane
+    :type num_candidates: int
+    :param index: Index of the next round
+    :type index: int
+    :param screening_rounds: Number of short rounds before the final round
+    :type screening_rounds: int
+    :param config: Successive halving configuration
+    :type config: SuccessiveHalvingConfig
+    :param final_duration: PRBS duration in seconds of the final round
+    :type final_duration: float
+    :param overhead: Time in seconds a candidate takes on top of its PRBS duration, e.g. EQ write, settle delay, and clearing and reading the counters
+    :type overhead: float
+    :return: Time in seconds
+    :rtype: float
+    """
+    _time = 0.0
+    _count = num_candidates
+    for i in range(index, index + screening_rounds):
+        _time += _count * (config.min_duration / (config.keep_fraction ** i) + overhead)
+        _count = max(1, math.ceil(_count * config.keep_fraction))
+    return _time + _count * (final_duration + overhead)
+
+
+# *************************************************************************************
+# func: plan_screening_rounds
+# description: Get the number of short rounds that makes a successive halving search the fastest
+# *************************************************************************************
+def plan_screening_rounds(num_candidates: int, index: int, config: SuccessiveHalvingConfig, final_duration: float, overhead: float) -> int:
+    """Get the number of short rounds before the final round that makes the rest of a successive halving search the fastest, see :func:`successive_halving_time`. A short round is only possible while its duration is below the final duration and more than one candidate is left. Screening is skipped (0 rounds) unless it saves at least ``config.min_saving`` of the time of measuring every candidate with the final duration, because a short round costs the same overhead per candidate as a final one.
+
+    :param num_candidates: Number of candidates left for a lane
+    :type num_candidates: int
+    :param index: Index of the next round
+    :type index: int
+    :param config: Successive halving configuration
+    :type config: SuccessiveHalvingConfig
+    :param final_duration: PRBS duration in seconds of the final round
+    :type final_duration: float
+    :param overhead: Time in seconds a candidate takes on top of its PRBS duration
+    :type overhead: float
+    :return: Number of short rounds
+    :rtype: int
+    """
+    _full_time = successive_halving_time(num_candidates, index, 0, config, final_duration, overhead)
+    _best_rounds, _best_time = 0, _full_time
+    _rounds, _count = 0, num_candidates
+    while _count > 1 and config.min_duration / (config.keep_fraction ** (index + _rounds)) < final_duration:
+        _rounds += 1
+        _count = max(1, math.ceil(_count * config.keep_fraction))
+        _time = successive_halving_time(num_candidates, index, _rounds, config, final_duration, overhead)
+        if _time < _best_time:
+            _best_rounds, _best_time = _rounds, _time
+    if _best_time > (1.0 - config.min_saving) * _full_time:
+        return 0
+    return _best_rounds
+
+
+# *************************************************************************************
+# func: get_rung
+# description: Get the PRBS duration and polynomial of a successive halving round
+# *************************************************************************************
+def get_rung(index: int, num_survivors: int, config: SuccessiveHalvingConfig, final_duration: float, final_polynomial: enums.PRBSPolynomial, overhead: float = 0.0) -> Rung:
+    """Get the PRBS duration and polynomial of a successive halving round.
+
+    The duration starts at ``config.min_duration`` and grows by 1/keep_fraction each round, so every round costs about the same PRBS time. The round is the final round, with the final duration and the final polynomial, when no more short rounds pay off given the overhead of a candidate (see :func:`plan_screening_rounds`), e.g. when a short window plus the overhead is not clearly shorter than a final window. The earlier rounds use ``config.polynomials`` in order, or the final polynomial if there is none left.
+
+    :param index: Round index, from 0
+    :type index: int
+    :param num_survivors: The largest number of candidates left for a lane
+    :type num_survivors: int
+    :param config: Successive halving configuration
+    :type config: SuccessiveHalvingConfig
+    :param final_duration: PRBS duration in seconds of the final round
+    :type final_duration: float
+    :param final_polynomial: PRBS polynomial of the final round
+    :type final_polynomial: enums.PRBSPolynomial
+    :param overhead: Time in seconds a candidate takes on top of its PRBS duration, defaults to 0.0
+    :type overhead: float, optional
+    :return: The round
+    :rtype: Rung
+    """
+    if plan_screening_rounds(num_survivors, index, config, final_duration, overhead) == 0:
+        return Rung(index=index, duration=final_duration, polynomial=final_polynomial, is_final=True)
+    _duration = config.min_duration / (config.keep_fraction ** index)
+    if len(config.polynomials) > 0:
+        _polynomial = enums.PRBSPolynomial[config.polynomials[min(index, len(config.polynomials)-1)]]
+    else:
+        _polynomial = final_polynomial
+    return Rung(index=index, duration=_duration, polynomial=_polynomial, is_final=False)
+
+
+# *************************************************************************************
+# func: successive_halving
+# description: Find the best candidate of each lane with successive halving
+# *************************************************************************************
+async def successive_halving(candidates: Sequence[C], lanes: Sequence[int], evaluate: Callable[[C, Sequence[int], Rung], Awaitable[Dict[int, float]]], config: SuccessiveHalvingConfig, final_duration: float, final_polynomial: enums.PRBSPolynomial, logger_name: str, prepare_rung: Optional[Callable[[Rung], Awaitable[None]]] = None, overhead: float = 0.0) -> Dict[int, List[Tuple[C, float]]]:
+    """Find the best candidate of each lane with successive halving.
+
+    Every candidate is first measured with a short PRBS window. After each round, only the best ``keep_fraction`` of the candidates of each lane are kept, and measured again with a longer window, until the final round measures the survivors with the full duration. The candidates are kept per lane, so lanes can have different winners. A candidate is measured while it is kept by at least one lane.
+
+    Each candidate also costs a fixed overhead on top of its PRBS window, so the number of short rounds is planned from the overhead (see :func:`get_rung`). The first round uses the ``overhead`` estimate, and the later rounds the overhead measured in the earlier rounds. When screening does not pay off, every candidate is measured once with the full duration, as in an exhaustive search.
+
+    :param candidates: Candidates to search, in the order they should be measured
+    :type candidates: Sequence[C]
+    :param lanes: Lanes to optimize
+    :type lanes: Sequence[int]
+    :param evaluate: Coroutine function that applies a candidate to the given lanes, measures it in a round, and returns {lane: PRBS BER}. A lane missing from the result is treated as BER 1.
+    :type evaluate: Callable[[C, Sequence[int], Rung], Awaitable[Dict[int, float]]]
+    :param config: Successive halving configuration
+    :type config: SuccessiveHalvingConfig
+    :param final_duration: PRBS duration in seconds of the final round
+    :type final_duration: float
+    :param final_polynomial: PRBS polynomial of the final round
+    :type final_polynomial: enums.PRBSPolynomial
+    :param logger_name: Logger name
+    :type logger_name: str
+    :param prepare_rung: Coroutine function called at the start of each round, e.g. to change the PRBS polynomial
+    :type prepare_rung: Optional[Callable[[Rung], Awaitable[None]]]
+    :param overhead: Estimated time in seconds a candidate takes on top of its PRBS duration, e.g. EQ write, settle delay, and clearing and reading the counters, defaults to 0.0
+    :type overhead: float, optional
+    :return: For each lane, the candidates of the final round and their PRBS BER, best first
+    :rtype: Dict[int, List[Tuple[C, float]]]
+    """
+    logger = logging.getLogger(logger_name)
+    if not 0 < config.keep_fraction < 1:
+        raise ValueError(f"keep_fraction must be between 0 and 1, got {config.keep_fraction}")
+    loop = asyncio.get_running_loop()
+    survivors: Dict[int, List[C]] = {lane: list(candidates) for lane in lanes}
+    overhead_total, overhead_count = 0.0, 0
+    index = 0
+    while True:
+        _overhead = overhead_total / overhead_count if overhead_count > 0 else overhead
+        rung = get_rung(index, max(len(items) for items in survivors.values()), config, final_duration, final_polynomial, _overhead)
+        to_measure = [candidate for candidate in candidates if any(candidate in survivors[lane] for lane in lanes)]
+        logger.info(f"Successive halving round {index}: {len(to_measure)} candidates, {rung.duration}s of {rung.polynomial.name}{' (final)' if rung.is_final else ''}, {_overhead:.1f}s overhead per candidate")
+        if prepare_rung is not None:
+            await prepare_rung(rung)
+
+        scores: Dict[int, Dict[C, float]] = {lane: {} for lane in lanes}
+        for candidate in to_measure:
+            candidate_lanes = [lane for lane in lanes if candidate in survivors[lane]]
+            _start = loop.time()
+            lane_bers = await evaluate(candidate, candidate_lanes, rung)
+            overhead_total += max(0.0, loop.time() - _start - rung.duration)
+            overhead_count += 1
+            for lane in candidate_lanes:
+                scores[lane][candidate] = lane_bers.get(lane, 1.0)
+
+        if rung.is_final:
+            return {lane: sorted(scores[lane].items(), key=lambda x: x[1]) for lane in lanes}
+
+        for lane in lanes:
+            _ranked = sorted(survivors[lane], key=lambda candidate: scores[lane][candidate])
+            _keep = max(1, math.ceil(len(_ranked) * config.keep_fraction))
+            survivors[lane] = _ranked[:_keep]
+            logger.info(f"  Lane ({lane}): keep {_keep} of {len(_ranked)} candidates")
+        index += 1
+
+
+# *************************************************************************************
+# func: bayesian_search
+# description: Find the best grid point of each lane with Bayesian optimization
+# *************************************************************************************
+async def bayesian_search(grid: Sequence[Tuple[int, ...]], lanes: Sequence[int], evaluate: Callable[[Dict[int, Tuple[int, ...]]], Awaitable[Dict[int, Dict[str, Any]]]], config: BayesianSearchConfig, logger_name: str, start: Optional[Tuple[int, ...]] = None) -> Dict[int, List[Tuple[Tuple[int, ...], float]]]:
+    """Find the best grid point of each lane with Bayesian optimization.
+
+    The lanes first measure ``config.initial_points`` grid points spread over the grid, the first of them ``start`` if given. Then each lane fits a Gaussian process of log10(BER) over its measured points, and measures the unmeasured point with the highest expected improvement. The lanes are searched independently, but measured in the same window, so each lane can test a different point. A lane stops when it has ``config.max_measurements`` measurements, or when no point is expected to improve log10(BER) by more than ``config.min_expected_improvement``.
+
+    :param grid: Grid points
+    :type grid: Sequence[Tuple[int, ...]]
+    :param lanes: Lanes to optimize
+    :type lanes: Sequence[int]
+    :param evaluate: Coroutine function that applies a grid point to each lane, measures them in one window, and returns {lane: {"prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits}}. A lane missing from the result is treated as BER 1.
+    :type evaluate: Callable[[Dict[int, Tuple[int, ...]]], Awaitable[Dict[int, Dict[str, Any]]]]
+    :param config: Bayesian search configuration
+    :type config: BayesianSearchConfig
+    :param logger_name: Logger name
+    :type logger_name: str
+    :param start: Grid point to measure first, e.g. the best point of a previous module, defaults to None
+    :type start: Optional[Tuple[int, ...]], optional
+    :return: For each lane, the measured grid points and their PRBS BER, best first
+    :rtype: Dict[int, List[Tuple[Tuple[int, ...], float]]]
+    """
+    logger = logging.getLogger(logger_name)
+    num_initial_points = min(config.initial_points, config.max_measurements)
+    initial_points = spread_points(grid, num_initial_points)
+    if start is not None and start in grid:
+        initial_points = ([start] + [point for point in initial_points if point != start])[:num_initial_points]
+    measured: Dict[int, Dict[Tuple[int, ...], Tuple[float, float]]] = {lane: {} for lane in lanes}   # {lane: {point: (prbs_ber, score)}}
+    active = list(lanes)
+
+    async def measure(lane_points: Dict[int, Tuple[int, ...]]) -> None:
+        lane_ber_dicts = await evaluate(lane_points)
+        for lane, point in lane_points.items():
+            lane_ber_dict = lane_ber_dicts.get(lane, {"prbs_ber": 1.0})
+            measured[lane][point] = (lane_ber_dict["prbs_ber"], log_ber_score(lane_ber_dict))
+
+    for i, point in enumerate(initial_points):
+        logger.info(f"Bayesian search: initial point {i+1}/{len(initial_points)} {point}")
+        await measure({lane: point for lane in lanes})
+
+    iteration = 0
+    while len(active) > 0:
+        iteration += 1
+        lane_points: Dict[int, Tuple[int, ...]] = {}
+        for lane in list(active):
+            candidates = [point for point in grid if point not in measured[lane]]
+            if len(measured[lane]) >= config.max_measurements or len(candidates) == 0:
+                logger.info(f"  Lane ({lane}): measurement budget used ({len(measured[lane])} measurements)")
+                active.remove(lane)
+                continue
+            model = GaussianProcess()
+            model.fit(list(measured[lane].keys()), [score for _, score in measured[lane].values()])
+            best_score = min(score for _, score in measured[lane].values())
+            improvements = [(expected_improvement(*model.predict(point), best_score), point) for point in candidates]
+            improvement, point = max(improvements, key=lambda x: x[0])
+            if improvement < config.min_expected_improvement:
+                logger.info(f"  Lane ({lane}): converged after {len(measured[lane])} measurements (expected improvement {improvement:.3f} decades)")
+                active.remove(lane)
+                continue
+            logger.info(f"  Lane ({lane}): next point {point}, expected improvement {improvement:.3f} decades")
+            lane_points[lane] = point
+        if len(lane_points) > 0:
+            logger.info(f"Bayesian search: iteration {iteration}")
+            await measure(lane_points)
+
+    return {lane: sorted(((point, prbs_ber) for point, (prbs_ber, _) in measured[lane].items()), key=lambda x: x[1]) for lane in lanes}
+
+
+# *************************************************************************************
+# func: golden_section_line
+# description: Search the best integer value of a unimodal function with golden-section steps
+# *************************************************************************************
+def golden_section_line(low: int, high: int, to_point: Callable[[int], Any], scores: Dict[Any, float]) -> Generator[Any, float, int]:
+    """Search the best integer value in [low, high] of a function that is roughly unimodal, with golden-section steps. When the two probes tie, e.g. both have no error, the search keeps the range between them.
+
+    This is a generator: it yields the point to measure, and expects its score (lower is better) to be sent back. Points already in ``scores`` are not yielded again.
+
+    :param low: The lowest value
+    :type low: int
+    :param high: The highest value
+    :type high: int
+    :param to_point: Function that converts a value to the point to measure
+    :type to_point: Callable[[int], Any]
+    :param scores: The scores of the measured points, shared with the caller and updated by the search
+    :type scores: Dict[Any, float]
+    :return: The best value
+    :rtype: int
+    """
+    lo, hi = low, high
+    while hi - lo > 2:
+        m1 = lo + int(round((hi - lo) * 0.382))
+        # the two probes must differ, or a tie would collapse the range to one point, e.g. both round to lo + 2 when hi - lo is 4
+        m2 = max(lo + int(round((hi - lo) * 0.618)), m1 + 1)
+        for m in (m1, m2):
+            if to_point(m) not in scores:
+                scores[to_point(m)] = yield to_point(m)
+        if scores[to_point(m1)] < scores[to_point(m2)]:
+            hi = m2 - 1
+        elif scores[to_point(m1)] > scores[to_point(m2)]:
+            lo = m1 + 1
+        else:
+            lo, hi = m1, m2
+    for v in range(lo, hi+1):
+        if to_point(v) not in scores:
+            scores[to_point(v)] = yield to_point(v)
+    return min(range(lo, hi+1), key=lambda v: scores[to_point(v)])
+
+
+# *************************************************************************************
+# func: grid_neighbourhood
+# description: The grid points around a point
+# *************************************************************************************
+def grid_neighbourhood(point: Tuple[int, ...], ranges: Sequence[Tuple[int, int]], radius: int) -> List[Tuple[int, ...]]:
+    """The grid points within ``radius`` steps of a point on every axis, the point itself excluded
+
+    :param point: The center point
+    :type point: Tuple[int, ...]
+    :param ranges: (min, max) of each axis
+    :type ranges: Sequence[Tuple[int, int]]
+    :param radius: Number of steps
+    :type radius: int
+    :return: List of grid points
+    :rtype: List[Tuple[int, ...]]
+    """
+    axes = [range(max(lo, x - radius), min(hi, x + radius) + 1) for x, (lo, hi) in zip(point, ranges)]
+    return [p for p in itertools.product(*axes) if p != tuple(point)]
+
+
+# *************************************************************************************
+# func: refine_steps
+# description: Measure the neighbourhood of the best point until no neighbour is better
+# *************************************************************************************
+def refine_steps(best: Any, neighbourhood: Callable[[Any], List[Any]], scores: Dict[Any, float]) -> Generator[Any, float, Any]:
+    """Measure all neighbours of the best point. If a neighbour is better, move to it and measure its neighbours, until no neighbour is better. This catches the cases where the search is misled by noise or by a function that is not quite unimodal.
+
+    This is a generator, see :func:`golden_section_line`.
+
+    :param best: The best point so far, already measured
+    :type best: Any
+    :param neighbourhood: Function that returns the neighbours of a point
+    :type neighbourhood: Callable[[Any], List[Any]]
+    :param scores: The scores of the measured points
+    :type scores: Dict[Any, float]
+    :return: The best point
+    :rtype: Any
+    """
+    while True:
+        for p in neighbourhood(best):
+            if p not in scores:
+                scores[p] = yield p
+        new_best = min([best] + neighbourhood(best), key=lambda p: scores[p])
+        if new_best == best:
+            return best
+        best = new_best
+
+
+# *************************************************************************************
+# func: golden_section_steps
+# description: 1-D golden-section search followed by local refinement
+# *************************************************************************************
+def golden_section_steps(low: int, high: int, refine_radius: int) -> Generator[int, float, None]:
+    """Golden-section search of the best integer value in [low, high], followed by local refinement within ``refine_radius`` values of the best one.
+
+    This is a generator, see :func:`golden_section_line`.
+    """
+    scores: Dict[Any, float] = {}
+    best = yield from golden_section_line(low, high, lambda v: v, scores)
+    if refine_radius > 0:
+        yield from refine_steps(best, lambda v: [x for x in range(max(low, v - refine_radius), min(high, v + refine_radius) + 1) if x != v], scores)
+
+
+# *************************************************************************************
+# func: coordinate_descent_steps
+# description: Cyclic coordinate descent on a grid followed by local refinement
+# *************************************************************************************
+def coordinate_descent_steps(ranges: Sequence[Tuple[int, int]], refine_radius: int, start: Optional[Tuple[int, ...]] = None) -> Generator[Tuple[int, ...], float, None]:
+    """Cyclic coordinate descent on a grid: starting from ``start`` (the center by default), each axis in turn is searched with golden-section steps while the other axes stay fixed, until a full cycle does not improve the best point. Then the neighbourhood within ``refine_radius`` steps on every axis is searched, which also catches interactions between the axes.
+
+    This is a generator, see :func:`golden_section_line`.
+
+    :param ranges: (min, max) of each axis
+    :type ranges: Sequence[Tuple[int, int]]
+    :param refine_radius: Number of steps of the local refinement
+    :type refine_radius: int
+    :param start: Start point, clamped to the ranges, defaults to None
+    :type start: Optional[Tuple[int, ...]], optional
+    """
+    scores: Dict[Any, float] = {}
+    if start is None:
+        current = tuple((lo + hi) // 2 for lo, hi in ranges)
+    else:
+        current = tuple(min(max(v, lo), hi) for v, (lo, hi) in zip(start, ranges))
+    scores[current] = yield current
+    while True:
+        start = current
+        for axis, (lo, hi) in enumerate(ranges):
+            to_point = lambda v, axis=axis, base=current: base[:axis] + (v,) + base[axis+1:]
+            value = yield from golden_section_line(lo, hi, to_point, scores)
+            if scores[to_point(value)] < scores[current]:
+                current = to_point(value)
+        if current == start:
+            break
+    if refine_radius > 0:
+        yield from refine_steps(current, lambda p: grid_neighbourhood(p, ranges, refine_radius), scores)
+
+
+# *************************************************************************************
+# func: run_lane_searches
+# description: Run one search per lane, measuring the lanes in the same windows
+# *************************************************************************************
+async def run_lane_searches(lanes: Sequence[int], make_search: Callable[[int], Generator[Any, float, Any]], evaluate: Callable[[Dict[int, Any]], Awaitable[Dict[int, Dict[str, Any]]]], logger_name: str) -> Dict[int, List[Tuple[Any, float]]]:
+    """Run one search per lane. Each window measures the next point of every lane that is still searching, so the lanes run in parallel even when they probe different points. The score of a point is its log10(BER), see :func:`log_ber_score`.
+
+    :param lanes: Lanes to optimize
+    :type lanes: Sequence[int]
+    :param make_search: Function that creates the search generator of a lane from the lane number, e.g. ``lambda lane: golden_section_steps(0, 15, 1)``
+    :type make_search: Callable[[int], Generator[Any, float, Any]]
+    :param evaluate: Coroutine function that applies a point to each lane, measures them in one window, and returns {lane: {"prbs_ber": PRBS BER value, "error_count": number of errors, "bit_count": number of bits}}. A lane missing from the result is treated as BER 1.
+    :type evaluate: Callable[[Dict[int, Any]], Awaitable[Dict[int, Dict[str, Any]]]]
+    :param logger_name: Logger name
+    :type logger_name: str
+    :return: For each lane, the measured points and their PRBS BER, best first
+    :rtype: Dict[int, List[Tuple[Any, float]]]
+    """
+    logger = logging.getLogger(logger_name)
+    measured: Dict[int, Dict[Any, Tuple[float, float]]] = {lane: {} for lane in lanes}   # {lane: {point: (prbs_ber, score)}}
+    searches = {lane: make_search(lane) for lane in lanes}
+    pending: Dict[int, Any] = {}
+    for lane in lanes:
+        try:
+            pending[lane] = next(searches[lane])
+        except StopIteration:
+            pass
+
+    window = 0
+    while len(pending) > 0:
+        window += 1
+        logger.info(f"Search window {window}: (Lane, Point) {sorted(pending.items())}")
+        lane_ber_dicts = await evaluate(dict(pending))
+        for lane, point in list(pending.items()):
+            lane_ber_dict = lane_ber_dicts.get(lane, {"prbs_ber": 1.0})
+            measured[lane][point] = (lane_ber_dict["prbs_ber"], log_ber_score(lane_ber_dict))
+            try:
+                next_point = searches[lane].send(measured[lane][point][1])
+                # a point measured by an earlier step of the search is answered without a new measurement
+                while next_point in measured[lane]:
+                    next_point = searches[lane].send(measured[lane][next_point][1])
+                pending[lane] = next_point
+            except StopIteration:
+                logger.info(f"  Lane ({lane}): search done after {len(measured[lane])} measurements")
+                del pending[lane]
+
+    return {lane: sorted(((point, prbs_ber) for point, (prbs_ber, _) in measured[lane].items()), key=lambda x: x[1]) for lane in lanes}
+
+
+# *************************************************************************************
+# func: project_to_limits
+# description: Move a tap vector into its bounds and its sum limit
+# *************************************************************************************
+def project_to_limits(values: Sequence[float], positions: Sequence[int], bounds: Sequence[Tuple[int, int]], max_abs_sum: int) -> Tuple[int, ...]:
+    """Round the optimized taps of a tap vector, clip them to their bounds, and, if the sum of the absolute tap values is above ``max_abs_sum``, move the largest optimized tap towards zero one step at a time until the sum fits or no optimized tap can move.
+
+    :param values: Tap vector, e.g. [pre2, pre1, main, post1, post2]
+    :type values: Sequence[float]
+    :param positions: Positions of the optimized taps in the tap vector
+    :type positions: Sequence[int]
+    :param bounds: (min, max) of each optimized tap
+    :type bounds: Sequence[Tuple[int, int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values
+    :type max_abs_sum: int
+    :return: Tap vector
+    :rtype: Tuple[int, ...]
+    """
+    result = [int(round(v)) if v is not None else None for v in values]
+    for position, (low, high) in zip(positions, bounds):
+        result[position] = min(high, max(low, result[position]))
+    while sum(abs(v) for v in result if v is not None) > max_abs_sum:
+        movable = [(position, low, high) for position, (low, high) in zip(positions, bounds) if (result[position] > 0 and result[position] - 1 >= low) or (result[position] < 0 and result[position] + 1 <= high)]
+        if len(movable) == 0:
+            break
+        position, _, _ = max(movable, key=lambda x: abs(result[x[0]]))
+        result[position] += -1 if result[position] > 0 else 1
+    return tuple(result) # type: ignore
+
+
+# *************************************************************************************
+# func: spsa_steps
+# description: Simultaneous perturbation stochastic approximation on a tap vector
+# *************************************************************************************
+def spsa_steps(start: Sequence[int], positions: Sequence[int], bounds: Sequence[Tuple[int, int]], max_abs_sum: int, config: SpsaConfig, seed: int) -> Generator[Tuple[int, ...], float, None]:
+    """Simultaneous perturbation stochastic approximation (SPSA) on the optimized taps of a tap vector. Each iteration perturbs all optimized taps at once in a random +/- direction, measures the two perturbed vectors, and moves against the gradient estimated from the two scores, so an iteration costs two measurements whatever the number of taps. The gains follow the usual decays, a_k = a / (k + 1 + A)^0.602 and c_k = c / (k + 1)^0.101, and ``a`` is calibrated on the first gradient so the first step moves the largest tap by ``config.initial_step``. Every vector is projected into the tap bounds and the tap sum limit before it is measured. The final vector is measured at the end.
+
+    This is a generator, see :func:`golden_section_line`.
+
+    :param start: Starting tap vector
+    :type start: Sequence[int]
+    :param positions: Positions of the optimized taps in the tap vector
+    :type positions: Sequence[int]
+    :param bounds: (min, max) of each optimized tap
+    :type bounds: Sequence[Tuple[int, int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values
+    :type max_abs_sum: int
+    :param config: SPSA configuration
+    :type config: SpsaConfig
+    :param seed: Seed of the random perturbation directions
+    :type seed: int
+    """
+    rng = random.Random(seed)
+    stability = 0.1 * config.iterations
+    x = [float(v) if v is not None else None for v in start]
+    gain = None
+    yield project_to_limits(x, positions, bounds, max_abs_sum)
+    for k in range(config.iterations):
+        c_k = max(1.0, config.perturbation / (k + 1) ** 0.101)
+        delta = [rng.choice((-1, 1)) for _ in positions]
+        x_plus, x_minus = list(x), list(x)
+        for position, d in zip(positions, delta):
+            x_plus[position] += c_k * d
+            x_minus[position] -= c_k * d
+        p_plus = project_to_limits(x_plus, positions, bounds, max_abs_sum)
+        p_minus = project_to_limits(x_minus, positions, bounds, max_abs_sum)
+        y_plus = yield p_plus
+        y_minus = yield p_minus
+        # the projection can shrink or cancel the perturbation of a tap, so use the actual difference
+        gradient = [(y_plus - y_minus) / (p_plus[position] - p_minus[position]) if p_plus[position] != p_minus[position] else 0.0 for position in positions]
+        largest = max(abs(g) for g in gradient)
+        if gain is None and largest > 0:
+            gain = config.initial_step * (1 + stability) ** 0.602 / largest
+        if gain is None:
+            continue
+        a_k = gain / (k + 1 + stability) ** 0.602
+        for position, (low, high), g in zip(positions, bounds, gradient):
+            x[position] = min(high, max(low, x[position] - a_k * g))
+    yield project_to_limits(x, positions, bounds, max_abs_sum)
@@ -0,0 +1,697 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import asyncio
+import heapq
+import math
+import random
+import selectors
+from types import SimpleNamespace
+from xoa_driver import enums
+from .enums import *
+from .models import SimulatorConfig, SimulatedBerSurfaceConfig, PortPair
+from .timing import count_event
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+MIN_LOG_BER = math.log10(0.5)
+ALL_PORT_SPEEDS = (10000, 25000, 40000, 50000, 100000, 200000, 400000, 800000, 1600000)    # in Mbps
+
+
+# *************************************************************************************
+# class: VirtualClockSelector
+# description: Selector that advances a virtual clock instead of blocking
+# *************************************************************************************
+class VirtualClockSelector(selectors.DefaultSelector):
+    """Selector that polls the registered file objects without blocking. When nothing is ready and the event loop waits for a timer, the virtual clock jumps to the timer instead of sleeping.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.now = 0.0
+
+    def select(self, timeout: Optional[float] = None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # nothing is scheduled, only I/O (e.g. a worker thread) can wake the loop up
+            return super().select(None)
+        self.now += timeout
+        return events
+
+
+# *************************************************************************************
+# class: VirtualTimeEventLoop
+# description: Event loop that runs in simulated time
+# *************************************************************************************
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """Event loop that runs in simulated time. ``asyncio.sleep()`` and timeouts complete as soon as no other task is ready to run, and ``loop.time()`` returns the simulated time in seconds.
+    """
+    def __init__(self) -> None:
+        self.__selector = VirtualClockSelector()
+        super().__init__(self.__selector)
+
+    def time(self) -> float:
+        return self.__selector.now
+
+
+# *************************************************************************************
+# func: run_in_virtual_time
+# description: Run a coroutine function in simulated time
+# *************************************************************************************
+async def run_in_virtual_time(coro_func: Callable[[], Awaitable[T]]) -> T:
+    """Run a coroutine function in a :class:`VirtualTimeEventLoop` on a worker thread, and wait for its result. The objects used by the coroutine must be created inside it, so they belong to the simulated event loop.
+
+    :param coro_func: Coroutine function without arguments
+    :type coro_func: Callable[[], Awaitable[T]]
+    :return: The result of the coroutine
+    :rtype: T
+    """
+    def run() -> T:
+        loop = VirtualTimeEventLoop()
+        try:
+            return loop.run_until_complete(coro_func())
+        finally:
+            loop.close()
+    return await asyncio.get_running_loop().run_in_executor(None, run)
+
+
+# *************************************************************************************
+# func: sample_poisson
+# description: Draw a sample from a Poisson distribution
+# *************************************************************************************
+def sample_poisson(rng: random.Random, lam: float) -> int:
+    """Draw a sample from a Poisson distribution, exactly for small means and with the normal approximation for large means
+    """
+    if lam <= 0:
+        return 0
+    if lam > 50:
+        return max(0, round(rng.gauss(lam, math.sqrt(lam))))
+    limit = math.exp(-lam)
+    k = 0
+    p = rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+# *************************************************************************************
+# class: BerSurface
+# description: BER of a simulated lane as a function of the equalization settings
+# *************************************************************************************
+class BerSurface:
+    """BER of a simulated lane as a function of the equalization settings. log10(BER) is a quadratic bowl around the optimum: every setting that is one width away from its optimum makes the BER 10 times worse, two widths 10^4 times worse, and so on, up to a BER of 0.5.
+    """
+    def __init__(self, config: SimulatedBerSurfaceConfig, simulator_config: SimulatorConfig, rng: random.Random) -> None:
+        spread = config.lane_spread
+        self.log_best_ber = math.log10(config.best_ber)
+        self.rx_output_eq_optimum = [min(max(value + rng.randint(-spread, spread), 0), max_value) for value, max_value in zip(config.rx_output_eq_optimum, simulator_config.rx_output_eq_max)]
+        self.rx_output_eq_width = list(config.rx_output_eq_width)
+        self.tx_input_eq_optimum = min(max(config.tx_input_eq_optimum + rng.randint(-spread, spread), 0), simulator_config.tx_input_eq_max)
+        self.tx_input_eq_width = config.tx_input_eq_width
+        self.host_txeq_optimum = [round(value + rng.uniform(-spread, spread) * width) for value, width in zip(config.host_txeq_optimum, config.host_txeq_width)]
+        self.host_txeq_width = list(config.host_txeq_width)
+
+    def log_ber(self, rx_output_eq: List[int], tx_input_eq: Optional[int], host_txeq: List[int]) -> float:
+        """log10(BER) of the lane
+
+        :param rx_output_eq: Active RX output EQ of the receiving module, [amplitude, pre, post]
+        :type rx_output_eq: List[int]
+        :param tx_input_eq: Active TX input EQ of the transmitting module, None if the module adapts its input EQ
+        :type tx_input_eq: Optional[int]
+        :param host_txeq: Host TX tap values of the transmitting port
+        :type host_txeq: List[int]
+        :return: log10(BER)
+        :rtype: float
+        """
+        distance = 0.0
+        for value, optimum, width in zip(rx_output_eq, self.rx_output_eq_optimum, self.rx_output_eq_width):
+            distance += ((value - optimum) / width) ** 2
+        if tx_input_eq is not None:
+            distance += ((tx_input_eq - self.tx_input_eq_optimum) / self.tx_input_eq_width) ** 2
+        for value, optimum, width in zip(host_txeq, self.host_txeq_optimum, self.host_txeq_width):
+            distance += ((value - optimum) / width) ** 2
+        return min(MIN_LOG_BER, self.log_best_ber + distance)
+
+
+# *************************************************************************************
+# class: SimulatedConnection
+# description: Command transport of a simulated tester
+# *************************************************************************************
+class SimulatedConnection:
+    """Command transport of a simulated tester. It has the interface that ``xoa_driver.utils.apply`` uses, so commands sent together take one round trip, as on a real tester.
+
+    The testbed executes the commands. Besides :class:`SimulatedTestbed`, it can be any object with ``command_latency``, ``round_trip_count`` and ``execute(request)``, e.g. :class:`xoa_cpom.traffic.TrafficReplay`.
+    """
+    def __init__(self, testbed: Any) -> None:
+        self.testbed = testbed
+        self.__pending: List[Tuple[Callable[[], Any], asyncio.Future]] = []
+
+    async def prepare_data(self, request: Callable[[], Any]) -> Tuple[bytes, asyncio.Future]:
+        future = asyncio.get_running_loop().create_future()
+        self.__pending.append((request, future))
+        return (b"", future)
+
+    def send(self, data: bytes) -> None:
+        pending, self.__pending = self.__pending, []
+        self.testbed.round_trip_count += 1
+        count_event("round_trip")
+        asyncio.get_running_loop().call_later(self.testbed.command_latency, self.__execute_pending, pending)
+
+    def __execute_pending(self, pending: List[Tuple[Callable[[], Any], asyncio.Future]]) -> None:
+        for request, future in pending:
+            if future.cancelled():
+                continue
+            try:
+                future.set_result(self.testbed.execute(request))
+            except Exception as e:
+                future.set_exception(e)
+
+    async def query(self, request: Callable[[], Any]) -> Any:
+        self.testbed.round_trip_count += 1
+        count_event("round_trip")
+        await asyncio.sleep(self.testbed.command_latency)
+        return self.testbed.execute(request)
+
+
+# *************************************************************************************
+# class: SimulatedToken
+# description: One command to a simulated tester
+# *************************************************************************************
+class SimulatedToken:
+    """One command to a simulated tester. Await it to send it alone, or pass several to ``xoa_driver.utils.apply`` to send them in one round trip.
+    """
+    def __init__(self, connection: SimulatedConnection, request: Callable[[], Any]) -> None:
+        self.connection = connection
+        self.request = request
+
+    def __await__(self):
+        return self.connection.query(self.request).__await__()
+
+
+class SimulatedCommand:
+    """A command with ``get()`` and ``set()``"""
+    def __init__(self, connection: SimulatedConnection, get_func: Optional[Callable[[], Any]] = None, set_func: Optional[Callable[..., Any]] = None) -> None:
+        self.connection = connection
+        self.get_func = get_func
+        self.set_func = set_func
+
+    def get(self) -> SimulatedToken:
+        if self.get_func is None:
+            raise NotImplementedError("The simulated command does not support get")
+        return SimulatedToken(self.connection, self.get_func)
+
+    def set(self, *args, **kwargs) -> SimulatedToken:
+        if self.set_func is None:
+            raise NotImplementedError("The simulated command does not support set")
+        return SimulatedToken(self.connection, lambda: self.set_func(*args, **kwargs))
+
+
+class SimulatedReservation:
+    """Reservation of a simulated module or port"""
+    def __init__(self, connection: SimulatedConnection) -> None:
+        self.connection = connection
+        self.status = enums.ReservedStatus.RELEASED
+
+    def get(self) -> SimulatedToken:
+        return SimulatedToken(self.connection, lambda: SimpleNamespace(status=self.status, operation=self.status))
+
+    def __update(self, status: enums.ReservedStatus) -> SimulatedToken:
+        def request():
+            self.status = status
+        return SimulatedToken(self.connection, request)
+
+    def set_reserve(self) -> SimulatedToken:
+        return self.__update(enums.ReservedStatus.RESERVED_BY_YOU)
+
+    def set_release(self) -> SimulatedToken:
+        return self.__update(enums.ReservedStatus.RELEASED)
+
+    def set_relinquish(self) -> SimulatedToken:
+        return self.__update(enums.ReservedStatus.RELEASED)
+
+
+class SimulatedCollection:
+    """Modules of a tester, or ports of a module, created when first obtained"""
+    def __init__(self, factory: Callable[[int], Any]) -> None:
+        self.__factory = factory
+        self.__items: Dict[int, Any] = {}
+
+    def obtain(self, index: int) -> Any:
+        if index not in self.__items:
+            self.__items[index] = self.__factory(index)
+        return self.__items[index]
+
+    def obtain_multiple(self, *indices: int) -> List[Any]:
+        return [self.obtain(index) for index in indices]
+
+    def __iter__(self):
+        return iter([self.__items[index] for index in sorted(self.__items)])
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+
+# *************************************************************************************
+# class: SimulatedLane
+# description: PRBS generator and checker of one serdes lane
+# *************************************************************************************
+class SimulatedLane:
+    """PRBS generator and checker of one serdes lane, with the host TX taps of the lane
+    """
+    def __init__(self, port: "SimulatedPort", serdes_index: int) -> None:
+        self.port = port
+        self.serdes_index = serdes_index
+        self.prbs_on = False
+        self.byte_count = 0
+        self.error_count = 0
+        self.bit_fraction = 0.0
+        self.log_ber_offset = 0.0
+        self.tap_values = list(port.testbed.config.host_txeq_default)
+        connection = port.connection
+        self.prbs = SimpleNamespace(
+            control=SimulatedCommand(connection, set_func=self.__set_prbs_control),
+            status=SimulatedCommand(connection, get_func=self.__get_prbs_status),
+        )
+        self.medium = SimpleNamespace(tx=SimpleNamespace(native=SimulatedCommand(connection, get_func=self.__get_taps, set_func=self.__set_taps)))
+
+    @property
+    def lane(self) -> int:
+        return self.serdes_index + 1
+
+    def reset(self) -> None:
+        self.prbs_on = False
+        self.byte_count = 0
+        self.error_count = 0
+        self.bit_fraction = 0.0
+        self.tap_values = list(self.port.testbed.config.host_txeq_default)
+
+    def __set_prbs_control(self, prbs_seed: int, prbs_on_off: enums.PRBSOnOff, error_on_off: enums.ErrorOnOff) -> None:
+        turn_on = prbs_on_off == enums.PRBSOnOff.PRBSON
+        if turn_on and not self.prbs_on:
+            self.port.testbed.start_window(self)
+        self.prbs_on = turn_on
+
+    def __get_prbs_status(self) -> SimpleNamespace:
+        return SimpleNamespace(byte_count=self.byte_count, error_count=self.error_count, lock=self.port.testbed.lock_status(self))
+
+    def __get_taps(self) -> SimpleNamespace:
+        return SimpleNamespace(tap_values=list(self.tap_values))
+
+    def __set_taps(self, tap_values: List[int]) -> None:
+        config = self.port.testbed.config
+        if len(tap_values) != len(config.host_txeq_default):
+            raise ValueError(f"Expected {len(config.host_txeq_default)} tap values, got {len(tap_values)}")
+        for value, min_value, max_value in zip(tap_values, config.host_txeq_min, config.host_txeq_max):
+            if not min_value <= value <= max_value:
+                raise ValueError(f"Tap values {tap_values} are out of range")
+        self.tap_values = list(tap_values)
+
+
+# *************************************************************************************
+# class: SimulatedTransceiver
+# description: CMIS memory map and state machines of a simulated transceiver
+# *************************************************************************************
+class SimulatedTransceiver:
+    """CMIS memory map and state machines of a simulated transceiver.
+
+    Host writes to the Staged Control Set (page 10h) take effect on the lanes of an Apply trigger (10h:143 or 10h:144) after ``apply_delay`` seconds, during which the ConfigStatus of the lanes (11h:202-205) is ConfigInProgress. Writing DPDeinit (10h:128) moves the Data Path state of the lanes (11h:128-131) through DPDeinit/DPInit after ``dp_state_delay`` seconds.
+    """
+    def __init__(self, port: "SimulatedPort") -> None:
+        self.port = port
+        config = port.testbed.config
+        self.memory: Dict[Tuple[int, int], int] = {}
+        # 00h:2 stepped config only = 0, both regular and hot reconfiguration supported
+        self.memory[(0x00, 2)] = 0x00
+        # 00h:129-144 vendor name, 00h:148-163 part number, 00h:166-181 serial number
+        serial_number = "".join(c for c in port.port_str if c.isalnum())[-16:]
+        for start_addr, text in ((129, config.vendor_name), (148, config.part_number), (166, serial_number)):
+            for offset, byte in enumerate(text[:16].ljust(16).encode("ascii")):
+                self.memory[(0x00, start_addr + offset)] = byte
+        # 01h:153-154 max TX input EQ, supported RX output amplitude codes, max RX output pre/post cursor
+        self.memory[(0x01, 153)] = (((1 << (config.rx_output_eq_max[0] + 1)) - 1) << 4) & 0xF0 | config.tx_input_eq_max & 0x0F
+        self.memory[(0x01, 154)] = (config.rx_output_eq_max[2] << 4) | config.rx_output_eq_max[1]
+        # 01h:161 TX input EQ host control supported, 01h:162 RX output EQ controls supported
+        self.memory[(0x01, 161)] = 0x04
+        self.memory[(0x01, 162)] = 0x1C
+        # 10h:145-152 DPConfig: AppSel 1, DataPathID 0
+        for lane in range(1, 9):
+            self.memory[(0x10, 144 + lane)] = 0x10
+        # 10h:153 adaptive TX input EQ enabled on all lanes
+        self.memory[(0x10, 153)] = 0xFF
+        self.active: Dict[int, Dict[str, Any]] = {lane: self.staged_lane_settings(lane) for lane in range(1, 9)}
+        self.dp_states: Dict[int, DataPathState] = {lane: DataPathState.DPActivated for lane in range(1, 9)}
+        self.config_statuses: Dict[int, ConfigStatus] = {lane: ConfigStatus.ConfigUndefined for lane in range(1, 9)}
+        self.access_rw_seq = self.__access_rw_seq
+
+    def nibble(self, page: int, start_addr: int, lane: int) -> int:
+        byte = self.memory.get((page, start_addr + int((lane - 1) / 2)), 0)
+        return (byte >> 4) if lane % 2 == 0 else (byte & 0x0F)
+
+    def staged_lane_settings(self, lane: int) -> Dict[str, Any]:
+        """Staged SI settings of a lane: RX output EQ [amplitude, pre, post], TX input EQ, and whether the TX input EQ is adaptive
+        """
+        return {
+            "rx_output_eq": [self.nibble(0x10, 162 + int(cursor.value) * 4, lane) for cursor in (Cursor.Amplitude, Cursor.Precursor, Cursor.Postcursor)],
+            "tx_input_eq": self.nibble(0x10, 156, lane),
+            "adaptive_tx_input_eq": bool((self.memory.get((0x10, 153), 0) >> (lane - 1)) & 0x01),
+        }
+
+    def read_byte(self, page: int, reg_addr: int) -> int:
+        if page == 0x11 and 128 <= reg_addr <= 131:
+            lane = (reg_addr - 128) * 2 + 1
+            return (int(self.dp_states[lane + 1]) << 4) | int(self.dp_states[lane])
+        if page == 0x11 and 202 <= reg_addr <= 205:
+            lane = (reg_addr - 202) * 2 + 1
+            return (int(self.config_statuses[lane + 1]) << 4) | int(self.config_statuses[lane])
+        return self.memory.get((page, reg_addr), 0)
+
+    def write_byte(self, page: int, reg_addr: int, value: int) -> None:
+        if page != 0x10:
+            # only the host-writable control page is modelled
+            return
+        if reg_addr in (143, 144):
+            self.apply(lanes=[lane for lane in range(1, 9) if value & (1 << (lane - 1))], dp_init=(reg_addr == 143))
+            return
+        if reg_addr == 128:
+            self.set_dp_deinit(value)
+        self.memory[(page, reg_addr)] = value
+
+    def apply(self, lanes: List[int], dp_init: bool) -> None:
+        testbed = self.port.testbed
+        config = testbed.config
+        for lane in lanes:
+            staged = self.staged_lane_settings(lane)
+            if dp_init and self.dp_states[lane] != DataPathState.DPDeactivated:
+                result = ConfigStatus.ConfigRejectedLanesInUse
+            elif any(value > max_value for value, max_value in zip(staged["rx_output_eq"], config.rx_output_eq_max)) or staged["tx_input_eq"] > config.tx_input_eq_max:
+                result = ConfigStatus.ConfigRejectedInvalidSI
+            else:
+                result = ConfigStatus.ConfigSuccess
+            self.config_statuses[lane] = ConfigStatus.ConfigInProgress
+            testbed.commission_count += 1
+            testbed.schedule(config.apply_delay, self.__complete_apply, lane, staged, result)
+
+    def __complete_apply(self, lane: int, staged: Dict[str, Any], result: ConfigStatus) -> None:
+        if result == ConfigStatus.ConfigSuccess:
+            self.active[lane] = staged
+        self.config_statuses[lane] = result
+
+    def set_dp_deinit(self, value: int) -> None:
+        testbed = self.port.testbed
+        for lane in range(1, 9):
+            deinit = bool(value & (1 << (lane - 1)))
+            if deinit and self.dp_states[lane] in (DataPathState.DPActivated, DataPathState.DPInit):
+                self.dp_states[lane] = DataPathState.DPDeinit
+                testbed.schedule(testbed.config.dp_state_delay, self.__set_dp_state, lane, DataPathState.DPDeactivated)
+            elif not deinit and self.dp_states[lane] in (DataPathState.DPDeactivated, DataPathState.DPDeinit):
+                self.dp_states[lane] = DataPathState.DPInit
+                testbed.schedule(testbed.config.dp_state_delay, self.__set_dp_state, lane, DataPathState.DPActivated)
+
+    def __set_dp_state(self, lane: int, state: DataPathState) -> None:
+        self.dp_states[lane] = state
+
+    def __access_rw_seq(self, page_address: int, register_address: int, byte_count: int) -> SimulatedCommand:
+        def get_func() -> SimpleNamespace:
+            self.port.testbed.cmis_read_count += 1
+            return SimpleNamespace(value="".join("{:02X}".format(self.read_byte(page_address, register_address + offset)) for offset in range(byte_count)))
+
+        def set_func(value: str) -> None:
+            self.port.testbed.cmis_write_count += 1
+            data = bytes.fromhex(value)
+            if len(data) != byte_count:
+                raise ValueError(f"Expected {byte_count} bytes, got {len(data)}")
+            for offset, byte in enumerate(data):
+                self.write_byte(page_address, register_address + offset, byte)
+        return SimulatedCommand(self.port.connection, get_func=get_func, set_func=set_func)
+
+
+# *************************************************************************************
+# class: SimulatedPort
+# description: Simulated tester port
+# *************************************************************************************
+class SimulatedPort:
+    """Simulated tester port, with the subset of the ``xoa_driver`` port API used by xoa_cpom
+    """
+    def __init__(self, module: "SimulatedModule", port_id: int) -> None:
+        self.module = module
+        self.testbed = module.testbed
+        self.connection = module.connection
+        self.kind = SimpleNamespace(module_id=module.module_id, port_id=port_id)
+        self.port_str = f"{module.tester.info.host}:{module.module_id}/{port_id}"
+        self.polynomial: Optional[enums.PRBSPolynomial] = None
+        config = self.testbed.config
+        self.lanes = [SimulatedLane(self, i) for i in range(config.serdes_count)]
+        self.reservation = SimulatedReservation(self.connection)
+        self.reset = SimulatedCommand(self.connection, set_func=self.__reset)
+        self.capabilities = SimulatedCommand(self.connection, get_func=self.__get_capabilities)
+        self.layer1 = SimpleNamespace(
+            serdes=self.lanes,
+            prbs_config=SimulatedCommand(self.connection, get_func=self.__get_prbs_config, set_func=self.__set_prbs_config),
+            pcs=SimpleNamespace(clear=SimulatedCommand(self.connection, set_func=self.__clear_counters)),
+        )
+        self.transceiver = SimulatedTransceiver(self)
+
+    @property
+    def lane_bit_rate(self) -> float:
+        return self.module.port_speed * 1e6 / len(self.lanes)
+
+    def __reset(self) -> None:
+        self.polynomial = None
+        for lane in self.lanes:
+            lane.reset()
+
+    def __get_capabilities(self) -> SimpleNamespace:
+        config = self.testbed.config
+        return SimpleNamespace(
+            max_speed=self.module.port_speed,
+            serdes_count=len(self.lanes),
+            tx_eq_tap_count=len(config.host_txeq_default),
+            num_txeq_pre=config.num_txeq_pre,
+            txeq_max_seq=list(config.host_txeq_max),
+            txeq_min_seq=list(config.host_txeq_min),
+        )
+
+    def __get_prbs_config(self) -> SimpleNamespace:
+        return SimpleNamespace(polynomial=self.polynomial)
+
+    def __set_prbs_config(self, prbs_inserted_type: enums.PRBSInsertedType, polynomial: enums.PRBSPolynomial, invert: enums.PRBSInvertState, statistics_mode: enums.PRBSStatisticsMode) -> None:
+        self.polynomial = polynomial
+
+    def __clear_counters(self) -> None:
+        for lane in self.lanes:
+            lane.byte_count = 0
+            lane.error_count = 0
+            lane.bit_fraction = 0.0
+
+
+# *************************************************************************************
+# class: SimulatedModule
+# description: Simulated tester module
+# *************************************************************************************
+class SimulatedModule:
+    """Simulated tester module. It supports every media and port speed, so the module configuration of the tests always succeeds.
+    """
+    def __init__(self, tester: "SimulatedTester", module_id: int) -> None:
+        self.tester = tester
+        self.testbed = tester.testbed
+        self.connection = tester.connection
+        self.module_id = module_id
+        self.port_speed = 400000    # Mbps
+        self.reservation = SimulatedReservation(self.connection)
+        self.ports = SimulatedCollection(lambda port_id: SimulatedPort(self, port_id))
+        self.info = SimpleNamespace(media_info_list=[
+            SimpleNamespace(cage_type=media, supported_configs=[SimpleNamespace(port_count=count, port_speed=speed) for count in (1, 2, 4, 8) for speed in ALL_PORT_SPEEDS])
+            for media in enums.MediaConfigurationType
+        ])
+        self.config = SimpleNamespace(
+            media=SimulatedCommand(self.connection, set_func=lambda media_config: None),
+            port_speed=SimulatedCommand(self.connection, set_func=self.__set_port_speed),
+        )
+
+    def __set_port_speed(self, portspeed_list: List[int]) -> None:
+        self.port_speed = portspeed_list[1]
+
+
+# *************************************************************************************
+# class: SimulatedTester
+# description: Simulated tester, used in place of testers.L23Tester
+# *************************************************************************************
+class SimulatedTester:
+    """Simulated tester, used in place of ``testers.L23Tester``
+    """
+    def __init__(self, testbed: "SimulatedTestbed", host: str) -> None:
+        self.testbed = testbed
+        self.connection = SimulatedConnection(testbed)
+        self.info = SimpleNamespace(host=host)
+        self.modules = SimulatedCollection(lambda module_id: SimulatedModule(self, module_id))
+        self.session = SimpleNamespace(logoff=self.__logoff)
+
+    async def __logoff(self) -> None:
+        pass
+
+
+# *************************************************************************************
+# class: SimulatedTestbed
+# description: Simulated testers connected by simulated links
+# *************************************************************************************
+class SimulatedTestbed:
+    """Simulated testers connected by simulated links. Each link connects the lanes of a TX port to the lanes of an RX port through the transceivers of the two ports, and the BER of a lane depends on the host TX taps of the TX port, the TX input EQ of the TX port transceiver and the RX output EQ of the RX port transceiver.
+
+    The PRBS counters of the RX lanes are advanced every time a command is executed, using the event loop time, so the test can run in real or simulated time.
+    """
+    def __init__(self, config: SimulatorConfig, port_pairs: List[PortPair]) -> None:
+        self.config = config
+        self.testers: Dict[str, SimulatedTester] = {}
+        self.links: Dict[str, str] = {port_pair.rx: port_pair.tx for port_pair in port_pairs}    # RX port to TX port
+        self.surfaces: Dict[Tuple[str, int], BerSurface] = {}
+        self.rng = random.Random(config.seed)
+        self.command_count = 0
+        self.round_trip_count = 0
+        self.cmis_read_count = 0
+        self.cmis_write_count = 0
+        self.commission_count = 0      # lanes commissioned by an Apply
+        self.prbs_lane_seconds = 0.0   # time the RX lanes received PRBS, summed over the lanes
+        self.start_time = self.now()
+        self.last_time = self.start_time
+        self.__events: List[Tuple[float, int, Callable[..., None], Tuple[Any, ...]]] = []
+        self.__event_count = 0
+        self.__last_update: Optional[float] = None
+
+    def connect(self, host: str) -> SimulatedTester:
+        """Create the simulated tester of a chassis
+
+        :param host: Chassis IP address
+        :type host: str
+        :return: The simulated tester
+        :rtype: SimulatedTester
+        """
+        if host not in self.testers:
+            self.testers[host] = SimulatedTester(self, host)
+        return self.testers[host]
+
+    def find_port(self, port_str: str) -> Optional[SimulatedPort]:
+        host, port_id = port_str.split(":")
+        if host not in self.testers:
+            return None
+        module_id, port_index = port_id.split("/")
+        return self.testers[host].modules.obtain(int(module_id)).ports.obtain(int(port_index))
+
+    def surface(self, rx_port: SimulatedPort, lane: int) -> BerSurface:
+        key = (rx_port.port_str, lane)
+        if key not in self.surfaces:
+            for surface_config in self.config.surfaces:
+                if surface_config.rx_port not in (None, rx_port.port_str) or surface_config.lane not in (None, lane):
+                    continue
+                self.surfaces[key] = BerSurface(surface_config, self.config, random.Random(f"{self.config.seed}:{rx_port.port_str}:{lane}"))
+                break
+            else:
+                raise ValueError(f"No simulated BER surface for Port {rx_port.port_str} Lane {lane}")
+        return self.surfaces[key]
+
+    def peer_lane(self, rx_lane: SimulatedLane) -> Optional[SimulatedLane]:
+        tx_port_str = self.links.get(rx_lane.port.port_str)
+        if tx_port_str is None:
+            return None
+        tx_port = self.find_port(tx_port_str)
+        if tx_port is None:
+            return None
+        return tx_port.lanes[rx_lane.serdes_index]
+
+    def log_ber(self, rx_lane: SimulatedLane, tx_lane: SimulatedLane) -> float:
+        """log10(BER) of a lane, without noise
+        """
+        rx_port = rx_lane.port
+        tx_port = tx_lane.port
+        lane = rx_lane.lane
+        if rx_port.polynomial != tx_port.polynomial:
+            return MIN_LOG_BER
+        if rx_port.transceiver.dp_states[lane] != DataPathState.DPActivated or tx_port.transceiver.dp_states[lane] != DataPathState.DPActivated:
+            return MIN_LOG_BER
+        rx_settings = rx_port.transceiver.active[lane]
+        tx_settings = tx_port.transceiver.active[lane]
+        tx_input_eq = None if tx_settings["adaptive_tx_input_eq"] else tx_settings["tx_input_eq"]
+        return self.surface(rx_port, lane).log_ber(rx_settings["rx_output_eq"], tx_input_eq, tx_lane.tap_values)
+
+    def lock_status(self, rx_lane: SimulatedLane) -> enums.PRBSLockStatus:
+        tx_lane = self.peer_lane(rx_lane)
+        if tx_lane is None or not tx_lane.prbs_on:
+            return enums.PRBSLockStatus.PRBSOFF
+        if self.log_ber(rx_lane, tx_lane) + rx_lane.log_ber_offset > -3:
+            return enums.PRBSLockStatus.PRBSONUNSTABLE
+        return enums.PRBSLockStatus.PRBSON
+
+    def start_window(self, tx_lane: SimulatedLane) -> None:
+        """Draw the noise of the PRBS window that starts on a TX lane
+        """
+        for rx_port_str, tx_port_str in self.links.items():
+            if tx_port_str != tx_lane.port.port_str:
+                continue
+            rx_port = self.find_port(rx_port_str)
+            if rx_port is not None:
+                rx_port.lanes[tx_lane.serdes_index].log_ber_offset = self.rng.gauss(0.0, self.config.noise)
+
+    def schedule(self, delay: float, callback: Callable[..., None], *args: Any) -> None:
+        """Schedule a state change of the simulated hardware
+        """
+        self.__event_count += 1
+        heapq.heappush(self.__events, (self.now() + delay, self.__event_count, callback, args))
+
+    def now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    @property
+    def command_latency(self) -> float:
+        return self.config.command_latency
+
+    @property
+    def elapsed(self) -> float:
+        """Time from the creation of the testbed to the last command, in seconds of the event loop clock
+        """
+        return self.last_time - self.start_time
+
+    def advance(self, until: float) -> None:
+        """Count the PRBS bits and errors received since the last update
+        """
+        if self.__last_update is None:
+            self.__last_update = until
+        if until <= self.__last_update:
+            return
+        elapsed = until - self.__last_update
+        self.__last_update = until
+        for rx_port_str in self.links:
+            rx_port = self.find_port(rx_port_str)
+            if rx_port is None:
+                continue
+            for rx_lane in rx_port.lanes:
+                tx_lane = self.peer_lane(rx_lane)
+                if tx_lane is None or not tx_lane.prbs_on:
+                    continue
+                self.prbs_lane_seconds += elapsed
+                bits = rx_port.lane_bit_rate * elapsed + rx_lane.bit_fraction
+                whole_bytes = int(bits / 8)
+                rx_lane.bit_fraction = bits - whole_bytes * 8
+                ber = min(0.5, 10 ** (self.log_ber(rx_lane, tx_lane) + rx_lane.log_ber_offset))
+                rx_lane.byte_count += whole_bytes
+                rx_lane.error_count += sample_poisson(self.rng, ber * whole_bytes * 8)
+
+    def settle(self) -> None:
+        """Bring the simulated hardware up to the current time: run the due state changes in order, and count the PRBS bits and errors in between
+        """
+        now = self.now()
+        self.last_time = now
+        while len(self.__events) > 0 and self.__events[0][0] <= now:
+            when, _, callback, args = heapq.heappop(self.__events)
+            self.advance(when)
+            callback(*args)
+        self.advance(now)
+
+    def execute(self, request: Callable[[], Any]) -> Any:
+        """Execute one command on the simulated hardware
+        """
+        self.command_count += 1
+        self.settle()
+        return request()
@@ -7,16 +7,40 @@ from xoa_driver import testers, modules, ports, enums
 from xoa_driver.hlfuncs import mgmt
 from xoa_cpom.utils import *
 from xoa_cpom.cmisfuncs import *
+from ..search_engines import *
+from ..sweep_planner import *
 from ..models import *
 from ..enums import *
 from ..reportgen import *
 from ..prbs_control import *
 from ..txeq_control import *
-from typing import List, Dict, Set
+from ..timing import span, phase_sleep
+from ..result_store import ResultStore, SubtestResults, test_condition
+from ..measurement import EvidenceMemo
+from typing import List, Dict, Set, Tuple, Any, Optional, Callable, Awaitable
+from dataclasses import dataclass
 
 import logging
 import copy
 
+
+# *************************************************************************************
+# class: HostTxEqPortPair
+# description: A port pair prepared for a search of the host TX EQ
+# *************************************************************************************
+@dataclass
+class HostTxEqPortPair:
+    """A port pair prepared for a search of the host TX EQ, with PRBS configured and the starting Tx Eq values written to the lanes, see :meth:`XenaHostTxEqOptimization.host_txeq_search_on_port_pair`
+    """
+    tx_port: FreyaEdunPort
+    rx_port: FreyaEdunPort
+    tx_port_txt: str                    # e.g. "Port 0/1"
+    name: str                           # port pair name in the report
+    module_identity: Optional[ModuleIdentity]
+    prbs_duration: float                # full PRBS duration in seconds
+    port_txeq_limits: PortTxEqLimits
+    start_txeq_dicts: List[Dict[str, Any]]  # Tx Eq values read back from the lanes after writing the starting values, see :func:`read_txeq_from_lanes`
+
 # *************************************************************************************
 # class: XenaHostTxEqOptimization
 # description: This class provides an automated optimization framework that uses 
@@ -27,15 +51,21 @@ class XenaHostTxEqOptimization:
     """
     This class provides an automated optimization framework that uses PRBS-based BER testing to test Host Tx Equalization for the best possible signal integrity.
     """
-    def __init__(self, tester_objs: List[testers.L23Tester], test_config: HostTxEqTestConfig, logger_name: str, report_filename: str):
+    def __init__(self, tester_objs: List[testers.L23Tester], test_config: HostTxEqTestConfig, logger_name: str, report_filename: str, result_store: Optional[ResultStore] = None, report_writer: ReportWriterConfig = ReportWriterConfig()):
         self.tester_objs = tester_objs
         self.test_config = test_config
         self.logger_name = logger_name
         self.report_filename = report_filename
         self.report_gen = HostTxEqTestReportGenerator(
             logger_name=self.logger_name, 
+            filename=self.report_filename,
+            writer_config=report_writer,
+            port_pair_column=self.concurrency.enable and len(self.port_pair_list) > 1,
             name="Host Tx EQ Test", 
             chassis_list=[tester_obj.info.host for tester_obj in self.tester_objs])        
+        self.results = SubtestResults(result_store, "host_tx_eq", test_condition(test_config.module_media, test_config.port_speed, test_config.prbs_config.polynomial))
+        # errors and bits of every setting measured in the run, pooled when a search comes back to a setting
+        self.evidence = EvidenceMemo(test_config.evidence_pooling.confidence) if test_config.evidence_pooling.enable else None
 
         logger = logging.getLogger(self.logger_name)
         logger.info(f"=============== Host Tx Equalization Optimization Test ===============")
@@ -45,11 +75,15 @@ class XenaHostTxEqOptimization:
         logger.info(f"  Delay After Reset:    {self.delay_after_reset} seconds")
         logger.info(f"  Delay After EQ Write: {self.delay_after_eq_write} seconds")
         logger.info(f"  PRBS Polynomial:      {self.prbs_polynomial.name}")
-        logger.info(f"  PRBS Duration:        {self.prbs_duration} seconds")
+        logger.info(f"  PRBS Duration:        {describe_prbs_duration(self.test_config.prbs_config, self.target_ber)}")
+        logger.info(f"  PRBS Measurement:     {self.prbs_measurement_mode}")
         logger.info(f"  Target BER:           {self.target_ber}")
         logger.info(f"  Start Tx Eq Values:   {self.start_txeq_values}")
         logger.info(f"  Optimize Mode:        {self.optimize_mode}")
         logger.info(f"  Optimize Tx Eq Ids:   {self.optimize_txeq_ids}")
+        logger.info(f"  Concurrent Pairs:     {self.concurrency.enable}")
+        logger.info(f"  Early Stop:           {self.early_stop.enable}")
+        logger.info(f"  Evidence Pooling:     {self.test_config.evidence_pooling.enable}")
     
     @property
     def port_pair_list(self):
@@ -100,12 +134,16 @@ class XenaHostTxEqOptimization:
     def prbs_polynomial(self) -> enums.PRBSPolynomial:
         return enums.PRBSPolynomial[self.test_config.prbs_config.polynomial]
 
+    @property
+    def prbs_measurement_mode(self) -> str:
+        return self.test_config.prbs_config.measurement_mode
+
     @property
     def delay_after_eq_write(self) -> int:
         return self.test_config.delay_after_eq_write
 
     @property
-    def prbs_duration(self) -> int:
+    def prbs_duration(self) -> Optional[int]:
         return self.test_config.prbs_config.duration
     
     @property
@@ -125,6 +163,32 @@ class XenaHostTxEqOptimization:
     def optimize_txeq_ids(self) -> List[int]:
         return self.test_config.optimize_txeq_ids
     
+    @property
+    def successive_halving(self) -> SuccessiveHalvingConfig:
+        return self.test_config.successive_halving
+    
+    @property
+    def spsa(self) -> SpsaConfig:
+        return self.test_config.spsa
+    
+    @property
+    def joint_sweep(self) -> HostTxEqJointSweepConfig:
+        return self.test_config.joint_sweep
+    
+    @property
+    def concurrency(self) -> ConcurrencyConfig:
+        return self.test_config.concurrency
+
+    @property
+    def early_stop(self) -> EarlyStopConfig:
+        return self.test_config.early_stop
+    
+    def log_evidence_pooling(self) -> None:
+        if self.evidence is None:
+            return
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Evidence pooling: {self.evidence.served_count} lane measurements served from earlier visits, {self.evidence.topped_up_count} topped up")
+
     async def config_modules(self):
         for chassis_ip, module_ids in self.chassis_modules_dict.items():
             module_str_configs = []
@@ -141,6 +205,64 @@ class XenaHostTxEqOptimization:
             return False
         return True
     
+    async def host_txeq_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort], search: Callable[["HostTxEqPortPair"], Awaitable[None]]):
+        """Prepare a port pair for a search of the host TX EQ, run the search, and stop PRBS after it. The port pair is reserved and reset, PRBS is configured and the starting Tx Eq values are written to the lanes, from the best stored setting of the part number if the result store has one.
+        """
+        logger = logging.getLogger(self.logger_name)
+        tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
+        rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
+        tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
+        rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+
+        logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
+        logger.info(f"Reserving and reseting port pair")
+        with span("reserve_reset"):
+            await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
+        logger.info(f"Delay after reset: {self.delay_after_reset}s")
+        await phase_sleep("reset_delay", self.delay_after_reset)
+        prbs_duration = await get_prbs_duration(rx_port_obj, self.test_config.prbs_config, self.port_speed, self.logger_name, default_target_ber=self.target_ber)
+
+        port_txeq_limits = await get_port_txeq_limits(tx_port_obj)
+
+        # setup report record structure
+        self.report_gen.setup(
+            port_name=f"{tx_port_txt} -> {rx_port_txt}",
+            num_tx_taps=port_txeq_limits.num_txeq,
+            num_txtaps_pre=port_txeq_limits.num_txeq_pre,
+            num_txtaps_post=port_txeq_limits.num_txeq_post
+        )
+
+        # configure prbs
+        await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
+        module_identity = await self.results.identify(tx_port_obj)
+        # start from the best stored setting of the part number, if the result store has one
+        start_txeq_values = list(self.results.warm_start(module_identity) or self.start_txeq_values)
+        if self.prbs_measurement_mode == "continuous":
+            await start_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+
+        # load preset tap values
+        logger.info(f"Writing starting Tx Eq values: {start_txeq_values}")
+        await write_txeq_to_lanes(tx_port_obj, [(lane, start_txeq_values) for lane in self.lanes], self.delay_after_eq_write, self.logger_name)
+        start_txeq_dicts = await read_txeq_from_lanes(tx_port_obj, lanes=self.lanes)
+
+        await search(HostTxEqPortPair(
+            tx_port=tx_port_obj,
+            rx_port=rx_port_obj,
+            tx_port_txt=tx_port_txt,
+            name=f"{tx_port_txt} -> {rx_port_txt}",
+            module_identity=module_identity,
+            prbs_duration=prbs_duration,
+            port_txeq_limits=port_txeq_limits,
+            start_txeq_dicts=start_txeq_dicts))
+        if self.prbs_measurement_mode == "continuous":
+            await stop_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+
+    def record_readings(self, port_pair: "HostTxEqPortPair", lane_ber_dicts: List[Dict[str, Any]], txeq_dicts: List[Dict[str, Any]]) -> None:
+        """Save the readings of a measurement to the report and to the result store
+        """
+        self.report_gen.record_data(port_name=port_pair.name, lane_ber_dicts=lane_ber_dicts, lane_txeqs_dicts=txeq_dicts)
+        self.results.record(port_pair.module_identity, {item["lane"]: item["txeq_values"] for item in txeq_dicts}, lane_ber_dicts)
+
     async def heuristic_search(self, port_pair_list: List[Dict[str, str]]):
         logger = logging.getLogger(self.logger_name)
         logger.info(f"Heuristic search started")
@@ -148,74 +270,44 @@ class XenaHostTxEqOptimization:
         # Get port pair objects list from port pair list
         port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)  
 
-        # heuristic search per port pair
-        for port_pair_obj in port_pair_obj_list:
-            tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
-            rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
-            tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
-            rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.heuristic_search_on_port_pair, self.concurrency, self.logger_name)
+        self.log_evidence_pooling()
 
-            logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
-            logger.info(f"Reserving and reseting port pair")
-            await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
-            logger.info(f"Delay after reset: {self.delay_after_reset}s")
-            await asyncio.sleep(self.delay_after_reset)
-
-            port_txeq_limits = await get_port_txeq_limits(tx_port_obj)
-
-            # setup report record structure
-            self.report_gen.setup(
-                num_tx_taps=port_txeq_limits.num_txeq,
-                num_txtaps_pre=port_txeq_limits.num_txeq_pre,
-                num_txtaps_post=port_txeq_limits.num_txeq_post
-            )
-
-            # configure prbs
-            await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
 
-            # load preset tap values
-            logger.info(f"Writing starting Tx Eq values")
-            await write_txeq_to_lanes(tx_port_obj, [(lane, self.start_txeq_values) for lane in self.lanes], self.delay_after_eq_write, self.logger_name)
-
-            # clear counters
-            await clear_prbs_counters(rx_port_obj, self.logger_name)
+    async def heuristic_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
 
-            # run prbs on lanes
-            await run_prbs_on_lanes(tx_port_obj, self.lanes, self.prbs_duration, self.logger_name)
-            
-            # read current PRBS BER and current TxEqs
-            lane_ber_dicts = await read_ber_from_lanes(port=rx_port_obj, lanes=self.lanes, logger_name=self.logger_name)
-            txeq_dicts = await read_txeq_from_lanes(tx_port_obj, lanes=self.lanes)
+        async def search(port_pair: HostTxEqPortPair) -> None:
+            # measure PRBS BER at the starting Tx Eq values
+            txeq_dicts = port_pair.start_txeq_dicts
+            lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence, early_stop=self.early_stop, target_ber=self.target_ber)
 
             # save reading to report
-            self.report_gen.record_data(port_name=f"{tx_port_txt} -> {rx_port_txt}", lane_ber_dicts=lane_ber_dicts, lane_txeqs_dicts=txeq_dicts)
+            self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
 
             # remove lanes and their ber reading that already meet target ber
             lane_ber_dicts = get_below_target_lane_ber_dicts(lane_ber_dicts, self.target_ber, self.logger_name)
             lanes_to_optimize = [item["lane"] for item in lane_ber_dicts]
             best_lane_ber_dicts = copy.deepcopy(lane_ber_dicts)
-            
+
             for txeq_id in self.optimize_txeq_ids:
                 while len(lanes_to_optimize) > 0:
                     logger.info(f"## Optimizing c({txeq_id}) on Lanes {lanes_to_optimize} ##")
                     # adjust txeq on lanes, and update lanes to optimize
-                    lanes_to_optimize = await optimize_txeq_on_lanes(tx_port_obj, lanes_to_optimize, txeq_id, "inc", self.delay_after_eq_write, self.logger_name, port_txeq_limits)
+                    lanes_to_optimize = await optimize_txeq_on_lanes(port_pair.tx_port, lanes_to_optimize, txeq_id, "inc", self.delay_after_eq_write, self.logger_name, port_pair.port_txeq_limits)
                     if len(lanes_to_optimize) == 0:
                         logger.info(f"No lane to optimize. Quit optimization.")
                         break
-                
-                    # clear counters
-                    await clear_prbs_counters(rx_port_obj, self.logger_name)
 
-                    # run prbs on lanes
-                    await run_prbs_on_lanes(tx_port_obj, lanes_to_optimize, self.prbs_duration, self.logger_name)
+                    # read current TxEqs, and measure PRBS BER
+                    txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=lanes_to_optimize)
+                    lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence, early_stop=self.early_stop, incumbent_lane_ber_dicts=best_lane_ber_dicts, target_ber=self.target_ber)
 
-                    # read current PRBS BER and current TxEqs
-                    lane_ber_dicts = await read_ber_from_lanes(port=rx_port_obj, lanes=lanes_to_optimize, logger_name=self.logger_name)
-                    txeq_dicts = await read_txeq_from_lanes(tx_port_obj, lanes=lanes_to_optimize)
-                    
                     # save result to report
-                    self.report_gen.record_data(port_name=f"{tx_port_txt} -> {rx_port_txt}", lane_ber_dicts=lane_ber_dicts, lane_txeqs_dicts=txeq_dicts)
+                    self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
 
                     # determine lanes to continue optimization
                     lane_ber_dicts = get_below_target_lane_ber_dicts(lane_ber_dicts, self.target_ber, self.logger_name)
@@ -226,20 +318,17 @@ class XenaHostTxEqOptimization:
                         break
                     worsen_lane_ber_dict = get_worsen_lane_ber_dicts(lane_ber_dicts, best_lane_ber_dicts, self.logger_name)
                     best_lane_ber_dicts = update_best_lane_ber_dicts(lane_ber_dicts, best_lane_ber_dicts)
-                    await optimize_txeq_on_lanes(tx_port_obj, [int(item["lane"]) for item in worsen_lane_ber_dict], txeq_id, "dec", self.delay_after_eq_write, self.logger_name, port_txeq_limits)
-                
+                    await optimize_txeq_on_lanes(port_pair.tx_port, [int(item["lane"]) for item in worsen_lane_ber_dict], txeq_id, "dec", self.delay_after_eq_write, self.logger_name, port_pair.port_txeq_limits)
+
             # check if any lane did not meet target ber
-            await clear_prbs_counters(rx_port_obj, self.logger_name)
-            await run_prbs_on_lanes(tx_port_obj, self.lanes, self.prbs_duration, self.logger_name)
-            lane_ber_dicts = await read_ber_from_lanes(port=rx_port_obj, lanes=self.lanes, logger_name=self.logger_name)
+            txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=self.lanes)
+            lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence, early_stop=self.early_stop, target_ber=self.target_ber)
             lane_ber_dicts = get_below_target_lane_ber_dicts(lane_ber_dicts, self.target_ber, self.logger_name)
             for lane_ber_dict in lane_ber_dicts:
                 logger.warning(f"Lane ({lane_ber_dict['lane']}) did not meet target BER {self.target_ber}. Final BER: {lane_ber_dict['prbs_ber']}")
-            
-            # Generate report
-            logger.info(f"Generatinging test report..")
-            self.report_gen.generate_report(self.report_filename)
 
+        await self.host_txeq_search_on_port_pair(port_pair_obj, search)
+        
     async def exhaustive_search(self, port_pair_list: List[Dict[str, str]]):
         logger = logging.getLogger(self.logger_name)
         logger.info(f"Exhaustive search started")
@@ -247,48 +336,28 @@ class XenaHostTxEqOptimization:
         # Get port pair objects list from port pair list
         port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)  
 
-        # heuristic search per port pair
-        for port_pair_obj in port_pair_obj_list:
-            tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
-            rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
-            tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
-            rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
-
-            logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
-            logger.info(f"Reserving and reseting port pair")
-            await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
-            logger.info(f"Delay after reset: {self.delay_after_reset}s")
-            await asyncio.sleep(self.delay_after_reset)
-            
-            result_on_lanes = []
-            port_txeq_limits = await get_port_txeq_limits(tx_port_obj)
-
-            # setup report record structure
-            self.report_gen.setup(
-                num_tx_taps=port_txeq_limits.num_txeq,
-                num_txtaps_pre=port_txeq_limits.num_txeq_pre,
-                num_txtaps_post=port_txeq_limits.num_txeq_post
-            )
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.exhaustive_search_on_port_pair, self.concurrency, self.logger_name)
+        self.log_evidence_pooling()
 
-            # configure prbs
-            await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
 
-            # load preset tap values
-            logger.info(f"Writing starting Tx Eq values")
-            await write_txeq_to_lanes(tx_port_obj, [(lane, self.start_txeq_values) for lane in self.lanes], self.delay_after_eq_write, self.logger_name)
+    async def exhaustive_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
 
-            # clear counters
-            await clear_prbs_counters(rx_port_obj, self.logger_name)
+        async def search(port_pair: HostTxEqPortPair) -> None:
+            result_on_lanes = []
 
-            # run prbs on lanes
-            await run_prbs_on_lanes(tx_port_obj, self.lanes, self.prbs_duration, self.logger_name)
-            
-            # read current PRBS BER and current TxEqs
-            lane_ber_dicts = await read_ber_from_lanes(port=rx_port_obj, lanes=self.lanes, logger_name=self.logger_name)
-            txeq_dicts = await read_txeq_from_lanes(tx_port_obj, lanes=self.lanes)
+            # measure PRBS BER at the starting Tx Eq values
+            txeq_dicts = port_pair.start_txeq_dicts
+            lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence)
 
             # save reading to report
-            self.report_gen.record_data(port_name=f"{tx_port_txt} -> {rx_port_txt}", lane_ber_dicts=lane_ber_dicts, lane_txeqs_dicts=txeq_dicts)
+            self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
+
+            # the best reading of each lane so far, used as incumbent by early stop
+            best_lane_ber_dicts = copy.deepcopy(lane_ber_dicts)
 
             sorted_lane_ber_dicts = sorted(lane_ber_dicts, key=lambda x: x["lane"])
             sorted_txeq_dicts = sorted(txeq_dicts, key=lambda x: x["lane"])
@@ -300,29 +369,24 @@ class XenaHostTxEqOptimization:
                 keep_optimizing = True
                 while keep_optimizing:
                     lanes_to_optimize = []
-                    lanes_to_optimize = await optimize_txeq_on_lanes(tx_port_obj, self.lanes, txeq_id, "inc", self.delay_after_eq_write, self.logger_name, port_txeq_limits)
+                    lanes_to_optimize = await optimize_txeq_on_lanes(port_pair.tx_port, self.lanes, txeq_id, "inc", self.delay_after_eq_write, self.logger_name, port_pair.port_txeq_limits)
 
                     if len(lanes_to_optimize) == 0:
                         logger.info(f"No lane to optimize for c({txeq_id})")
                         keep_optimizing = False
                         continue
 
-                    # clear counters
-                    await clear_prbs_counters(rx_port_obj, self.logger_name)
-
-                    # run prbs on lanes
-                    await run_prbs_on_lanes(tx_port_obj, self.lanes, self.prbs_duration, self.logger_name)
-
-                    # read current PRBS BER and current TxEqs
-                    lane_ber_dicts = await read_ber_from_lanes(port=rx_port_obj, lanes=self.lanes, logger_name=self.logger_name)
-                    txeq_dicts = await read_txeq_from_lanes(tx_port_obj, lanes=self.lanes)
+                    # read current TxEqs, and measure PRBS BER
+                    txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=self.lanes)
+                    lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence, early_stop=self.early_stop, incumbent_lane_ber_dicts=best_lane_ber_dicts)
 
                     # save result to report
-                    self.report_gen.record_data(port_name=f"{tx_port_txt} -> {rx_port_txt}", lane_ber_dicts=lane_ber_dicts, lane_txeqs_dicts=txeq_dicts)
+                    self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
                     sorted_lane_ber_dicts = sorted(lane_ber_dicts, key=lambda x: x["lane"])
                     sorted_txeq_dicts = sorted(txeq_dicts, key=lambda x: x["lane"])
                     for lane_ber_dict, txeq_dict in zip(sorted_lane_ber_dicts, sorted_txeq_dicts):
                         result_on_lanes.append({"lane": lane_ber_dict["lane"], "tx_eq": txeq_dict["txeq_values"], "prbs_ber": lane_ber_dict["prbs_ber"]})
+                    best_lane_ber_dicts = update_best_lane_ber_dicts(lane_ber_dicts, best_lane_ber_dicts)
 
                 # write the best tap values to lanes as the starting point for next iteration
                 lane_txeq_list = []
@@ -337,11 +401,7 @@ class XenaHostTxEqOptimization:
                         lane_txeq_list.append((lane, sorted_result[0]['tx_eq']))
                     else:
                         logger.info(f"Lane ({lane}): No result found")
-                await write_txeq_to_lanes(tx_port_obj, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
-            
-            # Generate report
-            logger.info(f"Generatinging test report..")
-            self.report_gen.generate_report(self.report_filename)
+                await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
 
             # write the final best result to lanes
             logger.info(f"[Final Result]")
@@ -357,9 +417,270 @@ class XenaHostTxEqOptimization:
                     lane_txeq_list.append((lane, sorted_result[0]['tx_eq']))
                 else:
                     logger.info(f"Lane ({lane}): No result found")
-            await write_txeq_to_lanes(tx_port_obj, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+            await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+
+        await self.host_txeq_search_on_port_pair(port_pair_obj, search)
             
     
+    async def successive_halving_search(self, port_pair_list: List[Dict[str, str]]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Successive halving search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)  
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.successive_halving_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def successive_halving_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: HostTxEqPortPair) -> None:
+            port_txeq_limits = port_pair.port_txeq_limits
+            current_polynomial = self.prbs_polynomial
+
+            # the starting tap values are the best tap values of each lane
+            best_txeqs = {item["lane"]: list(item["txeq_values"]) for item in port_pair.start_txeq_dicts}
+            best_bers: Dict[int, Optional[float]] = {lane: None for lane in self.lanes}
+
+            async def prepare_rung(rung: Rung) -> None:
+                nonlocal current_polynomial
+                if rung.polynomial != current_polynomial:
+                    await switch_prbs_polynomial(port_pair.tx_port, port_pair.rx_port, self.lanes, rung.polynomial, self.prbs_measurement_mode, self.logger_name)
+                    current_polynomial = rung.polynomial
+
+            for txeq_id in self.optimize_txeq_ids:
+                try:
+                    txeq_position = port_txeq_limits.txeq_position(txeq_id)
+                except ValueError as e:
+                    logger.warning(f"c({txeq_id}) is not supported by {port_pair.tx_port_txt}: {e}")
+                    continue
+                txeq_min, txeq_max = port_txeq_limits.txeq_range(txeq_id)
+                logger.info(f"## Optimizing c({txeq_id}) in [{txeq_min}, {txeq_max}] on Lanes {self.lanes} ##")
+
+                async def evaluate(txeq_value: int, lanes: List[int], rung: Rung) -> Dict[int, float]:
+                    # the best tap values of each lane, with the optimized tap replaced
+                    lane_txeq_list = []
+                    for lane in lanes:
+                        _txeq_values = list(best_txeqs[lane])
+                        _txeq_values[txeq_position] = txeq_value
+                        if sum(abs(x) for x in _txeq_values if x is not None) > port_txeq_limits.max_txeq_sum:
+                            logger.info(f"Lane ({lane}): c({txeq_id}) = {txeq_value} exceeds the tap value sum limit ({port_txeq_limits.max_txeq_sum}). Skip.")
+                            continue
+                        lane_txeq_list.append((lane, _txeq_values))
+                    if len(lane_txeq_list) == 0:
+                        return {}
+                    await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+
+                    # measure PRBS BER, and read current TxEqs
+                    measure_lanes = [lane for lane, _ in lane_txeq_list]
+                    lane_ber_dicts = await measure_prbs_ber(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lanes=measure_lanes, duration=rung.duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, lane_settings=dict(lane_txeq_list))
+                    if rung.is_final:
+                        # only the final round has the full measurement quality, so only it goes to the report
+                        txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=measure_lanes)
+                        self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
+                    return {lane_ber_dict["lane"]: lane_ber_dict["prbs_ber"] for lane_ber_dict in lane_ber_dicts}
+
+                # the tap range is sampled with an even step through the best value of each lane so far
+                candidates = sorted(set(value for lane in self.lanes for value in plan_tap_values(txeq_min, txeq_max, best_txeqs[lane][txeq_position], self.successive_halving.max_tap_values)))
+                logger.info(f"c({txeq_id}): {len(candidates)} values {candidates}")
+                results = await successive_halving(candidates=candidates, lanes=self.lanes, evaluate=evaluate, config=self.successive_halving, final_duration=port_pair.prbs_duration, final_polynomial=self.prbs_polynomial, logger_name=self.logger_name, prepare_rung=prepare_rung, overhead=self.delay_after_eq_write + prbs_measurement_overhead(self.prbs_measurement_mode))
+
+                # keep the best value of the tap as the starting point for the next tap
+                for lane in self.lanes:
+                    if len(results[lane]) > 0:
+                        best_txeqs[lane][txeq_position] = results[lane][0][0]
+                        best_bers[lane] = results[lane][0][1]
+                        logger.info(f"Lane ({lane}) - Best result: Host Tx Eq: {best_txeqs[lane]}, PRBS BER: {best_bers[lane]}")
+                    else:
+                        logger.info(f"Lane ({lane}): No result found")
+
+            # write the final best result to lanes
+            logger.info(f"[Final Result]")
+            for lane in self.lanes:
+                logger.info(f"Lane ({lane}) - Host Tx Eq: {best_txeqs[lane]}, PRBS BER: {best_bers[lane]}")
+                if best_bers[lane] is not None and best_bers[lane] > self.target_ber:
+                    logger.warning(f"Lane ({lane}) did not meet target BER {self.target_ber}. Final BER: {best_bers[lane]}")
+            logger.info(f"Writing the best result to Host Tx Eq as final result")
+            await write_txeq_to_lanes(port_pair.tx_port, [(lane, best_txeqs[lane]) for lane in self.lanes], self.delay_after_eq_write, self.logger_name)
+
+        await self.host_txeq_search_on_port_pair(port_pair_obj, search)
+    
+    async def spsa_search(self, port_pair_list: List[Dict[str, str]]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"SPSA search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)  
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.spsa_search_on_port_pair, self.concurrency, self.logger_name)
+        self.log_evidence_pooling()
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def spsa_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: HostTxEqPortPair) -> None:
+            port_txeq_limits = port_pair.port_txeq_limits
+
+            # the taps to optimize, with their position in the tap value list and their range
+            positions = []
+            bounds = []
+            for txeq_id in self.optimize_txeq_ids:
+                try:
+                    positions.append(port_txeq_limits.txeq_position(txeq_id))
+                    bounds.append(port_txeq_limits.txeq_range(txeq_id))
+                except ValueError as e:
+                    logger.warning(f"c({txeq_id}) is not supported by {port_pair.tx_port_txt}: {e}")
+            if len(positions) == 0:
+                logger.warning(f"No Tx Eq to optimize on {port_pair.tx_port_txt}")
+                return
+            logger.info(f"Optimizing Tx Eq positions {positions} in {bounds}, tap value sum limit {port_txeq_limits.max_txeq_sum}")
+
+            # the starting tap values are the starting point
+            start_txeqs = {item["lane"]: tuple(item["txeq_values"]) for item in port_pair.start_txeq_dicts}
+
+            async def evaluate(lane_txeqs: Dict[int, Tuple[int, ...]]) -> Dict[int, Dict[str, Any]]:
+                await write_txeq_to_lanes(port_pair.tx_port, [(lane, list(txeq_values)) for lane, txeq_values in lane_txeqs.items()], self.delay_after_eq_write, self.logger_name)
+
+                # read current TxEqs, and measure PRBS BER
+                lanes = list(lane_txeqs.keys())
+                txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=lanes)
+                lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence)
+
+                # save result to report
+                self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
+                return {lane_ber_dict["lane"]: lane_ber_dict for lane_ber_dict in lane_ber_dicts}
+
+            results = await run_lane_searches(lanes=self.lanes, make_search=lambda lane: spsa_steps(start_txeqs[lane], positions, bounds, port_txeq_limits.max_txeq_sum, self.spsa, self.spsa.seed + lane), evaluate=evaluate, logger_name=self.logger_name)
+
+            # write the final best result to lanes
+            logger.info(f"[Final Result]")
+            lane_txeq_list = []
+            for lane in self.lanes:
+                if len(results[lane]) > 0:
+                    txeq_values, prbs_ber = results[lane][0]
+                    logger.info(f"Lane ({lane}) - Best result: Host Tx Eq: {list(txeq_values)}, PRBS BER: {prbs_ber}")
+                    if prbs_ber > self.target_ber:
+                        logger.warning(f"Lane ({lane}) did not meet target BER {self.target_ber}. Final BER: {prbs_ber}")
+                    lane_txeq_list.append((lane, list(txeq_values)))
+                else:
+                    logger.info(f"Lane ({lane}): No result found")
+            logger.info(f"Writing the best result to Host Tx Eq as final result")
+            await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+
+        await self.host_txeq_search_on_port_pair(port_pair_obj, search)
+    
+    async def joint_exhaustive_search(self, port_pair_list: List[Dict[str, str]]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Joint exhaustive search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)  
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.joint_exhaustive_search_on_port_pair, self.concurrency, self.logger_name)
+        self.log_evidence_pooling()
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    def plan_joint_sweep_axes(self, port_txeq_limits: PortTxEqLimits, logger_name: str) -> Tuple[List[int], List[List[int]]]:
+        """Get the positions and the values of the taps of ``optimize_txeq_ids`` in a joint sweep, from the port limits and ``joint_sweep.tap_ranges``. A tap that the port does not support, or whose tap range is outside the port range, is left out of the sweep and keeps its start value.
+        """
+        logger = logging.getLogger(logger_name)
+        tap_ranges = {item.txeq_id: item for item in self.joint_sweep.tap_ranges}
+        positions = []
+        axes = []
+        for txeq_id in self.optimize_txeq_ids:
+            try:
+                position = port_txeq_limits.txeq_position(txeq_id)
+                txeq_min, txeq_max = port_txeq_limits.txeq_range(txeq_id)
+            except ValueError as e:
+                logger.warning(f"c({txeq_id}) is not supported by the port: {e}")
+                continue
+            step = 1
+            if txeq_id in tap_ranges:
+                # a sub-range is clipped to the port range
+                if tap_ranges[txeq_id].min is not None:
+                    txeq_min = max(txeq_min, tap_ranges[txeq_id].min)
+                if tap_ranges[txeq_id].max is not None:
+                    txeq_max = min(txeq_max, tap_ranges[txeq_id].max)
+                step = tap_ranges[txeq_id].step
+                if txeq_min > txeq_max:
+                    logger.warning(f"c({txeq_id}) tap range [{tap_ranges[txeq_id].min}, {tap_ranges[txeq_id].max}] is outside the port range {port_txeq_limits.txeq_range(txeq_id)}. c({txeq_id}) is left out of the sweep.")
+                    continue
+            positions.append(position)
+            axes.append(plan_txeq_axis(txeq_min, txeq_max, step))
+        return positions, axes
+
+    async def joint_exhaustive_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: HostTxEqPortPair) -> None:
+            port_txeq_limits = port_pair.port_txeq_limits
+            positions, axes = self.plan_joint_sweep_axes(port_txeq_limits, self.logger_name)
+            if len(positions) == 0:
+                logger.warning(f"No Tx Eq to optimize on {port_pair.tx_port_txt}")
+                return
+
+            # the taps not in the sweep keep their starting values
+            start_txeqs = {item["lane"]: list(item["txeq_values"]) for item in port_pair.start_txeq_dicts}
+
+            # plan the feasible candidates upfront, so no write hits the tap value sum limit
+            fixed_abs_sum = max(sum(abs(v) for i, v in enumerate(txeq_values) if i not in positions and v is not None) for txeq_values in start_txeqs.values())
+            total = count_joint_txeq_sweep(axes, port_txeq_limits.max_txeq_sum - fixed_abs_sum)
+            sweep_plan = plan_joint_txeq_sweep(axes, port_txeq_limits.max_txeq_sum - fixed_abs_sum, self.joint_sweep.max_candidates, self.joint_sweep.seed)
+            logger.info(f"Sweep plan: {len(sweep_plan)} of {total} feasible candidates for Tx Eq positions {positions}, {count_axis_changes(sweep_plan)} tap changes")
+            # each candidate costs the settle delay and the measurement overhead on top of its PRBS window
+            candidate_time = self.delay_after_eq_write + prbs_measurement_overhead(self.prbs_measurement_mode) + port_pair.prbs_duration
+            logger.info(f"Estimated duration: {len(sweep_plan) * candidate_time / 3600:.2f} hours ({candidate_time}s per candidate)")
+
+            results_to_sort: Dict[int, List[Dict[str, Any]]] = {lane: [] for lane in self.lanes}
+            # the best reading of each lane so far, used as incumbent by early stop
+            best_lane_ber_dicts = None
+            for i, candidate in enumerate(sweep_plan):
+                logger.info(f"Candidate {i+1}/{len(sweep_plan)}: {candidate}")
+                lane_txeq_list = []
+                for lane in self.lanes:
+                    txeq_values = list(start_txeqs[lane])
+                    for position, value in zip(positions, candidate):
+                        txeq_values[position] = value
+                    lane_txeq_list.append((lane, txeq_values))
+                await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+
+                # read current TxEqs, and measure PRBS BER
+                txeq_dicts = await read_txeq_from_lanes(port_pair.tx_port, lanes=self.lanes)
+                lane_ber_dicts = await measure_prbs_ber_pooled(tx_port=port_pair.tx_port, rx_port=port_pair.rx_port, lane_settings=lane_txeq_settings(txeq_dicts), duration=port_pair.prbs_duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, memo=self.evidence, early_stop=self.early_stop, incumbent_lane_ber_dicts=best_lane_ber_dicts)
+
+                # save result to report
+                self.record_readings(port_pair, lane_ber_dicts, txeq_dicts)
+                txeq_dict_of_lane = {item["lane"]: item["txeq_values"] for item in txeq_dicts}
+                for lane_ber_dict in lane_ber_dicts:
+                    results_to_sort[lane_ber_dict["lane"]].append({"tx_eq": txeq_dict_of_lane[lane_ber_dict["lane"]], "prbs_ber": lane_ber_dict["prbs_ber"]})
+                best_lane_ber_dicts = copy.deepcopy(lane_ber_dicts) if best_lane_ber_dicts is None else update_best_lane_ber_dicts(lane_ber_dicts, best_lane_ber_dicts)
+
+            # write the final best result to lanes
+            logger.info(f"[Final Result]")
+            lane_txeq_list = []
+            for lane in self.lanes:
+                if len(results_to_sort[lane]) > 0:
+                    sorted_result = sorted(results_to_sort[lane], key = lambda x: x["prbs_ber"])
+                    logger.info(f"Lane ({lane}) - Best result: Host Tx Eq: {sorted_result[0]['tx_eq']}, PRBS BER: {sorted_result[0]['prbs_ber']}")
+                    lane_txeq_list.append((lane, sorted_result[0]['tx_eq']))
+                else:
+                    logger.info(f"Lane ({lane}): No result found")
+            logger.info(f"Writing the best result to Host Tx Eq as final result")
+            await write_txeq_to_lanes(port_pair.tx_port, lane_txeq_list, self.delay_after_eq_write, self.logger_name)
+
+        await self.host_txeq_search_on_port_pair(port_pair_obj, search)
+    
     async def run(self):
         self.validate_lanes()
         await self.config_modules()
@@ -367,7 +688,13 @@ class XenaHostTxEqOptimization:
             await self.heuristic_search(self.port_pair_list)
         elif self.optimize_mode == "exhaustive":
             await self.exhaustive_search(self.port_pair_list)    
+        elif self.optimize_mode == "successive_halving":
+            await self.successive_halving_search(self.port_pair_list)
+        elif self.optimize_mode == "spsa":
+            await self.spsa_search(self.port_pair_list)
+        elif self.optimize_mode == "joint_exhaustive":
+            await self.joint_exhaustive_search(self.port_pair_list)
         else:
             logger = logging.getLogger(self.logger_name)
-            logger.error(f"Invalid search mode: {self.optimize_mode}. Supported modes are 'heuristic' and 'exhaustive'.") 
+            logger.error(f"Invalid search mode: {self.optimize_mode}. Supported modes are 'heuristic', 'exhaustive', 'successive_halving', 'spsa' and 'joint_exhaustive'.") 
     
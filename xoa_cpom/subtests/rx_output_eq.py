@@ -7,16 +7,40 @@ from xoa_driver import testers, modules, ports, enums
 from xoa_driver.hlfuncs import mgmt
 from xoa_cpom.utils import *
 from xoa_cpom.cmisfuncs import *
+from ..cmis_shadow import CmisShadowCache
+from ..sweep_planner import *
+from ..search_engines import *
 from ..models import *
 from ..enums import *
 from ..reportgen import *
 from ..prbs_control import *
 from ..txeq_control import *
-from typing import List, Dict, Set
+from ..timing import span, phase_sleep
+from ..checkpoint import settle_sleep
+from ..measurement import LaneMeasurement
+from ..result_store import ResultStore, SubtestResults, test_condition
+from typing import List, Dict, Set, Any, Tuple, Optional, Callable, Awaitable
+from dataclasses import dataclass
 
 import logging
 import copy
 
+
+# *************************************************************************************
+# class: RxOutputEqPortPair
+# description: A port pair prepared for a search of the RX output EQ
+# *************************************************************************************
+@dataclass
+class RxOutputEqPortPair:
+    """A port pair prepared for a search of the RX output EQ, with the Data Path explicit control enabled on the lanes, see :meth:`XenaTcvrRxOutputEqOptimization.rx_output_eq_search_on_port_pair`
+    """
+    tx_port: FreyaEdunPort
+    rx_port: FreyaEdunPort
+    name: str                           # port pair name in the report
+    module_identity: Optional[ModuleIdentity]
+    prbs_duration: float                # full PRBS duration in seconds
+    measure: Callable[[Dict[int, Tuple[int, int, int]], float], Awaitable[List[Dict[str, Any]]]]    # apply {lane: (amplitude, pre-cursor, post-cursor)}, wait for the settings to take effect, and return the lane BER dicts of a PRBS window of the given duration. Lanes where the write fails are left out.
+
 # *************************************************************************************
 # class: XenaRxOutputEqOptimization
 # description: This class provides an automated optimization framework that uses 
@@ -27,28 +51,35 @@ class XenaTcvrRxOutputEqOptimization:
     """
     This class provides an automated optimization framework that uses PRBS-based BER testing to test Module Rx Output Equalization for the best possible signal integrity.
     """
-    def __init__(self, tester_objs: List[testers.L23Tester], test_config: TcvrRxOutputEqTestConfig, logger_name: str, report_filename: str):
+    def __init__(self, tester_objs: List[testers.L23Tester], test_config: TcvrRxOutputEqTestConfig, logger_name: str, report_filename: str, result_store: Optional[ResultStore] = None, report_writer: ReportWriterConfig = ReportWriterConfig()):
         self.tester_objs = tester_objs
         self.test_config = test_config
         self.logger_name = logger_name
         self.report_filename = report_filename
         self.report_gen = TcvrRxOutputEqTestReportGenerator(
             logger_name=self.logger_name, 
+            filename=self.report_filename,
+            writer_config=report_writer,
+            port_pair_column=self.concurrency.enable and len(self.port_pair_list) > 1,
             name="Tcvr Rx Output EQ Test", 
             chassis_list=[tester.info.host for tester in self.tester_objs])
+        self.results = SubtestResults(result_store, "rx_output_eq", test_condition(test_config.module_media, test_config.port_speed, test_config.prbs_config.polynomial))
         
         logger = logging.getLogger(self.logger_name)
         logger.info(f"=============== Tcvr Rx Output Equalization Optimization Test ===============")
         logger.info(f"Test Config:")
         logger.info(f"  Port Pair:            {self.port_pair_list}")
-        logger.info(f"  Lane:                 {self.lane}")
+        logger.info(f"  Lanes:                {self.lanes}")
         logger.info(f"  Amplitude Range:      [{self.amp_min}, {self.amp_max}]")
         logger.info(f"  PreCursor Range:      [{self.pre_min}, {self.pre_max}]")
         logger.info(f"  PostCursor Range:     [{self.post_min}, {self.post_max}]")
         logger.info(f"  Delay After Reset:    {self.delay_after_reset} seconds")
         logger.info(f"  Delay After EQ Write: {self.delay_after_eq_write} seconds")
         logger.info(f"  PRBS Polynomial:      {self.prbs_polynomial.name}")
-        logger.info(f"  PRBS Duration:        {self.prbs_duration} seconds")
+        logger.info(f"  PRBS Duration:        {describe_prbs_duration(self.test_config.prbs_config)}")
+        logger.info(f"  PRBS Measurement:     {self.prbs_measurement_mode}")
+        logger.info(f"  Optimize Mode:        {self.optimize_mode}")
+        logger.info(f"  Concurrent Pairs:     {self.concurrency.enable}")
     
     @property
     def port_pair_list(self):
@@ -84,8 +115,12 @@ class XenaTcvrRxOutputEqOptimization:
         return self.test_config.port_speed
     
     @property
-    def lane(self):
-        return self.test_config.lane
+    def lanes(self) -> List[int]:
+        if self.test_config.lanes is not None:
+            return self.test_config.lanes
+        if self.test_config.lane is not None:
+            return [self.test_config.lane]
+        return []
     
     @property
     def delay_after_reset(self):
@@ -99,6 +134,10 @@ class XenaTcvrRxOutputEqOptimization:
     def prbs_polynomial(self) -> enums.PRBSPolynomial:
         return enums.PRBSPolynomial[self.test_config.prbs_config.polynomial]
 
+    @property
+    def prbs_measurement_mode(self) -> str:
+        return self.test_config.prbs_config.measurement_mode
+
     @property
     def amp_min(self):
         return self.test_config.rx_output_eq_range.amp_min
@@ -131,15 +170,43 @@ class XenaTcvrRxOutputEqOptimization:
     def prbs_duration(self):
         return self.test_config.prbs_config.duration
     
+    @property
+    def optimize_mode(self) -> str:
+        return self.test_config.optimize_mode
+    
+    @property
+    def successive_halving(self) -> SuccessiveHalvingConfig:
+        return self.test_config.successive_halving
+    
+    @property
+    def bayesian(self) -> BayesianSearchConfig:
+        return self.test_config.bayesian
+    
+    @property
+    def local_search(self) -> LocalSearchConfig:
+        return self.test_config.local_search
+    
+    @property
+    def concurrency(self) -> ConcurrencyConfig:
+        return self.test_config.concurrency
+    
+    @property
+    def cmis_wait_policy(self) -> CmisWaitPolicy:
+        return get_cmis_wait_policy(self.test_config.cmis_wait, self.test_config.module_media)
+    
     async def config_modules(self):
-        module_str_configs = []
         for chassis_ip, module_ids in self.chassis_modules_dict.items():
-            module_str_configs.append((str(module_ids), self.test_config.module_media, self.test_config.port_speed))
+            module_str_configs = []
+            for module_id in module_ids:
+                module_str_configs.append((str(module_id), self.test_config.module_media, self.test_config.port_speed))
             tester_obj = find_tester_obj(chassis_ip, self.tester_objs)
             await config_modules(tester_obj, module_str_configs, self.logger_name)
 
-    def validate_lane(self) -> bool:
-        if not 1<=self.lane<=8:
+    def validate_lanes(self) -> bool:
+        if len(self.lanes) == 0:
+            logging.warning(f"No lane to test. Set lane or lanes.")
+            return False
+        if max(self.lanes) > 8 or min(self.lanes) < 1:
             logging.warning(f"Lane must in range[1,8]")
             return False
         return True
@@ -169,111 +236,262 @@ class XenaTcvrRxOutputEqOptimization:
         # Get port pair objects list from port pair list
         port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)            
 
-        # exhaustive search of all cursor combinations
-        for port_pair_obj in port_pair_obj_list:
-            tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
-            rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
-            tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
-            rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.exhaustive_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def exhaustive_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: RxOutputEqPortPair) -> Dict[int, List[Tuple[Any, float]]]:
+            results_to_sort: Dict[int, List[Tuple[Any, float]]] = {lane: [] for lane in self.lanes}
+            sweep_plan = plan_rx_output_eq_sweep((self.amp_min, self.amp_max), (self.pre_min, self.pre_max), (self.post_min, self.post_max))
+            logger.info(f"Sweep plan: {len(sweep_plan)} grid points, {count_axis_changes(sweep_plan)} cursor changes, on Lanes {self.lanes}")
+            for amp_value, pre_value, post_value in sweep_plan:
+                logger.info(f"Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value}")
+                lane_points = {lane: (amp_value, pre_value, post_value) for lane in self.lanes}
+                # measure PRBS BER on all successful lanes in one window
+                prbs_bers = await port_pair.measure(lane_points, port_pair.prbs_duration)
+
+                # save result to report, and remember the result
+                self.record_readings(port_pair, lane_points, prbs_bers)
+                for lane_ber_dict in prbs_bers:
+                    results_to_sort[lane_ber_dict["lane"]].append(((amp_value, pre_value, post_value), lane_ber_dict["prbs_ber"]))
+            return {lane: sorted(results, key=lambda x: x[1]) for lane, results in results_to_sort.items()}
+
+        await self.rx_output_eq_search_on_port_pair(port_pair_obj, search)
+    
+    async def successive_halving_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Successive halving search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.successive_halving_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def successive_halving_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: RxOutputEqPortPair) -> Dict[int, List[Tuple[Any, float]]]:
+            current_polynomial = self.prbs_polynomial
+
+            async def prepare_rung(rung: Rung) -> None:
+                nonlocal current_polynomial
+                if rung.polynomial != current_polynomial:
+                    await switch_prbs_polynomial(port_pair.tx_port, port_pair.rx_port, self.lanes, rung.polynomial, self.prbs_measurement_mode, self.logger_name)
+                    current_polynomial = rung.polynomial
+
+            async def evaluate(cursors: Any, lanes: List[int], rung: Rung) -> Dict[int, float]:
+                amp_value, pre_value, post_value = cursors
+                logger.info(f"Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value} on Lanes {lanes}")
+                lane_points = {lane: (amp_value, pre_value, post_value) for lane in lanes}
+                # measure PRBS BER on all successful lanes in one window
+                prbs_bers = await port_pair.measure(lane_points, rung.duration)
+                if rung.is_final:
+                    # only the final round has the full measurement quality, so only it goes to the report
+                    self.record_readings(port_pair, lane_points, prbs_bers)
+                return {lane_ber_dict["lane"]: lane_ber_dict["prbs_ber"] for lane_ber_dict in prbs_bers}
+
+            sweep_plan = plan_rx_output_eq_sweep((self.amp_min, self.amp_max), (self.pre_min, self.pre_max), (self.post_min, self.post_max))
+            logger.info(f"Sweep plan: {len(sweep_plan)} grid points on Lanes {self.lanes}")
+            return await successive_halving(candidates=sweep_plan, lanes=self.lanes, evaluate=evaluate, config=self.successive_halving, final_duration=port_pair.prbs_duration, final_polynomial=self.prbs_polynomial, logger_name=self.logger_name, prepare_rung=prepare_rung, overhead=self.delay_after_eq_write + prbs_measurement_overhead(self.prbs_measurement_mode))
 
-            logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
-            logger.info(f"Reserving and reseting port pair")
+        await self.rx_output_eq_search_on_port_pair(port_pair_obj, search)
+    
+    async def bayesian_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Bayesian search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.bayesian_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def bayesian_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        async def search(grid: List[Tuple[int, int, int]], evaluate: Callable[[Dict[int, Any]], Awaitable[Dict[int, Dict[str, Any]]]], start: Optional[Tuple[int, ...]]) -> Dict[int, List[Tuple[Any, float]]]:
+            return await bayesian_search(grid=grid, lanes=self.lanes, evaluate=evaluate, config=self.bayesian, logger_name=self.logger_name, start=start)
+        await self.lane_point_search_on_port_pair(port_pair_obj, search)
+
+    async def coordinate_descent_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Coordinate descent search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.coordinate_descent_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def coordinate_descent_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        ranges = [(self.amp_min, self.amp_max), (self.pre_min, self.pre_max), (self.post_min, self.post_max)]
+        async def search(grid: List[Tuple[int, int, int]], evaluate: Callable[[Dict[int, Any]], Awaitable[Dict[int, Dict[str, Any]]]], start: Optional[Tuple[int, ...]]) -> Dict[int, List[Tuple[Any, float]]]:
+            return await run_lane_searches(lanes=self.lanes, make_search=lambda lane: coordinate_descent_steps(ranges, self.local_search.refine_radius, start), evaluate=evaluate, logger_name=self.logger_name)
+        await self.lane_point_search_on_port_pair(port_pair_obj, search)
+
+    async def lane_point_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort], search: Callable[[List[Tuple[int, int, int]], Callable[[Dict[int, Any]], Awaitable[Dict[int, Dict[str, Any]]]], Optional[Tuple[int, ...]]], Awaitable[Dict[int, List[Tuple[Any, float]]]]]):
+        """Search the grid with a search where each lane picks its own next grid point, and the lanes are measured in the same windows. The search starts from the best stored setting of the part number, if the result store has one.
+        """
+        logger = logging.getLogger(self.logger_name)
+
+        async def grid_search(port_pair: RxOutputEqPortPair) -> Dict[int, List[Tuple[Any, float]]]:
+            async def evaluate(lane_points: Dict[int, Any]) -> Dict[int, Dict[str, Any]]:
+                for lane, (amp_value, pre_value, post_value) in lane_points.items():
+                    logger.info(f"Lane ({lane}) - Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value}")
+                # measure PRBS BER on all successful lanes in one window
+                prbs_bers = await port_pair.measure(lane_points, port_pair.prbs_duration)
+                self.record_readings(port_pair, lane_points, prbs_bers)
+                return {lane_ber_dict["lane"]: lane_ber_dict for lane_ber_dict in prbs_bers}
+
+            sweep_plan = plan_rx_output_eq_sweep((self.amp_min, self.amp_max), (self.pre_min, self.pre_max), (self.post_min, self.post_max))
+            logger.info(f"Search space: {len(sweep_plan)} grid points on Lanes {self.lanes}")
+            warm_start = self.results.warm_start(port_pair.module_identity)
+            if warm_start is not None:
+                logger.info(f"Warm start from (Amplitude, PreCursor, PostCursor) {warm_start}")
+            return await search(sweep_plan, evaluate, warm_start)
+
+        await self.rx_output_eq_search_on_port_pair(port_pair_obj, grid_search)
+
+    async def rx_output_eq_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort], search: Callable[["RxOutputEqPortPair"], Awaitable[Dict[int, List[Tuple[Any, float]]]]]):
+        """Prepare a port pair for a search of the RX output EQ, run the search, and write the best result of each lane. The port pair is reserved and reset, PRBS is configured, and the Data Path explicit control is enabled on the lanes, so the search only needs :meth:`RxOutputEqPortPair.measure` to apply cursors and measure them. The search returns the results of each lane, best first.
+        """
+        logger = logging.getLogger(self.logger_name)
+        tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
+        rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
+        tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
+        rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+
+        logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
+        logger.info(f"Reserving and reseting port pair")
+        with span("reserve_reset"):
             await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
-            logger.info(f"Delay after reset: {self.delay_after_reset}s")
-            await asyncio.sleep(self.delay_after_reset)
-            
-            # check if the transceiver supports RX Output EQ Host Control
-            if not await rx_output_eq_control_supported(rx_port_obj, self.logger_name):
-                logger.warning(f"RX Output Eq Control is not supported by {rx_port_txt}")
-                return
-
-            # configure prbs
-            await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
-            
-            results_to_sort = []
-            # check if the module supports Reconfiguration
-            reconfig_supported = await check_eq_reconfig_support(rx_port_obj, self.logger_name)
-            
-            if reconfig_supported == ReconfigurationSupport.Neither:
-                logger.warning(f"Neither Reconfiguration supported on {rx_port_txt}")
-                logger.warning(f"RX Output EQ Test aborted!")
-                return
+        logger.info(f"Delay after reset: {self.delay_after_reset}s")
+        await phase_sleep("reset_delay", self.delay_after_reset)
+        prbs_duration = await get_prbs_duration(rx_port_obj, self.test_config.prbs_config, self.port_speed, self.logger_name)
+        
+        # check if the transceiver supports RX Output EQ Host Control
+        if not await rx_output_eq_control_supported(rx_port_obj, self.logger_name):
+            logger.warning(f"RX Output Eq Control is not supported by {rx_port_txt}")
+            return
+
+        # configure prbs
+        await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
+        module_identity = await self.results.identify(rx_port_obj)
+        
+        # check if the module supports Reconfiguration
+        reconfig_supported = await check_eq_reconfig_support(rx_port_obj, self.logger_name)
+        
+        if reconfig_supported == ReconfigurationSupport.Neither:
+            logger.warning(f"Neither Reconfiguration supported on {rx_port_txt}")
+            logger.warning(f"RX Output EQ Test aborted!")
+            return
+        
+        for lane in self.lanes:
+            _appsel_code, _dp_id, _explicit_ctrl = await dp_read(port=rx_port_obj, lane=lane, logger_name=self.logger_name)
+            await dp_write(port=rx_port_obj, lane=lane, appsel_code=_appsel_code, dp_id=_dp_id, explicit_ctrl=1, logger_name=self.logger_name, wait_policy=self.cmis_wait_policy)
+
+        # shadow copy of the staged control set, so each window needs only one register write
+        shadow = CmisShadowCache(rx_port_obj, self.logger_name)
+        # the cursors applied on each lane, to skip the Provision-and-Commission procedure when they do not change
+        lane_applied: Dict[int, Any] = {lane: None for lane in self.lanes}
+
+        async def measure(lane_points: Dict[int, Tuple[int, int, int]], duration: float) -> List[Dict[str, Any]]:
+            # Write the RX output EQ settings of each lane to the RX Output EQ registers.
+            await rx_output_eq_write_cursors_on_lanes(port=rx_port_obj, lane_cursors=[(lane,) + tuple(point) for lane, point in lane_points.items()], logger_name=self.logger_name, shadow=shadow, wait_policy=self.cmis_wait_policy)
+
+            # Trigger the Provision-and-Commission procedure on the lanes where the settings change
+            apply_lanes = [lane for lane, point in lane_points.items() if lane_applied[lane] != tuple(point)]
+            config_statuses = {lane: ConfigStatus.ConfigSuccess for lane in lane_points}
+            if len(apply_lanes) > 0:
+                config_statuses.update(await apply_change_on_lanes(port=rx_port_obj, lanes=apply_lanes, logger_name=self.logger_name, reconfig_support=reconfig_supported, wait_policy=self.cmis_wait_policy))
             else:
-                _appsel_code, _dp_id, _explicit_ctrl = await dp_read(port=rx_port_obj, lane=self.lane, logger_name=self.logger_name)
-                await dp_write(port=rx_port_obj, lane=self.lane, appsel_code=_appsel_code, dp_id=_dp_id, explicit_ctrl=1, logger_name=self.logger_name)
-                for amp_value in range(self.amp_min, self.amp_max+1):
-                    for pre_value in range(self.pre_min, self.pre_max+1):
-                        for post_value in range(self.post_min, self.post_max+1):
-                            logger.info(f"Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value}")
-                            # Write the RX output EQ settings to the RX Output EQ registers.
-                            await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=amp_value, cursor=Cursor.Amplitude, logger_name=self.logger_name)
-                            await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=pre_value, cursor=Cursor.Precursor, logger_name=self.logger_name)
-                            await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=post_value, cursor=Cursor.Postcursor, logger_name=self.logger_name)
-                            
-                            # Trigger the Provision-and-Commission procedure
-                            await apply_change_on_lane(port=rx_port_obj, lane=self.lane, logger_name=self.logger_name, reconfig_support=reconfig_supported)
-
-                            # Read ConfigStatus register to check if the EQ settings are applied.
-                            while True:
-                                config_status = await read_config_status(port=rx_port_obj, lane=self.lane, logger_name=self.logger_name)
-                                if config_status == ConfigStatus.ConfigInProgress:
-                                    logger.info(f"  ConfigStatus is still ConfigInProgress. Please wait for the configuration to complete.")
-                                    await asyncio.sleep(1)
-                                    continue
-                                elif config_status == ConfigStatus.ConfigSuccess:
-                                    logger.info(f"  Write operation successful")
-                                    break
-                                else:
-                                    logger.info(f"  Write operation failed. (ConfigStatus is {config_status.name})")
-                                    break
-                            
-                            if config_status == ConfigStatus.ConfigSuccess:
-                                # Wait for a certain duration to let the EQ settings take effect.
-                                logger.info(f"Delay after EQ write: {self.delay_after_eq_write}s")
-                                await asyncio.sleep(self.delay_after_eq_write)
-
-                                # clear counters
-                                logger.info(f"Clearing PRBS counters")
-                                await clear_prbs_counters(port=rx_port_obj, logger_name=self.logger_name)
-
-                                # run PRBS for a certain duration
-                                await run_prbs_on_lanes(port=tx_port_obj, lanes=[self.lane], duration=self.prbs_duration, logger_name=self.logger_name)
-
-                                # read PRBS BER
-                                prbs_bers =await read_ber_from_lanes(port=rx_port_obj, lanes=[self.lane], logger_name=self.logger_name)
-                                prbs_ber = prbs_bers[0]["prbs_ber"]
-
-                                # save result to report
-                                self.report_gen.record_data(port_name=f"{tx_port_txt} --> {rx_port_txt}", lane=self.lane, amplitude=amp_value, precursor=pre_value, postcursor=post_value, prbs_ber=prbs_ber)
-
-                                # remember the result
-                                results_to_sort.append({"amp": amp_value, "pre": pre_value, "post": post_value, "prbs_ber": prbs_ber})
-                            else:
-                                logger.info(f"Write operation failed. Skip the PRBS test.")
-            
-                # Generate report
-                logger.info(f"Generatinging test report..")
-                self.report_gen.generate_report(self.report_filename)
-
-                # find the best
-                if len(results_to_sort) > 0:
-                    sorted_result = sorted(results_to_sort, key = lambda x: x["prbs_ber"])
-                    logger.info(f"Final sorted results:")
-                    for i in sorted_result:
-                        logger.info(f"Lane ({self.lane}) - Amplitude: {i['amp']}, PreCursor: {i['pre']}, PostCursor: {i['post']}, PRBS BER: {i['prbs_ber']}")
-                    
-                    logger.info(f"Best result: Amplitude: {sorted_result[0]['amp']}, PreCursor: {sorted_result[0]['pre']}, PostCursor: {sorted_result[0]['post']}, PRBS BER: {sorted_result[0]['prbs_ber']}")
-                    logger.info(f"Writing the best result to Rx Output Eq registers")
-                    await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=sorted_result[0]['amp'], cursor=Cursor.Amplitude, logger_name=self.logger_name)
-                    await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=sorted_result[0]['pre'], cursor=Cursor.Precursor, logger_name=self.logger_name)
-                    await rx_output_eq_write(port=rx_port_obj, lane=self.lane, value=sorted_result[0]['post'], cursor=Cursor.Postcursor, logger_name=self.logger_name)
-                    await apply_change_on_lane(port=rx_port_obj, lane=self.lane, logger_name=self.logger_name, reconfig_support=reconfig_supported)
+                logger.info(f"  EQ settings unchanged. Skip Provision-and-Commission.")
+            success_lanes = []
+            for lane, point in lane_points.items():
+                if config_statuses[lane] == ConfigStatus.ConfigSuccess:
+                    lane_applied[lane] = tuple(point)
+                    success_lanes.append(lane)
                 else:
-                    logger.info(f"No results found")
+                    lane_applied[lane] = None
+                    logger.info(f"  Lane {lane}: Write operation failed. (ConfigStatus is {config_statuses[lane].name})")
+            if len(success_lanes) == 0:
+                logger.info(f"Write operation failed. Skip the PRBS test.")
+                return []
+
+            # Wait for a certain duration to let the EQ settings take effect.
+            logger.info(f"Delay after EQ write: {self.delay_after_eq_write}s")
+            await settle_sleep(self.delay_after_eq_write)
+
+            # measure PRBS BER
+            return await measure_prbs_ber(tx_port=tx_port_obj, rx_port=rx_port_obj, lanes=success_lanes, duration=duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, lane_settings=lane_points)
+
+        if self.prbs_measurement_mode == "continuous":
+            await start_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+        results = await search(RxOutputEqPortPair(
+            tx_port=tx_port_obj,
+            rx_port=rx_port_obj,
+            name=f"{tx_port_txt} --> {rx_port_txt}",
+            module_identity=module_identity,
+            prbs_duration=prbs_duration,
+            measure=measure))
+        if self.prbs_measurement_mode == "continuous":
+            await stop_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+
+        # find the best of each lane
+        logger.info(f"Final sorted results:")
+        best_lane_cursors = []
+        for lane in self.lanes:
+            if len(results.get(lane, [])) > 0:
+                for (amp_value, pre_value, post_value), prbs_ber in results[lane]:
+                    logger.info(f"Lane ({lane}) - Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value}, PRBS BER: {prbs_ber}")
+                (amp_value, pre_value, post_value), prbs_ber = results[lane][0]
+                logger.info(f"Lane ({lane}) - Best result: Amplitude: {amp_value}, PreCursor: {pre_value}, PostCursor: {post_value}, PRBS BER: {prbs_ber}")
+                best_lane_cursors.append((lane, amp_value, pre_value, post_value))
+            else:
+                logger.info(f"Lane ({lane}): No results found")
+
+        if len(best_lane_cursors) > 0:
+            logger.info(f"Writing the best results to Rx Output Eq registers")
+            await rx_output_eq_write_cursors_on_lanes(port=rx_port_obj, lane_cursors=best_lane_cursors, logger_name=self.logger_name, shadow=shadow, wait_policy=self.cmis_wait_policy)
+            apply_lanes = [lane for lane, amp, pre, post in best_lane_cursors if lane_applied[lane] != (amp, pre, post)]
+            if len(apply_lanes) > 0:
+                await apply_change_on_lanes(port=rx_port_obj, lanes=apply_lanes, logger_name=self.logger_name, reconfig_support=reconfig_supported, wait_policy=self.cmis_wait_policy)
+        logger.info(f"CMIS register transactions on {rx_port_txt}: {shadow.read_count} reads, {shadow.write_count} writes")
+
+    def record_readings(self, port_pair: "RxOutputEqPortPair", lane_points: Dict[int, Tuple[int, int, int]], prbs_bers: List[Dict[str, Any]]) -> None:
+        """Save the readings of a window to the report and to the result store
+        """
+        for lane_ber_dict in prbs_bers:
+            self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, lane_points[lane_ber_dict["lane"]]))
+        if len(prbs_bers) > 0:
+            self.results.record(port_pair.module_identity, lane_points, prbs_bers)
     
     async def run(self):
-        self.validate_lane()
+        self.validate_lanes()
         self.validate_transceiver_eq_config()
         await self.config_modules()
-        await self.exhaustive_search(self.port_pair_list)        
+        if self.optimize_mode == "exhaustive":
+            await self.exhaustive_search(self.port_pair_list)
+        elif self.optimize_mode == "successive_halving":
+            await self.successive_halving_search(self.port_pair_list)
+        elif self.optimize_mode == "bayesian":
+            await self.bayesian_search(self.port_pair_list)
+        elif self.optimize_mode == "coordinate_descent":
+            await self.coordinate_descent_search(self.port_pair_list)
+        else:
+            logger = logging.getLogger(self.logger_name)
+            logger.error(f"Invalid search mode: {self.optimize_mode}. Supported modes are 'exhaustive', 'successive_halving', 'bayesian' and 'coordinate_descent'.")        
     
\ No newline at end of file
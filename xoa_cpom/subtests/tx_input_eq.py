@@ -7,16 +7,42 @@ from xoa_driver import testers, modules, ports, enums
 from xoa_driver.hlfuncs import mgmt
 from xoa_cpom.utils import *
 from xoa_cpom.cmisfuncs import *
+from ..cmis_shadow import CmisShadowCache
+from ..sweep_planner import *
+from ..search_engines import *
+from ..ber_stats import lane_value_effects
 from ..models import *
 from ..enums import *
 from ..reportgen import *
 from ..prbs_control import *
 from ..txeq_control import *
-from typing import List, Dict, Set
+from ..timing import span, phase_sleep
+from ..checkpoint import settle_sleep
+from ..measurement import LaneMeasurement
+from ..q_factor import fit_q_factor, rank_by_q_factor, plateau_center
+from ..result_store import ResultStore, SubtestResults, test_condition
+from typing import List, Dict, Set, Any, Optional, Callable, Awaitable
+from dataclasses import dataclass
 
 import logging
 import copy
 
+
+# *************************************************************************************
+# class: TxInputEqPortPair
+# description: A port pair prepared for a search of the TX input EQ
+# *************************************************************************************
+@dataclass
+class TxInputEqPortPair:
+    """A port pair prepared for a search of the TX input EQ, with Host Controlled EQ enabled on the lanes, see :meth:`XenaTcvrTxInputEqOptimization.host_controlled_eq_search_on_port_pair`
+    """
+    tx_port: FreyaEdunPort
+    rx_port: FreyaEdunPort
+    name: str                           # port pair name in the report
+    module_identity: Optional[ModuleIdentity]
+    prbs_duration: float                # full PRBS duration in seconds
+    measure: Callable[[Dict[int, int], float], Awaitable[List[Dict[str, Any]]]]    # apply {lane: EQ value}, wait for the settings to take effect, and return the lane BER dicts of a PRBS window of the given duration. Lanes where the write fails are left out.
+
 # *************************************************************************************
 # class: XenaTxInputEqOptimization
 # description: This class provides an automated optimization framework that uses 
@@ -27,26 +53,33 @@ class XenaTcvrTxInputEqOptimization:
     """
     This class provides an automated optimization framework that uses PRBS-based BER testing to test Module Tx Input Equalization for the best possible signal integrity.
     """
-    def __init__(self, tester_objs: List[testers.L23Tester], test_config: TcvrTxInputEqTestConfig, logger_name: str, report_filename: str):
+    def __init__(self, tester_objs: List[testers.L23Tester], test_config: TcvrTxInputEqTestConfig, logger_name: str, report_filename: str, result_store: Optional[ResultStore] = None, report_writer: ReportWriterConfig = ReportWriterConfig()):
         self.tester_objs = tester_objs
         self.test_config = test_config
         self.logger_name = logger_name
         self.report_filename = report_filename
         self.report_gen = TcvrTxInputEqTestReportGenerator(
             logger_name=self.logger_name, 
+            filename=self.report_filename,
+            writer_config=report_writer,
+            port_pair_column=self.concurrency.enable and len(self.port_pair_list) > 1,
             name="Tcvr Rx Output EQ Test", 
             chassis_list=[tester.info.host for tester in self.tester_objs])
+        self.results = SubtestResults(result_store, "tx_input_eq", test_condition(test_config.module_media, test_config.port_speed, test_config.prbs_config.polynomial))
         
         logger = logging.getLogger(self.logger_name)
         logger.info(f"=============== Tcvr Tx Input Equalization Optimization Test ===============")
         logger.info(f"Test Config:")
         logger.info(f"  Port Pair:            {self.port_pair_list}")
-        logger.info(f"  Lane:                 {self.lane}")
+        logger.info(f"  Lanes:                {self.lanes}")
         logger.info(f"  TX EQ Range:          [{self.eq_min}, {self.eq_max}]")
         logger.info(f"  Delay After Reset:    {self.delay_after_reset} seconds")
         logger.info(f"  Delay After EQ Write: {self.delay_after_eq_write} seconds")
         logger.info(f"  PRBS Polynomial:      {self.prbs_polynomial.name}")
-        logger.info(f"  PRBS Duration:        {self.prbs_duration} seconds")
+        logger.info(f"  PRBS Duration:        {describe_prbs_duration(self.test_config.prbs_config)}")
+        logger.info(f"  PRBS Measurement:     {self.prbs_measurement_mode}")
+        logger.info(f"  Optimize Mode:        {self.optimize_mode}")
+        logger.info(f"  Concurrent Pairs:     {self.concurrency.enable}")
 
     @property
     def port_pair_list(self):
@@ -82,8 +115,12 @@ class XenaTcvrTxInputEqOptimization:
         return self.test_config.port_speed
     
     @property
-    def lane(self):
-        return self.test_config.lane
+    def lanes(self) -> List[int]:
+        if self.test_config.lanes is not None:
+            return self.test_config.lanes
+        if self.test_config.lane is not None:
+            return [self.test_config.lane]
+        return []
     
     @property
     def delay_after_reset(self):
@@ -97,6 +134,10 @@ class XenaTcvrTxInputEqOptimization:
     def prbs_polynomial(self) -> enums.PRBSPolynomial:
         return enums.PRBSPolynomial[self.test_config.prbs_config.polynomial]
 
+    @property
+    def prbs_measurement_mode(self) -> str:
+        return self.test_config.prbs_config.measurement_mode
+
     @property
     def eq_min(self):
         return self.test_config.tx_input_eq_range.min
@@ -113,15 +154,43 @@ class XenaTcvrTxInputEqOptimization:
     def prbs_duration(self):
         return self.test_config.prbs_config.duration
     
+    @property
+    def optimize_mode(self) -> str:
+        return self.test_config.optimize_mode
+
+    @property
+    def successive_halving(self) -> SuccessiveHalvingConfig:
+        return self.test_config.successive_halving
+    
+    @property
+    def local_search(self) -> LocalSearchConfig:
+        return self.test_config.local_search
+
+    @property
+    def q_factor(self) -> QFactorConfig:
+        return self.test_config.q_factor
+    
+    @property
+    def concurrency(self) -> ConcurrencyConfig:
+        return self.test_config.concurrency
+    
+    @property
+    def cmis_wait_policy(self) -> CmisWaitPolicy:
+        return get_cmis_wait_policy(self.test_config.cmis_wait, self.test_config.module_media)
+    
     async def config_modules(self):
-        module_str_configs = []
         for chassis_ip, module_ids in self.chassis_modules_dict.items():
-            module_str_configs.append((str(module_ids), self.test_config.module_media, self.test_config.port_speed))
+            module_str_configs = []
+            for module_id in module_ids:
+                module_str_configs.append((str(module_id), self.test_config.module_media, self.test_config.port_speed))
             tester_obj = find_tester_obj(chassis_ip, self.tester_objs)
             await config_modules(tester_obj, module_str_configs, self.logger_name)
 
-    def validate_lane(self) -> bool:
-        if not 1<=self.lane<=8:
+    def validate_lanes(self) -> bool:
+        if len(self.lanes) == 0:
+            logging.warning(f"No lane to test. Set lane or lanes.")
+            return False
+        if max(self.lanes) > 8 or min(self.lanes) < 1:
             logging.warning(f"Lane must in range[1,8]")
             return False
         return True
@@ -143,113 +212,361 @@ class XenaTcvrTxInputEqOptimization:
         logger.info(f"Exhaustive search started")
 
         # Get port pair objects list from port pair list
-        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list) 
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
 
-        # exhaustive search of all cursor combinations
-        for port_pair_obj in port_pair_obj_list:
-            tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
-            rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
-            tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
-            rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.exhaustive_search_on_port_pair, self.concurrency, self.logger_name)
 
-            logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
-            logger.info(f"Reserving and reseting port pair")
-            await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
-            logger.info(f"Delay after reset: {self.delay_after_reset}s")
-            await asyncio.sleep(self.delay_after_reset)
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
 
-            # check if the transceiver supports TX Input EQ Host Control
-            if not await tx_input_eq_host_control_supported(rx_port_obj, self.logger_name):
-                logger.warning(f"TX Input EQ Host Control is not supported by {rx_port_txt}")
-                return
-            
-            # configure prbs
-            await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
-
-            results_to_sort = []
-            # check if the module supports Reconfiguration
-            reconfig_supported = await check_eq_reconfig_support(rx_port_obj, self.logger_name)
-            
-            if reconfig_supported == ReconfigurationSupport.Neither:
-                logger.warning(f"Neither Reconfiguration supported on {rx_port_txt}")
-                logger.warning(f"TX Input EQ Test Aborted!")
-                return
-            else:
-                _appsel_code, _dp_id, _explicit_ctrl = await dp_read(port=rx_port_obj, lane=self.lane, logger_name=self.logger_name)
-                await dp_write(port=rx_port_obj, lane=self.lane, appsel_code=_appsel_code, dp_id=_dp_id, explicit_ctrl=1, logger_name=self.logger_name)
-
-                # Enable Host Controlled EQ
-                await enable_host_controlled_eq(tx_port_obj, lane=self.lane, logger_name=self.logger_name)
-
-                for eq_value in range(self.eq_min, self.eq_max+1):
-
-                    logger.info(f"Equalizer: {eq_value}")
-
-                    # Write the TX input EQ setting to the TX Input EQ registers.
-                    await tx_input_eq_write(port=tx_port_obj, lane=self.lane, value=eq_value, logger_name=self.logger_name)
-                    
-                    # Trigger the Provision-and-Commission procedure
-                    await apply_change_on_lane(port=tx_port_obj, lane=self.lane, logger_name=self.logger_name, reconfig_support=reconfig_supported)
-
-                    # Read ConfigStatus register to check if the EQ settings are applied.
-                    while True:
-                        config_status = await read_config_status(port=tx_port_obj, lane=self.lane, logger_name=self.logger_name)
-                        if config_status == ConfigStatus.ConfigInProgress:
-                            logger.info(f"  ConfigStatus is still ConfigInProgress. Please wait for the configuration to complete.")
-                            await asyncio.sleep(1)
-                            continue
-                        elif config_status == ConfigStatus.ConfigSuccess:
-                            logger.info(f"  Write operation successful")
-                            break
-                        else:
-                            logger.info(f"  Write operation failed. (ConfigStatus is {config_status.name})")
-                            break
-                    
-                    if config_status == ConfigStatus.ConfigSuccess:
-                        # Wait for a certain duration to let the EQ settings take effect.
-                        logger.info(f"Delay after EQ write: {self.delay_after_eq_write}s")
-                        await asyncio.sleep(self.delay_after_eq_write)
-
-                        # clear counters
-                        logger.info(f"Clearing PRBS counters")
-                        await clear_prbs_counters(port=rx_port_obj, logger_name=self.logger_name)
-
-                        # run PRBS for a certain duration
-                        await run_prbs_on_lanes(port=tx_port_obj, lanes=[self.lane], duration=self.prbs_duration, logger_name=self.logger_name)
-
-                        # read PRBS BER
-                        prbs_bers =await read_ber_from_lanes(port=rx_port_obj, lanes=[self.lane], logger_name=self.logger_name)
-                        prbs_ber = prbs_bers[0]["prbs_ber"]
-
-                        # save result to reporeqst
-                        self.report_gen.record_data(port_name=f"{tx_port_txt} --> {rx_port_txt}", lane=self.lane, eq_value=eq_value, prbs_ber=prbs_ber)
-
-                        # remember the result
-                        results_to_sort.append({"tx_eq": eq_value, "prbs_ber": prbs_ber})
-                    else:
-                        logger.info(f"Write operation failed. Skip the PRBS test.")
-                
-                # Disable Host Controlled EQ
-                await disable_host_controlled_eq(tx_port_obj, lane=self.lane, logger_name=self.logger_name)
-            
-                # Generate report
-                logger.info(f"Generating test report...")
-                self.report_gen.generate_report(self.report_filename)
-
-                # find the best
-                if len(results_to_sort) > 0:
-                    sorted_result = sorted(results_to_sort, key = lambda x: x["prbs_ber"])
-                    logger.info(f"Final sorted results:")
+    async def exhaustive_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: TxInputEqPortPair) -> None:
+            results_to_sort: Dict[int, List[Dict[str, Any]]] = {lane: [] for lane in self.lanes}
+            for eq_value in range(self.eq_min, self.eq_max+1):
+                logger.info(f"Equalizer: {eq_value}")
+                prbs_bers = await port_pair.measure({lane: eq_value for lane in self.lanes}, port_pair.prbs_duration)
+                for lane_ber_dict in prbs_bers:
+                    # save result to report
+                    self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (eq_value,)))
+
+                    # remember the result
+                    results_to_sort[lane_ber_dict["lane"]].append({"tx_eq": eq_value, "prbs_ber": lane_ber_dict["prbs_ber"]})
+                if len(prbs_bers) > 0:
+                    self.results.record(port_pair.module_identity, {lane_ber_dict["lane"]: (eq_value,) for lane_ber_dict in prbs_bers}, prbs_bers)
+
+            # find the best of each lane
+            logger.info(f"Final sorted results:")
+            for lane in self.lanes:
+                if len(results_to_sort[lane]) > 0:
+                    sorted_result = sorted(results_to_sort[lane], key = lambda x: x["prbs_ber"])
                     for i in sorted_result:
-                        logger.info(f"Lane ({self.lane}) - Tcvr Tx Eq: {i['tx_eq']}, PRBS BER: {i['prbs_ber']}")
-                    logger.info(f"Best result: Tcvr Tx Eq: {sorted_result[0]['tx_eq']}, PRBS BER: {sorted_result[0]['prbs_ber']}")
-                    
+                        logger.info(f"Lane ({lane}) - Tcvr Tx Eq: {i['tx_eq']}, PRBS BER: {i['prbs_ber']}")
+                    logger.info(f"Lane ({lane}) - Best result: Tcvr Tx Eq: {sorted_result[0]['tx_eq']}, PRBS BER: {sorted_result[0]['prbs_ber']}")
+                else:
+                    logger.info(f"Lane ({lane}): No results found")
+
+        await self.host_controlled_eq_search_on_port_pair(port_pair_obj, search)
+
+    async def lane_multiplexed_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Lane-multiplexed search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.lane_multiplexed_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def lane_multiplexed_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: TxInputEqPortPair) -> None:
+            results = []
+            # each window tests a different EQ value on each lane, and the values rotate across windows until every lane has seen every value
+            rotation_plan = plan_lane_rotation(self.lanes, list(range(self.eq_min, self.eq_max+1)))
+            logger.info(f"Rotation plan: {len(rotation_plan)} windows on Lanes {self.lanes}")
+            for window, lane_values in enumerate(rotation_plan):
+                logger.info(f"Window {window+1}/{len(rotation_plan)}: (Lane, Equalizer) {lane_values}")
+                lane_value_dict = dict(lane_values)
+                prbs_bers = await port_pair.measure(lane_value_dict, port_pair.prbs_duration)
+                for lane_ber_dict in prbs_bers:
+                    # save result to report
+                    self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (lane_value_dict[lane_ber_dict["lane"]],)))
+
+                    # remember the result
+                    results.append({"lane": lane_ber_dict["lane"], "value": lane_value_dict[lane_ber_dict["lane"]], "prbs_ber": lane_ber_dict["prbs_ber"]})
+                if len(prbs_bers) > 0:
+                    self.results.record(port_pair.module_identity, {lane: (value,) for lane, value in lane_value_dict.items()}, prbs_bers)
+
+            if len(results) == 0:
+                logger.info(f"No results found")
+                return
+
+            # separate the lane effect from the value effect
+            effects = lane_value_effects(results)
+            logger.info(f"Effect summary (log10 BER): mean {effects['mean']:.2f}, residual RMS {effects['residual_rms']:.2f}")
+            for lane, effect in effects["lane_effects"].items():
+                logger.info(f"  Lane ({lane}) effect: {effect:+.2f}")
+            for value, effect in effects["value_effects"].items():
+                logger.info(f"  Tcvr Tx Eq ({value}) effect: {effect:+.2f}")
+            logger.info(f"Shared best result: Tcvr Tx Eq: {effects['shared_best']}")
+            for lane, (value, prbs_ber) in effects["per_lane_best"].items():
+                logger.info(f"Lane ({lane}) - Best result: Tcvr Tx Eq: {value}, PRBS BER: {prbs_ber}")
+            self.report_gen.record_effect_summary(port_name=port_pair.name, effects=effects)
+
+        await self.host_controlled_eq_search_on_port_pair(port_pair_obj, search)
+
+    async def successive_halving_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Successive halving search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.successive_halving_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def successive_halving_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: TxInputEqPortPair) -> None:
+            current_polynomial = self.prbs_polynomial
+
+            async def prepare_rung(rung: Rung) -> None:
+                nonlocal current_polynomial
+                if rung.polynomial != current_polynomial:
+                    await switch_prbs_polynomial(port_pair.tx_port, port_pair.rx_port, self.lanes, rung.polynomial, self.prbs_measurement_mode, self.logger_name)
+                    current_polynomial = rung.polynomial
+
+            async def evaluate(eq_value: int, lanes: List[int], rung: Rung) -> Dict[int, float]:
+                logger.info(f"Equalizer: {eq_value} on Lanes {lanes}")
+                prbs_bers = await port_pair.measure({lane: eq_value for lane in lanes}, rung.duration)
+                if rung.is_final and len(prbs_bers) > 0:
+                    # only the final round has the full measurement quality, so only it goes to the report
+                    for lane_ber_dict in prbs_bers:
+                        self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (eq_value,)))
+                    self.results.record(port_pair.module_identity, {lane_ber_dict["lane"]: (eq_value,) for lane_ber_dict in prbs_bers}, prbs_bers)
+                return {lane_ber_dict["lane"]: lane_ber_dict["prbs_ber"] for lane_ber_dict in prbs_bers}
+
+            results = await successive_halving(candidates=list(range(self.eq_min, self.eq_max+1)), lanes=self.lanes, evaluate=evaluate, config=self.successive_halving, final_duration=port_pair.prbs_duration, final_polynomial=self.prbs_polynomial, logger_name=self.logger_name, prepare_rung=prepare_rung, overhead=self.delay_after_eq_write + prbs_measurement_overhead(self.prbs_measurement_mode))
+
+            # find the best of each lane
+            logger.info(f"Final sorted results:")
+            for lane in self.lanes:
+                if len(results[lane]) > 0:
+                    for eq_value, prbs_ber in results[lane]:
+                        logger.info(f"Lane ({lane}) - Tcvr Tx Eq: {eq_value}, PRBS BER: {prbs_ber}")
+                    logger.info(f"Lane ({lane}) - Best result: Tcvr Tx Eq: {results[lane][0][0]}, PRBS BER: {results[lane][0][1]}")
+                else:
+                    logger.info(f"Lane ({lane}): No results found")
+
+        await self.host_controlled_eq_search_on_port_pair(port_pair_obj, search)
+
+    async def golden_section_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Golden-section search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.golden_section_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def golden_section_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: TxInputEqPortPair) -> None:
+            async def evaluate(lane_values: Dict[int, int]) -> Dict[int, Dict[str, Any]]:
+                prbs_bers = await port_pair.measure(lane_values, port_pair.prbs_duration)
+                for lane_ber_dict in prbs_bers:
+                    self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (lane_values[lane_ber_dict["lane"]],)))
+                if len(prbs_bers) > 0:
+                    self.results.record(port_pair.module_identity, {lane: (value,) for lane, value in lane_values.items()}, prbs_bers)
+                return {lane_ber_dict["lane"]: lane_ber_dict for lane_ber_dict in prbs_bers}
+
+            # narrow the search to the values around the best stored value of the part number, if the result store has one
+            eq_low, eq_high = self.eq_min, self.eq_max
+            warm_start = self.results.warm_start(port_pair.module_identity)
+            if warm_start is not None and self.results.store is not None:
+                window = self.results.store.config.tx_input_eq_window
+                eq_low, eq_high = max(self.eq_min, warm_start[0] - window), min(self.eq_max, warm_start[0] + window)
+                logger.info(f"Warm start from Equalizer {warm_start[0]}, search range [{eq_low}, {eq_high}]")
+
+            results = await run_lane_searches(lanes=self.lanes, make_search=lambda lane: golden_section_steps(eq_low, eq_high, self.local_search.refine_radius), evaluate=evaluate, logger_name=self.logger_name)
+
+            # find the best of each lane
+            logger.info(f"Final sorted results:")
+            for lane in self.lanes:
+                if len(results[lane]) > 0:
+                    for eq_value, prbs_ber in results[lane]:
+                        logger.info(f"Lane ({lane}) - Tcvr Tx Eq: {eq_value}, PRBS BER: {prbs_ber}")
+                    logger.info(f"Lane ({lane}) - Best result: Tcvr Tx Eq: {results[lane][0][0]}, PRBS BER: {results[lane][0][1]}")
                 else:
-                    logger.info(f"No results found")
+                    logger.info(f"Lane ({lane}): No results found")
+
+        await self.host_controlled_eq_search_on_port_pair(port_pair_obj, search)
+
+    async def q_factor_search(self, port_pair_list: List[dict]):
+        logger = logging.getLogger(self.logger_name)
+        logger.info(f"Q-factor search started")
+
+        # Get port pair objects list from port pair list
+        port_pair_obj_list = await convert_port_ids_to_objects(self.tester_objs, port_pair_list)
+
+        await run_port_pairs(port_pair_list, port_pair_obj_list, self.q_factor_search_on_port_pair, self.concurrency, self.logger_name)
+
+        # Generate report
+        logger.info(f"Generating test report...")
+        self.report_gen.generate_report()
+
+    async def q_factor_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort]):
+        logger = logging.getLogger(self.logger_name)
+
+        async def search(port_pair: TxInputEqPortPair) -> None:
+            # screen every EQ value on all lanes with a short window
+            candidates = list(range(self.eq_min, self.eq_max+1))
+            screening: Dict[int, List[LaneMeasurement]] = {lane: [] for lane in self.lanes}
+            for eq_value in candidates:
+                logger.info(f"Screening Equalizer: {eq_value} on Lanes {self.lanes} for {self.q_factor.short_duration}s")
+                for lane_ber_dict in await port_pair.measure({lane: eq_value for lane in self.lanes}, self.q_factor.short_duration):
+                    screening[lane_ber_dict["lane"]].append(LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (eq_value,)))
+
+            # fit the Q-factor model of each lane, and pick the value with the best predicted BER
+            winners: Dict[int, int] = {}
+            for lane in self.lanes:
+                if len(screening[lane]) == 0:
+                    logger.info(f"Lane ({lane}): No screening results found")
+                    continue
+                counts = [(measurement.setting[0], measurement.error_count, measurement.bit_count) for measurement in screening[lane]]
+                fit = fit_q_factor(counts, self.q_factor.min_errors, self.q_factor.max_residual_rms)
+                if fit is None:
+                    # no trusted fit: fall back to the middle of the error-free values, or to the lowest measured BER if every value has errors
+                    center = plateau_center(counts)
+                    if center is not None:
+                        logger.info(f"Lane ({lane}) - No Q-factor fit, middle of the error-free screened values: Tcvr Tx Eq: {center}")
+                        winners[lane] = center
+                        continue
+                    best = min(screening[lane], key=lambda x: x.prbs_ber)
+                    logger.info(f"Lane ({lane}) - No Q-factor fit, best screened result: Tcvr Tx Eq: {best.setting[0]}, PRBS BER: {best.prbs_ber}")
+                    winners[lane] = best.setting[0]
+                    continue
+                ranking = rank_by_q_factor([measurement.setting[0] for measurement in screening[lane]], fit)
+                logger.info(f"Lane ({lane}) - Q-factor fit on {fit.points} values, residual RMS {fit.residual_rms:.3f}")
+                for eq_value, predicted_ber in ranking[:3]:
+                    logger.info(f"Lane ({lane}) - Tcvr Tx Eq: {eq_value}, predicted PRBS BER: {'{0:.2e}'.format(predicted_ber)}")
+                winners[lane] = ranking[0][0]
+
+            # confirm the winner of each lane with a full window
+            if len(winners) > 0:
+                logger.info(f"Confirming {winners} for {port_pair.prbs_duration}s")
+                prbs_bers = await port_pair.measure(winners, port_pair.prbs_duration)
+                for lane_ber_dict in prbs_bers:
+                    self.report_gen.record_data(port_name=port_pair.name, measurement=LaneMeasurement.from_lane_ber_dict(lane_ber_dict, (winners[lane_ber_dict["lane"]],)))
+                    logger.info(f"Lane ({lane_ber_dict['lane']}) - Best result: Tcvr Tx Eq: {winners[lane_ber_dict['lane']]}, PRBS BER: {lane_ber_dict['prbs_ber']}")
+                if len(prbs_bers) > 0:
+                    self.results.record(port_pair.module_identity, {lane: (value,) for lane, value in winners.items()}, prbs_bers)
+
+        await self.host_controlled_eq_search_on_port_pair(port_pair_obj, search)
+
+    async def host_controlled_eq_search_on_port_pair(self, port_pair_obj: Dict[str, FreyaEdunPort], search: Callable[["TxInputEqPortPair"], Awaitable[None]]):
+        """Prepare a port pair for a search of the TX input EQ, run the search, and restore the port pair. The port pair is reserved and reset, PRBS is configured, and Host Controlled EQ is enabled on the lanes, so the search only needs :meth:`TxInputEqPortPair.measure` to apply EQ values and measure them. Host Controlled EQ is disabled after the search.
+        """
+        logger = logging.getLogger(self.logger_name)
+        tx_port_obj: FreyaEdunPort = port_pair_obj["tx"] # type: ignore
+        rx_port_obj: FreyaEdunPort = port_pair_obj["rx"] # type: ignore
+        tx_port_txt = f"Port {tx_port_obj.kind.module_id}/{tx_port_obj.kind.port_id}"
+        rx_port_txt = f"Port {rx_port_obj.kind.module_id}/{rx_port_obj.kind.port_id}"
+
+        logger.info(f"-- Port Pair: {tx_port_txt} -> {rx_port_txt} --")
+        logger.info(f"Reserving and reseting port pair")
+        with span("reserve_reset"):
+            await mgmt.reserve_ports(ports=[tx_port_obj, rx_port_obj], reset=True)
+        logger.info(f"Delay after reset: {self.delay_after_reset}s")
+        await phase_sleep("reset_delay", self.delay_after_reset)
+        prbs_duration = await get_prbs_duration(rx_port_obj, self.test_config.prbs_config, self.port_speed, self.logger_name)
+
+        # check if the transceiver supports TX Input EQ Host Control
+        if not await tx_input_eq_host_control_supported(rx_port_obj, self.logger_name):
+            logger.warning(f"TX Input EQ Host Control is not supported by {rx_port_txt}")
+            return
+
+        # configure prbs
+        await config_prbs([tx_port_obj, rx_port_obj], self.prbs_polynomial, self.logger_name)
+        module_identity = await self.results.identify(tx_port_obj)
+
+        # check if the module supports Reconfiguration
+        reconfig_supported = await check_eq_reconfig_support(rx_port_obj, self.logger_name)
+
+        if reconfig_supported == ReconfigurationSupport.Neither:
+            logger.warning(f"Neither Reconfiguration supported on {rx_port_txt}")
+            logger.warning(f"TX Input EQ Test Aborted!")
+            return
+
+        for lane in self.lanes:
+            _appsel_code, _dp_id, _explicit_ctrl = await dp_read(port=rx_port_obj, lane=lane, logger_name=self.logger_name)
+            await dp_write(port=rx_port_obj, lane=lane, appsel_code=_appsel_code, dp_id=_dp_id, explicit_ctrl=1, logger_name=self.logger_name, wait_policy=self.cmis_wait_policy)
+
+            # Enable Host Controlled EQ
+            await enable_host_controlled_eq(tx_port_obj, lane=lane, logger_name=self.logger_name, wait_policy=self.cmis_wait_policy)
+
+        # shadow copy of the staged control set, so each window needs only one register write
+        shadow = CmisShadowCache(tx_port_obj, self.logger_name)
+
+        async def measure(lane_values: Dict[int, int], duration: float) -> List[Dict[str, Any]]:
+            # Write the TX input EQ setting of each lane to the TX Input EQ registers.
+            await tx_input_eq_write_on_lanes(port=tx_port_obj, lane_values=list(lane_values.items()), logger_name=self.logger_name, shadow=shadow, wait_policy=self.cmis_wait_policy)
+
+            # Trigger the Provision-and-Commission procedure on the lanes and wait for the ConfigStatus
+            config_statuses = await apply_change_on_lanes(port=tx_port_obj, lanes=list(lane_values.keys()), logger_name=self.logger_name, reconfig_support=reconfig_supported, wait_policy=self.cmis_wait_policy)
+            success_lanes = self.log_config_statuses(config_statuses)
+            if len(success_lanes) == 0:
+                logger.info(f"Write operation failed. Skip the PRBS test.")
+                return []
+
+            # Wait for a certain duration to let the EQ settings take effect.
+            logger.info(f"Delay after EQ write: {self.delay_after_eq_write}s")
+            await settle_sleep(self.delay_after_eq_write)
+
+            # measure PRBS BER
+            return await measure_prbs_ber(tx_port=tx_port_obj, rx_port=rx_port_obj, lanes=success_lanes, duration=duration, measurement_mode=self.prbs_measurement_mode, logger_name=self.logger_name, lane_settings={lane: (value,) for lane, value in lane_values.items()})
+
+        if self.prbs_measurement_mode == "continuous":
+            await start_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+        await search(TxInputEqPortPair(
+            tx_port=tx_port_obj,
+            rx_port=rx_port_obj,
+            name=f"{tx_port_txt} --> {rx_port_txt}",
+            module_identity=module_identity,
+            prbs_duration=prbs_duration,
+            measure=measure))
+        if self.prbs_measurement_mode == "continuous":
+            await stop_prbs_on_lanes(tx_port_obj, self.lanes, self.logger_name)
+
+        # Disable Host Controlled EQ
+        for lane in self.lanes:
+            await disable_host_controlled_eq(tx_port_obj, lane=lane, logger_name=self.logger_name, wait_policy=self.cmis_wait_policy)
+        shadow.invalidate()
+
+    def log_config_statuses(self, config_statuses: Dict[int, ConfigStatus]) -> List[int]:
+        """Log the ConfigStatus of each lane, and return the lanes where the write is successful
+        """
+        logger = logging.getLogger(self.logger_name)
+        success_lanes = []
+        for lane, config_status in config_statuses.items():
+            if config_status == ConfigStatus.ConfigSuccess:
+                logger.info(f"  Lane {lane}: Write operation successful")
+                success_lanes.append(lane)
+            else:
+                logger.info(f"  Lane {lane}: Write operation failed. (ConfigStatus is {config_status.name})")
+        return success_lanes
     
     async def run(self):
-        self.validate_lane()
+        self.validate_lanes()
         self.validate_transceiver_eq_config()
         await self.config_modules()
-        await self.exhaustive_search(self.port_pair_list)        
+        if self.optimize_mode == "exhaustive":
+            await self.exhaustive_search(self.port_pair_list)
+        elif self.optimize_mode == "lane_multiplexed":
+            await self.lane_multiplexed_search(self.port_pair_list)
+        elif self.optimize_mode == "successive_halving":
+            await self.successive_halving_search(self.port_pair_list)
+        elif self.optimize_mode == "golden_section":
+            await self.golden_section_search(self.port_pair_list)
+        elif self.optimize_mode == "q_factor":
+            await self.q_factor_search(self.port_pair_list)
+        else:
+            logger = logging.getLogger(self.logger_name)
+            logger.error(f"Invalid search mode: {self.optimize_mode}. Supported modes are 'exhaustive', 'lane_multiplexed', 'successive_halving', 'golden_section' and 'q_factor'.")        
     
\ No newline at end of file
@@ -0,0 +1,312 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+from typing import List, Tuple, Sequence, Iterator
+import random
+
+
+# *************************************************************************************
+# func: serpentine_order
+# description: Order the points of a grid so that consecutive points differ in one axis
+# *************************************************************************************
+def serpentine_order(axes: Sequence[Sequence[int]]) -> List[Tuple[int, ...]]:
+    """Order the points of a grid so that consecutive points differ in exactly one axis, by one step (reflected mixed-radix Gray code).
+
+    The first axis changes the slowest and the last axis the fastest. Every other pass over an inner axis runs backwards, e.g. for axes [[0, 1], [0, 1, 2]]: (0,0), (0,1), (0,2), (1,2), (1,1), (1,0).
+
+    :param axes: The values of each axis
+    :type axes: Sequence[Sequence[int]]
+    :return: List of grid points
+    :rtype: List[Tuple[int, ...]]
+    """
+    if len(axes) == 0:
+        return [()]
+    inner = serpentine_order(axes[1:])
+    result: List[Tuple[int, ...]] = []
+    for i, value in enumerate(axes[0]):
+        sequence = inner if i % 2 == 0 else inner[::-1]
+        result.extend((value,) + point for point in sequence)
+    return result
+
+
+# *************************************************************************************
+# func: count_axis_changes
+# description: Count how many axis values change along a sequence of grid points
+# *************************************************************************************
+def count_axis_changes(points: Sequence[Tuple[int, ...]]) -> int:
+    """Count how many axis values change along a sequence of grid points. The first point counts as a change of every axis.
+
+    :param points: The sequence of grid points
+    :type points: Sequence[Tuple[int, ...]]
+    :return: Total number of axis value changes
+    :rtype: int
+    """
+    changes = 0
+    previous = None
+    for point in points:
+        if previous is None:
+            changes += len(point)
+        else:
+            changes += sum(1 for a, b in zip(previous, point) if a != b)
+        previous = point
+    return changes
+
+
+# *************************************************************************************
+# func: plan_rx_output_eq_sweep
+# description: Plan the order of the (amplitude, precursor, postcursor) grid
+# *************************************************************************************
+def plan_rx_output_eq_sweep(amp_range: Tuple[int, int], pre_range: Tuple[int, int], post_range: Tuple[int, int]) -> List[Tuple[int, int, int]]:
+    """Plan the order of the (amplitude, precursor, postcursor) grid, so that only one cursor changes between two consecutive grid points.
+
+    :param amp_range: (min, max) of amplitude
+    :type amp_range: Tuple[int, int]
+    :param pre_range: (min, max) of precursor
+    :type pre_range: Tuple[int, int]
+    :param post_range: (min, max) of postcursor
+    :type post_range: Tuple[int, int]
+    :return: List of (amplitude, precursor, postcursor)
+    :rtype: List[Tuple[int, int, int]]
+    """
+    axes = [
+        list(range(amp_range[0], amp_range[1]+1)),
+        list(range(pre_range[0], pre_range[1]+1)),
+        list(range(post_range[0], post_range[1]+1)),
+    ]
+    return serpentine_order(axes) # type: ignore
+
+
+# *************************************************************************************
+# func: plan_lane_rotation
+# description: Assign candidate values to lanes, rotating the assignment across windows
+# *************************************************************************************
+def plan_lane_rotation(lanes: Sequence[int], values: Sequence[int]) -> List[List[Tuple[int, int]]]:
+    """Assign candidate values to lanes, rotating the assignment across measurement windows (cyclic Latin square), so that every lane sees every value once.
+
+    In window w, the i-th lane gets the value at index (i + w) mod len(values). This needs len(values) windows, each evaluating up to len(lanes) different values at the same time.
+
+    :param lanes: Lanes to assign values to
+    :type lanes: Sequence[int]
+    :param values: Candidate values
+    :type values: Sequence[int]
+    :return: List of windows, each a list of (lane, value)
+    :rtype: List[List[Tuple[int, int]]]
+    """
+    windows: List[List[Tuple[int, int]]] = []
+    for w in range(len(values)):
+        windows.append([(lane, values[(i + w) % len(values)]) for i, lane in enumerate(lanes)])
+    return windows
+
+
+# *************************************************************************************
+# func: iter_joint_txeq_sweep
+# description: Enumerate the joint tap values that fit a tap value sum limit
+# *************************************************************************************
+def iter_joint_txeq_sweep(axes: Sequence[Sequence[int]], max_abs_sum: int) -> Iterator[Tuple[int, ...]]:
+    """Enumerate the joint values of several taps whose absolute values sum to at most ``max_abs_sum``, in serpentine order.
+
+    Infeasible branches are pruned during the enumeration, so the full product of the axes is never built. Each axis reverses its direction after every pass that yields a point, so consecutive points usually differ in one tap by one step, as with :func:`serpentine_order`. A pruned branch can make a jump. An empty axis gives no point.
+
+    :param axes: The values of each tap, in ascending order
+    :type axes: Sequence[Sequence[int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values, e.g. the tap value sum limit of the port minus the sum of the taps not in the sweep
+    :type max_abs_sum: int
+    :return: Iterator of tap value tuples
+    :rtype: Iterator[Tuple[int, ...]]
+    """
+    if any(len(axis) == 0 for axis in axes):
+        return iter(())
+    # the smallest absolute sum the remaining axes can have, to prune early
+    min_rest = [0] * (len(axes) + 1)
+    for depth in range(len(axes) - 1, -1, -1):
+        min_rest[depth] = min_rest[depth + 1] + min(abs(v) for v in axes[depth])
+    forward = [True] * len(axes)
+
+    def walk(depth: int, budget: int) -> Iterator[Tuple[int, ...]]:
+        if depth == len(axes):
+            yield ()
+            return
+        values = axes[depth] if forward[depth] else list(reversed(axes[depth]))
+        yielded = False
+        for value in values:
+            if abs(value) + min_rest[depth + 1] > budget:
+                continue
+            for rest in walk(depth + 1, budget - abs(value)):
+                yielded = True
+                yield (value,) + rest
+        if yielded:
+            forward[depth] = not forward[depth]
+
+    if min_rest[0] > max_abs_sum:
+        return iter(())
+    return walk(0, max_abs_sum)
+
+
+# *************************************************************************************
+# func: count_joint_txeq_sweep
+# description: Count the joint tap values that fit a tap value sum limit
+# *************************************************************************************
+def count_joint_txeq_sweep(axes: Sequence[Sequence[int]], max_abs_sum: int) -> int:
+    """Count the joint values of several taps whose absolute values sum to at most ``max_abs_sum``, without enumerating them.
+
+    :param axes: The values of each tap
+    :type axes: Sequence[Sequence[int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values
+    :type max_abs_sum: int
+    :return: Number of tap value tuples
+    :rtype: int
+    """
+    if max_abs_sum < 0:
+        return 0
+    # ways[s] = number of partial tuples with absolute sum s
+    ways = [0] * (max_abs_sum + 1)
+    ways[0] = 1
+    for axis in axes:
+        new_ways = [0] * (max_abs_sum + 1)
+        for total, count in enumerate(ways):
+            if count == 0:
+                continue
+            for value in axis:
+                if total + abs(value) <= max_abs_sum:
+                    new_ways[total + abs(value)] += count
+        ways = new_ways
+    return sum(ways)
+
+
+# *************************************************************************************
+# func: serpentine_rank
+# description: Position of a grid point in the serpentine order of the full grid
+# *************************************************************************************
+def serpentine_rank(point: Tuple[int, ...], axes: Sequence[Sequence[int]]) -> int:
+    """Position of a grid point in :func:`serpentine_order` of the full grid, without building the order
+
+    :param point: The grid point
+    :type point: Tuple[int, ...]
+    :param axes: The values of each axis
+    :type axes: Sequence[Sequence[int]]
+    :return: Position, from 0
+    :rtype: int
+    """
+    if len(axes) == 0:
+        return 0
+    inner_size = 1
+    for axis in axes[1:]:
+        inner_size *= len(axis)
+    i = list(axes[0]).index(point[0])
+    inner_rank = serpentine_rank(point[1:], axes[1:])
+    return i * inner_size + (inner_rank if i % 2 == 0 else inner_size - 1 - inner_rank)
+
+
+# *************************************************************************************
+# func: sample_joint_txeq_sweep
+# description: Draw random joint tap values that fit a tap value sum limit
+# *************************************************************************************
+def sample_joint_txeq_sweep(axes: Sequence[Sequence[int]], max_abs_sum: int, count: int, seed: int = 0) -> List[Tuple[int, ...]]:
+    """Draw ``count`` different joint tap values, uniformly among those whose absolute values sum to at most ``max_abs_sum``, and order them as in the serpentine order of the full grid, so consecutive points stay close.
+
+    Each tap value is drawn with a weight equal to the number of feasible completions of the remaining taps, which gives every feasible point the same probability without enumerating them.
+
+    :param axes: The values of each tap
+    :type axes: Sequence[Sequence[int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values
+    :type max_abs_sum: int
+    :param count: Number of points, at most the number of feasible points
+    :type count: int
+    :param seed: Seed of the random sample
+    :type seed: int
+    :return: List of tap value tuples
+    :rtype: List[Tuple[int, ...]]
+    """
+    # completions[d][b] = number of feasible values of axes d.. with an absolute sum of at most b
+    completions = [[1] * (max_abs_sum + 1)]
+    for axis in reversed(axes):
+        previous = completions[0]
+        completions.insert(0, [sum(previous[b - abs(v)] for v in axis if abs(v) <= b) for b in range(max_abs_sum + 1)])
+    rng = random.Random(seed)
+    points = set()
+    while len(points) < min(count, completions[0][max_abs_sum]):
+        budget = max_abs_sum
+        point = []
+        for depth, axis in enumerate(axes):
+            weights = [completions[depth + 1][budget - abs(v)] if abs(v) <= budget else 0 for v in axis]
+            value = rng.choices(axis, weights=weights)[0]
+            point.append(value)
+            budget -= abs(value)
+        points.add(tuple(point))
+    return sorted(points, key=lambda p: serpentine_rank(p, axes))
+
+
+# *************************************************************************************
+# func: plan_joint_txeq_sweep
+# description: Plan a joint sweep of several taps, sampled if it is too large
+# *************************************************************************************
+def plan_joint_txeq_sweep(axes: Sequence[Sequence[int]], max_abs_sum: int, max_candidates: int = 0, seed: int = 0) -> List[Tuple[int, ...]]:
+    """Plan a joint sweep of several taps within a tap value sum limit, in serpentine order. If there are more than ``max_candidates`` feasible points, a uniform random sample of ``max_candidates`` points is kept, see :func:`sample_joint_txeq_sweep`.
+
+    :param axes: The values of each tap, in ascending order
+    :type axes: Sequence[Sequence[int]]
+    :param max_abs_sum: The maximum sum of the absolute tap values
+    :type max_abs_sum: int
+    :param max_candidates: The maximum number of points. 0 means no limit.
+    :type max_candidates: int
+    :param seed: Seed of the random sample
+    :type seed: int
+    :return: List of tap value tuples
+    :rtype: List[Tuple[int, ...]]
+    """
+    total = count_joint_txeq_sweep(axes, max_abs_sum)
+    if max_candidates <= 0 or total <= max_candidates:
+        return list(iter_joint_txeq_sweep(axes, max_abs_sum))
+    return sample_joint_txeq_sweep(axes, max_abs_sum, max_candidates, seed)
+
+
+# *************************************************************************************
+# func: plan_txeq_axis
+# description: The values of one tap in a joint sweep
+# *************************************************************************************
+def plan_txeq_axis(low: int, high: int, step: int = 1) -> List[int]:
+    """The values of one tap in a joint sweep, from ``low`` to ``high`` by ``step``. ``high`` is always included, so the whole range is covered.
+
+    :param low: The lowest value
+    :type low: int
+    :param high: The highest value
+    :type high: int
+    :param step: The step between two values
+    :type step: int
+    :return: List of values
+    :rtype: List[int]
+    """
+    if step < 1:
+        raise ValueError(f"step must be at least 1, got {step}")
+    values = list(range(low, high + 1, step))
+    if len(values) > 0 and values[-1] != high:
+        values.append(high)
+    return values
+
+
+# *************************************************************************************
+# func: plan_tap_values
+# description: Evenly spaced values of one tap through a start value
+# *************************************************************************************
+def plan_tap_values(low: int, high: int, start: int, max_values: int) -> List[int]:
+    """Evenly spaced values of one tap from ``low`` to ``high``, through ``start``, so a search of the values never loses the start value. The step is the smallest that spreads ``max_values`` values over the range, so there are at most ``max_values`` + 1 values, e.g. 40 to 168 with 16 values is stepped by 9.
+
+    :param low: The lowest value
+    :type low: int
+    :param high: The highest value
+    :type high: int
+    :param start: The value the steps go through. A start value outside the range is replaced by the nearest end of the range.
+    :type start: int
+    :param max_values: The largest number of values, 0 for every value of the range
+    :type max_values: int
+    :return: List of values, in increasing order
+    :rtype: List[int]
+    """
+    if high < low:
+        return []
+    if max_values < 1 or high - low + 1 <= max_values:
+        return list(range(low, high + 1))
+    step = -(-(high - low) // max(1, max_values - 1))
+    anchor = min(max(start, low), high)
+    return sorted(set(range(anchor, low - 1, -step)) | set(range(anchor, high + 1, step)))
@@ -0,0 +1,273 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+RUN_SCOPE = "run"
+"""
+Scope of the spans outside the port pairs, e.g. connect and module configuration
+"""
+
+_current_timer: contextvars.ContextVar[Optional["PhaseTimer"]] = contextvars.ContextVar("xoa_cpom_phase_timer", default=None)
+_current_scope: contextvars.ContextVar[str] = contextvars.ContextVar("xoa_cpom_phase_scope", default=RUN_SCOPE)
+_current_path: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("xoa_cpom_phase_path", default=())
+
+
+@dataclass
+class Span:
+    scope: str                  # port pair, or RUN_SCOPE
+    path: Tuple[str, ...]       # names of the enclosing spans and this span
+    start: float                # event loop time, in seconds
+    end: float
+    task: int                   # index of the asyncio task that ran the span
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+# *************************************************************************************
+# class: PhaseTimer
+# description: Collect the timed phases of a test run
+# *************************************************************************************
+class PhaseTimer:
+    """Collect the timed phases (spans) of a test run, using the event loop clock, so a run in simulated time is timed in simulated time.
+
+    Spans nest: a span started inside another span, also in a task created inside it, is its child. Each span belongs to the port pair it ran for, see :func:`port_pair_scope`.
+    """
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.counters: Dict[str, Dict[str, int]] = {}
+        """
+        Event counts by scope and by name, see :func:`count_event`
+        """
+        self.listeners: List[Callable[[Span], None]] = []
+        """
+        Functions called with every span that ends
+        """
+        self.start = asyncio.get_running_loop().time()
+        self.__tasks: Dict[int, int] = {}
+
+    def now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def task_index(self) -> int:
+        task = asyncio.current_task()
+        key = id(task) if task is not None else 0
+        if key not in self.__tasks:
+            self.__tasks[key] = len(self.__tasks)
+        return self.__tasks[key]
+
+    def breakdown(self) -> Dict[str, Dict[Tuple[str, ...], Tuple[int, float]]]:
+        """Aggregate the spans by port pair and by path
+
+        :return: Dictionary of {scope: {path: (count, total seconds)}}, in the order the paths first ran
+        :rtype: Dict[str, Dict[Tuple[str, ...], Tuple[int, float]]]
+        """
+        result: Dict[str, Dict[Tuple[str, ...], Tuple[int, float]]] = {}
+        for span in sorted(self.spans, key=lambda x: x.start):
+            paths = result.setdefault(span.scope, {})
+            count, total = paths.get(span.path, (0, 0.0))
+            paths[span.path] = (count + 1, total + span.duration)
+        return result
+
+    def format_breakdown(self) -> List[str]:
+        """Format the breakdown as lines of text. Each phase shows its count, total and mean time, and its share of the time of its port pair (or of the whole run). Child phases are indented under their parents, and the time of a phase includes its children.
+        """
+        run_time = self.now() - self.start
+        lines = [f"Time breakdown by phase, {run_time:.1f}s in total:"]
+        lines.append(f"  {'phase':<40}{'count':>8}{'total (s)':>12}{'mean (s)':>12}{'share':>8}")
+        breakdown = self.breakdown()
+        for scope in [RUN_SCOPE] + sorted(scope for scope in breakdown if scope != RUN_SCOPE):
+            if scope not in breakdown:
+                continue
+            paths = breakdown[scope]
+            # the time base of a port pair is the time of its top level spans
+            base = run_time if scope == RUN_SCOPE else sum(total for path, (_, total) in paths.items() if len(path) == 1)
+            counters = "".join(f", {name}: {count}" for name, count in self.counters.get(scope, {}).items())
+            lines.append(f"  [{scope}]{counters}")
+            # children right after their parent, siblings in the order they first ran
+            order = {path: i for i, path in enumerate(paths)}
+            for path in sorted(paths, key=lambda p: tuple(order.get(p[:i + 1], -1) for i in range(len(p)))):
+                count, total = paths[path]
+                name = "  " * (len(path) - 1) + path[-1]
+                share = f"{100.0 * total / base:.1f}%" if base > 0 else "-"
+                lines.append(f"  {name:<40}{count:>8}{total:>12.2f}{total / count:>12.3f}{share:>8}")
+        return lines
+
+    def save_chrome_traces(self, path: str, prefix: str = "xena_cpom_trace") -> List[str]:
+        """Save a Chrome trace-event JSON timeline per port pair, and one for the spans outside the port pairs. Open them in chrome://tracing or https://ui.perfetto.dev. Each asyncio task is a thread of the timeline.
+
+        :param path: Directory of the files
+        :type path: str
+        :param prefix: File name prefix, defaults to "xena_cpom_trace"
+        :type prefix: str, optional
+        :return: File paths
+        :rtype: List[str]
+        """
+        filenames = []
+        for scope in sorted(set(span.scope for span in self.spans)):
+            events = []
+            for span in sorted((span for span in self.spans if span.scope == scope), key=lambda x: x.start):
+                events.append({
+                    "name": span.path[-1],
+                    "cat": span.path[0],
+                    "ph": "X",
+                    "ts": round((span.start - self.start) * 1e6, 1),
+                    "dur": round(span.duration * 1e6, 1),
+                    "pid": 1,
+                    "tid": span.task,
+                    "args": dict(span.args, path=" > ".join(span.path)),
+                })
+            filename = os.path.join(path, f"{prefix}_{re.sub(r'[^0-9A-Za-z]+', '_', scope).strip('_')}.json")
+            with open(filename, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"scope": scope}}, f)
+            filenames.append(filename)
+        return filenames
+
+
+# *************************************************************************************
+# func: set_phase_timer
+# description: Set the phase timer of the current context
+# *************************************************************************************
+def set_phase_timer(timer: Optional[PhaseTimer]) -> contextvars.Token:
+    """Set the phase timer of the current context, and of the tasks created in it. No span is recorded without a timer.
+
+    :param timer: The phase timer, or None to stop timing
+    :type timer: Optional[PhaseTimer]
+    :return: Token to restore the previous timer with ``reset_phase_timer()``
+    :rtype: contextvars.Token
+    """
+    return _current_timer.set(timer)
+
+def reset_phase_timer(token: contextvars.Token) -> None:
+    _current_timer.reset(token)
+
+
+# *************************************************************************************
+# func: span
+# description: Time a phase
+# *************************************************************************************
+@contextlib.contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    """Time a phase, e.g. ``with span("prbs_window", lanes=lanes):``. Does nothing if no phase timer is set.
+
+    :param name: Phase name
+    :type name: str
+    :param args: Details shown in the Chrome trace
+    :type args: Any
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    path = _current_path.get() + (name,)
+    token = _current_path.set(path)
+    start = timer.now()
+    try:
+        yield
+    finally:
+        ended = Span(scope=_current_scope.get(), path=path, start=start, end=timer.now(), task=timer.task_index(), args=args)
+        timer.spans.append(ended)
+        _current_path.reset(token)
+        for listener in timer.listeners:
+            listener(ended)
+
+
+# *************************************************************************************
+# func: count_event
+# description: Count an event in the current scope
+# *************************************************************************************
+def count_event(name: str, count: int = 1) -> None:
+    """Count an event, e.g. a command round trip, in the current port pair (or run) scope. Does nothing if no phase timer is set.
+
+    :param name: Event name
+    :type name: str
+    :param count: Number of events, defaults to 1
+    :type count: int, optional
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return
+    counters = timer.counters.setdefault(_current_scope.get(), {})
+    counters[name] = counters.get(name, 0) + count
+
+
+# *************************************************************************************
+# func: port_pair_scope
+# description: Attribute the spans of a block to a port pair
+# *************************************************************************************
+@contextlib.contextmanager
+def port_pair_scope(port_pair: Dict[str, str]) -> Iterator[None]:
+    """Attribute the spans of a block to a port pair, and time the block as the "port_pair" phase
+
+    :param port_pair: The port pair as defined in the config file, {"tx": "chassis_ip:m/p", "rx": "chassis_ip:m/p"}
+    :type port_pair: Dict[str, str]
+    """
+    scope_token = _current_scope.set(f"{port_pair['tx']} -> {port_pair['rx']}")
+    path_token = _current_path.set(())
+    try:
+        with span("port_pair"):
+            yield
+    finally:
+        _current_path.reset(path_token)
+        _current_scope.reset(scope_token)
+
+def current_scope() -> str:
+    """The port pair of the current context, "tx -> rx", or RUN_SCOPE outside the port pairs
+    """
+    return _current_scope.get()
+
+
+# *************************************************************************************
+# func: timed
+# description: Decorator that times every call of a function as a phase
+# *************************************************************************************
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator that times every call of a function, or of a coroutine function, as a phase
+
+    :param name: Phase name
+    :type name: str
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper # type: ignore
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# *************************************************************************************
+# func: phase_sleep
+# description: Sleep as a timed phase
+# *************************************************************************************
+async def phase_sleep(name: str, seconds: float) -> None:
+    """Sleep as a timed phase, e.g. the delay after a reset or after an EQ write
+
+    :param name: Phase name
+    :type name: str
+    :param seconds: Sleep time in seconds
+    :type seconds: float
+    """
+    with span(name):
+        await asyncio.sleep(seconds)
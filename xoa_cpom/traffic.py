@@ -0,0 +1,543 @@
+# *************************************
+# author: leonard.yu@teledyne.com
+# *************************************
+
+import asyncio
+import enum
+import importlib
+import json
+import re
+import statistics
+import time
+from types import SimpleNamespace
+from xoa_driver import enums
+from .simulator import SimulatedConnection, SimulatedToken
+from typing import List, Dict, Any, Tuple, Optional, FrozenSet, Callable
+
+# *************************************************************************************
+# func: encode_value / decode_value
+# description: Convert driver values to and from JSON
+# *************************************************************************************
+def encode_value(value: Any) -> Any:
+    """Convert a command argument or response to JSON. Enums keep their class name, and responses become a dictionary of their fields.
+    """
+    if isinstance(value, enum.Enum):
+        return {"enum": type(value).__name__, "name": value.name}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "to_dict"):
+        return {"fields": encode_value(value.to_dict())}
+    if isinstance(value, SimpleNamespace):
+        return {"fields": encode_value(vars(value))}
+    return repr(value)
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        if "enum" in value and "name" in value:
+            enum_class = getattr(enums, value["enum"], None)
+            return enum_class[value["name"]] if enum_class is not None else value["name"]
+        if "fields" in value:
+            return SimpleNamespace(**{k: decode_value(v) for k, v in value["fields"].items()})
+        return {k: decode_value(v) for k, v in value.items()}
+    return value
+
+def is_plain(value: Any) -> bool:
+    if value is None or isinstance(value, (bool, int, float, str, enum.Enum)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_plain(v) for v in value)
+    return False
+
+def call_path(path: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """Path of a method call, e.g. ``10.0.0.1/modules/obtain(3)``, which identifies the command in a recording
+    """
+    texts = [json.dumps(encode_value(arg)) for arg in args] + [f"{key}={json.dumps(encode_value(value))}" for key, value in kwargs.items()]
+    return f"{path}({', '.join(texts)})"
+
+CMIS_ACCESS = re.compile(r'^(?P<port>.*)/transceiver/access_rw_seq\(page_address=(?P<page>\d+), register_address=(?P<register>\d+), byte_count=(?P<count>\d+)\)/(?P<method>get|set)\((?:value="(?P<value>[0-9A-Fa-f]*)")?\)$')
+
+def parse_cmis_access(command: str) -> Optional[Tuple[str, int, int, int, str, Optional[str]]]:
+    """Parse a CMIS register command into (port, page, register, byte count, "get" or "set", written value). None if the command is not a CMIS register command.
+    """
+    match = CMIS_ACCESS.match(command)
+    if match is None:
+        return None
+    return match["port"], int(match["page"]), int(match["register"]), int(match["count"]), match["method"], match["value"]
+
+def split_bytes(value: str) -> List[str]:
+    return [value[i:i + 2].upper() for i in range(0, len(value), 2)]
+
+def generic_path(path: str) -> str:
+    """Path with the CMIS register range and the written value replaced by ``*``"""
+    path = re.sub(r"access_rw_seq\([^)]*\)", "access_rw_seq(*)", path)
+    return re.sub(r"/set\(value=[^)]*\)$", "/set(*)", path)
+
+CHANNEL_SETTINGS = ("/config/media/set", "/config/port_speed/set", "/layer1/prbs_config/set", "/medium/tx/native/set")
+"""
+Set commands that change the channel, besides the CMIS register writes. Other set commands, e.g. PRBS on/off, counter clear, reservation and reset, are actions that do not change the state of a replay.
+"""
+
+def cmis_byte_setting(port: str, page: int, register: int) -> str:
+    return f"{port}/cmis/{page}:{register}"
+
+def channel_settings(command: str) -> List[Tuple[str, str]]:
+    """Channel settings changed by a command, as (setting, value). A set command changes one setting, e.g. ``.../native/set`` to ``tap_values=[...])``, and a CMIS register write changes one setting per byte.
+    """
+    access = parse_cmis_access(command)
+    if access is not None:
+        port, page, register, _, method, value = access
+        if method != "set" or value is None:
+            return []
+        return [(cmis_byte_setting(port, page, register + i), byte) for i, byte in enumerate(split_bytes(value))]
+    head, _, args = command.rpartition("(")
+    if not head.endswith(CHANNEL_SETTINGS):
+        return []
+    return [(head, args)]
+
+
+# *************************************************************************************
+# class: TrafficRecorder
+# description: Record the commands and responses between the tests and the testers
+# *************************************************************************************
+class TrafficRecorder:
+    """Record the commands and responses between the tests and the testers. :func:`wrap` puts a recording proxy around a tester object, which records every command sent through it (with the time it was sent, the round trip it was sent in and the response time), and every attribute read from it, e.g. the module and port information read at connect.
+
+    The recording can be served by :class:`TrafficReplay`.
+    """
+    def __init__(self) -> None:
+        self.kinds: Dict[str, str] = {}         # path -> "method", "token", "coroutine", "list" or "object:<module>:<class>"
+        self.attributes: Dict[str, List[List[Any]]] = {}    # path -> [[number of commands before the read, value], ...], one item per change of the value
+        self.commands: List[Dict[str, Any]] = []
+        self.batch_count = 0
+        self.__proxies: Dict[str, "RecordingProxy"] = {}
+        self.__pending: Dict[int, List[Dict[str, Any]]] = {}
+        self.__start: Optional[float] = None
+
+    def wrap(self, target: Any, path: str) -> Any:
+        """Wrap a tester object in a recording proxy
+
+        :param target: The tester object
+        :type target: Any
+        :param path: Name of the tester in the recording, e.g. the chassis IP address
+        :type path: str
+        :return: The recording proxy, to be used instead of the tester object
+        :rtype: Any
+        """
+        if is_plain(target):
+            self.set_attribute(path, target)
+            return target
+        if path not in self.__proxies:
+            if isinstance(target, (list, tuple)):
+                self.kinds[path] = "list"
+            else:
+                self.kinds[path] = f"object:{type(target).__module__}:{type(target).__qualname__}"
+            self.__proxies[path] = RecordingProxy(self, target, path)
+        return self.__proxies[path]
+
+    def set_attribute(self, path: str, value: Any) -> None:
+        value = encode_value(value)
+        history = self.attributes.setdefault(path, [])
+        if len(history) == 0 or history[-1][1] != value:
+            history.append([len(self.commands), value])
+
+    def now(self) -> float:
+        now = asyncio.get_running_loop().time()
+        if self.__start is None:
+            self.__start = now
+        return now - self.__start
+
+    def add_command(self, command: str) -> Dict[str, Any]:
+        entry = {"seq": len(self.commands), "command": command, "time": self.now()}
+        self.commands.append(entry)
+        return entry
+
+    def complete(self, entry: Dict[str, Any], result: Any = None, error: Optional[BaseException] = None) -> None:
+        entry["latency"] = self.now() - entry["time"]
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        else:
+            entry["response"] = encode_value(result)
+
+    def prepared(self, connection: Any, entry: Dict[str, Any]) -> None:
+        self.__pending.setdefault(id(connection), []).append(entry)
+
+    def sent(self, connection: Any) -> None:
+        for entry in self.__pending.pop(id(connection), []):
+            entry["batch"] = self.batch_count
+        self.batch_count += 1
+
+    def save(self, filename: str) -> None:
+        """Save the recording as JSON
+
+        :param filename: File path
+        :type filename: str
+        """
+        with open(filename, "w") as f:
+            json.dump({
+                "version": 1,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+                "kinds": self.kinds,
+                "attributes": self.attributes,
+                "commands": self.commands,
+            }, f, indent=1)
+
+
+class RecordingProxy:
+    """Proxy of a tester object that records the commands sent through it. ``isinstance()`` sees the class of the wrapped object."""
+    def __init__(self, recorder: TrafficRecorder, target: Any, path: str) -> None:
+        object.__setattr__(self, "_recorder", recorder)
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_path", path)
+
+    @property
+    def __class__(self):  # type: ignore
+        return type(self._target)
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._target, name)
+        path = f"{self._path}/{name}"
+        if callable(value) and not isinstance(value, (list, tuple)):
+            self._recorder.kinds[path] = "method"
+            return RecordingMethod(self._recorder, value, path)
+        return self._recorder.wrap(value, path)
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._recorder.wrap(self._target[index], f"{self._path}[{index}]")
+
+    def __len__(self) -> int:
+        length = len(self._target)
+        self._recorder.set_attribute(f"{self._path}/__len__", length)
+        return length
+
+    def __iter__(self):
+        # the items are recorded by position, so the replay can iterate collections that cannot be indexed
+        items = list(self._target)
+        self._recorder.set_attribute(f"{self._path}/__len__", len(items))
+        return iter([self._recorder.wrap(item, f"{self._path}[{i}]") for i, item in enumerate(items)])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0 if isinstance(self._target, (list, tuple)) else bool(self._target)
+
+    def __repr__(self) -> str:
+        return repr(self._target)
+
+
+class RecordingMethod:
+    """Method of a tester object. Commands (tokens) and coroutines it returns are recorded, other results are wrapped."""
+    def __init__(self, recorder: TrafficRecorder, method: Callable[..., Any], path: str) -> None:
+        self.recorder = recorder
+        self.method = method
+        self.path = path
+
+    def __call__(self, *args, **kwargs) -> Any:
+        args = tuple(arg._target if isinstance(arg, RecordingProxy) else arg for arg in args)
+        result = self.method(*args, **kwargs)
+        command = call_path(self.path, args, kwargs)
+        if hasattr(result, "connection") and hasattr(result, "request") and hasattr(result, "__await__"):
+            self.recorder.kinds[command] = "token"
+            return RecordingToken(self.recorder, result, command)
+        if asyncio.iscoroutine(result):
+            self.recorder.kinds[command] = "coroutine"
+            return self.__record_coroutine(result, command)
+        if isinstance(result, (list, tuple)) and not is_plain(result):
+            self.recorder.kinds[command] = "list"
+            self.recorder.set_attribute(f"{command}/__len__", len(result))
+            return [self.recorder.wrap(item, f"{command}[{i}]") for i, item in enumerate(result)]
+        return self.recorder.wrap(result, command)
+
+    async def __record_coroutine(self, coro: Any, command: str) -> Any:
+        entry = self.recorder.add_command(command)
+        try:
+            result = await coro
+        except Exception as e:
+            self.recorder.complete(entry, error=e)
+            raise
+        self.recorder.complete(entry, result)
+        return result
+
+
+class RecordingConnection:
+    """Connection of a recorded command, which records the command when ``xoa_driver.utils.apply`` sends it and the response when it arrives"""
+    def __init__(self, recorder: TrafficRecorder, connection: Any, command: str) -> None:
+        self.recorder = recorder
+        self.connection = connection
+        self.command = command
+
+    async def prepare_data(self, request: Any) -> Tuple[bytes, asyncio.Future]:
+        data, future = await self.connection.prepare_data(request)
+        entry = self.recorder.add_command(self.command)
+        self.recorder.prepared(self.connection, entry)
+
+        def on_done(fut: asyncio.Future) -> None:
+            if fut.cancelled():
+                return
+            if fut.exception() is not None:
+                self.recorder.complete(entry, error=fut.exception())
+            else:
+                self.recorder.complete(entry, fut.result())
+        future.add_done_callback(on_done)
+        return data, future
+
+    def send(self, data: bytes) -> None:
+        self.recorder.sent(self.connection)
+        self.connection.send(data)
+
+
+class RecordingToken:
+    """A recorded command. Await it to send it alone, or pass several to ``xoa_driver.utils.apply`` to send them in one round trip."""
+    def __init__(self, recorder: TrafficRecorder, token: Any, command: str) -> None:
+        self.connection = RecordingConnection(recorder, token.connection, command)
+        self.request = token.request
+
+    def __await__(self):
+        return self.__ask().__await__()
+
+    async def __ask(self) -> Any:
+        data, future = await self.connection.prepare_data(self.request)
+        self.connection.send(data)
+        return await future
+
+
+# *************************************************************************************
+# class: TrafficReplay
+# description: Serve a recording of the tester traffic in place of the testers
+# *************************************************************************************
+class TrafficReplay:
+    """Serve a recording made by :class:`TrafficRecorder` in place of the testers, so a test can be re-run without the chassis, e.g. with a modified search.
+
+    A command gets the response recorded for the same command in the same state. The state is the last value of every channel setting the recording changed: the module media and port speed, the PRBS polynomial, the host TX taps, and every byte written to the CMIS registers (a byte written with the value it had before the recording wrote it counts as unchanged). A command sent several times in the same state, e.g. repeated PRBS counter reads, gets the recorded responses in order, and then the last one again. So a search that visits settings the recording measured gets the measurements of the recording, even if it visits them in a different order.
+
+    CMIS registers are handled byte by byte, so a read of a register range that was not recorded (e.g. one read of several registers instead of one read per register) is assembled from the bytes recorded in the same state. A command never recorded in the current state gets the responses recorded for it in any state, which is counted as a miss if it is a get command. A recording of an exhaustive sweep covers the settings of the other search modes, except the combinations of lanes that share a CMIS register. The replay is deterministic.
+    """
+    def __init__(self, filename: str, command_latency: Optional[float] = None) -> None:
+        """
+        :param filename: Recording file path
+        :type filename: str
+        :param command_latency: Seconds per command round trip, defaults to None (the median response time of the recording)
+        :type command_latency: Optional[float], optional
+        """
+        with open(filename, "r") as f:
+            recording = json.load(f)
+        self.kinds: Dict[str, str] = recording["kinds"]
+        self.attributes: Dict[str, List[List[Any]]] = recording["attributes"]
+        latencies = [entry["latency"] for entry in recording["commands"] if "latency" in entry]
+        self.command_latency = command_latency if command_latency is not None else (statistics.median(latencies) if len(latencies) > 0 else 0.0)
+        self.command_count = 0
+        self.round_trip_count = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.connection = SimulatedConnection(self)
+        self.__generic_kinds = {generic_path(path): kind for path, kind in self.kinds.items()}
+        self.__responses: Dict[Tuple[str, FrozenSet[Tuple[str, str]]], List[Dict[str, Any]]] = {}
+        self.__any_state_responses: Dict[str, List[Dict[str, Any]]] = {}
+        self.__cmis_bytes: Dict[Tuple[str, int, int, FrozenSet[Tuple[str, str]]], str] = {}   # (port, page, register, state) -> byte read
+        self.__any_state_cmis_bytes: Dict[Tuple[str, int, int], str] = {}
+        self.__cursors: Dict[Any, int] = {}
+        self.__nodes: Dict[str, TrafficReplayNode] = {}
+        self.__settings: Dict[str, str] = {}
+        self.__state: FrozenSet[Tuple[str, str]] = frozenset()
+        commands = sorted(recording["commands"], key=lambda x: x["seq"])
+
+        # the settings the recording changed, and the CMIS bytes it read before changing them
+        initial_values: Dict[str, str] = {}
+        changed_settings = set()
+        for entry in commands:
+            access = parse_cmis_access(entry["command"])
+            if access is not None and access[4] == "get" and "response" in entry:
+                port, page, register, _, _, _ = access
+                for i, byte in enumerate(split_bytes(entry["response"]["fields"]["value"])):
+                    setting = cmis_byte_setting(port, page, register + i)
+                    if setting not in changed_settings:
+                        initial_values.setdefault(setting, byte)
+            changed_settings.update(setting for setting, _ in channel_settings(entry["command"]))
+        self.__recorded_settings = {setting: initial_values.get(setting, "") for setting in changed_settings}  # setting -> value before the recording changed it, "" if unknown
+
+        for entry in commands:
+            self.__responses.setdefault((entry["command"], self.__state), []).append(entry)
+            self.__any_state_responses.setdefault(entry["command"], []).append(entry)
+            access = parse_cmis_access(entry["command"])
+            if access is not None and access[4] == "get" and "response" in entry:
+                port, page, register, _, _, _ = access
+                for i, byte in enumerate(split_bytes(entry["response"]["fields"]["value"])):
+                    self.__cmis_bytes[(port, page, register + i, self.__state)] = byte
+                    self.__any_state_cmis_bytes[(port, page, register + i)] = byte
+            self.__update_state(entry["command"])
+        self.__settings = {}
+        self.__state = frozenset()
+
+    def __update_state(self, command: str) -> None:
+        changed = False
+        for setting, value in channel_settings(command):
+            if setting not in self.__recorded_settings:
+                # the recording never changed it, so it cannot tell states apart
+                continue
+            if value == self.__recorded_settings[setting]:
+                changed = changed or self.__settings.pop(setting, None) is not None
+            elif self.__settings.get(setting) != value:
+                self.__settings[setting] = value
+                changed = True
+        if changed:
+            self.__state = frozenset(self.__settings.items())
+
+    def connect(self, host: str) -> Any:
+        """The replayed tester of a chassis
+
+        :param host: Chassis IP address
+        :type host: str
+        :return: The replayed tester
+        :rtype: Any
+        """
+        return self.resolve(host)
+
+    def kind_of(self, path: str) -> Optional[str]:
+        kind = self.kinds.get(path)
+        if kind is None:
+            # CMIS register ranges that were not recorded work like the recorded ones
+            kind = self.__generic_kinds.get(generic_path(path))
+        return kind
+
+    def resolve(self, path: str) -> Any:
+        if path in self.attributes:
+            return self.attribute(path)
+        kind = self.kind_of(path)
+        if kind is None:
+            raise TrafficReplayError(f"{path} was not recorded")
+        if kind == "method":
+            return TrafficReplayMethod(self, path)
+        if path not in self.__nodes:
+            self.__nodes[path] = TrafficReplayNode(self, path)
+        return self.__nodes[path]
+
+    def attribute(self, path: str) -> Any:
+        """Value of an attribute, as it was when the recording had sent as many commands as the replay has served, e.g. the ports of a module before and after the module media is set
+        """
+        history = self.attributes[path]
+        value = history[0][1]
+        for count, recorded_value in history:
+            if count > self.command_count:
+                break
+            value = recorded_value
+        return decode_value(value)
+
+    def call(self, command: str) -> Any:
+        kind = self.kind_of(command)
+        if kind == "token":
+            return SimulatedToken(self.connection, command)
+        if kind == "coroutine":
+            return self.connection.query(command)
+        if kind == "list":
+            return [self.resolve(f"{command}[{i}]") for i in range(self.attribute(f"{command}/__len__"))]
+        return self.resolve(command)
+
+    def execute(self, command: str) -> Any:
+        """Serve one command
+        """
+        self.command_count += 1
+        try:
+            return self.__serve(command)
+        finally:
+            self.__update_state(command)
+
+    def __serve(self, command: str) -> Any:
+        key: Any = (command, self.__state)
+        entries = self.__responses.get(key)
+        access = parse_cmis_access(command)
+        if entries is None and access is not None:
+            port, page, register, byte_count, method, _ = access
+            if method == "set":
+                self.hit_count += 1
+                return None
+            value = self.__read_cmis_bytes(port, page, register, byte_count, self.__state)
+            if value is not None:
+                self.hit_count += 1
+                return SimpleNamespace(value=value)
+        if entries is not None:
+            self.hit_count += 1
+        else:
+            if command.rpartition("(")[0].endswith("/get"):
+                self.miss_count += 1
+            key = command
+            entries = self.__any_state_responses.get(command)
+            if entries is None:
+                value = self.__read_cmis_bytes(port, page, register, byte_count, None) if access is not None else None
+                if value is None:
+                    raise TrafficReplayError(f"{command} was not recorded")
+                return SimpleNamespace(value=value)
+        cursor = self.__cursors.get(key, 0)
+        self.__cursors[key] = cursor + 1
+        entry = entries[min(cursor, len(entries) - 1)]
+        if "error" in entry:
+            raise TrafficReplayError(f"{command}: {entry['error']}")
+        return decode_value(entry.get("response"))
+
+    def __read_cmis_bytes(self, port: str, page: int, register: int, byte_count: int, state: Optional[FrozenSet[Tuple[str, str]]]) -> Optional[str]:
+        value = ""
+        for reg_addr in range(register, register + byte_count):
+            byte = self.__cmis_bytes.get((port, page, reg_addr, state)) if state is not None else self.__any_state_cmis_bytes.get((port, page, reg_addr))
+            if byte is None:
+                return None
+            value += byte
+        return value
+
+
+class TrafficReplayError(Exception):
+    """A command that the recording cannot serve, or that failed when it was recorded"""
+
+
+class TrafficReplayNode:
+    """A replayed tester object. ``isinstance()`` sees the class of the recorded object."""
+    def __init__(self, replay: TrafficReplay, path: str) -> None:
+        object.__setattr__(self, "_replay", replay)
+        object.__setattr__(self, "_path", path)
+
+    @property
+    def __class__(self):  # type: ignore
+        kind = self._replay.kinds.get(self._path, "")
+        if kind == "list":
+            return list
+        if kind.startswith("object:"):
+            _, module_name, class_name = kind.split(":")
+            try:
+                target = importlib.import_module(module_name)
+                for name in class_name.split("."):
+                    target = getattr(target, name)
+                return target
+            except (ImportError, AttributeError):
+                pass
+        return TrafficReplayNode
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self._replay.resolve(f"{self._path}/{name}")
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._replay.resolve(f"{self._path}[{index}]")
+
+    def __len__(self) -> int:
+        return self._replay.attribute(f"{self._path}/__len__")
+
+    def __iter__(self):
+        return iter([self[i] for i in range(len(self))])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0 if f"{self._path}/__len__" in self._replay.attributes else True
+
+    def __repr__(self) -> str:
+        return f"<replayed {self._path}>"
+
+
+class TrafficReplayMethod:
+    """A replayed method of a tester object"""
+    def __init__(self, replay: TrafficReplay, path: str) -> None:
+        self.replay = replay
+        self.path = path
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.replay.call(call_path(self.path, args, kwargs))
@@ -7,6 +7,8 @@ from xoa_driver import testers, modules, ports, enums, utils
 from xoa_driver.misc import Hex
 from xoa_driver.hlfuncs import mgmt
 from .enums import *
+from .timing import timed
+from .checkpoint import settle_sleep
 import logging
 from typing import(List, Any, Union, Dict, Tuple, TYPE_CHECKING)
 import time, os
@@ -42,6 +44,32 @@ class PortTxEqLimits:
     def num_txeq_post(self) -> int:
         return self.num_txeq - self.num_txeq_pre - 1
 
+    @property
+    def max_txeq_sum(self) -> int:
+        """The maximum sum of the absolute tap values of a lane
+        """
+        return 87 if isinstance(self.port_obj, ports.Z800FreyaPort) else 168
+
+    def txeq_position(self, txeq_index: int) -> int:
+        """Return the position of a Tx Eq in the tap value list
+
+        :param txeq_index: Tx Eq index. -1 = pre1, -2 = pre2, 0 = main, 1 = post1, 2 = post2
+        :type txeq_index: int
+        :return: position in the tap value list, e.g. [pre2, pre1, main, post1, post2]
+        :rtype: int
+        """
+        if txeq_index < 0 and abs(txeq_index) > self.num_txeq_pre:
+            raise ValueError("Invalid TXEQ_PRE index")
+        if txeq_index > 0 and txeq_index > self.num_txeq_post:
+            raise ValueError("Invalid TXEQ_POST index")
+        return self.num_txeq_pre + txeq_index
+
+    def txeq_range(self, txeq_index: int) -> Tuple[int, int]:
+        """Return the (min, max) of a Tx Eq
+        """
+        _position = self.txeq_position(txeq_index)
+        return (self.txeq_mins[_position], self.txeq_maxs[_position])
+
     @property
     def txeq_limits(self) -> List[Dict[str, int]]:
         """Return the max and min for each Tx Eq.
@@ -117,6 +145,7 @@ async def read_one_txeq_range_from_lane(port: FreyaEdunPort, lane: int, txeq_ind
 # func: read_txeq_from_lanes
 # description: Read Tx Eq values from the lanes.
 # *************************************************************************************
+@timed("txeq_read")
 async def read_txeq_from_lanes(port: FreyaEdunPort, lanes: List[int]) -> List[Dict[str, Any]]:
     """Read host tx eq values of the lanes
 
@@ -141,10 +170,16 @@ async def read_txeq_from_lanes(port: FreyaEdunPort, lanes: List[int]) -> List[Di
     await asyncio.sleep(1)
     return results
 
+def lane_txeq_settings(txeq_dicts: List[Dict[str, Any]]) -> Dict[int, Tuple[int, ...]]:
+    """Tx eq values of each lane, from the result of :func:`read_txeq_from_lanes`
+    """
+    return {item["lane"]: tuple(item["txeq_values"]) for item in txeq_dicts}
+
 # *************************************************************************************
 # func: optimize_txeq_on_lanes
 # description: Update one TX eq value from the lanes. 
 # *************************************************************************************
+@timed("txeq_optimize")
 async def optimize_txeq_on_lanes(port: FreyaEdunPort, lanes: List[int], txeq_index: int, mode: str, delay_after_write: int, logger_name: str, port_txeq_limits: PortTxEqLimits) -> List[int]:
     """Update one Tx eq on the lanes
 
@@ -185,7 +220,7 @@ async def optimize_txeq_on_lanes(port: FreyaEdunPort, lanes: List[int], txeq_ind
     if txeq_index > 0 and txeq_index > num_txeq_post:
         raise ValueError("Invalid TXEQ_POST index")
     
-    max_txeq_sum = 87 if isinstance(port, ports.Z800FreyaPort) else 168
+    max_txeq_sum = port_txeq_limits.max_txeq_sum
 
     # Read the current TxEq values from the lanes
     cmd_list = []
@@ -253,7 +288,7 @@ async def optimize_txeq_on_lanes(port: FreyaEdunPort, lanes: List[int], txeq_ind
     # Wait for a certain duration to let the EQ settings take effect.
     logger = logging.getLogger(logger_name)
     logger.info(f"Delay after EQ write: {delay_after_write}s")
-    await asyncio.sleep(delay_after_write)
+    await settle_sleep(delay_after_write)
     return results
 
 
@@ -261,6 +296,7 @@ async def optimize_txeq_on_lanes(port: FreyaEdunPort, lanes: List[int], txeq_ind
 # func: write_txeq_to_lanes
 # description: Load Tx tap values to the lanes.
 # *************************************************************************************
+@timed("txeq_write")
 async def write_txeq_to_lanes(port: FreyaEdunPort, lane_txeq_list: List[Tuple[int, List[int]]], delay_after_write: int, logger_name: str) -> None:
     """Write Tx eq values to the lanes
 
@@ -283,7 +319,7 @@ async def write_txeq_to_lanes(port: FreyaEdunPort, lane_txeq_list: List[Tuple[in
         logger.info(f"Port {port.kind.module_id}/{port.kind.port_id}: Write tx eq values {_txeq_values} to Lane {_lane}")
     await utils.apply(*cmd_list)
     logger.info(f"Delay after EQ write: {delay_after_write}s")
-    await asyncio.sleep(delay_after_write)
+    await settle_sleep(delay_after_write)
 
 
 # *************************************************************************************
@@ -7,9 +7,12 @@ from xoa_driver import testers, modules, ports, enums, utils
 from xoa_driver.misc import Hex
 from xoa_driver.hlfuncs import mgmt
 from .enums import *
+from .models import ConcurrencyConfig
+from .timing import port_pair_scope, timed
 import logging
-from typing import(List, Any, Union, Dict, Tuple, TYPE_CHECKING)
+from typing import(List, Any, Union, Dict, Tuple, Set, Callable, Awaitable, TYPE_CHECKING)
 import time, os
+import contextlib
 from dataclasses import dataclass
 
 FreyaEdunModule = Union[modules.Z800FreyaModule, modules.Z1600EdunModule]
@@ -73,6 +76,7 @@ async def convert_port_ids_to_objects(tester_objs: List[testers.L23Tester], port
 # func: config_modules
 # description: Configure modules with media and port speed
 # *************************************************************************************
+@timed("config_modules")
 async def config_modules(tester_obj: testers.L23Tester, module_str_configs: List[Tuple[str, str, str]], logger_name: str) -> None:
     """Config each module in the list
 
@@ -148,3 +152,93 @@ def find_tester_obj(chassis_ip: str, tester_objs: List[testers.L23Tester]) -> te
 
 
 
+
+
+
+# *************************************************************************************
+# func: get_port_pair_resources
+# description: Get the chassis and modules used by a port pair
+# *************************************************************************************
+def get_port_pair_resources(port_pair: Dict[str, str]) -> Tuple[Set[str], Set[Tuple[str, int]]]:
+    """Get the chassis and modules used by a port pair
+
+    :param port_pair: The port pair as defined in the config file, e.g. {"tx": "10.165.136.60:3/0", "rx": "10.165.136.60:6/0"}
+    :type port_pair: Dict[str, str]
+    :return: Tuple of the set of chassis IPs, and the set of (chassis IP, module id)
+    :rtype: Tuple[Set[str], Set[Tuple[str, int]]]
+    """
+    chassis_set: Set[str] = set()
+    module_set: Set[Tuple[str, int]] = set()
+    for port_str in (port_pair["tx"], port_pair["rx"]):
+        chassis_ip = port_str.split(":")[0]
+        module_id = int(port_str.split(":")[1].split("/")[0])
+        chassis_set.add(chassis_ip)
+        module_set.add((chassis_ip, module_id))
+    return chassis_set, module_set
+
+
+# *************************************************************************************
+# func: run_port_pairs
+# description: Run a test function on each port pair, either one pair at a time or
+# concurrently with a parallelism cap per chassis and per module
+# *************************************************************************************
+async def run_port_pairs(port_pair_list: List[Dict[str, str]], port_pair_obj_list: List[Dict[str, FreyaEdunPort]], pair_func: Callable[[Dict[str, FreyaEdunPort]], Awaitable[None]], concurrency: ConcurrencyConfig, logger_name: str) -> None:
+    """Run a test function on each port pair, either one pair at a time or concurrently.
+
+    In concurrent mode, each port pair runs as its own asyncio task. A port pair only starts when it can take a slot on every chassis and every module it uses, so ``max_pairs_per_chassis`` and ``max_pairs_per_module`` cap the parallelism on the hardware. Slots are always taken in the same order to avoid deadlocks between pairs spanning several chassis.
+
+    :param port_pair_list: The list of port pairs as defined in the config file
+    :type port_pair_list: List[Dict[str, str]]
+    :param port_pair_obj_list: The list of port objects in the same order as the port pair list
+    :type port_pair_obj_list: List[Dict[str, FreyaEdunPort]]
+    :param pair_func: The coroutine function to run on one port pair
+    :type pair_func: Callable[[Dict[str, FreyaEdunPort]], Awaitable[None]]
+    :param concurrency: Concurrency configuration
+    :type concurrency: ConcurrencyConfig
+    :param logger_name: Logger name
+    :type logger_name: str
+    """
+    logger = logging.getLogger(logger_name)
+    if not concurrency.enable or len(port_pair_obj_list) <= 1:
+        for port_pair, port_pair_obj in zip(port_pair_list, port_pair_obj_list):
+            with port_pair_scope(port_pair):
+                await pair_func(port_pair_obj)
+        return
+
+    chassis_sems: Dict[str, asyncio.Semaphore] = {}
+    module_sems: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+    pair_sems: List[List[asyncio.Semaphore]] = []
+    for port_pair in port_pair_list:
+        chassis_set, module_set = get_port_pair_resources(port_pair)
+        sems = []
+        if concurrency.max_pairs_per_chassis > 0:
+            for chassis_ip in sorted(chassis_set):
+                if chassis_ip not in chassis_sems:
+                    chassis_sems[chassis_ip] = asyncio.Semaphore(concurrency.max_pairs_per_chassis)
+                sems.append(chassis_sems[chassis_ip])
+        if concurrency.max_pairs_per_module > 0:
+            for module_key in sorted(module_set):
+                if module_key not in module_sems:
+                    module_sems[module_key] = asyncio.Semaphore(concurrency.max_pairs_per_module)
+                sems.append(module_sems[module_key])
+        pair_sems.append(sems)
+
+    async def _run_one(port_pair: Dict[str, str], port_pair_obj: Dict[str, FreyaEdunPort], sems: List[asyncio.Semaphore]) -> None:
+        async with contextlib.AsyncExitStack() as stack:
+            for sem in sems:
+                await stack.enter_async_context(sem)
+            with port_pair_scope(port_pair):
+                await pair_func(port_pair_obj)
+
+    logger.info(f"Running {len(port_pair_obj_list)} port pairs concurrently (max per chassis: {concurrency.max_pairs_per_chassis or 'unlimited'}, max per module: {concurrency.max_pairs_per_module or 'unlimited'})")
+    results = await asyncio.gather(
+        *[_run_one(port_pair, port_pair_obj, sems) for port_pair, port_pair_obj, sems in zip(port_pair_list, port_pair_obj_list, pair_sems)],
+        return_exceptions=True
+    )
+    errors = []
+    for port_pair, result in zip(port_pair_list, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Port pair {port_pair['tx']} -> {port_pair['rx']} failed: {result!r}")
+            errors.append(result)
+    if len(errors) > 0:
+        raise errors[0]